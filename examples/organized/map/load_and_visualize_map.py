@@ -13,6 +13,9 @@ from secontrol.tools.navigation_tools import get_world_position
 
 
 MAX_SOLID_POINTS = 2000
+# Уровень LOD карты: 0 — все точки, 1/2 — ячейки в 4/16 раз крупнее (8/32 м
+# при чанке 100 м). Для обзора на километр хватает первого уровня.
+MAP_LOD = 1
 
 
 def _downsample_points(points, max_points: int = MAX_SOLID_POINTS):
@@ -117,7 +120,7 @@ class App:
         print(f"Позиция для загрузки: {own_position}")
 
         # Загрузить регион карты вокруг позиции
-        data = self.map_ctrl.load_region(center=own_position, radius=self.visualization_radius)
+        data = self.map_ctrl.load_region(center=own_position, radius=self.visualization_radius, lod=MAP_LOD)
         print(f"Загружено: {len(data.voxels)} вокселей, {len(data.ores)} руд, {len(data.visited)} посещенных")
 
         # Подготовка данных для визуализации
@@ -32,7 +32,7 @@ from secontrol.common import close, prepare_grid
 from secontrol.devices.ore_detector_device import OreDetectorDevice
 from secontrol.devices.remote_control_device import RemoteControlDevice
 from secontrol.controllers.radar_controller import RadarController
-from secontrol.tools.radar_navigation import PathFinder, PassabilityProfile, RawRadarMap
+from secontrol.tools.radar_navigation import PathCache, PathFinder, PassabilityProfile, RawRadarMap
 from secontrol.tools.navigation_tools import fly_to_point, get_world_position, _dist
 
 DEFAULT_GRID = "skynet-baza0"
@@ -121,6 +121,10 @@ def build_radar_map(
 
 # ── A* path planning (same as reference code) ────────────────────────
 
+# Dock <-> mine legs repeat; cached paths are re-validated against each new map.
+PATH_CACHE = PathCache()
+
+
 def plan_path(
     radar_map: RawRadarMap,
     start: Tuple[float, float, float],
@@ -137,7 +141,7 @@ def plan_path(
         is_ground_vehicle=False,         # flying, not driving
     )
     pathfinder = PathFinder(radar_map, profile)
-    return pathfinder.find_path_world(start, goal)
+    return pathfinder.find_path_world(start, goal, cache=PATH_CACHE)
 
 
 # ── Forward scanner (background safety check) ────────────────────────
@@ -1,9 +1,42 @@
-from typing import Optional, Tuple, List, Dict, Any
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, List, Dict, Any, Callable, Generator
 import time
 import numpy as np
 from secontrol.devices.ore_detector_device import OreDetectorDevice
 from secontrol.devices.remote_control_device import RemoteControlDevice
 from secontrol.tools.navigation_tools import fly_to_point, get_world_position
+from secontrol.tools.ore_index import OreIndex
+from secontrol.tools.radar_fusion import FusedRadarMap
+
+
+ScanResult = Tuple[
+    Optional[List[List[float]]],
+    Optional[Dict[str, Any]],
+    Optional[List[Dict[str, Any]]],
+    Optional[List[Dict[str, Any]]],
+]
+
+
+@dataclass
+class ScanUpdate:
+    """Progress report yielded by :meth:`RadarController.iter_scan_voxels`.
+
+    ``new_solid`` holds only the solid points whose cells were not occupied by
+    an earlier update of the same scan, so consumers can merge incrementally.
+    The final update has ``done=True`` and carries the same
+    ``(solid, metadata, contacts, ore_cells)`` tuple ``scan_voxels`` returns.
+    """
+
+    processed_tiles: int = 0
+    total_tiles: int = 0
+    progress: float = 0.0
+    new_solid: List[List[float]] = field(default_factory=list)
+    solid_count: int = 0
+    metadata: Optional[Dict[str, Any]] = None
+    contacts: List[Dict[str, Any]] = field(default_factory=list)
+    ore_cells: List[Dict[str, Any]] = field(default_factory=list)
+    done: bool = False
+    result: Optional[ScanResult] = None
 
 
 class RadarController:
@@ -27,7 +60,8 @@ class RadarController:
         budget_ms_per_tick: Optional[float] = None,
         filter_no_stone: bool = True,
         telemetry_retries: int = 5,
-        telemetry_retry_delay: float = 0.5
+        telemetry_retry_delay: float = 0.5,
+        world_model: Optional[FusedRadarMap] = None,
     ):
         self.radar: OreDetectorDevice = radar
 
@@ -58,6 +92,12 @@ class RadarController:
         self.telemetry_retries = telemetry_retries
         self.telemetry_retry_delay = telemetry_retry_delay
 
+        # Optional persistent map that accumulates every completed scan
+        self.world_model = world_model
+
+        # Ore cells from every scan, deduplicated and clustered into deposits
+        self.ore_index = OreIndex()
+
     @staticmethod
     def _radar_marker(radar: Optional[Dict[str, Any]]) -> tuple[Any, Any, Any]:
         if not isinstance(radar, dict):
@@ -163,12 +203,7 @@ class RadarController:
 
     def filter_valuable_ore_cells(self, ore_cells: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Filter ore cells to exclude Stone, keeping only valuable minerals."""
-        valuable_ores = []
-        for cell in ore_cells:
-            material = cell.get("material") or cell.get("ore")
-            if material != "Stone":
-                valuable_ores.append(cell)
-        return valuable_ores
+        return [cell for cell in ore_cells if (cell.get("material") or cell.get("ore")) != "Stone"]
 
     def set_scan_params(self, **kwargs):
         """Update scan parameters."""
@@ -234,13 +269,45 @@ class RadarController:
 
         return contacts
 
-    def scan_voxels(self, filter_no_stone = None, max_wait_sec: float = 120.0, **scan_kwargs):
+    def scan_voxels(
+        self,
+        filter_no_stone = None,
+        max_wait_sec: float = 120.0,
+        on_progress: Optional[Callable[[ScanUpdate], None]] = None,
+        **scan_kwargs,
+    ):
         """Scan voxels, process result and return solid, metadata, contacts.
 
         Args:
             max_wait_sec: Maximum seconds to wait for a complete scan (100%).
                           The scan may be interrupted by telemetry resets; this
                           timeout prevents an infinite wait.
+            on_progress: Optional callback receiving every :class:`ScanUpdate`
+                         while tiles arrive (see :meth:`iter_scan_voxels`).
+        """
+        stream = self.iter_scan_voxels(filter_no_stone, max_wait_sec, **scan_kwargs)
+        while True:
+            try:
+                update = next(stream)
+            except StopIteration as stop:
+                return stop.value
+            if on_progress is not None:
+                on_progress(update)
+
+    def iter_scan_voxels(
+        self,
+        filter_no_stone = None,
+        max_wait_sec: float = 120.0,
+        **scan_kwargs,
+    ) -> Generator[ScanUpdate, None, ScanResult]:
+        """Streaming variant of :meth:`scan_voxels`.
+
+        Yields a :class:`ScanUpdate` whenever the server reports new tiles or
+        publishes an intermediate radar payload, merging partial solid points
+        into :attr:`occupancy_grid` as they arrive so planning can start on the
+        near field before the sphere is complete. The generator's return value
+        (and the ``result`` of the last ``done`` update) is the usual
+        ``(solid, metadata, contacts, ore_cells)`` tuple.
         """
         print(f"Scanning voxels...")
         start_time = time.time()
@@ -274,6 +341,9 @@ class RadarController:
         radar_data = None
         saw_scan_start = False
         last_active_scan = None
+        partial_marker = initial_marker
+        partial_cells: Optional[np.ndarray] = None
+        partial_key: Optional[tuple] = None
         while True:
             elapsed_total = time.time() - start_time
             if elapsed_total > max_wait_sec:
@@ -301,7 +371,40 @@ class RadarController:
                     print(f"[scan] Completed: {progress:.1f}% ({processed}/{total} tiles, {elapsed:.1f}s)")
                 break
 
-            if isinstance(scan, dict):
+            new_solid: Optional[List[List[float]]] = None
+            if (
+                isinstance(candidate, dict)
+                and marker != partial_marker
+                and marker != (None, None, None)
+            ):
+                partial_marker = marker
+                partial_solid, partial_meta, partial_contacts, partial_ores = self.extract_solid(candidate)
+                try:
+                    key = (
+                        tuple(partial_meta.get("size") or ()),
+                        tuple(partial_meta.get("origin") or ()),
+                        partial_meta.get("cellSize"),
+                    )
+                except TypeError:
+                    # Malformed intermediate payload: skip it, the next one may be fine.
+                    key = None
+                if key is not None:
+                    if key != partial_key:
+                        partial_key = key
+                        partial_cells = None
+                    new_solid, partial_cells = self._merge_partial_solid(partial_solid, partial_meta, partial_cells)
+
+            if not isinstance(scan, dict):
+                # No scan state in this packet: still report the new cells.
+                if new_solid:
+                    yield ScanUpdate(
+                        new_solid=new_solid,
+                        solid_count=int(partial_cells.size) if partial_cells is not None else 0,
+                        metadata=partial_meta,
+                        contacts=partial_contacts,
+                        ore_cells=partial_ores,
+                    )
+            else:
                 self.last_scan_state = scan
                 in_progress = scan.get("inProgress", False)
                 progress = scan.get("progressPercent", 0)
@@ -309,6 +412,18 @@ class RadarController:
                 total = scan.get("totalTiles", 0)
                 elapsed = scan.get("elapsedSeconds", 0)
 
+                if (in_progress and progress != last_progress) or new_solid:
+                    yield ScanUpdate(
+                        processed_tiles=int(processed or 0),
+                        total_tiles=int(total or 0),
+                        progress=float(progress or 0.0),
+                        new_solid=new_solid or [],
+                        solid_count=int(partial_cells.size) if partial_cells is not None else 0,
+                        metadata=partial_meta if new_solid is not None else None,
+                        contacts=partial_contacts if new_solid is not None else [],
+                        ore_cells=partial_ores if new_solid is not None else [],
+                    )
+
                 if in_progress and progress != last_progress:
                     saw_scan_start = True
                     last_active_scan = scan
@@ -462,7 +577,83 @@ class RadarController:
             self.cell_size = cell_sz
             self.size = (size_x, size_y, size_z)
 
-        return solid, metadata, contacts, ore_cells
+        if ore_cells:
+            self.ore_index.add_cells(ore_cells)
+
+        if self.world_model is not None:
+            rev = self.world_model.integrate_scan(solid, metadata)
+            print(f"[scan] Fused into world model: rev={rev}, bricks={len(self.world_model)}")
+
+        result = (solid, metadata, contacts, ore_cells)
+        final_scan = last_active_scan if isinstance(last_active_scan, dict) else (self.last_scan_state or {})
+        yield ScanUpdate(
+            processed_tiles=int(final_scan.get("processedTiles", 0) or 0),
+            total_tiles=int(final_scan.get("totalTiles", 0) or 0),
+            progress=100.0 if radar_data.get("done") else float(final_scan.get("progressPercent", 0) or 0),
+            solid_count=len(solid),
+            metadata=metadata,
+            contacts=contacts,
+            ore_cells=ore_cells,
+            done=True,
+            result=result,
+        )
+        return result
+
+    def _merge_partial_solid(
+        self,
+        solid: List[List[float]],
+        metadata: Dict[str, Any],
+        known_cells: Optional[np.ndarray],
+    ) -> Tuple[List[List[float]], Optional[np.ndarray]]:
+        """Merge an intermediate radar payload into ``occupancy_grid``.
+
+        ``known_cells`` is the sorted array of flat cell indices already merged
+        for this scan. Returns the points that landed in new cells together
+        with the updated index array.
+        """
+        try:
+            origin = np.array(metadata["origin"], dtype=float)
+            cell_sz = float(metadata["cellSize"])
+            size_x, size_y, size_z = (int(v) for v in metadata["size"])
+        except (KeyError, TypeError, ValueError):
+            return [], known_cells
+        if cell_sz <= 0 or size_x <= 0 or size_y <= 0 or size_z <= 0:
+            return [], known_cells
+
+        if known_cells is None or self.occupancy_grid is None or self.size != (size_x, size_y, size_z):
+            self.occupancy_grid = np.zeros((size_x, size_y, size_z), dtype=bool)
+            self.origin = tuple(origin)
+            self.cell_size = cell_sz
+            self.size = (size_x, size_y, size_z)
+            known_cells = np.zeros(0, dtype=np.int64)
+
+        if not solid:
+            return [], known_cells
+        try:
+            arr = np.asarray(solid, dtype=np.float64)
+        except (TypeError, ValueError):
+            return [], known_cells
+        if arr.ndim != 2 or arr.shape[1] != 3:
+            return [], known_cells
+
+        idx = np.rint((arr - origin.reshape(1, 3)) / cell_sz - 0.5).astype(np.int64)
+        valid = (
+            (idx[:, 0] >= 0) & (idx[:, 0] < size_x) &
+            (idx[:, 1] >= 0) & (idx[:, 1] < size_y) &
+            (idx[:, 2] >= 0) & (idx[:, 2] < size_z)
+        )
+        arr = arr[valid]
+        idx = idx[valid]
+        flat = (idx[:, 0] * size_y + idx[:, 1]) * size_z + idx[:, 2]
+        flat, first = np.unique(flat, return_index=True)
+        fresh = ~np.isin(flat, known_cells, assume_unique=True)
+        if not np.any(fresh):
+            return [], known_cells
+
+        fresh_idx = idx[first[fresh]]
+        self.occupancy_grid[fresh_idx[:, 0], fresh_idx[:, 1], fresh_idx[:, 2]] = True
+        known_cells = np.union1d(known_cells, flat[fresh])
+        return arr[first[fresh]].tolist(), known_cells
 
     def get_surface_height(
         self,
@@ -523,7 +714,8 @@ class RadarController:
         1) Очищает регион скана (делает все клетки пустыми).
         2) Записывает новые solid-ячейки.
 
-        solid_points – список точек (x, y, z) или dict'ов с координатами.
+        solid_points – список точек (x, y, z), dict'ов с координатами или
+                       массив ``(N, 3)`` (обрабатывается векторно, без цикла).
         scan_center  – центр скана в мировых координатах (если знаем).
         scan_radius  – радиус скана (если знаем).
 
@@ -538,7 +730,12 @@ class RadarController:
             print("RadarController.apply_scan_to_occupancy: no grid metadata, skip update.")
             return
 
-        if not solid_points:
+        solid_array = (
+            np.asarray(solid_points, dtype=np.float64).reshape(-1, 3)
+            if isinstance(solid_points, np.ndarray)
+            else None
+        )
+        if (len(solid_array) == 0) if solid_array is not None else not solid_points:
             print("RadarController.apply_scan_to_occupancy: no solid points, clearing scanned region only.")
 
         ox, oy, oz = self.origin
@@ -557,6 +754,14 @@ class RadarController:
             max_y = cy + r
             min_z = cz - r
             max_z = cz + r
+        elif solid_array is not None:
+            if len(solid_array) == 0:
+                print("RadarController.apply_scan_to_occupancy: no valid solid coords.")
+                return
+            (min_x, min_y, min_z), (max_x, max_y, max_z) = (
+                solid_array.min(axis=0) - cell,
+                solid_array.max(axis=0) + cell,
+            )
         else:
             # Берём AABB по фактическим solid-точкам
             xs = []
@@ -620,6 +825,14 @@ class RadarController:
         self.occupancy_grid[ix0:ix1 + 1, iy0:iy1 + 1, iz0:iz1 + 1] = False
 
         # --- 3. Записываем новые solid-пункты ---
+        if solid_array is not None:
+            cells = ((solid_array - np.array([ox, oy, oz], dtype=np.float64)) / cell).astype(np.int64)
+            inside = np.all((cells >= 0) & (cells < np.array([size_x, size_y, size_z])), axis=1)
+            cells = cells[inside]
+            self.occupancy_grid[cells[:, 0], cells[:, 1], cells[:, 2]] = True
+            print(f"apply_scan_to_occupancy: written {len(cells)} solid cells.")
+            return
+
         written = 0
         for p in solid_points:
             if isinstance(p, dict):
@@ -1,23 +1,97 @@
 from __future__ import annotations
 
+import functools
 import json
 import math
 import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
+import numpy as np
+from redis.exceptions import WatchError
+
 from secontrol.common import resolve_owner_id
 from secontrol.controllers.radar_controller import RadarController
 from secontrol.devices.ore_detector_device import OreDetectorDevice
 from secontrol.devices.remote_control_device import RemoteControlDevice
 from secontrol.redis_client import RedisEventClient
+from secontrol.tools import chunk_codec
 from secontrol.tools.navigation_tools import get_world_position
 
 
 Point3D = Tuple[float, float, float]
 
+_KINDS = ("voxels", "visited", "ores")
+_MGET_BATCH = 512
+_BOX_ENUM_LIMIT = 4096
+_WATCH_RETRIES = 32
+
+# LOD-пирамида точек: уровень N хранит центр каждой занятой ячейки ребром
+# ``chunk_size / _LOD_BASE_CELLS * 4**N`` в чанках ребром ``chunk_size * 4**N``
+# (при чанке 100 м — ячейки 8 и 32 м в чанках 400 м и 1.6 км). Ячейки и чанки
+# соседних уровней вложены, поэтому уровень N строится из уровня N - 1.
+_LOD_FACTOR = 4
+_LOD_LEVELS = 2
+_LOD_BASE_CELLS = 50
+_LOD_SOURCES = ("voxels", "visited")
+_LOD_KINDS = tuple(f"{kind}_lod{level}" for level in range(1, _LOD_LEVELS + 1) for kind in _LOD_SOURCES)
+_INDEXED_KINDS = _KINDS + _LOD_KINDS
+# Вид записи в SharedMapChunkCache для рудных чанков в колоночном виде.
+_ORE_ARRAYS = "ores_arrays"
+
+# Атомарное слияние несжатого int16-чанка точек (см. chunk_codec): записи по
+# 6 байт дописываются без дубликатов, счетчик в заголовке переписывается,
+# id чанка добавляется в SET индекса. Чанк другого формата или с другим
+# центром/разрешением не трогаем и возвращаем -1 — его сольет клиент.
+# KEYS: чанк, SET индекса; ARGV: заголовок, новые записи, id чанка, флаг индекса.
+_MERGE_POINTS_LUA = """
+local header, incoming = ARGV[1], ARGV[2]
+local size = #header
+if #incoming % 6 ~= 0 then
+  return redis.error_reply('record block is not a multiple of 6 bytes')
+end
+local current = redis.call('GET', KEYS[1])
+local body = ''
+if current then
+  if #current < size or (#current - size) % 6 ~= 0
+      or string.sub(current, 1, 8) ~= string.sub(header, 1, 8)
+      or string.sub(current, 13, size) ~= string.sub(header, 13, size) then
+    return -1
+  end
+  body = string.sub(current, size + 1)
+end
+local seen = {}
+for i = 1, #body, 6 do
+  seen[string.sub(body, i, i + 5)] = true
+end
+local parts, added = {body}, 0
+for i = 1, #incoming, 6 do
+  local record = string.sub(incoming, i, i + 5)
+  if not seen[record] then
+    seen[record] = true
+    added = added + 1
+    parts[#parts + 1] = record
+  end
+end
+if added > 0 or not current then
+  local merged = table.concat(parts)
+  local n = #merged / 6
+  local count = string.char(n % 256, math.floor(n / 256) % 256,
+    math.floor(n / 65536) % 256, math.floor(n / 16777216) % 256)
+  redis.call('SET', KEYS[1], string.sub(header, 1, 8) .. count .. string.sub(header, 13, size) .. merged)
+end
+if ARGV[4] == '1' then
+  redis.call('SADD', KEYS[2], ARGV[3])
+end
+return added
+"""
+
 
 @dataclass
 class OreHit:
@@ -32,6 +106,173 @@ def _normalize_point(point: Sequence[float]) -> Point3D:
     return (float(point[0]), float(point[1]), float(point[2]))
 
 
+def _chunk_coords(chunk_id: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        ix, iy, iz = (int(v) for v in str(chunk_id).split(":"))
+    except ValueError:
+        return None
+    return ix, iy, iz
+
+
+def _as_text(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else str(value)
+
+
+def _as_point_array(points: Iterable[Sequence[float]]) -> np.ndarray:
+    arr = np.asarray(points if isinstance(points, np.ndarray) else list(points), dtype=np.float64)
+    if arr.size == 0:
+        return np.zeros((0, 3), dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] != 3:
+        raise ValueError(f"Points must have 3 coordinates, got shape {arr.shape}")
+    return arr
+
+
+# Ключ вокселя — целые координаты точки на сетке ``resolution``. Точки,
+# отличающиеся на дрожание меньше шага сетки, дают один ключ.
+_PACK_BITS = 21
+
+
+def _voxel_row_keys(points: np.ndarray, resolution: float) -> List[bytes]:
+    """Ключи для множеств: три ``int64`` координаты сетки одной строкой байтов."""
+    cells = np.ascontiguousarray(np.rint(points / resolution), dtype=np.int64)
+    return cells.view(np.dtype((np.void, 24))).ravel().tolist()
+
+
+def _unique_voxel_rows(points: np.ndarray, resolution: float) -> np.ndarray:
+    """Индексы первых вхождений каждого вокселя, в исходном порядке."""
+    if len(points) < 2:
+        return np.arange(len(points))
+    cells = np.rint(points / resolution).astype(np.int64)
+    cells -= cells.min(axis=0)
+    if int(cells.max()) < (1 << _PACK_BITS):
+        # Чанк укладывается в 21 бит на ось: один int64 на точку и 1-D unique.
+        packed = (cells[:, 0] << (2 * _PACK_BITS)) | (cells[:, 1] << _PACK_BITS) | cells[:, 2]
+        _, first = np.unique(packed, return_index=True)
+    else:
+        _, first = np.unique(cells, axis=0, return_index=True)
+    return np.sort(first)
+
+
+def _thin_keep_mask(
+    points: np.ndarray,
+    resolution: float,
+    max_per_cell: int,
+    ore_cells: np.ndarray,
+) -> np.ndarray:
+    """Маска точек, остающихся после прореживания чанка.
+
+    В каждой ячейке сетки ``resolution`` остаются первые ``max_per_cell``
+    точек; ячейки с рудой (``ore_cells`` — целые координаты ячеек) не
+    прореживаются. Ключ ячейки считается относительно угла чанка, поэтому
+    помещается в int64 при любых мировых координатах.
+    """
+    cells = np.floor(points / resolution).astype(np.int64)
+    lo, hi = cells.min(axis=0), cells.max(axis=0)
+    dims = tuple(int(v) for v in hi - lo + 1)
+    keys = np.ravel_multi_index(tuple((cells - lo).T), dims)
+
+    if max_per_cell == 1:
+        _, first = np.unique(keys, return_index=True)
+        keep = np.zeros(len(points), dtype=bool)
+        keep[first] = True
+    else:
+        order = np.argsort(keys, kind="stable")
+        _, starts, sizes = np.unique(keys[order], return_index=True, return_counts=True)
+        rank = np.arange(len(points)) - np.repeat(starts, sizes)
+        keep = np.empty(len(points), dtype=bool)
+        keep[order] = rank < max_per_cell
+
+    if len(ore_cells):
+        inside = np.all((ore_cells >= lo) & (ore_cells <= hi), axis=1)
+        if inside.any():
+            ore_keys = np.ravel_multi_index(tuple((ore_cells[inside] - lo).T), dims)
+            keep |= np.isin(keys, ore_keys)
+    return keep
+
+
+def _lod_kind(kind: str, level: int) -> str:
+    return f"{kind}_lod{level}" if level else kind
+
+
+def _lod_level(kind: str) -> int:
+    _, sep, level = kind.rpartition("_lod")
+    return int(level) if sep and level.isdigit() else 0
+
+
+def _lod_grid(chunk_size: float, level: int) -> tuple[float, float]:
+    """Ребро чанка и ребро ячейки уровня ``level``."""
+    scale = float(_LOD_FACTOR**level)
+    return chunk_size * scale, chunk_size / _LOD_BASE_CELLS * scale
+
+
+def _lod_points(points: np.ndarray, cell: float) -> Dict[str, np.ndarray]:
+    """Центры занятых ячеек ребром ``cell``, разложенные по чанкам своего уровня.
+
+    Чанк уровня — ровно ``_LOD_BASE_CELLS`` ячеек по оси, поэтому его
+    координаты получаются целочисленным делением координат ячейки.
+    """
+    if not len(points):
+        return {}
+    cells = np.floor(points / cell).astype(np.int64)
+    lo = cells.min(axis=0)
+    dims = tuple(int(v) for v in cells.max(axis=0) - lo + 1)
+    if math.prod(dims) < 1 << 62:
+        # Как в _thin_keep_mask: один int64 на ячейку вместо unique по строкам.
+        flat = np.unique(np.ravel_multi_index(tuple((cells - lo).T), dims))
+        cells = np.stack(np.unravel_index(flat, dims), axis=1) + lo
+    else:
+        cells = np.unique(cells, axis=0)
+    chunks = cells // _LOD_BASE_CELLS
+    keys, inverse = np.unique(chunks, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1]
+    centres = (cells[order] + 0.5) * cell
+    return {
+        f"{ix}:{iy}:{iz}": part
+        for (ix, iy, iz), part in zip(keys.tolist(), np.split(centres, bounds))
+    }
+
+
+def _saved_kinds(idx: Dict[str, Any]) -> Tuple[str, ...]:
+    """Виды, которые переписывает ``save_index``: основные всегда, LOD — если есть в ``idx``."""
+    return _KINDS + tuple(kind for kind in _LOD_KINDS if kind in idx)
+
+
+def _merge_point_arrays(
+    existing: Optional[np.ndarray],
+    new: Sequence[Point3D],
+    resolution: float = chunk_codec.DEFAULT_RESOLUTION,
+) -> np.ndarray:
+    """Сохраненные точки чанка плюс новые, по одной на воксель сетки ``resolution``, в порядке поступления."""
+    parts = [arr for arr in (existing, np.asarray(new, dtype=np.float64).reshape(-1, 3)) if arr is not None and len(arr)]
+    if not parts:
+        return np.zeros((0, 3), dtype=np.float64)
+    merged = np.concatenate(parts)
+    return merged[_unique_voxel_rows(merged, resolution)]
+
+
+def _ore_chunk_from_hits(hits: Sequence["OreHit"]) -> chunk_codec.OreChunk:
+    names: Dict[str, int] = {}
+    ids = np.array([names.setdefault(hit.material, len(names)) for hit in hits], dtype=np.uint16)
+    content = np.array(
+        [float(h.content) if isinstance(h.content, (int, float)) and not isinstance(h.content, bool) else np.nan for h in hits],
+        dtype=np.float64,
+    )
+    return chunk_codec.OreChunk(
+        positions=np.asarray([hit.position for hit in hits], dtype=np.float64).reshape(-1, 3),
+        material_ids=ids,
+        materials=sorted(names, key=names.__getitem__),
+        content=content,
+    )
+
+
+def _merge_ore_hits(existing: Iterable[OreHit], new: Iterable[OreHit]) -> List[OreHit]:
+    """Руды чанка плюс новые; при совпадении материала и позиции побеждает новая."""
+    merged = {(o.material, o.position): o for o in [*existing, *new]}
+    return list(merged.values())
+
+
 @dataclass
 class SharedMapData:
     voxels: List[Point3D] = field(default_factory=list)
@@ -39,6 +280,11 @@ class SharedMapData:
     ores: List[OreHit] = field(default_factory=list)
     paths: Dict[str, List[Point3D]] = field(default_factory=dict)
     metadata: Dict[str, Any] = field(default_factory=dict)
+    # Шаг сетки для дедупликации merge_voxels/merge_visited.
+    resolution: float = chunk_codec.DEFAULT_RESOLUTION
+    # Множества ключей вокселей и длины списков, для которых они построены.
+    _keys: Dict[str, set] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _key_counts: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
 
     @classmethod
     def from_payload(cls, payload: Dict[str, Any] | None) -> "SharedMapData":
@@ -72,20 +318,26 @@ class SharedMapData:
         }
 
     def merge_voxels(self, points: Iterable[Sequence[float]]) -> None:
-        known = {p for p in self.voxels}
-        for point in points:
-            normalized = _normalize_point(point)
-            if normalized not in known:
-                self.voxels.append(normalized)
-                known.add(normalized)
+        self._merge_points("voxels", points)
 
     def merge_visited(self, points: Iterable[Sequence[float]]) -> None:
-        known = {p for p in self.visited}
-        for point in points:
-            normalized = _normalize_point(point)
-            if normalized not in known:
-                self.visited.append(normalized)
-                known.add(normalized)
+        self._merge_points("visited", points)
+
+    def _merge_points(self, kind: str, points: Iterable[Sequence[float]]) -> None:
+        # Множество ключей живет между вызовами, поэтому слияние стоит
+        # O(новых точек); список, измененный снаружи, переиндексируется.
+        target: List[Point3D] = getattr(self, kind)
+        known = self._keys.get(kind)
+        if known is None or self._key_counts.get(kind) != len(target):
+            existing = np.asarray(target, dtype=np.float64).reshape(-1, 3)
+            known = self._keys[kind] = set(_voxel_row_keys(existing, self.resolution))
+        arr = _as_point_array(points)
+        if len(arr):
+            for key, point in zip(_voxel_row_keys(arr, self.resolution), arr.tolist()):
+                if key not in known:
+                    known.add(key)
+                    target.append(tuple(point))  # type: ignore[arg-type]
+        self._key_counts[kind] = len(target)
 
     def merge_ores(self, ores: Iterable[OreHit]) -> None:
         known = {(ore.material, ore.position) for ore in self.ores}
@@ -96,6 +348,206 @@ class SharedMapData:
                 known.add(key)
 
 
+@dataclass
+class SharedMapArrays:
+    """Регион карты колонками NumPy (см. :meth:`SharedMapController.load_region_arrays`)."""
+
+    voxels: np.ndarray  # (N, 3)
+    visited: np.ndarray  # (K, 3)
+    ore_positions: np.ndarray  # (M, 3)
+    ore_material_ids: np.ndarray  # (M,) uint16, индексы в ore_materials
+    ore_materials: List[str]
+    ore_content: np.ndarray  # (M,) NaN, где содержание неизвестно
+
+    def ore_hits(self) -> List[OreHit]:
+        """Руды в виде :class:`OreHit` — для кода, который ждет объекты."""
+        content = [None if math.isnan(v) else v for v in self.ore_content.tolist()]
+        return [
+            OreHit(material=self.ore_materials[mid], position=tuple(pos), content=value)  # type: ignore[arg-type]
+            for mid, pos, value in zip(self.ore_material_ids.tolist(), self.ore_positions.tolist(), content)
+        ]
+
+
+class SharedMapWriteBuffer:
+    """Отложенные записи карты, сгруппированные по «грязным» чанкам.
+
+    ``add_*`` методы контроллера складывают сюда новые точки без обращения к
+    хранилищу; :meth:`SharedMapController.flush` забирает всё накопленное
+    одним снимком и пишет одним пакетом.
+    """
+
+    def __init__(self, *, max_points: int = 20_000, max_age: float = 2.0) -> None:
+        self.max_points = int(max_points)
+        self.max_age = float(max_age)
+        self.points: Dict[str, Dict[str, List[Point3D]]] = {"voxels": {}, "visited": {}}
+        self.ores: Dict[str, Dict[tuple[str, Point3D], OreHit]] = {}
+        self.pending = 0
+        self.first_at: Optional[float] = None
+        self.lock = threading.RLock()
+
+    def add_points(self, kind: str, chunk_id: str, points: List[Point3D]) -> None:
+        with self.lock:
+            self.points[kind].setdefault(chunk_id, []).extend(points)
+            self._touch(len(points))
+
+    def add_ores(self, chunk_id: str, ores: List[OreHit]) -> None:
+        with self.lock:
+            bucket = self.ores.setdefault(chunk_id, {})
+            for ore in ores:
+                bucket[(ore.material, ore.position)] = ore
+            self._touch(len(ores))
+
+    def dirty_chunks(self) -> Dict[str, set]:
+        with self.lock:
+            dirty = {kind: set(chunks) for kind, chunks in self.points.items()}
+            dirty["ores"] = set(self.ores)
+            return dirty
+
+    def due(self, now: Optional[float] = None) -> bool:
+        with self.lock:
+            if not self.pending:
+                return False
+            if self.pending >= self.max_points:
+                return True
+            now = time.monotonic() if now is None else now
+            return self.first_at is not None and now - self.first_at >= self.max_age
+
+    def take(self) -> tuple[Dict[str, Dict[str, List[Point3D]]], Dict[str, List[OreHit]]]:
+        """Забрать накопленные записи и очистить буфер."""
+        with self.lock:
+            points, ores = self.points, {cid: list(b.values()) for cid, b in self.ores.items()}
+            self.points = {"voxels": {}, "visited": {}}
+            self.ores = {}
+            self.pending = 0
+            self.first_at = None
+            return points, ores
+
+    def _touch(self, count: int) -> None:
+        if count and self.first_at is None:
+            self.first_at = time.monotonic()
+        self.pending += count
+
+
+class SharedMapChunkCache:
+    """LRU декодированных чанков по ключу ``(kind, chunk_id)``.
+
+    Размер ограничен суммарным числом точек/руд ``max_points``; при
+    переполнении вытесняются давно не использованные чанки. ``ttl`` (секунды)
+    дополнительно ограничивает возраст записи — страховка на случай, когда
+    keyspace-уведомления Redis выключены и чужие записи не инвалидируют кэш.
+
+    Чтение из хранилища может идти параллельно с инвалидацией, поэтому
+    :meth:`put_many` принимает ``epoch``, снятый до чтения, и не кладет чанк,
+    инвалидированный после этого момента.
+    """
+
+    _TRACKED_INVALIDATIONS = 4096
+
+    def __init__(self, *, max_points: int = 500_000, ttl: Optional[float] = None) -> None:
+        self.max_points = int(max_points)
+        self.ttl = float(ttl) if ttl is not None else None
+        self._entries: "OrderedDict[tuple[str, str], tuple[Any, int, float]]" = OrderedDict()
+        self._size = 0
+        self._epoch = 0
+        self._invalidated: "OrderedDict[tuple[str, str], int]" = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, kind: str, chunk_ids: Iterable[str]) -> tuple[Dict[str, Any], List[str]]:
+        """Вернуть найденные чанки и список id, которых в кэше нет."""
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        now = time.monotonic()
+        with self._lock:
+            for cid in chunk_ids:
+                key = (kind, cid)
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl is not None and now - entry[2] > self.ttl:
+                    self._drop(key)
+                    entry = None
+                if entry is None:
+                    missing.append(cid)
+                    continue
+                self._entries.move_to_end(key)
+                found[cid] = entry[0]
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, kind: str, values: Dict[str, Any], epoch: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for cid, value in values.items():
+                key = (kind, cid)
+                if self._invalidated.get(key, self._forgotten) > epoch:
+                    continue  # чанк изменился, пока мы его читали
+                if isinstance(value, np.ndarray):
+                    value.setflags(write=False)
+                size = max(1, len(value))
+                if size > self.max_points:
+                    continue
+                self._drop(key)
+                self._entries[key] = (value, size, now)
+                self._size += size
+            while self._size > self.max_points and self._entries:
+                _, (_, size, _) = self._entries.popitem(last=False)
+                self._size -= size
+                self.evictions += 1
+
+    def invalidate(self, kind: str, chunk_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._epoch += 1
+            for cid in chunk_ids:
+                key = (kind, cid)
+                if self._drop(key):
+                    self.invalidations += 1
+                self._invalidated[key] = self._epoch
+                self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self._TRACKED_INVALIDATIONS:
+                _, forgotten = self._invalidated.popitem(last=False)
+                self._forgotten = max(self._forgotten, forgotten)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._forgotten = self._epoch
+            self._invalidated.clear()
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "chunks": len(self._entries),
+                "points": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key: tuple[str, str]) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._size -= entry[1]
+        return True
+
+
 class SharedMapController:
     """Контроллер общей карты с переключаемыми бэкендами хранения.
 
@@ -103,6 +555,32 @@ class SharedMapController:
     базу. В обоих вариантах данные разбиваются на чанки фиксированного размера,
     чтобы выборка по радиусу выполнялась за счет работы только с нужными
     чанками.
+
+    С ``write_behind=True`` методы ``add_*`` только помечают чанки грязными;
+    запись идет одним пакетом при накоплении ``flush_max_points`` точек, по
+    возрасту ``flush_max_age`` секунд или при явном :meth:`flush`.
+    ``background_flush=True`` запускает поток, сбрасывающий буфер по
+    возрасту; :meth:`close` останавливает его и дописывает остаток.
+
+    ``chunk_cache_points > 0`` включает :class:`SharedMapChunkCache`:
+    повторные ``load``/``load_region``/``get_known_ores`` берут декодированные
+    чанки из памяти. Свои записи инвалидируют кэш сразу, чужие — через
+    keyspace-уведомления Redis (``notify-keyspace-events`` с ``K`` и ``g$``).
+    Статистика — ``chunk_cache.stats()``.
+
+    Атомарное слияние чанков точек за один round-trip (Lua-скрипт на
+    сервере Redis) работает только для несжатых бинарных чанков, поэтому
+    Redis по умолчанию хранит чанки без сжатия (``chunk_compression=None``
+    означает ``"none"`` для Redis и ``"zlib"`` для SQLite). Со сжатием
+    (``chunk_compression="zlib"``) чанки сливаются на клиенте через
+    WATCH/MULTI/EXEC с повтором при гонке — это тоже безопасно, но стоит
+    минимум двух round-trip на пачку чанков.
+
+    Для обзорных карт и грубого планирования поддерживается LOD-пирамида
+    (``maintain_lod=True``): уровни 1 и 2 хранят по точке на занятую ячейку
+    в 4 и 16 раз крупнее ``chunk_size / 50`` и дописываются при каждом
+    :meth:`flush`. ``load_region(..., lod=N)`` читает уровень ``N``; для карт,
+    записанных без LOD, его строит :meth:`rebuild_lod`.
     """
 
     def __init__(
@@ -115,6 +593,16 @@ class SharedMapController:
         storage_backend: str = "redis",
         sqlite_path: str | os.PathLike[str] | None = None,
         storage: Optional[SharedMapStorage] = None,
+        chunk_format: str = "binary",
+        chunk_resolution: float = chunk_codec.DEFAULT_RESOLUTION,
+        chunk_compression: Optional[str] = None,
+        write_behind: bool = False,
+        flush_max_points: int = 20_000,
+        flush_max_age: float = 2.0,
+        background_flush: bool = False,
+        chunk_cache_points: int = 0,
+        chunk_cache_ttl: Optional[float] = None,
+        maintain_lod: bool = True,
     ) -> None:
         self.owner_id = owner_id or resolve_owner_id()
         self.memory_key = memory_key or f"se:{self.owner_id}:memory"
@@ -122,22 +610,56 @@ class SharedMapController:
         self.chunk_size = float(chunk_size)
         self.storage: SharedMapStorage
         self.client: Optional[RedisEventClient] = None
+        # Формат записи чанков: "binary" (см. secontrol.tools.chunk_codec) или "json".
+        # Чтение понимает оба формата, поэтому старые карты остаются доступны.
+        # Сжатие по умолчанию выбирает хранилище: Redis — "none" (слияние
+        # Lua-скриптом), SQLite — "zlib".
+        encoding: Dict[str, Any] = {
+            "chunk_format": chunk_format,
+            "resolution": chunk_resolution,
+        }
+        if chunk_compression is not None:
+            encoding["compression"] = chunk_compression
 
         if storage is not None:
             self.storage = storage
         elif storage_backend.lower() == "sqlite":
             db_path = sqlite_path or Path.home() / ".secontrol" / "maps" / f"{self.owner_id}.sqlite"
-            self.storage = SQLiteSharedMapStorage(db_path, chunk_size=self.chunk_size)
+            self.storage = SQLiteSharedMapStorage(db_path, chunk_size=self.chunk_size, **encoding)
         else:
             self.client = redis_client or RedisEventClient()
             self.storage = RedisSharedMapStorage(
                 self.client,
                 memory_prefix=self.memory_prefix,
                 chunk_size=self.chunk_size,
+                **encoding,
             )
 
         self.chunk_size = float(self.storage.chunk_size)
-        self.data = SharedMapData()
+        self.data = SharedMapData(resolution=self.storage.resolution)
+
+        self._chunk_size_synced = False
+        self.maintain_lod = bool(maintain_lod)
+        self.write_behind = bool(write_behind or background_flush)
+        self.write_buffer = SharedMapWriteBuffer(max_points=flush_max_points, max_age=flush_max_age)
+        self._flush_lock = threading.RLock()
+        self._flusher_stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if background_flush:
+            self._flusher = threading.Thread(target=self._flush_loop, name="shared-map-flush", daemon=True)
+            self._flusher.start()
+
+        self.chunk_cache: Optional[SharedMapChunkCache] = None
+        self._cache_subscription: Any = None
+        if chunk_cache_points > 0:
+            self.chunk_cache = SharedMapChunkCache(max_points=chunk_cache_points, ttl=chunk_cache_ttl)
+            if isinstance(self.storage, RedisSharedMapStorage):
+                try:
+                    self._cache_subscription = self.storage.client.subscribe_to_key_pattern(
+                        f"{self.storage.memory_prefix}:*", self._on_map_key_event
+                    )
+                except Exception as exc:  # pragma: no cover - нет прав на keyspace-каналы
+                    print(f"[shared_map] chunk cache invalidation unavailable: {exc}")
 
     # ------------------------------------------------------------------
     # Внутренние ключи и формат
@@ -150,8 +672,18 @@ class SharedMapController:
         idx = self.storage.load_index()
         self.chunk_size = float(idx.get("chunk_size", self.chunk_size))
         self.storage.chunk_size = self.chunk_size
+        self._chunk_size_synced = True
         return idx
 
+    def _refresh_chunk_size(self) -> float:
+        """Синхронизировать размер чанка с хранилищем без чтения всего индекса."""
+        stored = self.storage.load_chunk_size()
+        if stored:
+            self.chunk_size = float(stored)
+        self.storage.chunk_size = self.chunk_size
+        self._chunk_size_synced = True
+        return self.chunk_size
+
     def _save_index(self, idx: Dict[str, Any]) -> None:
         self.storage.chunk_size = self.chunk_size
         self.storage.save_index(idx)
@@ -161,12 +693,67 @@ class SharedMapController:
 
     def _save_chunk_points(self, kind: str, chunk_id: str, points: Iterable[Point3D]) -> None:
         self.storage.save_chunk_points(kind, chunk_id, points)
+        self._invalidate_chunks(kind, [chunk_id])
 
     def _load_chunk_ores(self, chunk_id: str) -> List[OreHit]:
         return self.storage.load_chunk_ores(chunk_id)
 
     def _save_chunk_ores(self, chunk_id: str, ores: Iterable[OreHit]) -> None:
         self.storage.save_chunk_ores(chunk_id, ores)
+        self._invalidate_chunks("ores", [chunk_id])
+
+    def _delete_chunk(self, kind: str, chunk_id: str) -> None:
+        self.storage.delete_chunk(kind, chunk_id)
+        self._invalidate_chunks(kind, [chunk_id])
+
+    # Чтение чанков через кэш (если он включен)
+    def _load_chunk_arrays(self, kind: str, chunk_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        if self.chunk_cache is None:
+            return self.storage.load_chunk_arrays(kind, chunk_ids)
+        found, missing = self.chunk_cache.get_many(kind, chunk_ids)
+        if missing:
+            epoch = self.chunk_cache.epoch
+            loaded = self.storage.load_chunk_arrays(kind, missing)
+            self.chunk_cache.put_many(kind, loaded, epoch)
+            found.update(loaded)
+        return found
+
+    def _load_chunk_ores_many(self, chunk_ids: Sequence[str]) -> Dict[str, List[OreHit]]:
+        if self.chunk_cache is None:
+            return self.storage.load_chunk_ores_many(chunk_ids)
+        found, missing = self.chunk_cache.get_many("ores", chunk_ids)
+        if missing:
+            epoch = self.chunk_cache.epoch
+            loaded = self.storage.load_chunk_ores_many(missing)
+            self.chunk_cache.put_many("ores", loaded, epoch)
+            found.update(loaded)
+        return found
+
+    def _load_chunk_ore_arrays(self, chunk_ids: Sequence[str]) -> Dict[str, chunk_codec.OreChunk]:
+        # Колоночные руды кэшируются отдельно от списков OreHit, но
+        # инвалидируются вместе с ними (см. _invalidate_chunks).
+        if self.chunk_cache is None:
+            return self.storage.load_chunk_ore_arrays(chunk_ids)
+        found, missing = self.chunk_cache.get_many(_ORE_ARRAYS, chunk_ids)
+        if missing:
+            epoch = self.chunk_cache.epoch
+            loaded = self.storage.load_chunk_ore_arrays(missing)
+            self.chunk_cache.put_many(_ORE_ARRAYS, loaded, epoch)
+            found.update(loaded)
+        return found
+
+    def _invalidate_chunks(self, kind: str, chunk_ids: Iterable[str]) -> None:
+        if self.chunk_cache is not None:
+            chunk_ids = list(chunk_ids)
+            self.chunk_cache.invalidate(kind, chunk_ids)
+            if kind == "ores":
+                self.chunk_cache.invalidate(_ORE_ARRAYS, chunk_ids)
+
+    def _on_map_key_event(self, key: str, _payload: Any, _event: str) -> None:
+        # ``{prefix}:{kind}:{ix}:{iy}:{iz}`` — чанк; индекс, пути и метаданные пропускаем.
+        kind, _, chunk_id = key[len(self.memory_prefix) + 1 :].partition(":")
+        if kind in _INDEXED_KINDS and chunk_id:
+            self._invalidate_chunks(kind, [chunk_id])
 
     def _load_paths(self) -> Dict[str, List[Point3D]]:
         return self.storage.load_paths()
@@ -194,14 +781,21 @@ class SharedMapController:
     ) -> SharedMapData:
         """Загрузить выбранные чанки карты."""
 
-        idx = self._load_index()
+        self._flush_pending()
+        self._migrate_legacy_blob()
 
+        # Без фильтра читаем весь индекс, с фильтром проверяем только нужные id.
+        if chunk_ids is None:
+            idx = self._load_index()
+            selected = {kind: set(idx[kind]) for kind in _KINDS if kind in kinds}
+        else:
+            selected = self.storage.index_select([kind for kind in _KINDS if kind in kinds], chunk_ids)
+        return self._load_selected(selected, include_paths=include_paths, include_metadata=include_metadata)
+
+    def _migrate_legacy_blob(self) -> None:
         # Поддержка старого формата: если индекс пустой, пробуем прочитать весь
         # словарь из ``memory_prefix`` и разложить его по чанкам.
-        if (
-            not (idx["voxels"] or idx["visited"] or idx["ores"])
-            and isinstance(self.storage, RedisSharedMapStorage)
-        ):
+        if isinstance(self.storage, RedisSharedMapStorage) and not self.storage.has_chunks():
             legacy_payload = self.storage.client.get_json(self.storage.memory_prefix)
             if isinstance(legacy_payload, dict) and any(
                 legacy_payload.get(k) for k in ("voxels", "visited", "ores")
@@ -225,29 +819,29 @@ class SharedMapController:
                 if legacy.metadata:
                     self.data.metadata = legacy.metadata
                     self._save_metadata()
-                idx = self._load_index()
-
-        self.data = SharedMapData()
+                self._flush_pending()
 
-        load_chunk_ids = set(chunk_ids) if chunk_ids is not None else None
-
-        def _should_load(cid: str) -> bool:
-            return load_chunk_ids is None or cid in load_chunk_ids
+    def _load_selected(
+        self,
+        selected: Dict[str, set],
+        *,
+        include_paths: bool,
+        include_metadata: bool,
+        lod: int = 0,
+    ) -> SharedMapData:
+        self.data = SharedMapData(resolution=self.storage.resolution)
 
-        if "voxels" in kinds:
-            for cid in idx["voxels"]:
-                if _should_load(cid):
-                    self.data.merge_voxels(self._load_chunk_points("voxels", cid))
+        if selected.get("voxels"):
+            for points in self._load_chunk_arrays(_lod_kind("voxels", lod), sorted(selected["voxels"])).values():
+                self.data.merge_voxels(points)
 
-        if "visited" in kinds:
-            for cid in idx["visited"]:
-                if _should_load(cid):
-                    self.data.merge_visited(self._load_chunk_points("visited", cid))
+        if selected.get("visited"):
+            for points in self._load_chunk_arrays(_lod_kind("visited", lod), sorted(selected["visited"])).values():
+                self.data.merge_visited(points)
 
-        if "ores" in kinds:
-            for cid in idx["ores"]:
-                if _should_load(cid):
-                    self.data.merge_ores(self._load_chunk_ores(cid))
+        if selected.get("ores"):
+            for ores in self._load_chunk_ores_many(sorted(selected["ores"])).values():
+                self.data.merge_ores(ores)
 
         if include_paths:
             self.data.paths = self._load_paths()
@@ -257,6 +851,38 @@ class SharedMapController:
 
         return self.data
 
+    def _chunk_box(
+        self, center: Point3D, radius: float, *, level: int = 0
+    ) -> tuple[Tuple[int, int, int], Tuple[int, int, int]]:
+        """Диапазон координат чанков уровня ``level``, покрывающий куб вокруг сферы ``(center, radius)``."""
+        chunk_size = _lod_grid(self._refresh_chunk_size(), level)[0]
+        r = float(radius)
+        lo = tuple(int(math.floor((float(c) - r) / chunk_size)) for c in center)
+        hi = tuple(int(math.floor((float(c) + r) / chunk_size)) for c in center)
+        return lo, hi  # type: ignore[return-value]
+
+    def lod_cell_size(self, lod: int) -> float:
+        """Ребро ячейки уровня ``lod`` (для ``lod=0`` — базовая ячейка пирамиды)."""
+        return _lod_grid(self._refresh_chunk_size(), lod)[1]
+
+    def _select_region(self, center: Point3D, radius: float, kinds: Sequence[str], lod: int) -> Dict[str, set]:
+        """Id чанков региона по видам; точки уровня ``lod`` берутся из LOD-чанков."""
+        if not 0 <= int(lod) <= _LOD_LEVELS:
+            raise ValueError(f"lod must be between 0 and {_LOD_LEVELS}, got {lod!r}")
+        wanted = [kind for kind in _KINDS if kind in kinds]
+        coarse = [kind for kind in wanted if lod and kind in _LOD_SOURCES]
+        selected: Dict[str, set] = {}
+        if coarse:
+            lo, hi = self._chunk_box(center, radius, level=lod)
+            found = self.storage.index_in_box([_lod_kind(kind, lod) for kind in coarse], lo, hi)
+            selected.update((kind, found[_lod_kind(kind, lod)]) for kind in coarse)
+        rest = [kind for kind in wanted if kind not in coarse]
+        if rest:
+            # Выборку чанков по кубу делает хранилище (в SQLite — запросом по ix/iy/iz).
+            lo, hi = self._chunk_box(center, radius)
+            selected.update(self.storage.index_in_box(rest, lo, hi))
+        return selected
+
     def load_region(
         self,
         center: Point3D,
@@ -265,33 +891,84 @@ class SharedMapController:
         kinds: Sequence[str] = ("voxels", "visited", "ores"),
         include_paths: bool = True,
         include_metadata: bool = True,
+        lod: int = 0,
     ) -> SharedMapData:
-        idx = self._load_index()
-        chunk_size = float(self.chunk_size)
-
-        cx, cy, cz = center
-        cr = float(radius)
-        min_x, max_x = cx - cr, cx + cr
-        min_y, max_y = cy - cr, cy + cr
-        min_z, max_z = cz - cr, cz + cr
-
-        def _chunk_range(vmin: float, vmax: float) -> range:
-            start = math.floor(vmin / chunk_size)
-            end = math.floor(vmax / chunk_size)
-            return range(int(start), int(end) + 1)
-
-        chunk_ids = {
-            f"{ix}:{iy}:{iz}"
-            for ix in _chunk_range(min_x, max_x)
-            for iy in _chunk_range(min_y, max_y)
-            for iz in _chunk_range(min_z, max_z)
-        }
+        """Загрузить чанки, пересекающие куб вокруг сферы ``(center, radius)``.
 
-        return self.load(
-            chunk_ids=chunk_ids,
-            kinds=kinds,
-            include_paths=include_paths,
-            include_metadata=include_metadata,
+        ``lod=1`` или ``2`` вместо точек возвращает центры занятых ячеек
+        соответствующего уровня LOD-пирамиды (руды, пути и метаданные — как
+        обычно): обзор в несколько километров укладывается в килобайты.
+        """
+        self._flush_pending()
+        self._migrate_legacy_blob()
+        selected = self._select_region(center, radius, kinds, lod)
+        return self._load_selected(
+            selected, include_paths=include_paths, include_metadata=include_metadata, lod=lod
+        )
+
+    def load_region_arrays(
+        self,
+        center: Sequence[float],
+        radius: float,
+        *,
+        kinds: Sequence[str] = ("voxels", "visited", "ores"),
+        dtype: Any = np.float32,
+        lod: int = 0,
+    ) -> SharedMapArrays:
+        """Точки и руды внутри сферы ``(center, radius)`` массивами NumPy.
+
+        В отличие от :meth:`load_region` не создает кортежей и ``OreHit``:
+        чанки читаются пачками (через кэш, если он включен), каждый обрезается
+        по сфере векторно и сразу приводится к ``dtype``. ``float32`` вдвое
+        экономнее, но у мировых координат ~1e6 м его шаг ~6 см; для точной
+        геометрии передайте ``dtype=np.float64``. ``lod`` — как в
+        :meth:`load_region`. ``self.data`` не меняется.
+        """
+        self._flush_pending()
+        self._migrate_legacy_blob()
+        selected = self._select_region(center, radius, kinds, lod)
+        c = np.asarray(center, dtype=np.float64).reshape(3)
+        r2 = float(radius) ** 2
+
+        def _inside(points: np.ndarray) -> np.ndarray:
+            d = points - c
+            return np.einsum("ij,ij->i", d, d) <= r2
+
+        clouds: Dict[str, np.ndarray] = {}
+        for kind in ("voxels", "visited"):
+            parts: List[np.ndarray] = []
+            ids = sorted(selected.get(kind, ()))
+            for start in range(0, len(ids), _MGET_BATCH):
+                for points in self._load_chunk_arrays(_lod_kind(kind, lod), ids[start : start + _MGET_BATCH]).values():
+                    if len(points):
+                        parts.append(points[_inside(points)].astype(dtype, copy=False))
+            clouds[kind] = np.concatenate(parts) if parts else np.zeros((0, 3), dtype=dtype)
+
+        materials: List[str] = []
+        lookup: Dict[str, int] = {}
+        positions: List[np.ndarray] = []
+        material_ids: List[np.ndarray] = []
+        contents: List[np.ndarray] = []
+        ore_ids = sorted(selected.get("ores", ()))
+        for start in range(0, len(ore_ids), _MGET_BATCH):
+            for chunk in self._load_chunk_ore_arrays(ore_ids[start : start + _MGET_BATCH]).values():
+                if not len(chunk):
+                    continue
+                # Материалы чанка переводим в общую для региона таблицу.
+                remap = np.array([lookup.setdefault(name, len(lookup)) for name in chunk.materials], dtype=np.uint16)
+                mask = _inside(chunk.positions)
+                positions.append(chunk.positions[mask].astype(dtype, copy=False))
+                material_ids.append(remap[chunk.material_ids[mask]])
+                contents.append(chunk.content[mask])
+        materials.extend(sorted(lookup, key=lookup.__getitem__))
+
+        return SharedMapArrays(
+            voxels=clouds["voxels"],
+            visited=clouds["visited"],
+            ore_positions=np.concatenate(positions) if positions else np.zeros((0, 3), dtype=dtype),
+            ore_material_ids=np.concatenate(material_ids) if material_ids else np.zeros(0, dtype=np.uint16),
+            ore_materials=materials,
+            ore_content=np.concatenate(contents) if contents else np.zeros(0, dtype=np.float64),
         )
 
     def save(self) -> None:
@@ -300,45 +977,16 @@ class SharedMapController:
         self._save_index(self._load_index())
 
     def add_voxel_points(self, points: Iterable[Sequence[float]], *, save: bool = True) -> None:
-        idx = self._load_index()
-        buckets: Dict[str, List[Point3D]] = {}
-        for point in points:
-            normalized = _normalize_point(point)
-            cid = self._chunk_id(normalized)
-            buckets.setdefault(cid, []).append(normalized)
-
-        for cid, pts in buckets.items():
-            existing = self._load_chunk_points("voxels", cid)
-            merged = list({*existing, *pts})
-            self._save_chunk_points("voxels", cid, merged)
-            idx["voxels"].add(cid)
-            self.data.merge_voxels(pts)
-
-        if save:
-            self._save_index(idx)
-            self._save_metadata()
+        self.data.merge_voxels(self._stage_points("voxels", points))
+        self._after_stage(save)
 
     def add_flight_points(self, points: Iterable[Sequence[float]], *, save: bool = True) -> None:
-        idx = self._load_index()
-        buckets: Dict[str, List[Point3D]] = {}
-        for point in points:
-            normalized = _normalize_point(point)
-            cid = self._chunk_id(normalized)
-            buckets.setdefault(cid, []).append(normalized)
-
-        for cid, pts in buckets.items():
-            existing = self._load_chunk_points("visited", cid)
-            merged = list({*existing, *pts})
-            self._save_chunk_points("visited", cid, merged)
-            idx["visited"].add(cid)
-            self.data.merge_visited(pts)
-
-        if save:
-            self._save_index(idx)
-            self._save_metadata()
+        self.data.merge_visited(self._stage_points("visited", points))
+        self._after_stage(save)
 
     def add_ore_cells(self, cells: Iterable[dict], *, save: bool = True) -> None:
-        idx = self._load_index()
+        if not self._chunk_size_synced:
+            self._refresh_chunk_size()
         buckets: Dict[str, List[OreHit]] = {}
         for cell in cells:
             if not isinstance(cell, dict):
@@ -354,15 +1002,142 @@ class SharedMapController:
             buckets.setdefault(cid, []).append(ore)
 
         for cid, ores in buckets.items():
-            existing = self._load_chunk_ores(cid)
-            merged = list({(o.material, o.position): o for o in [*existing, *ores]}.values())
-            self._save_chunk_ores(cid, merged)
-            idx["ores"].add(cid)
+            self.write_buffer.add_ores(cid, ores)
             self.data.merge_ores(ores)
+        self._after_stage(save)
+
+    # ------------------------------------------------------------------
+    # Отложенная запись
+    # ------------------------------------------------------------------
+    def _stage_points(self, kind: str, points: Iterable[Sequence[float]]) -> List[Point3D]:
+        if not self._chunk_size_synced:
+            self._refresh_chunk_size()
+        buckets: Dict[str, List[Point3D]] = {}
+        staged: List[Point3D] = []
+        for point in points:
+            normalized = _normalize_point(point)
+            buckets.setdefault(self._chunk_id(normalized), []).append(normalized)
+            staged.append(normalized)
+        for cid, pts in buckets.items():
+            self.write_buffer.add_points(kind, cid, pts)
+        return staged
+
+    def _after_stage(self, save: bool) -> None:
+        if not self.write_behind:
+            self.flush(save=save)
+        elif self.write_buffer.due():
+            self.flush()
+
+    def _flush_pending(self) -> None:
+        # Чтение после записи: перед выборкой дописываем буфер.
+        if self.write_buffer.pending:
+            self.flush()
+
+    def flush(self, *, save: bool = True) -> int:
+        """Записать все грязные чанки одним пакетом; вернуть число чанков.
+
+        Слияние новых точек с уже сохраненными выполняет хранилище
+        (:meth:`SharedMapStorage.merge_chunks`), в Redis — атомарно на
+        сервере. При ``save=False`` индекс и метаданные не обновляются (как и
+        раньше для ``add_*(save=False)``).
+        """
+        with self._flush_lock:
+            points, ores = self.write_buffer.take()
+            if not any(points.values()) and not ores:
+                return 0
 
-        if save:
-            self._save_index(idx)
-            self._save_metadata()
+            batch_points: Dict[tuple[str, str], Any] = {
+                (kind, cid): pts for kind, chunks in points.items() for cid, pts in chunks.items()
+            }
+            written = len(batch_points) + len(ores)
+            if self.maintain_lod:
+                batch_points.update(self._lod_updates(points))
+            try:
+                self.storage.merge_chunks(batch_points, ores, index=save)
+            except Exception:
+                self._invalidate_chunks("ores", ores)
+                for kind, cid in batch_points:
+                    self._invalidate_chunks(kind, [cid])
+                # Не теряем данные: вернем их в буфер до следующей попытки.
+                for kind, chunks in points.items():
+                    for cid, pts in chunks.items():
+                        self.write_buffer.add_points(kind, cid, pts)
+                for cid, hits in ores.items():
+                    self.write_buffer.add_ores(cid, hits)
+                raise
+            for kind, cid in batch_points:
+                self._invalidate_chunks(kind, [cid])
+            self._invalidate_chunks("ores", ores)
+            if save:
+                self._save_metadata()
+            return written
+
+    def _lod_updates(self, points: Dict[str, Dict[str, List[Point3D]]]) -> Dict[tuple[str, str], np.ndarray]:
+        """Центры LOD-ячеек под новыми точками; сливаются в LOD-чанки вместе с ними."""
+        updates: Dict[tuple[str, str], np.ndarray] = {}
+        for kind in _LOD_SOURCES:
+            parts = [_as_point_array(pts) for pts in points.get(kind, {}).values()]
+            level_points = np.concatenate(parts) if parts else np.zeros((0, 3), dtype=np.float64)
+            for level in range(1, _LOD_LEVELS + 1):
+                built = _lod_points(level_points, _lod_grid(self.chunk_size, level)[1])
+                if not built:
+                    break
+                updates.update(((_lod_kind(kind, level), cid), pts) for cid, pts in built.items())
+                level_points = np.concatenate(list(built.values()))
+        return updates
+
+    def rebuild_lod(
+        self,
+        *,
+        kinds: Sequence[str] = _LOD_SOURCES,
+        chunk_ids: Optional[Iterable[str]] = None,
+        workers: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Пересобрать LOD-пирамиду над ``chunk_ids`` (по умолчанию над всей картой).
+
+        Нужна для карт, записанных до появления LOD или с
+        ``maintain_lod=False``; при ``maintain_lod=True`` после
+        :meth:`clear_region`, :meth:`reduce_points` и
+        :meth:`thin_voxel_density` затронутые LOD-чанки пересобираются
+        сами. Возвращает число LOD-чанков по видам.
+        """
+        self._flush_pending()
+        idx = self._load_index() if chunk_ids is None else None
+        selected = list(chunk_ids) if chunk_ids is not None else []
+        counts: Dict[str, int] = {}
+        for kind in kinds:
+            if kind not in _LOD_SOURCES:
+                continue
+            ids = idx[kind] if idx is not None else selected
+            for lod_kind, touched in self._rebuild_lod(kind, ids, workers=workers).items():
+                counts[lod_kind] = len(touched)
+        return counts
+
+    def _rebuild_lod(self, kind: str, chunk_ids: Iterable[str], *, workers: Optional[int] = None) -> Dict[str, set]:
+        touched = self.storage.rebuild_lod(kind, list(chunk_ids), workers=workers)
+        for lod_kind, ids in touched.items():
+            self._invalidate_chunks(lod_kind, ids)
+        return touched
+
+    def close(self) -> None:
+        """Остановить фоновый сброс, дописать буфер и отписаться от уведомлений."""
+        self._flusher_stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=15)
+            self._flusher = None
+        self.flush()
+        if self._cache_subscription is not None:
+            self._cache_subscription.close()
+            self._cache_subscription = None
+
+    def _flush_loop(self) -> None:
+        interval = max(0.05, self.write_buffer.max_age / 2.0)
+        while not self._flusher_stop.wait(interval):
+            try:
+                if self.write_buffer.due():
+                    self.flush()
+            except Exception as exc:  # pragma: no cover - хранилище недоступно
+                print(f"[shared_map] background flush failed: {exc}")
 
     def add_remote_position(self, remote: RemoteControlDevice, *, save: bool = True) -> Optional[Point3D]:
         remote.update()
@@ -398,14 +1173,14 @@ class SharedMapController:
         *,
         chunk_ids: Optional[Iterable[str]] = None,
     ) -> List[OreHit]:
+        self._flush_pending()
         idx = self._load_index()
         ids = set(chunk_ids) if chunk_ids is not None else set(idx["ores"])
 
         ore_map: Dict[tuple[str, Point3D], OreHit] = {}
         material_filter = material.lower() if material else None
 
-        for cid in ids:
-            ores = self._load_chunk_ores(cid)
+        for ores in self._load_chunk_ores_many(sorted(ids)).values():
             for ore in ores:
                 if material_filter and ore.material.lower() != material_filter:
                     continue
@@ -413,27 +1188,61 @@ class SharedMapController:
 
         return list(ore_map.values())
 
-    def reduce_points(self, *, max_points: int = 1_000_000) -> Dict[str, int]:
+    def reduce_points(
+        self,
+        *,
+        max_points: int = 1_000_000,
+        dry_run: bool = False,
+        workers: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Оставить в каждом чанке вокселей каждую k-ю точку, чтобы всего было не больше ``max_points``.
+
+        Размеры бинарных чанков берутся из заголовков без загрузки точек
+        (JSON-чанки читаются целиком), затем чанки прореживаются пачками в
+        пуле потоков. Чанк из ``n`` точек сохраняет ``ceil(n / k)``, поэтому
+        ``k`` подбирается по суммарному остатку; ``max_points`` превышается,
+        только если непустых чанков больше, чем ``max_points`` (в каждом
+        остается хотя бы одна точка). ``dry_run=True`` только считает,
+        сколько точек было бы удалено.
+        """
         if max_points <= 0:
             raise ValueError("max_points must be positive")
 
-        idx = self.load_index()
-        voxel_chunk_ids = list(idx.get("voxels", []))
-
-        total_points = 0
-        for cid in voxel_chunk_ids:
-            total_points += len(self._load_chunk_points("voxels", cid))
+        self._flush_pending()
+        idx = self._load_index()
+        counts = self.storage.count_chunk_points("voxels", sorted(idx.get("voxels", [])))
+        total_points = sum(counts.values())
 
         removed = 0
-
         if total_points > max_points:
-            factor = total_points / max_points
-            for cid in voxel_chunk_ids:
-                points = self._load_chunk_points("voxels", cid)
-                keep_every = math.ceil(factor)
-                reduced = [p for i, p in enumerate(points) if i % keep_every == 0]
-                removed += len(points) - len(reduced)
-                self._save_chunk_points("voxels", cid, reduced)
+            sizes = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+
+            def kept(k: int) -> int:
+                return int(np.sum((sizes + k - 1) // k))
+
+            # Наименьшее k, при котором остаток укладывается в max_points.
+            lo, hi = math.ceil(total_points / max_points), max(int(sizes.max()), 1)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if kept(mid) > max_points:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            keep_every = lo
+            targets = sorted(cid for cid, count in counts.items() if count > 1)
+            if dry_run:
+                removed = sum(counts[cid] - math.ceil(counts[cid] / keep_every) for cid in targets)
+            else:
+
+                def decimate(_cid: str, points: np.ndarray) -> tuple[np.ndarray, int]:
+                    kept = points[::keep_every]
+                    return kept, len(points) - len(kept)
+
+                removed = sum(self.storage.map_chunks("voxels", targets, decimate, workers=workers))
+                if self.chunk_cache is not None:
+                    self.chunk_cache.clear()
+                if self.maintain_lod:
+                    self._rebuild_lod("voxels", targets, workers=workers)
 
         return {"removed": removed, "total": total_points, "kept": max(total_points - removed, 0)}
 
@@ -445,26 +1254,8 @@ class SharedMapController:
         kinds: Sequence[str] = ("voxels", "visited", "ores"),
         save: bool = True,
     ) -> Dict[str, Any]:
-        idx = self._load_index()
-        chunk_size = float(self.chunk_size)
-
-        cx, cy, cz = center
-
-        def _chunk_range(vmin: float, vmax: float) -> range:
-            start = math.floor(vmin / chunk_size)
-            end = math.floor(vmax / chunk_size)
-            return range(int(start), int(end) + 1)
-
-        min_x, max_x = cx - radius, cx + radius
-        min_y, max_y = cy - radius, cy + radius
-        min_z, max_z = cz - radius, cz + radius
-
-        relevant_chunk_ids = {
-            f"{ix}:{iy}:{iz}"
-            for ix in _chunk_range(min_x, max_x)
-            for iy in _chunk_range(min_y, max_y)
-            for iz in _chunk_range(min_z, max_z)
-        }
+        self._flush_pending()
+        lo, hi = self._chunk_box(center, radius)
 
         def _dist(a: Point3D, b: Point3D) -> float:
             dx, dy, dz = a[0] - b[0], a[1] - b[1], a[2] - b[2]
@@ -472,13 +1263,14 @@ class SharedMapController:
 
         total_removed = 0
         chunks_affected = 0
+        changed: Dict[str, List[str]] = {}
 
         for kind in kinds:
             if kind not in ("voxels", "visited", "ores"):
                 continue
 
-            chunk_ids = idx.get(kind, set())
-            chunks_to_process = relevant_chunk_ids & chunk_ids
+            # delete_chunk сам убирает пустой чанк из индекса.
+            chunks_to_process = self.storage.index_in_box([kind], lo, hi)[kind]
 
             for cid in chunks_to_process:
                 if kind == "ores":
@@ -489,8 +1281,7 @@ class SharedMapController:
                         if filtered_ores:
                             self._save_chunk_ores(cid, filtered_ores)
                         else:
-                            self.storage.delete_chunk("ores", cid)
-                            idx["ores"].discard(cid)
+                            self._delete_chunk("ores", cid)
                         chunks_affected += 1
                         total_removed += removed_count
                 else:
@@ -501,13 +1292,14 @@ class SharedMapController:
                         if filtered_points:
                             self._save_chunk_points(kind, cid, filtered_points)
                         else:
-                            self.storage.delete_chunk(kind, cid)
-                            idx[kind].discard(cid)
+                            self._delete_chunk(kind, cid)
+                        changed.setdefault(kind, []).append(cid)
                         chunks_affected += 1
                         total_removed += removed_count
 
-        if save:
-            self._save_index(idx)
+        if self.maintain_lod:
+            for kind, cids in changed.items():
+                self._rebuild_lod(kind, cids)
 
         return {
             "total_removed": total_removed,
@@ -522,18 +1314,43 @@ class SharedMapController:
         min_points_to_thin: int = 1000,
         max_points_per_cell: int = 1,
         verbose: bool = True,
+        dry_run: bool = False,
+        workers: Optional[int] = None,
     ) -> Dict[str, Any]:
-        return self.storage.thin_voxel_density(
-            resolution=resolution,
-            min_points_to_thin=min_points_to_thin,
-            max_points_per_cell=max_points_per_cell,
-            verbose=verbose,
-        )
+        self._flush_pending()
+        try:
+            stats = self.storage.thin_voxel_density(
+                resolution=resolution,
+                min_points_to_thin=min_points_to_thin,
+                max_points_per_cell=max_points_per_cell,
+                verbose=verbose,
+                dry_run=dry_run,
+                workers=workers,
+            )
+        finally:
+            # Прореживание переписывает чанки в обход контроллера.
+            if self.chunk_cache is not None and not dry_run:
+                self.chunk_cache.clear()
+        if self.maintain_lod and not dry_run and stats["changed_chunk_ids"]:
+            self._rebuild_lod("voxels", stats["changed_chunk_ids"], workers=workers)
+        return stats
 
 
 class SharedMapStorage:
-    def __init__(self, *, chunk_size: float) -> None:
+    def __init__(
+        self,
+        *,
+        chunk_size: float,
+        chunk_format: str = "binary",
+        resolution: float = chunk_codec.DEFAULT_RESOLUTION,
+        compression: str = "zlib",
+    ) -> None:
+        if chunk_format not in ("binary", "json"):
+            raise ValueError(f"chunk_format must be 'binary' or 'json', got {chunk_format!r}")
         self.chunk_size = float(chunk_size)
+        self.chunk_format = chunk_format
+        self.resolution = float(resolution)
+        self.compression = compression
 
     def load_index(self) -> Dict[str, Any]:
         raise NotImplementedError
@@ -542,8 +1359,122 @@ class SharedMapStorage:
         raise NotImplementedError
 
     def load_chunk_points(self, kind: str, chunk_id: str) -> List[Point3D]:
+        return [tuple(p) for p in self.load_chunk_array(kind, chunk_id).tolist()]  # type: ignore[misc]
+
+    def load_chunk_array(self, kind: str, chunk_id: str) -> np.ndarray:
+        """Точки чанка как массив ``(N, 3)`` ``float64``."""
         raise NotImplementedError
 
+    def load_chunk_size(self) -> Optional[float]:
+        return self.load_index().get("chunk_size")
+
+    def has_chunks(self) -> bool:
+        idx = self.load_index()
+        return any(idx.get(kind) for kind in _KINDS)
+
+    def index_contains(self, kind: str, chunk_ids: Iterable[str]) -> set:
+        """Те из ``chunk_ids``, что есть в индексе ``kind``."""
+        return set(chunk_ids) & set(self.load_index().get(kind, ()))
+
+    def index_select(self, kinds: Sequence[str], chunk_ids: Iterable[str]) -> Dict[str, set]:
+        """Для каждого вида — id из ``chunk_ids``, которые есть в индексе."""
+        ids = set(chunk_ids)
+        return {kind: self.index_contains(kind, ids) for kind in kinds}
+
+    def index_in_box(
+        self,
+        kinds: Sequence[str],
+        lo: Sequence[int],
+        hi: Sequence[int],
+    ) -> Dict[str, set]:
+        """Id чанков из индекса с координатами ``lo <= (ix, iy, iz) <= hi``.
+
+        Небольшой куб перебирается и проверяется через :meth:`index_select`;
+        для большого дешевле прочитать индекс и отфильтровать его.
+        """
+        dims = [max(0, int(h) - int(l) + 1) for l, h in zip(lo, hi)]
+        if dims[0] * dims[1] * dims[2] <= _BOX_ENUM_LIMIT:
+            ids = (
+                f"{ix}:{iy}:{iz}"
+                for ix in range(int(lo[0]), int(hi[0]) + 1)
+                for iy in range(int(lo[1]), int(hi[1]) + 1)
+                for iz in range(int(lo[2]), int(hi[2]) + 1)
+            )
+            return self.index_select(kinds, ids)
+        idx = self.load_index()
+        selected: Dict[str, set] = {}
+        for kind in kinds:
+            selected[kind] = set()
+            for cid in idx.get(kind, ()):
+                coords = _chunk_coords(cid)
+                if coords is not None and all(l <= c <= h for c, l, h in zip(coords, lo, hi)):
+                    selected[kind].add(cid)
+        return selected
+
+    def index_add(self, kind: str, chunk_ids: Iterable[str]) -> None:
+        idx = self.load_index()
+        idx[kind] = set(idx.get(kind, ())) | set(chunk_ids)
+        self.save_index(idx)
+
+    def load_chunk_arrays(self, kind: str, chunk_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        return {cid: self.load_chunk_array(kind, cid) for cid in chunk_ids}
+
+    def load_chunk_ores_many(self, chunk_ids: Sequence[str]) -> Dict[str, List[OreHit]]:
+        return {cid: self.load_chunk_ores(cid) for cid in chunk_ids}
+
+    def load_chunk_ore_arrays(self, chunk_ids: Sequence[str]) -> Dict[str, chunk_codec.OreChunk]:
+        """Рудные чанки колонками, без создания ``OreHit`` для бинарного формата."""
+        return {cid: _ore_chunk_from_hits(hits) for cid, hits in self.load_chunk_ores_many(chunk_ids).items()}
+
+    def save_chunk_batch(
+        self,
+        points: Dict[tuple[str, str], Any],
+        ores: Dict[str, List[OreHit]],
+    ) -> None:
+        """Записать пачку чанков: ``points`` по ключу ``(kind, chunk_id)`` и руды."""
+        for (kind, cid), pts in points.items():
+            self.save_chunk_points(kind, cid, pts)
+        for cid, hits in ores.items():
+            self.save_chunk_ores(cid, hits)
+
+    def merge_chunks(
+        self,
+        points: Dict[tuple[str, str], Any],
+        ores: Dict[str, List[OreHit]],
+        *,
+        index: bool = True,
+    ) -> None:
+        """Дописать новые точки (по ключу ``(kind, chunk_id)``) и руды в чанки.
+
+        Базовая реализация читает чанки, сливает и пишет их пачкой, а затем
+        при ``index=True`` добавляет id в индекс. Между чтением и записью
+        другой процесс может успеть изменить чанк, поэтому общие хранилища
+        переопределяют метод атомарным вариантом.
+        """
+        by_kind: Dict[str, Dict[str, Any]] = {}
+        for (kind, cid), pts in points.items():
+            by_kind.setdefault(kind, {})[cid] = pts
+
+        merged_points: Dict[tuple[str, str], Any] = {}
+        for kind, chunks in by_kind.items():
+            existing = self.load_chunk_arrays(kind, list(chunks))
+            resolution = self._grid(kind)[1]
+            for cid, pts in chunks.items():
+                merged_points[(kind, cid)] = _merge_point_arrays(existing.get(cid), pts, resolution)
+
+        merged_ores: Dict[str, List[OreHit]] = {}
+        if ores:
+            existing_ores = self.load_chunk_ores_many(list(ores))
+            for cid, new in ores.items():
+                merged_ores[cid] = _merge_ore_hits(existing_ores.get(cid, []), new)
+
+        self.save_chunk_batch(merged_points, merged_ores)
+        if index:
+            for kind, chunks in by_kind.items():
+                self.index_add(kind, chunks)
+            if merged_ores:
+                self.index_add("ores", merged_ores)
+
     def save_chunk_points(self, kind: str, chunk_id: str, points: Iterable[Point3D]) -> None:
         raise NotImplementedError
 
@@ -559,6 +1490,14 @@ class SharedMapStorage:
     def save_paths(self, paths: Dict[str, List[Point3D]]) -> None:
         raise NotImplementedError
 
+    def load_cached_path(self, key: str) -> Optional[List[Point3D]]:
+        """Путь из кэша :class:`PathCache` или ``None``, если он отсутствует или истёк."""
+        raise NotImplementedError
+
+    def save_cached_path(self, key: str, points: Sequence[Point3D], ttl: float) -> None:
+        """Сохранить путь кэша планировщика на ``ttl`` секунд отдельно от ``paths``."""
+        raise NotImplementedError
+
     def load_metadata(self) -> Dict[str, Any]:
         raise NotImplementedError
 
@@ -572,6 +1511,209 @@ class SharedMapStorage:
         """Вернуть примерный размер сохраненных данных в байтах."""
         raise NotImplementedError
 
+    # ------------------------------------------------------------------
+    # Кодирование чанков (бинарный формат или JSON для совместимости)
+    # ------------------------------------------------------------------
+    def _grid(self, kind: str) -> tuple[float, float]:
+        """Ребро чанка и шаг квантования точек ``kind``.
+
+        У LOD-уровней чанки крупнее, а точки — центры ячеек, поэтому шаг —
+        половина ячейки: центры кодируются точно и в int16.
+        """
+        level = _lod_level(kind)
+        if not level:
+            return self.chunk_size, self.resolution
+        chunk, cell = _lod_grid(self.chunk_size, level)
+        return chunk, cell / 2.0
+
+    def _encode_points(self, chunk_id: str, points: Iterable[Point3D], kind: str = "voxels") -> bytes | str:
+        if self.chunk_format == "json":
+            return json.dumps(points.tolist() if isinstance(points, np.ndarray) else list(points))
+        chunk_size, resolution = self._grid(kind)
+        return chunk_codec.encode_points(
+            points if isinstance(points, np.ndarray) else list(points),
+            centre=chunk_codec.chunk_centre(chunk_id, chunk_size),
+            resolution=resolution,
+            compression=self.compression,
+        )
+
+    @staticmethod
+    def _decode_points(payload: Any) -> np.ndarray:
+        if payload is None:
+            return np.zeros((0, 3), dtype=np.float64)
+        if chunk_codec.is_binary_chunk(payload):
+            return chunk_codec.decode_points(payload)
+        if isinstance(payload, (bytes, bytearray, str)):
+            try:
+                payload = json.loads(payload)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                return np.zeros((0, 3), dtype=np.float64)
+        if not isinstance(payload, list) or not payload:
+            return np.zeros((0, 3), dtype=np.float64)
+        return np.asarray([_normalize_point(p) for p in payload], dtype=np.float64)
+
+    def _encode_ores(self, chunk_id: str, ores: Iterable[OreHit]) -> bytes | str:
+        ores = list(ores)
+        if self.chunk_format == "json":
+            return json.dumps(
+                [{"material": ore.material, "position": ore.position, "content": ore.content} for ore in ores]
+            )
+        return chunk_codec.encode_ores(
+            [ore.position for ore in ores],
+            [ore.material for ore in ores],
+            [ore.content for ore in ores],
+            centre=chunk_codec.chunk_centre(chunk_id, self.chunk_size),
+            resolution=self.resolution,
+            compression=self.compression,
+        )
+
+    @classmethod
+    def _decode_ore_chunk(cls, payload: Any) -> chunk_codec.OreChunk:
+        if chunk_codec.is_binary_chunk(payload):
+            return chunk_codec.decode_ores(payload)
+        return _ore_chunk_from_hits(cls._decode_ores(payload))
+
+    @staticmethod
+    def _decode_ores(payload: Any) -> List[OreHit]:
+        if payload is None:
+            return []
+        if chunk_codec.is_binary_chunk(payload):
+            chunk = chunk_codec.decode_ores(payload)
+            materials = chunk.materials
+            return [
+                OreHit(material=materials[mid], position=tuple(pos), content=content)  # type: ignore[arg-type]
+                for mid, pos, content in zip(chunk.material_ids.tolist(), chunk.positions.tolist(), chunk.contents())
+            ]
+        if isinstance(payload, (bytes, bytearray, str)):
+            try:
+                payload = json.loads(payload)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                return []
+        if not isinstance(payload, list):
+            return []
+        ores: List[OreHit] = []
+        for item in payload:
+            if not isinstance(item, dict):
+                continue
+            pos = item.get("position")
+            if pos is None:
+                continue
+            ores.append(
+                OreHit(
+                    material=str(item.get("material") or item.get("ore") or "unknown"),
+                    position=_normalize_point(pos),
+                    content=item.get("content"),
+                )
+            )
+        return ores
+
+    def count_chunk_points(self, kind: str, chunk_ids: Sequence[str]) -> Dict[str, int]:
+        """Число точек в каждом чанке (без учета отсутствующих чанков)."""
+        counts: Dict[str, int] = {}
+        ids = list(chunk_ids)
+        for start in range(0, len(ids), _MGET_BATCH):
+            for cid, points in self.load_chunk_arrays(kind, ids[start : start + _MGET_BATCH]).items():
+                counts[cid] = len(points)
+        return counts
+
+    def map_chunks(
+        self,
+        kind: str,
+        chunk_ids: Sequence[str],
+        process: Any,
+        *,
+        workers: Optional[int] = None,
+        batch_size: int = 64,
+        write: bool = True,
+    ) -> List[Any]:
+        """Прогнать ``process(chunk_id, points) -> (new_points | None, info)`` по чанкам.
+
+        Чанки читаются пачками по ``batch_size``, пачки обрабатываются в пуле
+        из ``workers`` потоков (numpy, zlib и ввод-вывод отпускают GIL).
+        Измененные чанки (``new_points`` не ``None``) пишутся одной пачкой на
+        batch, если ``write=True``. Возвращает ``info`` в порядке ``chunk_ids``.
+        """
+        ids = list(chunk_ids)
+        batches = [ids[i : i + max(1, batch_size)] for i in range(0, len(ids), max(1, batch_size))]
+        empty = np.zeros((0, 3), dtype=np.float64)
+
+        def run(batch: List[str]) -> List[Any]:
+            loaded = self.load_chunk_arrays(kind, batch)
+            changed: Dict[tuple[str, str], Any] = {}
+            infos = []
+            for cid in batch:
+                new_points, info = process(cid, loaded.get(cid, empty))
+                if new_points is not None:
+                    changed[(kind, cid)] = new_points
+                infos.append(info)
+            if write and changed:
+                self.save_chunk_batch(changed, {})
+            return infos
+
+        workers = min(4, os.cpu_count() or 1) if workers is None else int(workers)
+        if workers <= 1 or len(batches) <= 1:
+            parts = [run(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shared-map") as pool:
+                parts = list(pool.map(run, batches))
+        return [info for part in parts for info in part]
+
+    def rebuild_lod(
+        self,
+        kind: str,
+        chunk_ids: Iterable[str],
+        *,
+        workers: Optional[int] = None,
+        batch_size: int = 8,
+    ) -> Dict[str, set]:
+        """Пересобрать LOD-чанки над чанками ``chunk_ids`` вида ``kind``.
+
+        Уровень за уровнем: каждый LOD-чанк целиком строится заново из 64
+        дочерних чанков уровня ниже и перезаписывается (пустой удаляется).
+        Пачки по ``batch_size`` LOD-чанков обрабатываются в пуле потоков.
+        Запись, слитая другим процессом между чтением и перезаписью чанка,
+        попадет в LOD только при следующей пересборке. Возвращает id
+        затронутых чанков по LOD-видам.
+        """
+        touched: Dict[str, set] = {}
+        dirty = {coords for cid in chunk_ids if (coords := _chunk_coords(cid)) is not None}
+        workers = min(4, os.cpu_count() or 1) if workers is None else int(workers)
+        offsets = [(dx, dy, dz) for dx in range(_LOD_FACTOR) for dy in range(_LOD_FACTOR) for dz in range(_LOD_FACTOR)]
+
+        for level in range(1, _LOD_LEVELS + 1):
+            source, target = _lod_kind(kind, level - 1), _lod_kind(kind, level)
+            cell = _lod_grid(self.chunk_size, level)[1]
+            parents = sorted({tuple(c // _LOD_FACTOR for c in coords) for coords in dirty})
+            parent_ids = [f"{px}:{py}:{pz}" for px, py, pz in parents]
+
+            def build(batch: List[tuple[int, int, int]]) -> List[str]:
+                children = [
+                    f"{px * _LOD_FACTOR + dx}:{py * _LOD_FACTOR + dy}:{pz * _LOD_FACTOR + dz}"
+                    for px, py, pz in batch
+                    for dx, dy, dz in offsets
+                ]
+                present = sorted(self.index_contains(source, children))
+                loaded = [pts for pts in self.load_chunk_arrays(source, present).values() if len(pts)]
+                built = _lod_points(np.concatenate(loaded), cell) if loaded else {}
+                if built:
+                    self.save_chunk_batch({(target, cid): pts for cid, pts in built.items()}, {})
+                return list(built)
+
+            batches = [parents[i : i + max(1, batch_size)] for i in range(0, len(parents), max(1, batch_size))]
+            if workers <= 1 or len(batches) <= 1:
+                built_ids = [cid for batch in batches for cid in build(batch)]
+            else:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shared-map-lod") as pool:
+                    built_ids = [cid for part in pool.map(build, batches) for cid in part]
+            # Индекс правим из одного потока: JSON-индекс переписывается целиком.
+            if built_ids:
+                self.index_add(target, built_ids)
+            for cid in self.index_contains(target, set(parent_ids) - set(built_ids)):
+                self.delete_chunk(target, cid)
+            touched[target] = set(parent_ids)
+            dirty = set(parents)
+        return touched
+
     def thin_voxel_density(
         self,
         *,
@@ -579,20 +1721,25 @@ class SharedMapStorage:
         min_points_to_thin: int = 1000,
         max_points_per_cell: int = 1,
         verbose: bool = True,
+        dry_run: bool = False,
+        workers: Optional[int] = None,
+        batch_size: int = 64,
     ) -> Dict[str, Any]:
         """
-        Проредить (разредить) облака вокселей в Redis-хранилище.
         Проредить (разредить) облака вокселей в активном хранилище.
 
         Логика:
         - Собираются позиции всех ресурсов (ore_cells).
         - Для каждого чанка с вокселями строится 3D-сетка с шагом `resolution`.
         - Ячейки сетки, содержащие ресурсы, не прореживаются.
-        - В остальных ячейках допускается не более `max_points_per_cell` точек.
+        - В остальных ячейках допускается не более `max_points_per_cell` точек
+          (первых по порядку в чанке).
         - Остальные точки в этой ячейке считаются "лишними" и удаляются.
-        - Операция выполняется ПРЯМО по Redis-чанкам (хранилище реально очищается).
         - Операция выполняется ПРЯМО по чанкам (хранилище реально очищается).
 
+        Чанки обрабатываются векторно (numpy) пачками в пуле потоков, см.
+        :meth:`map_chunks`; переписываются только чанки, где что-то удалено.
+
         Параметры:
             resolution:
                 Пространственный шаг (в метрах) для объединения близких точек.
@@ -606,21 +1753,28 @@ class SharedMapStorage:
                 Обычно достаточно 1.
             verbose:
                 Если True — печатает подробную статистику.
+            dry_run:
+                Только посчитать, сколько точек будет удалено, ничего не
+                записывая. Статистика та же, что и при реальном прореживании.
+            workers, batch_size:
+                Число потоков (по умолчанию до 4) и чанков в одной пачке.
 
         Возвращает:
             dict со статистикой:
             {
                 "chunks_total": int,
                 "chunks_thinned": int,
+                "chunks_changed": int,
+                "changed_chunk_ids": list[str],  # переписанные (при dry_run — подлежащие)
                 "total_before": int,
                 "total_after": int,
                 "total_removed": int,
                 "resolution": float,
                 "max_points_per_cell": int,
+                "dry_run": bool,
             }
 
         ВАЖНО:
-        - Метод изменяет данные в Redis. Если у контроллера уже загружена
         - Метод изменяет данные в хранилище. Если у контроллера уже загружена
           self.data.voxels, она может не совпасть с хранилищем — после
           прорядки имеет смысл вызвать load() / load_region() заново.
@@ -631,33 +1785,20 @@ class SharedMapStorage:
             raise ValueError(f"max_points_per_cell must be > 0, got {max_points_per_cell}")
 
         idx = self.load_index()
-        voxel_chunk_ids = list(idx.get("voxels", []))
-        ore_chunk_ids = list(idx.get("ores", []))
+        voxel_chunk_ids = sorted(idx.get("voxels", []))
+        ore_chunk_ids = sorted(idx.get("ores", []))
 
-        # Собираем все позиции ресурсов
-        ore_bucket_keys: set[Tuple[int, int, int]] = set()
-        for cid in ore_chunk_ids:
-            ores = self.load_chunk_ores(cid)
-            for ore in ores:
-                x, y, z = ore.position
-                cx = int(math.floor(x / resolution))
-                cy = int(math.floor(y / resolution))
-                cz = int(math.floor(z / resolution))
-                ore_bucket_keys.add((cx, cy, cz))
+        # Ячейки сетки с ресурсами: одна (M, 3) int64 матрица на всю карту.
+        ore_positions: List[Point3D] = []
+        for start in range(0, len(ore_chunk_ids), _MGET_BATCH):
+            for ores in self.load_chunk_ores_many(ore_chunk_ids[start : start + _MGET_BATCH]).values():
+                ore_positions.extend(ore.position for ore in ores)
+        ore_cells = np.floor(np.asarray(ore_positions, dtype=np.float64).reshape(-1, 3) / resolution).astype(np.int64)
 
-        chunks_total = len(voxel_chunk_ids)
-        chunks_thinned = 0
-        total_before = 0
-        total_after = 0
-
-        for cid in voxel_chunk_ids:
-            points = self.load_chunk_points("voxels", cid)
+        def process(cid: str, points: np.ndarray) -> tuple[Optional[np.ndarray], tuple[int, int, bool]]:
             n_before = len(points)
             if n_before == 0:
-                continue
-
-            total_before += n_before
-
+                return None, (0, 0, False)
             # Не трогаем мелкие чанки
             if n_before < min_points_to_thin:
                 if verbose:
@@ -665,55 +1806,30 @@ class SharedMapStorage:
                         f"[thin_voxel_density] chunk {cid}: {n_before} points "
                         f"(<{min_points_to_thin}), skip thinning."
                     )
-                total_after += n_before
-                continue
-
-            # Квантование в мировых координатах с шагом `resolution`
-            # ВАЖНО: ключи ячеек используются только внутри одного чанка,
-            # поэтому нас не волнует граница между чанками.
-            cell_buckets: Dict[Tuple[int, int, int], List[Point3D]] = {}
-
-            for p in points:
-                x, y, z = p
-                cx = int(math.floor(x / resolution))
-                cy = int(math.floor(y / resolution))
-                cz = int(math.floor(z / resolution))
-                key = (cx, cy, cz)
-
-                # Не прореживаем ячейки с ресурсами
-                if key in ore_bucket_keys:
-                    # Сохраняем все точки в этой ячейке
-                    cell_buckets.setdefault(key, []).append(p)
-                    continue
-
-                bucket = cell_buckets.setdefault(key, [])
-                if len(bucket) < max_points_per_cell:
-                    bucket.append(p)
-                # Если уже достигли max_points_per_cell — остальные точки
-                # в этом кубе считаем "лишними" и не добавляем.
-
-            # Собираем новые точки
-            new_points: List[Point3D] = []
-            for bucket in cell_buckets.values():
-                # Для ячеек с ресурсами сохраняем все точки
-                new_points.extend(bucket)
-
-            n_after = len(new_points)
-            total_after += n_after
-            chunks_thinned += 1
+                return None, (n_before, n_before, False)
 
+            keep = _thin_keep_mask(points, resolution, max_points_per_cell, ore_cells)
+            n_after = int(np.count_nonzero(keep))
             if verbose:
                 removed = n_before - n_after
-                ratio = (n_after / n_before) if n_before > 0 else 1.0
+                ratio = n_after / n_before
                 print(
                     f"[thin_voxel_density] chunk {cid}: "
                     f"{n_before} → {n_after} points "
                     f"(removed {removed}, kept {ratio * 100:.1f}%)"
                 )
+            return (points[keep] if n_after < n_before else None), (n_before, n_after, True)
 
-            # Перезаписываем чанк в Redis
-            self.save_chunk_points("voxels", cid, new_points)
+        infos = self.map_chunks(
+            "voxels", voxel_chunk_ids, process, workers=workers, batch_size=batch_size, write=not dry_run
+        )
 
+        chunks_total = len(voxel_chunk_ids)
+        chunks_thinned = sum(1 for _, _, thinned in infos if thinned)
+        changed_chunk_ids = [cid for cid, (before, after, _) in zip(voxel_chunk_ids, infos) if after < before]
+        chunks_changed = len(changed_chunk_ids)
+        total_before = sum(before for before, _, _ in infos)
+        total_after = sum(after for _, after, _ in infos)
         total_removed = total_before - total_after
 
         if verbose:
@@ -726,25 +1842,38 @@ class SharedMapStorage:
                 f"total_removed={total_removed}, "
                 f"resolution={resolution}, "
                 f"max_points_per_cell={max_points_per_cell}"
+                + (", dry_run" if dry_run else "")
             )
 
         return {
             "chunks_total": chunks_total,
             "chunks_thinned": chunks_thinned,
+            "chunks_changed": chunks_changed,
+            "changed_chunk_ids": changed_chunk_ids,
             "total_before": total_before,
             "total_after": total_after,
             "total_removed": total_removed,
             "resolution": float(resolution),
             "max_points_per_cell": int(max_points_per_cell),
+            "dry_run": bool(dry_run),
         }
 
 
 
 class RedisSharedMapStorage(SharedMapStorage):
-    def __init__(self, client: RedisEventClient, *, memory_prefix: str, chunk_size: float) -> None:
-        super().__init__(chunk_size=chunk_size)
+    def __init__(
+        self,
+        client: RedisEventClient,
+        *,
+        memory_prefix: str,
+        chunk_size: float,
+        compression: str = "none",
+        **encoding: Any,
+    ) -> None:
+        super().__init__(chunk_size=chunk_size, compression=compression, **encoding)
         self.client = client
         self.memory_prefix = memory_prefix
+        self._merge_script: Any = None
 
     @property
     def index_key(self) -> str:
@@ -761,61 +1890,299 @@ class RedisSharedMapStorage(SharedMapStorage):
     def _chunk_key(self, kind: str, chunk_id: str) -> str:
         return f"{self.memory_prefix}:{kind}:{chunk_id}"
 
+    def _index_set_key(self, kind: str) -> str:
+        return f"{self.memory_prefix}:index:{kind}"
+
+    def _raw(self) -> Any:
+        """Исходный ``redis.Redis`` клиента или ``None``, если его нет."""
+        raw = getattr(self.client, "_client", None)
+        return raw if raw is not None and hasattr(raw, "smembers") else None
+
+    # Индекс: id чанков лежат в SET ``{prefix}:index:{kind}``, а JSON по
+    # ``{prefix}:index`` хранит только chunk_size. Старый JSON-индекс со
+    # списками id переносится в множества при первом чтении.
+    def _index_meta(self) -> Dict[str, Any]:
+        meta = self.client.get_json(self.index_key)
+        return meta if isinstance(meta, dict) else {}
+
+    def _migrate_json_index(self, meta: Dict[str, Any]) -> None:
+        raw = self._raw()
+        if raw is None or not any(isinstance(meta.get(kind), list) for kind in _KINDS):
+            return
+        pipe = raw.pipeline(transaction=False)
+        for kind in _KINDS:
+            ids = [str(cid) for cid in meta.get(kind) or []]
+            if ids:
+                pipe.sadd(self._index_set_key(kind), *ids)
+        pipe.set(self.index_key, json.dumps({"chunk_size": float(meta.get("chunk_size", self.chunk_size))}))
+        pipe.execute()
+
+    def load_chunk_size(self) -> Optional[float]:
+        value = self._index_meta().get("chunk_size")
+        return float(value) if value is not None else None
+
     def load_index(self) -> Dict[str, Any]:
-        idx = self.client.get_json(self.index_key) or {}
-        chunk_size = float(idx.get("chunk_size", self.chunk_size))
+        meta = self._index_meta()
+        chunk_size = float(meta.get("chunk_size", self.chunk_size))
         self.chunk_size = chunk_size
-        return {
-            "chunk_size": chunk_size,
-            "voxels": set(idx.get("voxels", [])),
-            "visited": set(idx.get("visited", [])),
-            "ores": set(idx.get("ores", [])),
-        }
+        idx: Dict[str, Any] = {"chunk_size": chunk_size}
+        raw = self._raw()
+        if raw is None:
+            for kind in _INDEXED_KINDS:
+                idx[kind] = set(meta.get(kind, []))
+            return idx
+
+        self._migrate_json_index(meta)
+        pipe = raw.pipeline(transaction=False)
+        for kind in _INDEXED_KINDS:
+            pipe.smembers(self._index_set_key(kind))
+        for kind, members in zip(_INDEXED_KINDS, pipe.execute()):
+            idx[kind] = {_as_text(cid) for cid in members or ()}
+        return idx
 
     def save_index(self, idx: Dict[str, Any]) -> None:
-        payload = {
-            "chunk_size": self.chunk_size,
-            "voxels": sorted(idx.get("voxels", [])),
-            "visited": sorted(idx.get("visited", [])),
-            "ores": sorted(idx.get("ores", [])),
+        raw = self._raw()
+        if raw is None:
+            payload = {"chunk_size": self.chunk_size}
+            payload.update({kind: sorted(idx.get(kind, [])) for kind in _saved_kinds(idx)})
+            self.client.set_json(self.index_key, payload)
+            return
+
+        current = self.load_index()
+        pipe = raw.pipeline(transaction=False)
+        for kind in _saved_kinds(idx):
+            wanted = set(idx.get(kind, ()))
+            added, removed = wanted - current[kind], current[kind] - wanted
+            if added:
+                pipe.sadd(self._index_set_key(kind), *sorted(added))
+            if removed:
+                pipe.srem(self._index_set_key(kind), *sorted(removed))
+        pipe.set(self.index_key, json.dumps({"chunk_size": self.chunk_size}))
+        pipe.execute()
+
+    def has_chunks(self) -> bool:
+        raw = self._raw()
+        if raw is None:
+            return super().has_chunks()
+        keys = [self._index_set_key(kind) for kind in _KINDS]
+        if raw.exists(*keys):
+            return True
+        self._migrate_json_index(self._index_meta())
+        return bool(raw.exists(*keys))
+
+    def index_contains(self, kind: str, chunk_ids: Iterable[str]) -> set:
+        ids = sorted(set(chunk_ids))
+        raw = self._raw()
+        if raw is None:
+            return super().index_contains(kind, ids)
+        if not ids:
+            return set()
+        key = self._index_set_key(kind)
+        try:
+            flags = raw.smismember(key, ids)
+        except Exception:
+            # Redis < 6.2 без SMISMEMBER: те же проверки одним конвейером.
+            pipe = raw.pipeline(transaction=False)
+            for cid in ids:
+                pipe.sismember(key, cid)
+            flags = pipe.execute()
+        return {cid for cid, flag in zip(ids, flags) if flag}
+
+    def index_select(self, kinds: Sequence[str], chunk_ids: Iterable[str]) -> Dict[str, set]:
+        ids = sorted(set(chunk_ids))
+        raw = self._raw()
+        if raw is None or not ids or not kinds:
+            return super().index_select(kinds, ids)
+        pipe = raw.pipeline(transaction=False)
+        for kind in kinds:
+            for cid in ids:
+                pipe.sismember(self._index_set_key(kind), cid)
+        flags = pipe.execute()
+        return {
+            kind: {cid for cid, flag in zip(ids, flags[i * len(ids) : (i + 1) * len(ids)]) if flag}
+            for i, kind in enumerate(kinds)
         }
-        self.client.set_json(self.index_key, payload)
 
-    def load_chunk_points(self, kind: str, chunk_id: str) -> List[Point3D]:
-        payload = self.client.get_json(self._chunk_key(kind, chunk_id))
-        if not isinstance(payload, list):
-            return []
-        return [_normalize_point(p) for p in payload]
+    def index_add(self, kind: str, chunk_ids: Iterable[str]) -> None:
+        ids = sorted(set(chunk_ids))
+        raw = self._raw()
+        if raw is None:
+            super().index_add(kind, ids)
+            return
+        if not ids:
+            return
+        pipe = raw.pipeline(transaction=False)
+        pipe.sadd(self._index_set_key(kind), *ids)
+        pipe.set(self.index_key, json.dumps({"chunk_size": self.chunk_size}), nx=True)
+        pipe.execute()
+
+    def _mget(self, keys: List[str]) -> List[Any]:
+        raw = getattr(self.client, "_client", None)
+        if raw is None or not hasattr(raw, "mget"):
+            return [self.client.get_value(key) for key in keys]
+        values: List[Any] = []
+        for start in range(0, len(keys), _MGET_BATCH):
+            values.extend(raw.mget(keys[start : start + _MGET_BATCH]))
+        return values
+
+    def load_chunk_arrays(self, kind: str, chunk_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        ids = list(chunk_ids)
+        payloads = self._mget([self._chunk_key(kind, cid) for cid in ids])
+        return {cid: self._decode_points(payload) for cid, payload in zip(ids, payloads)}
+
+    def load_chunk_ores_many(self, chunk_ids: Sequence[str]) -> Dict[str, List[OreHit]]:
+        ids = list(chunk_ids)
+        payloads = self._mget([self._chunk_key("ores", cid) for cid in ids])
+        return {cid: self._decode_ores(payload) for cid, payload in zip(ids, payloads)}
+
+    def load_chunk_ore_arrays(self, chunk_ids: Sequence[str]) -> Dict[str, chunk_codec.OreChunk]:
+        ids = list(chunk_ids)
+        payloads = self._mget([self._chunk_key("ores", cid) for cid in ids])
+        return {cid: self._decode_ore_chunk(payload) for cid, payload in zip(ids, payloads)}
+
+    def load_chunk_array(self, kind: str, chunk_id: str) -> np.ndarray:
+        return self._decode_points(self.client.get_value(self._chunk_key(kind, chunk_id)))
+
+    def count_chunk_points(self, kind: str, chunk_ids: Sequence[str]) -> Dict[str, int]:
+        # Бинарный чанк хранит число точек в заголовке: хватает GETRANGE
+        # на несколько десятков байт вместо чтения и распаковки всего чанка.
+        raw = self._raw()
+        ids = list(chunk_ids)
+        if raw is None or not ids:
+            return super().count_chunk_points(kind, ids)
+        pipe = raw.pipeline(transaction=False)
+        for cid in ids:
+            pipe.getrange(self._chunk_key(kind, cid), 0, chunk_codec.HEADER_SIZE - 1)
+        counts: Dict[str, int] = {}
+        legacy: List[str] = []
+        for cid, prefix in zip(ids, pipe.execute()):
+            count = chunk_codec.point_count(prefix)
+            if count is not None:
+                counts[cid] = count
+            elif prefix:
+                legacy.append(cid)
+        counts.update(super().count_chunk_points(kind, legacy))
+        return counts
 
     def save_chunk_points(self, kind: str, chunk_id: str, points: Iterable[Point3D]) -> None:
-        self.client.set_json(self._chunk_key(kind, chunk_id), list(points))
+        self.client.set_value(self._chunk_key(kind, chunk_id), self._encode_points(chunk_id, points, kind))
 
     def load_chunk_ores(self, chunk_id: str) -> List[OreHit]:
-        payload = self.client.get_json(self._chunk_key("ores", chunk_id))
-        if not isinstance(payload, list):
-            return []
-        ores: List[OreHit] = []
-        for item in payload:
-            if not isinstance(item, dict):
-                continue
-            pos = item.get("position")
-            if pos is None:
-                continue
-            ores.append(
-                OreHit(
-                    material=str(item.get("material") or item.get("ore") or "unknown"),
-                    position=_normalize_point(pos),
-                    content=item.get("content"),
-                )
-            )
-        return ores
+        return self._decode_ores(self.client.get_value(self._chunk_key("ores", chunk_id)))
 
     def save_chunk_ores(self, chunk_id: str, ores: Iterable[OreHit]) -> None:
-        payload = [
-            {"material": ore.material, "position": ore.position, "content": ore.content}
-            for ore in ores
-        ]
-        self.client.set_json(self._chunk_key("ores", chunk_id), payload)
+        self.client.set_value(self._chunk_key("ores", chunk_id), self._encode_ores(chunk_id, ores))
+
+    def save_chunk_batch(
+        self,
+        points: Dict[tuple[str, str], Any],
+        ores: Dict[str, List[OreHit]],
+    ) -> None:
+        raw = getattr(self.client, "_client", None)
+        if raw is None or not hasattr(raw, "pipeline"):
+            super().save_chunk_batch(points, ores)
+            return
+        pipe = raw.pipeline(transaction=False)
+        for (kind, cid), pts in points.items():
+            pipe.set(self._chunk_key(kind, cid), self._encode_points(cid, pts, kind))
+        for cid, hits in ores.items():
+            pipe.set(self._chunk_key("ores", cid), self._encode_ores(cid, hits))
+        pipe.execute()
+
+    # Слияние: несжатые бинарные чанки точек сливает Lua-скрипт на сервере
+    # (один EVALSHA на чанк в общем конвейере). В Lua Redis нет zlib/lz4,
+    # поэтому сжатые и JSON-чанки, а также руды сливаются на клиенте в
+    # оптимистичной транзакции WATCH/MULTI/EXEC с повтором при гонке.
+    def merge_chunks(
+        self,
+        points: Dict[tuple[str, str], Any],
+        ores: Dict[str, List[OreHit]],
+        *,
+        index: bool = True,
+    ) -> None:
+        raw = self._raw()
+        if raw is None or not hasattr(raw, "pipeline"):
+            super().merge_chunks(points, ores, index=index)
+            return
+
+        pending = dict(points)
+        if pending and self._lua_merge_supported(raw):
+            for key in self._merge_points_lua(raw, pending, index=index):
+                del pending[key]
+
+        items: List[tuple[str, str, Any]] = []
+        for (kind, cid), pts in pending.items():
+            items.append((kind, cid, functools.partial(self._remerge_points, kind, cid, pts)))
+        for cid, hits in ores.items():
+            items.append(("ores", cid, functools.partial(self._remerge_ores, cid, hits)))
+        for start in range(0, len(items), _MGET_BATCH):
+            self._merge_watched(raw, items[start : start + _MGET_BATCH], index=index)
+
+    def _lua_merge_supported(self, raw: Any) -> bool:
+        return (
+            self.chunk_format == "binary"
+            and (self.compression or "none") == "none"
+            and hasattr(raw, "register_script")
+        )
+
+    def _merge_points_lua(self, raw: Any, points: Dict[tuple[str, str], Any], *, index: bool) -> List[tuple[str, str]]:
+        """Слить чанки скриптом; вернуть ключи, которые скрипт принял."""
+        if self._merge_script is None:
+            self._merge_script = raw.register_script(_MERGE_POINTS_LUA)
+        pipe = raw.pipeline(transaction=False)
+        queued: List[tuple[str, str]] = []
+        for (kind, cid), pts in points.items():
+            chunk_size, resolution = self._grid(kind)
+            centre = chunk_codec.chunk_centre(cid, chunk_size)
+            records = chunk_codec.point_records(pts, centre=centre, resolution=resolution)
+            if records is None:
+                continue  # смещения не влезают в int16 — сольем на клиенте
+            self._merge_script(
+                keys=[self._chunk_key(kind, cid), self._index_set_key(kind)],
+                args=[
+                    chunk_codec.point_header(0, centre=centre, resolution=resolution),
+                    records,
+                    cid,
+                    "1" if index else "0",
+                ],
+                client=pipe,
+            )
+            queued.append((kind, cid))
+        if not queued:
+            return []
+        if index:
+            pipe.set(self.index_key, json.dumps({"chunk_size": self.chunk_size}), nx=True)
+        results = pipe.execute()
+        return [key for key, added in zip(queued, results) if int(added) >= 0]
+
+    def _remerge_points(self, kind: str, chunk_id: str, points: Any, payload: Any) -> bytes | str:
+        merged = _merge_point_arrays(self._decode_points(payload), points, self._grid(kind)[1])
+        return self._encode_points(chunk_id, merged, kind)
+
+    def _remerge_ores(self, chunk_id: str, ores: List[OreHit], payload: Any) -> bytes | str:
+        return self._encode_ores(chunk_id, _merge_ore_hits(self._decode_ores(payload), ores))
+
+    def _merge_watched(self, raw: Any, items: List[tuple[str, str, Any]], *, index: bool) -> None:
+        """WATCH чанков, слияние на клиенте и запись в MULTI/EXEC; при гонке — повтор."""
+        keys = [self._chunk_key(kind, cid) for kind, cid, _ in items]
+        with raw.pipeline() as pipe:
+            for attempt in range(_WATCH_RETRIES):
+                try:
+                    pipe.watch(*keys)
+                    payloads = pipe.mget(keys)
+                    blobs = [merge(payload) for (_, _, merge), payload in zip(items, payloads)]
+                    pipe.multi()
+                    for key, blob in zip(keys, blobs):
+                        pipe.set(key, blob)
+                    if index:
+                        for kind, cid, _ in items:
+                            pipe.sadd(self._index_set_key(kind), cid)
+                        pipe.set(self.index_key, json.dumps({"chunk_size": self.chunk_size}), nx=True)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    if attempt == _WATCH_RETRIES - 1:
+                        raise
 
     def load_paths(self) -> Dict[str, List[Point3D]]:
         payload = self.client.get_json(self.paths_key) or {}
@@ -824,6 +2191,20 @@ class RedisSharedMapStorage(SharedMapStorage):
     def save_paths(self, paths: Dict[str, List[Point3D]]) -> None:
         self.client.set_json(self.paths_key, paths)
 
+    def _path_cache_key(self, key: str) -> str:
+        return f"{self.memory_prefix}:path_cache:{key}"
+
+    def load_cached_path(self, key: str) -> Optional[List[Point3D]]:
+        payload = self.client.get_json(self._path_cache_key(key))
+        if not isinstance(payload, list):
+            return None
+        return [_normalize_point(p) for p in payload]
+
+    def save_cached_path(self, key: str, points: Sequence[Point3D], ttl: float) -> None:
+        # Каждый путь — отдельный ключ со сроком жизни: агенты не
+        # переписывают общий документ и не мешают друг другу.
+        self.client.set_json(self._path_cache_key(key), [list(p) for p in points], expire=max(1, int(math.ceil(ttl))))
+
     def load_metadata(self) -> Dict[str, Any]:
         payload = self.client.get_json(self.metadata_key)
         return payload if isinstance(payload, dict) else {}
@@ -832,24 +2213,28 @@ class RedisSharedMapStorage(SharedMapStorage):
         self.client.set_json(self.metadata_key, metadata)
 
     def delete_chunk(self, kind: str, chunk_id: str) -> None:
-        try:
-            self.client._client.delete(self._chunk_key(kind, chunk_id))  # type: ignore[attr-defined]
-        except Exception:
-            # Если клиент не предоставляет прямого доступа, просто перезаписываем пустым списком
-            self.client.set_json(self._chunk_key(kind, chunk_id), [])
+        raw = self._raw()
+        if raw is not None:
+            pipe = raw.pipeline(transaction=False)
+            pipe.delete(self._chunk_key(kind, chunk_id))
+            pipe.srem(self._index_set_key(kind), chunk_id)
+            pipe.execute()
+            return
+        # Если клиент не предоставляет прямого доступа, просто перезаписываем пустым списком
+        self.client.set_json(self._chunk_key(kind, chunk_id), [])
+        idx = self.load_index()
+        idx[kind].discard(chunk_id)
+        self.save_index(idx)
 
     def get_storage_usage(self) -> int:
         """Подсчитать примерный размер всех ключей карты в Redis."""
         idx = self.load_index()
 
         keys: list[str] = [self.index_key, self.paths_key, self.metadata_key]
+        keys.extend(self._index_set_key(kind) for kind in _INDEXED_KINDS)
 
-        for cid in idx["voxels"]:
-            keys.append(self._chunk_key("voxels", cid))
-        for cid in idx["visited"]:
-            keys.append(self._chunk_key("visited", cid))
-        for cid in idx["ores"]:
-            keys.append(self._chunk_key("ores", cid))
+        for kind in _INDEXED_KINDS:
+            keys.extend(self._chunk_key(kind, cid) for cid in idx[kind])
 
         # На случай старого формата, когда всё лежало по memory_prefix
         keys.append(self.memory_prefix)
@@ -873,34 +2258,55 @@ class RedisSharedMapStorage(SharedMapStorage):
 
             if size == 0:
                 try:
-                    payload = self.client.get_json(key)
+                    payload = self.client.get_value(key)
                 except Exception:
                     payload = None
 
                 if payload is None:
                     continue
 
-                try:
-                    dump = json.dumps(payload, separators=(",", ":"))
-                except TypeError:
-                    dump = json.dumps(payload)
-
-                size = len(dump.encode("utf-8", "ignore"))
+                size = len(payload)
 
             total_size += size
 
         return total_size
 
 
+def _synchronized(method):
+    """Выполнить метод хранилища под его ``self._lock``."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class SQLiteSharedMapStorage(SharedMapStorage):
-    def __init__(self, path: str | os.PathLike[str], *, chunk_size: float) -> None:
+    """Карта в одном файле SQLite.
+
+    В ``chunk_index`` помимо строкового ``chunk_id`` хранятся целые
+    координаты чанка ``ix, iy, iz`` с составным индексом, поэтому выборка по
+    кубу (:meth:`index_in_box`) выполняется одним запросом. Полезная нагрузка
+    чанков — BLOB бинарного формата (или JSON-текст для ``chunk_format="json"``);
+    пачки чанков пишутся ``executemany`` в одной транзакции, а
+    :meth:`merge_chunks` держит блокировку записи (``BEGIN IMMEDIATE``) от
+    чтения до записи, так что несколько процессов на одной машине не теряют
+    точки друг друга.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], *, chunk_size: float, **encoding: Any) -> None:
         self.path = Path(path).expanduser().resolve()
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.path))
+        # Соединение может использоваться фоновым потоком сброса буфера,
+        # поэтому доступ к нему сериализуется через self._lock.
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.RLock()
         self.conn.execute("PRAGMA journal_mode=WAL")
         self.conn.execute("PRAGMA synchronous=NORMAL")
         self.conn.execute("PRAGMA foreign_keys=ON")
-        super().__init__(chunk_size=chunk_size)
+        super().__init__(chunk_size=chunk_size, **encoding)
         self._ensure_schema()
 
     def _ensure_schema(self) -> None:
@@ -910,16 +2316,32 @@ class SQLiteSharedMapStorage(SharedMapStorage):
                 CREATE TABLE IF NOT EXISTS chunk_index (
                     kind TEXT NOT NULL,
                     chunk_id TEXT NOT NULL,
+                    ix INTEGER,
+                    iy INTEGER,
+                    iz INTEGER,
                     PRIMARY KEY (kind, chunk_id)
                 )
                 """
             )
+            # Базы, созданные до появления координат: добавляем столбцы и
+            # заполняем их из chunk_id.
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(chunk_index)")}
+            for column in ("ix", "iy", "iz"):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE chunk_index ADD COLUMN {column} INTEGER")
+            missing = self.conn.execute("SELECT kind, chunk_id FROM chunk_index WHERE ix IS NULL").fetchall()
+            updates = [(*coords, kind, cid) for kind, cid in missing if (coords := _chunk_coords(cid)) is not None]
+            if updates:
+                self.conn.executemany(
+                    "UPDATE chunk_index SET ix = ?, iy = ?, iz = ? WHERE kind = ? AND chunk_id = ?", updates
+                )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS chunk_index_box ON chunk_index (kind, ix, iy, iz)")
             self.conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS chunks (
                     kind TEXT NOT NULL,
                     chunk_id TEXT NOT NULL,
-                    payload TEXT NOT NULL,
+                    payload BLOB NOT NULL,
                     PRIMARY KEY (kind, chunk_id)
                 )
                 """
@@ -932,6 +2354,15 @@ class SQLiteSharedMapStorage(SharedMapStorage):
                 )
                 """
             )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS path_cache (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
             self.conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS metadata (
@@ -941,6 +2372,33 @@ class SQLiteSharedMapStorage(SharedMapStorage):
                 """
             )
 
+    @staticmethod
+    def _index_rows(kind: str, chunk_ids: Iterable[str]) -> List[tuple]:
+        return [(kind, cid, *(_chunk_coords(cid) or (None, None, None))) for cid in chunk_ids]
+
+    def _insert_index(self, rows: List[tuple]) -> None:
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO chunk_index (kind, chunk_id, ix, iy, iz) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    def _write_chunk_rows(self, rows: List[tuple[str, str, Any]]) -> None:
+        """Записать ``(kind, chunk_id, payload)`` и id в индекс; транзакцией управляет вызывающий."""
+        self.conn.executemany("INSERT OR REPLACE INTO chunks (kind, chunk_id, payload) VALUES (?, ?, ?)", rows)
+        for kind in {kind for kind, _, _ in rows}:
+            self._insert_index(self._index_rows(kind, [cid for k, cid, _ in rows if k == kind]))
+
+    def _select_payloads(self, kind: str, chunk_ids: Sequence[str]) -> Dict[str, Any]:
+        ids = list(chunk_ids)
+        payloads: Dict[str, Any] = {}
+        for start in range(0, len(ids), _MGET_BATCH):
+            batch = ids[start : start + _MGET_BATCH]
+            cursor = self.conn.execute(
+                f"SELECT chunk_id, payload FROM chunks WHERE kind = ? AND chunk_id IN ({','.join('?' * len(batch))})",
+                (kind, *batch),
+            )
+            payloads.update(cursor.fetchall())
+        return payloads
+
     def _get_metadata(self, key: str) -> Optional[Any]:
         cursor = self.conn.execute("SELECT value FROM metadata WHERE key = ?", (key,))
         row = cursor.fetchone()
@@ -953,11 +2411,15 @@ class SQLiteSharedMapStorage(SharedMapStorage):
 
     def _set_metadata(self, key: str, value: Any) -> None:
         with self.conn:
-            self.conn.execute(
-                "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
-                (key, json.dumps(value)),
-            )
+            self._set_metadata_row(key, value)
+
+    def _set_metadata_row(self, key: str, value: Any) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
+        )
 
+    @_synchronized
     def load_index(self) -> Dict[str, Any]:
         stored_chunk_size = self._get_metadata("chunk_size")
         if stored_chunk_size is not None:
@@ -966,94 +2428,190 @@ class SQLiteSharedMapStorage(SharedMapStorage):
             except (TypeError, ValueError):
                 pass
 
-        idx = {"chunk_size": self.chunk_size, "voxels": set(), "visited": set(), "ores": set()}
+        idx: Dict[str, Any] = {"chunk_size": self.chunk_size, **{kind: set() for kind in _INDEXED_KINDS}}
         cursor = self.conn.execute("SELECT kind, chunk_id FROM chunk_index")
         for kind, chunk_id in cursor.fetchall():
             if kind in idx:
                 idx[kind].add(chunk_id)
         return idx
 
+    @_synchronized
     def save_index(self, idx: Dict[str, Any]) -> None:
         with self.conn:
             self._set_metadata("chunk_size", float(self.chunk_size))
-            for kind in ("voxels", "visited", "ores"):
+            for kind in _saved_kinds(idx):
                 self.conn.execute("DELETE FROM chunk_index WHERE kind = ?", (kind,))
-                chunk_ids = [(kind, cid) for cid in sorted(idx.get(kind, []))]
-                if chunk_ids:
-                    self.conn.executemany(
-                        "INSERT OR IGNORE INTO chunk_index (kind, chunk_id) VALUES (?, ?)", chunk_ids
-                    )
+                rows = self._index_rows(kind, sorted(idx.get(kind, [])))
+                if rows:
+                    self._insert_index(rows)
 
-    def load_chunk_points(self, kind: str, chunk_id: str) -> List[Point3D]:
+    @_synchronized
+    def load_chunk_size(self) -> Optional[float]:
+        value = self._get_metadata("chunk_size")
+        try:
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    @_synchronized
+    def has_chunks(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM chunk_index LIMIT 1").fetchone() is not None
+
+    @_synchronized
+    def index_contains(self, kind: str, chunk_ids: Iterable[str]) -> set:
+        ids = sorted(set(chunk_ids))
+        found: set = set()
+        for start in range(0, len(ids), _MGET_BATCH):
+            batch = ids[start : start + _MGET_BATCH]
+            cursor = self.conn.execute(
+                f"SELECT chunk_id FROM chunk_index WHERE kind = ? AND chunk_id IN ({','.join('?' * len(batch))})",
+                (kind, *batch),
+            )
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+
+    @_synchronized
+    def index_in_box(
+        self,
+        kinds: Sequence[str],
+        lo: Sequence[int],
+        hi: Sequence[int],
+    ) -> Dict[str, set]:
+        selected: Dict[str, set] = {kind: set() for kind in kinds}
+        if not kinds:
+            return selected
+        cursor = self.conn.execute(
+            f"""
+            SELECT kind, chunk_id FROM chunk_index
+            WHERE kind IN ({','.join('?' * len(kinds))})
+              AND ix BETWEEN ? AND ? AND iy BETWEEN ? AND ? AND iz BETWEEN ? AND ?
+            """,
+            (*kinds, int(lo[0]), int(hi[0]), int(lo[1]), int(hi[1]), int(lo[2]), int(hi[2])),
+        )
+        for kind, chunk_id in cursor.fetchall():
+            selected[kind].add(chunk_id)
+        return selected
+
+    @_synchronized
+    def index_add(self, kind: str, chunk_ids: Iterable[str]) -> None:
+        with self.conn:
+            self._set_metadata("chunk_size", float(self.chunk_size))
+            self._insert_index(self._index_rows(kind, chunk_ids))
+
+    @_synchronized
+    def load_chunk_array(self, kind: str, chunk_id: str) -> np.ndarray:
         cursor = self.conn.execute(
             "SELECT payload FROM chunks WHERE kind = ? AND chunk_id = ?", (kind, chunk_id)
         )
         row = cursor.fetchone()
-        if not row:
-            return []
-        try:
-            payload = json.loads(row[0])
-        except Exception:
-            return []
-        if not isinstance(payload, list):
-            return []
-        return [_normalize_point(p) for p in payload]
-
+        return self._decode_points(row[0] if row else None)
+
+    @_synchronized
+    def load_chunk_arrays(self, kind: str, chunk_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        payloads = self._select_payloads(kind, chunk_ids)
+        return {cid: self._decode_points(payloads.get(cid)) for cid in chunk_ids}
+
+    @_synchronized
+    def load_chunk_ores_many(self, chunk_ids: Sequence[str]) -> Dict[str, List[OreHit]]:
+        payloads = self._select_payloads("ores", chunk_ids)
+        return {cid: self._decode_ores(payloads.get(cid)) for cid in chunk_ids}
+
+    @_synchronized
+    def load_chunk_ore_arrays(self, chunk_ids: Sequence[str]) -> Dict[str, chunk_codec.OreChunk]:
+        payloads = self._select_payloads("ores", chunk_ids)
+        return {cid: self._decode_ore_chunk(payloads.get(cid)) for cid in chunk_ids}
+
+    @_synchronized
+    def count_chunk_points(self, kind: str, chunk_ids: Sequence[str]) -> Dict[str, int]:
+        # Число точек бинарного чанка лежит в заголовке: substr читает только
+        # его, без распаковки всего BLOB.
+        ids = list(chunk_ids)
+        counts: Dict[str, int] = {}
+        legacy: List[str] = []
+        for start in range(0, len(ids), _MGET_BATCH):
+            batch = ids[start : start + _MGET_BATCH]
+            cursor = self.conn.execute(
+                f"SELECT chunk_id, substr(payload, 1, ?) FROM chunks "
+                f"WHERE kind = ? AND chunk_id IN ({','.join('?' * len(batch))})",
+                (chunk_codec.HEADER_SIZE, kind, *batch),
+            )
+            for cid, prefix in cursor.fetchall():
+                count = chunk_codec.point_count(prefix) if isinstance(prefix, bytes) else None
+                if count is not None:
+                    counts[cid] = count
+                elif prefix:
+                    legacy.append(cid)
+        counts.update(super().count_chunk_points(kind, legacy))
+        return counts
+
+    @_synchronized
     def save_chunk_points(self, kind: str, chunk_id: str, points: Iterable[Point3D]) -> None:
-        payload = json.dumps(list(points))
+        payload = self._encode_points(chunk_id, points, kind)
         with self.conn:
-            self.conn.execute(
-                "INSERT OR REPLACE INTO chunks (kind, chunk_id, payload) VALUES (?, ?, ?)",
-                (kind, chunk_id, payload),
-            )
-            self.conn.execute(
-                "INSERT OR IGNORE INTO chunk_index (kind, chunk_id) VALUES (?, ?)",
-                (kind, chunk_id),
-            )
+            self._write_chunk_rows([(kind, chunk_id, payload)])
 
+    @_synchronized
+    def save_chunk_batch(
+        self,
+        points: Dict[tuple[str, str], Any],
+        ores: Dict[str, List[OreHit]],
+    ) -> None:
+        rows = [(kind, cid, self._encode_points(cid, pts, kind)) for (kind, cid), pts in points.items()]
+        rows += [("ores", cid, self._encode_ores(cid, hits)) for cid, hits in ores.items()]
+        if not rows:
+            return
+        with self.conn:
+            self._write_chunk_rows(rows)
+
+    @_synchronized
+    def merge_chunks(
+        self,
+        points: Dict[tuple[str, str], Any],
+        ores: Dict[str, List[OreHit]],
+        *,
+        index: bool = True,
+    ) -> None:
+        # Записанный чанк всегда попадает в chunk_index (как и в save_chunk_batch),
+        # поэтому ``index`` здесь влияет только на запись chunk_size.
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows: List[tuple[str, str, Any]] = []
+            for kind in sorted({kind for kind, _ in points}):
+                ids = [cid for k, cid in points if k == kind]
+                existing = self._select_payloads(kind, ids)
+                resolution = self._grid(kind)[1]
+                for cid in ids:
+                    merged = _merge_point_arrays(self._decode_points(existing.get(cid)), points[(kind, cid)], resolution)
+                    rows.append((kind, cid, self._encode_points(cid, merged, kind)))
+            if ores:
+                existing = self._select_payloads("ores", list(ores))
+                for cid, hits in ores.items():
+                    merged_ores = _merge_ore_hits(self._decode_ores(existing.get(cid)), hits)
+                    rows.append(("ores", cid, self._encode_ores(cid, merged_ores)))
+            if rows:
+                self._write_chunk_rows(rows)
+            if index:
+                self._set_metadata_row("chunk_size", float(self.chunk_size))
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    @_synchronized
     def load_chunk_ores(self, chunk_id: str) -> List[OreHit]:
         cursor = self.conn.execute(
             "SELECT payload FROM chunks WHERE kind = 'ores' AND chunk_id = ?", (chunk_id,)
         )
         row = cursor.fetchone()
-        if not row:
-            return []
-        try:
-            payload = json.loads(row[0])
-        except Exception:
-            return []
-        if not isinstance(payload, list):
-            return []
-        ores: List[OreHit] = []
-        for item in payload:
-            if not isinstance(item, dict):
-                continue
-            pos = item.get("position")
-            if pos is None:
-                continue
-            ores.append(
-                OreHit(
-                    material=str(item.get("material") or item.get("ore") or "unknown"),
-                    position=_normalize_point(pos),
-                    content=item.get("content"),
-                )
-            )
-        return ores
+        return self._decode_ores(row[0] if row else None)
 
+    @_synchronized
     def save_chunk_ores(self, chunk_id: str, ores: Iterable[OreHit]) -> None:
-        payload = [
-            {"material": ore.material, "position": ore.position, "content": ore.content}
-            for ore in ores
-        ]
+        payload = self._encode_ores(chunk_id, ores)
         with self.conn:
-            self.conn.execute(
-                "INSERT OR REPLACE INTO chunks (kind, chunk_id, payload) VALUES ('ores', ?, ?)",
-                (chunk_id, json.dumps(payload)),
-            )
-            self.conn.execute(
-                "INSERT OR IGNORE INTO chunk_index (kind, chunk_id) VALUES ('ores', ?)", (chunk_id,)
-            )
+            self._write_chunk_rows([("ores", chunk_id, payload)])
 
+    @_synchronized
     def load_paths(self) -> Dict[str, List[Point3D]]:
         cursor = self.conn.execute("SELECT name, payload FROM paths")
         paths: Dict[str, List[Point3D]] = {}
@@ -1066,6 +2624,7 @@ class SQLiteSharedMapStorage(SharedMapStorage):
                 paths[name] = [_normalize_point(p) for p in pts]
         return paths
 
+    @_synchronized
     def save_paths(self, paths: Dict[str, List[Point3D]]) -> None:
         with self.conn:
             self.conn.execute("DELETE FROM paths")
@@ -1075,6 +2634,27 @@ class SQLiteSharedMapStorage(SharedMapStorage):
                     [(name, json.dumps(points)) for name, points in paths.items()],
                 )
 
+    @_synchronized
+    def load_cached_path(self, key: str) -> Optional[List[Point3D]]:
+        row = self.conn.execute(
+            "SELECT payload FROM path_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        pts = json.loads(row[0])
+        return [_normalize_point(p) for p in pts] if isinstance(pts, list) else None
+
+    @_synchronized
+    def save_cached_path(self, key: str, points: Sequence[Point3D], ttl: float) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM path_cache WHERE expires_at <= ?", (now,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO path_cache (key, payload, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps([list(p) for p in points]), now + float(ttl)),
+            )
+
+    @_synchronized
     def load_metadata(self) -> Dict[str, Any]:
         cursor = self.conn.execute("SELECT key, value FROM metadata")
         metadata: Dict[str, Any] = {}
@@ -1087,6 +2667,7 @@ class SQLiteSharedMapStorage(SharedMapStorage):
                 metadata[key] = value
         return metadata
 
+    @_synchronized
     def save_metadata(self, metadata: Dict[str, Any]) -> None:
         with self.conn:
             self.conn.execute("DELETE FROM metadata WHERE key != 'chunk_size'")
@@ -1097,6 +2678,7 @@ class SQLiteSharedMapStorage(SharedMapStorage):
                 )
             self._set_metadata("chunk_size", float(self.chunk_size))
 
+    @_synchronized
     def delete_chunk(self, kind: str, chunk_id: str) -> None:
         with self.conn:
             self.conn.execute("DELETE FROM chunks WHERE kind = ? AND chunk_id = ?", (kind, chunk_id))
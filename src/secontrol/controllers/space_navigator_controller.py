@@ -19,18 +19,33 @@ import numpy as np
 
 from secontrol.controllers.radar_controller import RadarController
 from secontrol.devices.ore_detector_device import OreDetectorDevice
+from secontrol.grids import Grid
 from secontrol.devices.remote_control_device import RemoteControlDevice
+from secontrol.tools.hierarchical_pathfinding import HierarchicalPathFinder
+from secontrol.tools.incremental_pathfinding import DStarLitePlanner
 from secontrol.tools.navigation_tools import fly_to_point, get_world_position, _dist
+from secontrol.tools.planner_service import PlanFuture, PlannerService
+from secontrol.tools.radar_fusion import FusedRadarMap
 from secontrol.tools.radar_navigation import (
     PassabilityProfile,
+    PathCache,
     PathFinder,
     RadarContact,
     RawRadarMap,
 )
+from secontrol.tools.reservations import ReservationTable
+from secontrol.tools.spatial_index import PointGridIndex
 
 Point3D = Tuple[float, float, float]
 Index3 = Tuple[int, int, int]
 
+# Spatial index buckets span this many scan cells per axis, which keeps the
+# number of occupied buckets (and so the per-query pruning cost) small.
+_INDEX_CELLS_PER_BUCKET = 8.0
+
+# Telemetry poll period while a background path search is running.
+_PLAN_POLL_INTERVAL = 0.05
+
 
 @dataclass
 class ScanProfile:
@@ -237,6 +252,7 @@ class BackgroundScanner:
         self._nearest_obstacle = float("inf")
         self._nearest_ship = float("inf")
         self._solid_points: List[List[float]] = []
+        self._solid_index = PointGridIndex([])
         self._contacts: List[Dict[str, Any]] = []
         self._needs_replan = False
         self._ship_positions: Dict[int, Point3D] = {}
@@ -266,6 +282,11 @@ class BackgroundScanner:
         with self._lock:
             return self._solid_points.copy()
 
+    @property
+    def solid_index(self) -> PointGridIndex:
+        with self._lock:
+            return self._solid_index
+
     @property
     def contacts(self) -> List[Dict[str, Any]]:
         with self._lock:
@@ -298,14 +319,20 @@ class BackgroundScanner:
         )
         while self._running:
             try:
-                solid, _meta, contacts, _ore_cells = ctrl.scan_voxels()
+                solid, meta, contacts, _ore_cells = ctrl.scan_voxels()
                 ship_pos = _safe_get_position(self.rc)
-                nearest_voxel = nearest_point_distance(solid or [], ship_pos)
+                solid_index = PointGridIndex(
+                    solid or [],
+                    self.scan_profile.cell_size * _INDEX_CELLS_PER_BUCKET,
+                    revision=(meta or {}).get("rev"),
+                )
+                nearest_voxel = nearest_point_distance(solid_index, ship_pos)
                 nearest_ship, ship_positions = _nearest_grid_contact(contacts or [], ship_pos)
                 with self._lock:
                     self._nearest_obstacle = nearest_voxel
                     self._nearest_ship = nearest_ship
                     self._solid_points = solid or []
+                    self._solid_index = solid_index
                     self._contacts = contacts or []
                     self._ship_positions = ship_positions
                     if nearest_voxel < self.safety_distance:
@@ -448,6 +475,32 @@ def build_map_with_ships(
     )
 
 
+def overlay_world_model(radar_map: RawRadarMap, world_model: FusedRadarMap) -> int:
+    """Mark cells of ``radar_map`` covered by solid cells of ``world_model``.
+
+    Every occupied fused cell is rasterised over its whole footprint, so a
+    coarse fused lattice still blocks all finer scan cells it overlaps.
+    Returns the number of newly occupied cells.
+    """
+
+    points = world_model.solid_points()
+    if points.size == 0:
+        return 0
+    origin = np.asarray(radar_map.origin, dtype=np.float64).reshape(3)
+    size = np.asarray(radar_map.size, dtype=np.int64)
+    cell = float(radar_map.cell_size)
+    half = 0.5 * world_model.cell_size
+    lo = np.floor((points - half - origin) / cell).astype(np.int64)
+    hi = np.ceil((points + half - origin) / cell).astype(np.int64) - 1
+    keep = np.all(hi >= 0, axis=1) & np.all(lo < size, axis=1)
+    lo = np.maximum(lo[keep], 0)
+    hi = np.minimum(hi[keep], size - 1)
+    before = int(np.count_nonzero(radar_map.occ))
+    for (x0, y0, z0), (x1, y1, z1) in zip(lo, hi):
+        radar_map.occ[x0 : x1 + 1, y0 : y1 + 1, z0 : z1 + 1] = True
+    return int(np.count_nonzero(radar_map.occ)) - before
+
+
 def normalize_scan_metadata(
     metadata: Dict[str, Any],
     profile: ScanProfile,
@@ -491,8 +544,49 @@ def find_path_multiscale(
     goal: Point3D,
     ship_radius: float = 50.0,
     scan_profile: Optional[ScanProfile] = None,
+    *,
+    any_angle: bool = False,
+    path_cache: Optional[PathCache] = None,
+    inflation: str = "box",
 ) -> List[Point3D]:
-    """Run A* with obstacle inflation for the current scan profile."""
+    """Run A* with obstacle inflation for the current scan profile.
+
+    ``any_angle=True`` switches to Lazy Theta*, which returns a few straight
+    legs instead of one waypoint per voxel. With ``path_cache`` a validated
+    cached path for the same endpoint cells is returned without searching.
+    ``inflation="sphere"`` inflates obstacles with a ball instead of a cube.
+    """
+
+    path_map, passability = _path_search_inputs(
+        radar_map, start, goal, ship_radius, scan_profile, inflation=inflation
+    )
+    pathfinder = PathFinder(path_map, passability)
+    start_time = time.time()
+    path = pathfinder.find_path_world(start, goal, any_angle=any_angle, cache=path_cache)
+    elapsed = time.time() - start_time
+    if path:
+        print(
+            f"[PATH] {len(path)} waypoints in {elapsed:.2f}s "
+            f"map={path_map.size[0]}x{path_map.size[1]}x{path_map.size[2]}"
+        )
+    else:
+        print(
+            f"[PATH] No path in {elapsed:.2f}s "
+            f"map={path_map.size[0]}x{path_map.size[1]}x{path_map.size[2]}"
+        )
+    return path
+
+
+def _path_search_inputs(
+    radar_map: RawRadarMap,
+    start: Point3D,
+    goal: Point3D,
+    ship_radius: float,
+    scan_profile: Optional[ScanProfile],
+    *,
+    inflation: str = "box",
+) -> Tuple[RawRadarMap, PassabilityProfile]:
+    """Crop the map around one leg and build the matching passability profile."""
 
     robot_radius = float(ship_radius)
     if scan_profile is not None:
@@ -505,30 +599,19 @@ def find_path_multiscale(
         padding_m=max(robot_radius * 2.0, radar_map.cell_size * 20.0),
         label="PATH",
     )
+    return path_map, _flight_passability(robot_radius, inflation)
+
 
-    profile = PassabilityProfile(
+def _flight_passability(robot_radius: float, inflation: str = "box") -> PassabilityProfile:
+    return PassabilityProfile(
         robot_radius=robot_radius,
         max_slope_degrees=90.0,
         max_step_cells=5,
         allow_vertical_movement=True,
         allow_diagonal=True,
         is_ground_vehicle=False,
+        inflation=inflation,
     )
-    pathfinder = PathFinder(path_map, profile)
-    start_time = time.time()
-    path = pathfinder.find_path_world(start, goal)
-    elapsed = time.time() - start_time
-    if path:
-        print(
-            f"[PATH] {len(path)} waypoints in {elapsed:.2f}s "
-            f"map={path_map.size[0]}x{path_map.size[1]}x{path_map.size[2]}"
-        )
-    else:
-        print(
-            f"[PATH] No path in {elapsed:.2f}s "
-            f"map={path_map.size[0]}x{path_map.size[1]}x{path_map.size[2]}"
-        )
-    return path
 
 
 def crop_map_for_path(
@@ -559,22 +642,11 @@ def crop_map_for_path(
     if crop_size == radar_map.size:
         return radar_map
 
-    slices = tuple(slice(mins[axis], maxs[axis] + 1) for axis in range(3))
-    new_origin = radar_map.origin + np.asarray(mins, dtype=np.float64) * radar_map.cell_size
     print(
         f"[{label}] Crop map {radar_map.size[0]}x{radar_map.size[1]}x{radar_map.size[2]} -> "
         f"{crop_size[0]}x{crop_size[1]}x{crop_size[2]}"
     )
-    return RawRadarMap(
-        occ=radar_map.occ[slices].copy(),
-        origin=new_origin,
-        cell_size=radar_map.cell_size,
-        size=crop_size,  # type: ignore[arg-type]
-        revision=radar_map.revision,
-        timestamp_ms=radar_map.timestamp_ms,
-        contacts=radar_map.contacts,
-        _inflation_cache={},
-    )
+    return radar_map.crop(tuple(mins), tuple(m + 1 for m in maxs))  # type: ignore[arg-type]
 
 
 def resolve_nearest_safe_point(
@@ -676,8 +748,13 @@ def pick_waypoint_along_path(
     scan_center: Optional[Point3D] = None,
     rescan_distance: Optional[float] = None,
     max_leg_distance: Optional[float] = None,
+    interpolate: bool = False,
 ) -> Optional[Point3D]:
-    """Pick the farthest path waypoint that remains inside scan limits."""
+    """Pick the farthest path waypoint that remains inside scan limits.
+
+    With ``interpolate=True`` the waypoint may lie inside the first leg that
+    leaves the limits, which keeps long any-angle legs usable.
+    """
 
     if not path:
         return None
@@ -699,25 +776,57 @@ def pick_waypoint_along_path(
         else float("inf")
     )
 
+    def _inside(point: Point3D) -> bool:
+        return _dist(point, ship_pos) <= max_from_ship and _dist(point, scan_center) <= max_from_center
+
     best: Optional[Point3D] = None
+    previous: Optional[Point3D] = None
     for waypoint in path:
         if _dist(waypoint, ship_pos) < 1e-6:
+            previous = waypoint
             continue
-        if _dist(waypoint, ship_pos) > max_from_ship:
-            break
-        if _dist(waypoint, scan_center) > max_from_center:
+        if not _inside(waypoint):
+            if interpolate and previous is not None and _inside(previous):
+                # Both distances are convex along the leg, so the feasible part
+                # is a prefix and can be found by bisection.
+                lo, hi = 0.0, 1.0
+                for _ in range(40):
+                    mid = 0.5 * (lo + hi)
+                    if _inside(_lerp(previous, waypoint, mid)):
+                        lo = mid
+                    else:
+                        hi = mid
+                candidate = _lerp(previous, waypoint, lo)
+                if _dist(candidate, ship_pos) >= 1e-6:
+                    best = candidate
             break
         best = waypoint
+        previous = waypoint
 
     return best
 
 
+def _lerp(a: Point3D, b: Point3D, t: float) -> Point3D:
+    return (a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t, a[2] + (b[2] - a[2]) * t)
+
+
 class SpaceNavigatorController:
-    """Reusable obstacle-avoiding navigator for space grids."""
+    """Reusable obstacle-avoiding navigator for space grids.
+
+    Each leg is planned by at most one of four planners: ``reservations``
+    (timed WHCA* around other drones), ``incremental_replanning`` (D* Lite),
+    ``hierarchical_paths`` (HPA* for targets beyond the usable scan radius,
+    flat A* otherwise) or ``planner_service`` (A* off the control thread);
+    without any of them the flat A* runs inline. ``path_cache`` and
+    ``any_angle_paths`` apply to the flat, hierarchical and off-thread
+    searches; D* Lite shortcuts its path but keeps its own search state
+    instead of a cache. Combinations that would silently ignore an option
+    raise :class:`ValueError`.
+    """
 
     def __init__(
         self,
-        grid_name: str,
+        grid_name: "str | Grid",
         *,
         ship_radius: Optional[float] = None,
         speed_zone: Optional[SpeedZone] = None,
@@ -732,10 +841,41 @@ class SpaceNavigatorController:
         dry_run: bool = False,
         target_is_obstacle: bool = False,
         open_space_boost: Optional[OpenSpaceBoostConfig] = None,
+        any_angle_paths: bool = False,
+        incremental_replanning: bool = False,
+        hierarchical_paths: bool = False,
+        hierarchical_chunk_cells: int = 16,
+        path_cache: Optional[PathCache] = None,
+        planner_service: Optional[PlannerService] = None,
+        plan_deadline: float = 2.0,
+        inflation_shape: str = "box",
+        world_model: Optional[FusedRadarMap] = None,
+        reservations: Optional[ReservationTable] = None,
+        reservation_agent: Optional[str] = None,
+        reservation_priority: int = 0,
+        reservation_hold: float = 30.0,
     ):
         from secontrol.common import prepare_grid
 
-        self.grid = prepare_grid(grid_name)
+        planners = [
+            name
+            for name, enabled in (
+                ("reservations", reservations is not None),
+                ("incremental_replanning", incremental_replanning),
+                ("hierarchical_paths", hierarchical_paths),
+                ("planner_service", planner_service is not None),
+            )
+            if enabled
+        ]
+        if len(planners) > 1:
+            raise ValueError(f"choose one planner, got {' and '.join(planners)}")
+        if reservations is not None and (any_angle_paths or path_cache is not None):
+            raise ValueError("reserved paths are timed grid paths; any_angle_paths and path_cache do not apply")
+        if incremental_replanning and path_cache is not None:
+            raise ValueError("incremental_replanning keeps its own search state; path_cache does not apply")
+
+        # A ready Grid (e.g. from secontrol.sim.FlightSimulator.grid()) is used as is.
+        self.grid = grid_name if isinstance(grid_name, Grid) else prepare_grid(grid_name)
         self.speed_zone = speed_zone or SpeedZone()
         self.coarse_scan = coarse_scan or COARSE_SCAN
         self.medium_scan = medium_scan or MEDIUM_SCAN
@@ -748,6 +888,27 @@ class SpaceNavigatorController:
         self.dry_run = bool(dry_run)
         self.target_is_obstacle = bool(target_is_obstacle)
         self.open_space_boost = open_space_boost or OpenSpaceBoostConfig(enabled=False)
+        self.any_angle_paths = bool(any_angle_paths)
+        self.incremental_replanning = bool(incremental_replanning)
+        # Targets beyond the usable scan radius are routed over map chunks
+        # (HPA*) and only the legs the next waypoint can reach are refined.
+        self.hierarchical_paths = bool(hierarchical_paths)
+        self.hierarchical_chunk_cells = int(hierarchical_chunk_cells)
+        self.path_cache = path_cache
+        self.planner_service = planner_service
+        self.plan_deadline = float(plan_deadline)
+        self.inflation_shape = inflation_shape
+        # Scans are fused here and earlier solid cells are added to each
+        # planning map, so obstacles behind the ship are not forgotten.
+        self.world_model = world_model
+        # Shared space-time reservations: routes are planned around better-
+        # ranked drones and booked; a preempted leg stops and is replanned.
+        # The last block of a route, and the parking block after arrival, is
+        # held for ``reservation_hold`` seconds; everything else is released
+        # when navigation ends.
+        self.reservations = reservations
+        self.reservation_priority = int(reservation_priority)
+        self.reservation_hold = float(reservation_hold)
         self._last_speed_mode = "PROFILE_CAP"
         self._last_speed_details = ""
 
@@ -760,6 +921,9 @@ class SpaceNavigatorController:
 
         self.radar: OreDetectorDevice = radars[0]
         self.rc: RemoteControlDevice = rcs[0]
+        self.reservation_agent = str(
+            reservation_agent or getattr(self.grid, "grid_id", None) or getattr(self.grid, "name", "navigator")
+        )
         self.ship_radius = (
             float(ship_radius)
             if ship_radius is not None
@@ -774,6 +938,10 @@ class SpaceNavigatorController:
         self._nearest_voxel_distance = float("inf")
         self._last_valid_position: Optional[Point3D] = None
         self._fine_seen_voxels = False
+        self._incremental_planner: Optional[DStarLitePlanner] = None
+        # Search for the next leg, submitted when the current leg starts:
+        # (map it was planned on, start, goal, path map, future).
+        self._next_plan: Optional[Tuple[RawRadarMap, Point3D, Point3D, RawRadarMap, PlanFuture]] = None
 
     def navigate_to(
         self,
@@ -789,6 +957,8 @@ class SpaceNavigatorController:
         self._nearest_voxel_distance = float("inf")
         self._last_valid_position = None
         self._fine_seen_voxels = False
+        self._incremental_planner = None
+        self._next_plan = None
 
         print("=" * 60)
         print("  Space Navigator - distance-scanned obstacle avoidance")
@@ -831,11 +1001,33 @@ class SpaceNavigatorController:
         self.rc.set_collision_avoidance(False)
         time.sleep(1)
 
+        result: Optional[NavigationResult] = None
         try:
-            return self._navigate_loop(requested_target, cancel_check)
+            result = self._navigate_loop(requested_target, cancel_check)
+            return result
         finally:
             if self.scanner:
                 self.scanner.stop()
+            self._drop_next_plan()
+            self._settle_reservations(result)
+
+    def _settle_reservations(self, result: Optional[NavigationResult]) -> None:
+        """Hand back the booked route once navigation ends.
+
+        An arrived ship keeps only the block it parked in, for
+        :attr:`reservation_hold` seconds; any other outcome releases every
+        reservation of :attr:`reservation_agent`.
+        """
+
+        table = self.reservations
+        if table is None:
+            return
+        if result is not None and result.arrived and result.final_position is not None:
+            now = time.time()
+            parked = [(table.block_of(result.final_position), now, now + self.reservation_hold)]
+            if table.reserve(self.reservation_agent, parked, priority=self.reservation_priority):
+                return
+        table.release(self.reservation_agent)
 
     def _navigate_loop(
         self,
@@ -850,6 +1042,7 @@ class SpaceNavigatorController:
         cached_profile_name: Optional[str] = None
         cached_scan_center: Optional[Point3D] = None
         cached_solid: List[List[float]] = []
+        cached_index = PointGridIndex([])
         cached_scan_time = 0.0
 
         for step in range(self.max_steps):
@@ -912,6 +1105,7 @@ class SpaceNavigatorController:
                 radar_map = cached_map
                 map_scan_center = cached_scan_center or ship_pos
                 solid = cached_solid
+                solid_index = cached_index
                 scan_time = cached_scan_time
                 print(
                     f"[{profile.name}] reusing scan; "
@@ -952,12 +1146,18 @@ class SpaceNavigatorController:
                 cached_profile_name = profile.name.upper()
                 cached_scan_center = ship_pos
                 cached_solid = solid or []
+                cached_index = PointGridIndex(
+                    cached_solid,
+                    profile.cell_size * _INDEX_CELLS_PER_BUCKET,
+                    revision=radar_map.revision,
+                )
+                solid_index = cached_index
                 cached_scan_time = time.time()
                 scan_time = cached_scan_time
                 map_scan_center = ship_pos
 
             scan_age = max(0.0, time.time() - scan_time) if scan_time > 0.0 else float("inf")
-            self._nearest_voxel_distance = nearest_point_distance(solid or [], ship_pos)
+            self._nearest_voxel_distance = nearest_point_distance(solid_index, ship_pos)
             with self.state.lock:
                 self.state.nearest_obstacle = self._nearest_voxel_distance
 
@@ -1130,13 +1330,37 @@ class SpaceNavigatorController:
                     "Cannot get closer; safe resolution pushes target behind obstacle.",
                 )
 
-            path = find_path_multiscale(
-                radar_map,
-                ship_pos,
-                local_goal,
-                ship_radius=self.ship_radius,
-                scan_profile=profile,
-            )
+            planned_off_thread = False
+            if self.reservations is not None:
+                path = self._find_path_reserved(radar_map, ship_pos, local_goal, profile)
+            elif self.incremental_replanning:
+                path = self._find_path_incremental(radar_map, ship_pos, local_goal, profile)
+            elif self.hierarchical_paths and dist_to_target > self._usable_profile_radius(profile):
+                path = self._find_path_hierarchical(radar_map, ship_pos, local_goal, profile)
+            elif self.planner_service is not None:
+                planned_off_thread = True
+                path = self._find_path_off_thread(
+                    radar_map,
+                    ship_pos,
+                    local_goal,
+                    profile,
+                    cancel_check,
+                    scan_center=map_scan_center,
+                    solid_points=solid_index,
+                    requested_target=requested_target,
+                    profile_level=profile_level,
+                )
+            else:
+                path = find_path_multiscale(
+                    radar_map,
+                    ship_pos,
+                    local_goal,
+                    ship_radius=self.ship_radius,
+                    scan_profile=profile,
+                    any_angle=self.any_angle_paths,
+                    path_cache=self.path_cache,
+                    inflation=self.inflation_shape,
+                )
             if not path:
                 consecutive_failures += 1
                 self._replans += 1
@@ -1165,6 +1389,7 @@ class SpaceNavigatorController:
                 scan_center=map_scan_center,
                 rescan_distance=profile.rescan_distance,
                 max_leg_distance=profile.max_leg_distance,
+                interpolate=self.any_angle_paths,
             )
             if waypoint is None:
                 if dist_to_local <= max(self.arrival_distance, profile.cell_size):
@@ -1196,6 +1421,8 @@ class SpaceNavigatorController:
                     "Dry run planned one bounded segment.",
                 )
 
+            if planned_off_thread and _dist(waypoint, local_goal) > self.arrival_distance:
+                self._submit_next_plan(radar_map, waypoint, local_goal, profile)
             flight_ok = self._fly_to_waypoint(
                 waypoint,
                 map_scan_center,
@@ -1203,7 +1430,7 @@ class SpaceNavigatorController:
                 current_pos=ship_pos,
                 nearest_obstacle=self._nearest_voxel_distance,
                 target_distance=dist_to_target,
-                solid_points=solid or [],
+                solid_points=solid_index,
                 scan_age=scan_age,
                 cancel_check=cancel_check,
             )
@@ -1298,7 +1525,7 @@ class SpaceNavigatorController:
     ) -> Optional[RawRadarMap]:
         solid, meta, contacts, _ore_cells = scan_result
         ship_pos = _safe_get_position(self.rc)
-        return build_map_with_ships(
+        radar_map = build_map_with_ships(
             solid,
             meta,
             contacts,
@@ -1307,6 +1534,296 @@ class SpaceNavigatorController:
             scan_center=scan_center,
             scan_profile=profile,
         )
+        if radar_map is not None and self.world_model is not None:
+            self.world_model.integrate_scan(
+                solid,
+                normalize_scan_metadata(meta, profile, scan_center),
+                center=scan_center,
+                radius=profile.radius,
+            )
+            added = overlay_world_model(radar_map, self.world_model)
+            if added:
+                print(f"[MAP] world model added {added} remembered cells")
+        return radar_map
+
+    def _find_path_incremental(
+        self,
+        radar_map: RawRadarMap,
+        start: Point3D,
+        goal: Point3D,
+        profile: ScanProfile,
+    ) -> List[Point3D]:
+        """Plan with a D* Lite planner that survives between scans.
+
+        The planner sees the same cropped search volume as the A* path. It is
+        rebuilt when the clearance radius changes; otherwise the new crop is
+        diffed against its previous occupancy and only the flipped cells are
+        repaired. Scans centred on a moved ship are resampled onto the
+        planner's cell lattice by :meth:`DStarLitePlanner.update_map`.
+        """
+
+        path_map, passability = _path_search_inputs(
+            radar_map, start, goal, self.ship_radius, profile, inflation=self.inflation_shape
+        )
+        planner = self._incremental_planner
+        started = time.time()
+        if planner is None or not math.isclose(planner.profile.robot_radius, passability.robot_radius):
+            planner = DStarLitePlanner(path_map, passability)
+            self._incremental_planner = planner
+            flipped = -1
+        else:
+            flipped = planner.update_map(path_map)
+        expansions = planner.expansions
+        path = planner.find_path_world(start, goal)
+        if path and self.any_angle_paths:
+            path = planner.shortcut_path_world(path)
+        elapsed = time.time() - started
+        size = planner.radar_map.size
+        print(
+            f"[PATH] {'incremental' if flipped >= 0 else 'full'} D* Lite: "
+            f"{len(path)} waypoints, {planner.expansions - expansions} expansions, "
+            f"{max(flipped, 0)} flipped cells in {elapsed:.3f}s "
+            f"map={size[0]}x{size[1]}x{size[2]}"
+        )
+        return path
+
+    def _find_path_hierarchical(
+        self,
+        radar_map: RawRadarMap,
+        start: Point3D,
+        goal: Point3D,
+        profile: ScanProfile,
+    ) -> List[Point3D]:
+        """Plan a coarse chunk route and refine only the legs the next waypoint can use.
+
+        The ship never flies farther than the rescan or leg limit before the
+        next plan, so abstract legs beyond that distance are left coarse.
+        :attr:`path_cache` and :attr:`any_angle_paths` apply as for the flat
+        search.
+        """
+
+        path_map, passability = _path_search_inputs(
+            radar_map, start, goal, self.ship_radius, profile, inflation=self.inflation_shape
+        )
+        started = time.time()
+        planner = HierarchicalPathFinder(path_map, passability, chunk_cells=self.hierarchical_chunk_cells)
+        reach = min(
+            limit
+            for limit in (profile.rescan_distance, profile.max_leg_distance, profile.radius)
+            if limit is not None
+        )
+        # Abstract legs alternate between crossing a chunk and stepping over a face.
+        chunks = max(1, int(math.ceil(float(reach) / (planner.chunk_cells * path_map.cell_size))))
+        path = planner.find_path_world(
+            start,
+            goal,
+            max_legs=2 * chunks + 1,
+            any_angle=self.any_angle_paths,
+            cache=self.path_cache,
+        )
+        print(
+            f"[PATH] hierarchical: {len(path)} waypoints, {planner.built_chunks} chunks "
+            f"in {time.time() - started:.2f}s "
+            f"map={path_map.size[0]}x{path_map.size[1]}x{path_map.size[2]}"
+        )
+        return path
+
+    def _find_path_reserved(
+        self,
+        radar_map: RawRadarMap,
+        start: Point3D,
+        goal: Point3D,
+        profile: ScanProfile,
+    ) -> List[Point3D]:
+        """Plan around :attr:`reservations` of better-ranked drones and book the route.
+
+        The timed search (WHCA*) runs on the usual cropped map with cell
+        timings from the profile speed. The path is cut at the first planned
+        wait, so the ship stops there and replans instead of flying through a
+        block another drone holds. The last cell stays booked until the next
+        plan replaces it or :attr:`reservation_hold` runs out, so a waiting
+        ship keeps its spot. Returns ``[]`` when no route exists or a
+        better-ranked drone booked it first.
+        """
+
+        table = self.reservations
+        if table is None:
+            return []
+        refresh = getattr(table, "refresh", None)
+        if refresh is not None:
+            refresh()
+        path_map, passability = _path_search_inputs(
+            radar_map, start, goal, self.ship_radius, profile, inflation=self.inflation_shape
+        )
+        finder = PathFinder(path_map, passability)
+        speed = max(self._speed_for_profile(profile, self._nearest_voxel_distance), 0.1)
+        started = time.time()
+        timed = finder.find_path_timed_world(
+            start,
+            goal,
+            table,
+            agent=self.reservation_agent,
+            priority=self.reservation_priority,
+            start_time=started,
+            seconds_per_cell=path_map.cell_size / speed,
+        )
+        if not timed:
+            print(f"[PATH] No reserved path in {time.time() - started:.2f}s")
+            return []
+        if not table.reserve_path(
+            self.reservation_agent, timed, priority=self.reservation_priority, hold=self.reservation_hold
+        ):
+            print("[PATH] reservation lost to a higher-ranked drone; replanning")
+            return []
+
+        path: List[Point3D] = []
+        for point, _t in timed:
+            if path and point == path[-1]:
+                break
+            path.append(point)
+        print(
+            f"[PATH] reserved {len(timed)} timed cells as {self.reservation_agent!r}, "
+            f"flying {len(path)} before the first wait"
+        )
+        return path
+
+    def _find_path_off_thread(
+        self,
+        radar_map: RawRadarMap,
+        start: Point3D,
+        goal: Point3D,
+        profile: ScanProfile,
+        cancel_check: Optional[Callable[[], bool]],
+        *,
+        scan_center: Optional[Point3D] = None,
+        solid_points: Sequence[Sequence[float]] | PointGridIndex = (),
+        requested_target: Optional[Point3D] = None,
+        profile_level: Optional[str] = None,
+    ) -> List[Point3D]:
+        """Plan on :attr:`planner_service` and watch the ship until the search ends.
+
+        A search submitted by :meth:`_submit_next_plan` when the previous leg
+        started is collected when it was planned on the same map, from about
+        ``start``, towards about ``goal``; otherwise it is cancelled and a new
+        one is submitted. :attr:`path_cache` is consulted by the search
+        worker. While it runs, the ship is watched with the same checks as a
+        flight leg (cancel, telemetry validity, leaving the scanned volume)
+        plus the pre-movement obstacle check; any of them cancels the search
+        and returns ``[]`` so the caller stops and rescans. When
+        :attr:`plan_deadline` expires the best partial path is used.
+        """
+
+        prefetched = self._next_plan
+        self._next_plan = None
+        if prefetched is not None:
+            planned_map, planned_start, planned_goal, path_map, future = prefetched
+            if (
+                planned_map is not radar_map
+                or _dist(planned_start, start) > profile.cell_size
+                or _dist(planned_goal, goal) > profile.cell_size
+            ):
+                future.cancel()
+                prefetched = None
+        if prefetched is None:
+            path_map, future = self._submit_plan(radar_map, start, goal, profile)
+        while not future.done():
+            reason = self._leg_abort_reason(profile, scan_center or start, cancel_check)
+            if reason is None and requested_target is not None and profile_level is not None:
+                reason = self._obstacle_abort_reason(solid_points, requested_target, profile_level)
+            if reason is not None:
+                print(f"[PATH] search aborted: {reason}")
+                future.cancel()
+                return []
+            time.sleep(_PLAN_POLL_INTERVAL)
+        result = future.result()
+        print(
+            f"[PATH] {result.status}: {len(result.path)} waypoints in {result.elapsed:.2f}s "
+            f"map={path_map.size[0]}x{path_map.size[1]}x{path_map.size[2]}"
+        )
+        if result.status == "cancelled":
+            return []
+        return result.path
+
+    def _submit_plan(
+        self,
+        radar_map: RawRadarMap,
+        start: Point3D,
+        goal: Point3D,
+        profile: ScanProfile,
+    ) -> Tuple[RawRadarMap, PlanFuture]:
+        path_map, passability = _path_search_inputs(
+            radar_map, start, goal, self.ship_radius, profile, inflation=self.inflation_shape
+        )
+        future = self.planner_service.submit(  # type: ignore[union-attr]
+            path_map,
+            start,
+            goal,
+            passability,
+            deadline=self.plan_deadline,
+            any_angle=self.any_angle_paths,
+            cache=self.path_cache,
+        )
+        return path_map, future
+
+    def _submit_next_plan(
+        self,
+        radar_map: RawRadarMap,
+        waypoint: Point3D,
+        goal: Point3D,
+        profile: ScanProfile,
+    ) -> None:
+        """Start searching the leg after ``waypoint`` while the ship flies there."""
+
+        self._drop_next_plan()
+        path_map, future = self._submit_plan(radar_map, waypoint, goal, profile)
+        self._next_plan = (radar_map, waypoint, goal, path_map, future)
+
+    def _drop_next_plan(self) -> None:
+        if self._next_plan is not None:
+            self._next_plan[-1].cancel()
+            self._next_plan = None
+
+    def _leg_abort_reason(
+        self,
+        profile: ScanProfile,
+        scan_center: Point3D,
+        cancel_check: Optional[Callable[[], bool]],
+    ) -> Optional[str]:
+        """Why the current leg must stop now, or ``None``; also refreshes :attr:`state`."""
+
+        if cancel_check and cancel_check():
+            return "cancelled by caller"
+        if self.reservations is not None and self.reservations.preempted(self.reservation_agent):
+            return "reservation preempted by a higher-ranked drone"
+        pos, telemetry_invalid = self._read_ship_position()
+        if telemetry_invalid:
+            return "invalid zero-position telemetry"
+        if pos is None:
+            return None
+        with self.state.lock:
+            self.state.position = pos
+        limit = profile.radius - self._boundary_margin(profile)
+        if _dist(pos, scan_center) > limit:
+            return f"leaving scanned volume ({limit:.0f}m)"
+        return None
+
+    def _obstacle_abort_reason(
+        self,
+        solid_points: Sequence[Sequence[float]] | PointGridIndex,
+        requested_target: Point3D,
+        profile_level: str,
+    ) -> Optional[str]:
+        """Pre-movement obstacle check of the navigation loop for the current position."""
+
+        with self.state.lock:
+            pos = self.state.position
+        if pos is None:
+            return None
+        nearest = nearest_point_distance(solid_points, pos)
+        recommended = self._recommended_profile_level(_dist(pos, requested_target), nearest)
+        if self._profile_rank(recommended) > self._profile_rank(profile_level):
+            return f"obstacle at {_fmt_distance(nearest)} needs a {recommended} scan"
+        return None
 
     def _resolve_local_goal(
         self,
@@ -1351,7 +1868,7 @@ class SpaceNavigatorController:
         current_pos: Point3D,
         nearest_obstacle: float,
         target_distance: float = float("inf"),
-        solid_points: Sequence[Sequence[float]] = (),
+        solid_points: Sequence[Sequence[float]] | PointGridIndex = (),
         scan_age: float = 0.0,
         cancel_check: Optional[Callable[[], bool]],
     ) -> bool:
@@ -1372,19 +1889,15 @@ class SpaceNavigatorController:
         print(f"[SPEED] mode={self._last_speed_mode} speed={speed_far:.1f}m/s {self._last_speed_details}")
 
         def should_cancel() -> bool:
+            # A caller cancel is expected and stops silently; the safety
+            # checks below report why they end the leg.
             if cancel_check and cancel_check():
                 return True
-            pos, telemetry_invalid = self._read_ship_position()
-            if telemetry_invalid:
-                print("[FLY] stopping on invalid zero-position telemetry")
-                return True
-            if pos is None:
+            reason = self._leg_abort_reason(profile, scan_center, None)
+            if reason is None:
                 return False
-            limit = profile.radius - self._boundary_margin(profile)
-            if _dist(pos, scan_center) > limit:
-                print(f"[FLY] stopping before leaving scanned volume ({limit:.0f}m)")
-                return True
-            return False
+            print(f"[FLY] stopping: {reason}")
+            return True
 
         decel_distance = max(50.0, speed_far * 5.0)
         stop_pos = fly_to_point(
@@ -1431,7 +1944,7 @@ class SpaceNavigatorController:
         *,
         current_pos: Optional[Point3D] = None,
         waypoint: Optional[Point3D] = None,
-        solid_points: Sequence[Sequence[float]] = (),
+        solid_points: Sequence[Sequence[float]] | PointGridIndex = (),
         scan_age: float = 0.0,
     ) -> float:
         profile_name = profile.name.upper()
@@ -1663,6 +2176,8 @@ class SpaceNavigatorController:
     def stop(self) -> None:
         if self.scanner:
             self.scanner.stop()
+        if self.reservations is not None:
+            self.reservations.release(self.reservation_agent)
         self.rc.disable()
         self.rc.dampeners_on()
         self.rc.handbrake_on()
@@ -1698,15 +2213,26 @@ def speed_from_stop_distance(
 def corridor_free_distance(
     origin: Point3D,
     direction_point: Point3D,
-    solid_points: Sequence[Sequence[float]],
+    solid_points: Sequence[Sequence[float]] | PointGridIndex,
     *,
     lookahead: float,
     corridor_radius: float,
 ) -> float:
-    """Distance to the first voxel inside a forward cylindrical corridor."""
+    """Distance to the first voxel inside a forward cylindrical corridor.
+
+    ``solid_points`` may be a prebuilt :class:`PointGridIndex`, in which case
+    only the cells around the corridor are visited.
+    """
 
     lookahead = max(1.0, float(lookahead))
     corridor_radius = max(1.0, float(corridor_radius))
+    if isinstance(solid_points, PointGridIndex):
+        return solid_points.corridor_free_distance(
+            origin,
+            direction_point,
+            lookahead=lookahead,
+            corridor_radius=corridor_radius,
+        )
     dx = float(direction_point[0]) - float(origin[0])
     dy = float(direction_point[1]) - float(origin[1])
     dz = float(direction_point[2]) - float(origin[2])
@@ -1750,10 +2276,14 @@ def _fmt_distance(value: float) -> str:
 
 
 def nearest_point_distance(
-    points: Sequence[Sequence[float]],
+    points: Sequence[Sequence[float]] | PointGridIndex,
     origin: Optional[Point3D],
 ) -> float:
-    if origin is None or not points:
+    if origin is None:
+        return float("inf")
+    if isinstance(points, PointGridIndex):
+        return points.nearest_distance(origin)
+    if not points:
         return float("inf")
     nearest = float("inf")
     ox, oy, oz = origin
@@ -1919,6 +2449,7 @@ __all__ = [
     "nearest_point_distance",
     "speed_from_stop_distance",
     "normalize_scan_metadata",
+    "overlay_world_model",
     "pick_waypoint_along_path",
     "point_is_safe",
     "resolve_nearest_safe_point",
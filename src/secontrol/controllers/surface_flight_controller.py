@@ -4,8 +4,11 @@ from typing import Tuple, List, Optional, Dict, Any
 
 from dataclasses import dataclass
 
+import numpy as np
+
 from secontrol.common import prepare_grid
 from secontrol.devices.ore_detector_device import OreDetectorDevice
+from secontrol.grids import Grid
 from secontrol.devices.remote_control_device import RemoteControlDevice
 from secontrol.controllers.radar_controller import RadarController
 from secontrol.controllers.shared_map_controller import SharedMapController
@@ -73,12 +76,15 @@ class SurfaceFlightController:
 
     def __init__(
         self,
-        grid_name: str,
+        grid_name: "str | Grid",
         scan_radius: float = 100.0,
         boundingBoxY: float = 100.0,
+        *,
+        map_cache_points: int = 200_000,
+        map_cache_ttl: Optional[float] = 30.0,
         **scan_kwargs: Any,
     ) -> None:
-        self.grid = prepare_grid(grid_name)
+        self.grid = grid_name if isinstance(grid_name, Grid) else prepare_grid(grid_name)
 
         radars = self.grid.find_devices_by_type(OreDetectorDevice)
         rcs = self.grid.find_devices_by_type(RemoteControlDevice)
@@ -110,7 +116,11 @@ class SurfaceFlightController:
             **scan_kwargs,
         )
 
-        self.shared_map_controller = SharedMapController(owner_id=self.grid.owner_id)
+        self.shared_map_controller = SharedMapController(
+            owner_id=self.grid.owner_id,
+            chunk_cache_points=map_cache_points,
+            chunk_cache_ttl=map_cache_ttl,
+        )
         self.visited_points: List[Tuple[float, float, float]] = []
 
         start_pos = _get_pos(self.rc)
@@ -1242,6 +1252,14 @@ class SurfaceFlightController:
     def get_visited_points(self) -> List[Tuple[float, float, float]]:
         return self.visited_points.copy()
 
+    def close(self) -> None:
+        """
+        Закрыть SharedMapController: дописать буфер карты и остановить
+        подписку на инвалидацию кэша чанков.
+        """
+        if self.shared_map_controller is not None:
+            self.shared_map_controller.close()
+
     def load_map_region(
         self,
         center: Optional[Tuple[float, float, float]] = None,
@@ -1260,7 +1278,11 @@ class SurfaceFlightController:
             f"center=({cx:.2f}, {cy:.2f}, {cz:.2f}), radius={radius:.1f}m"
         )
 
-        data = self.shared_map_controller.load_region(center=center, radius=radius)
+        # apply_scan_to_occupancy очищает куб center ± radius, поэтому берем
+        # описанную вокруг него сферу: иначе углы куба останутся пустыми.
+        data = self.shared_map_controller.load_region_arrays(
+            center=center, radius=radius * math.sqrt(3.0), dtype=np.float64
+        )
 
         solid = data.voxels
         ore_cells = [
@@ -1269,7 +1291,7 @@ class SurfaceFlightController:
                 "position": list(ore.position),
                 "content": ore.content,
             }
-            for ore in data.ores
+            for ore in data.ore_hits()
         ]
         visited = data.visited
 
@@ -1295,8 +1317,6 @@ class SurfaceFlightController:
         contacts: List[Dict[str, Any]] = []
 
         try:
-            import numpy as np
-
             self.radar_controller.origin = (origin[0], origin[1], origin[2])
             self.radar_controller.cell_size = cell_size
             self.radar_controller.size = (size_x, size_y, size_z)
@@ -1305,7 +1325,7 @@ class SurfaceFlightController:
                 (size_x, size_y, size_z), dtype=bool
             )
 
-            if solid:
+            if len(solid):
                 print(
                     "load_map_region_from_redis: applying "
                     f"{len(solid)} voxels into occupancy grid..."
@@ -1488,86 +1508,28 @@ class SurfaceFlightController:
         cx, cy, cz = center
         print(f"find_nearest_resources: center position ({cx:.2f}, {cy:.2f}, {cz:.2f}), search_radius={search_radius:.1f}m")
 
-        # 2. Достаём уже сохранённые данные по ресурсам из RadarController
-        # Ожидаем, что где-то при сканировании они были сохранены.
-        ore_points = (
-                getattr(self.radar_controller, "ore_cells", None)
-                or getattr(self.radar_controller, "ore_points", None)
-        )
-
-        if not ore_points:
+        # 2. Берём индекс руды, который RadarController пополняет при каждом скане
+        index = self.radar_controller.ore_index
+        if len(index) == 0:
             print(
                 "find_nearest_resources: no ore data in radar controller. "
                 "Make sure map was filled by a previous scan in another script/process."
             )
             return []
 
-        r2 = search_radius * search_radius
-        results: List[Dict[str, Any]] = []
-
-        # 3. Перебираем все сохранённые точки руды и считаем дистанции
-        for cell in ore_points:
-            # Поддерживаем разные форматы хранения: dict с position или прямые координаты
-            if isinstance(cell, dict):
-                position = cell.get("position")
-                if position and isinstance(position, (list, tuple)) and len(position) >= 3:
-                    x, y, z = position[0], position[1], position[2]
-                else:
-                    x = (
-                            cell.get("x")
-                            or cell.get("X")
-                            or cell.get("worldX")
-                            or cell.get("wx")
-                    )
-                    y = (
-                            cell.get("y")
-                            or cell.get("Y")
-                            or cell.get("worldY")
-                            or cell.get("wy")
-                    )
-                    z = (
-                            cell.get("z")
-                            or cell.get("Z")
-                            or cell.get("worldZ")
-                            or cell.get("wz")
-                    )
-                ore_type = (
-                        cell.get("ore")
-                        or cell.get("material")
-                        or cell.get("type")
-                )
-            elif isinstance(cell, (tuple, list)) and len(cell) >= 3:
-                x, y, z = cell[0], cell[1], cell[2]
-                ore_type = None
-            else:
-                continue
-
-            try:
-                fx = float(x)
-                fy = float(y)
-                fz = float(z)
-            except (TypeError, ValueError):
-                continue
-
-            dx = fx - cx
-            dy = fy - cy
-            dz = fz - cz
-            dist2 = dx * dx + dy * dy + dz * dz
-
-            if dist2 <= r2:
-                results.append(
-                    {
-                        "position": (fx, fy, fz),
-                        "distance": math.sqrt(dist2),
-                        "ore": ore_type,
-                    }
-                )
-
-        # 4. Сортируем по расстоянию и обрезаем до max_results
-        results.sort(key=lambda item: item["distance"])
-
-        if max_results is not None and max_results > 0:
-            results = results[:max_results]
+        # 3. Считаем дистанции одним векторным проходом по индексу
+        results: List[Dict[str, Any]] = [
+            {
+                "position": cell.position,
+                "distance": distance,
+                "ore": cell.material or None,
+            }
+            for distance, cell in index.cells_within(
+                center,
+                search_radius,
+                limit=max_results if max_results is not None and max_results > 0 else None,
+            )
+        ]
 
         print(
             f"find_nearest_resources: found {len(results)} ore cells "
@@ -1578,28 +1540,11 @@ class SurfaceFlightController:
         # Debug: if no results, print all loaded ores
         if not results:
             print("Debug: All loaded ore_cells:")
-            for cell in ore_points:
-                if isinstance(cell, dict):
-                    x = cell.get("x") or cell.get("X") or cell.get("worldX") or cell.get("wx")
-                    y = cell.get("y") or cell.get("Y") or cell.get("worldY") or cell.get("wy")
-                    z = cell.get("z") or cell.get("Z") or cell.get("worldZ") or cell.get("wz")
-                    ore_type = cell.get("ore") or cell.get("material") or cell.get("type")
-                elif isinstance(cell, (tuple, list)) and len(cell) >= 3:
-                    x, y, z = cell[0], cell[1], cell[2]
-                    ore_type = None
-                else:
-                    continue
-                try:
-                    fx = float(x)
-                    fy = float(y)
-                    fz = float(z)
-                    dx = fx - cx
-                    dy = fy - cy
-                    dz = fz - cz
-                    dist = math.sqrt(dx*dx + dy*dy + dz*dz)
-                    print(f"  Ore: material={ore_type}, pos=({fx:.2f}, {fy:.2f}, {fz:.2f}), dist={dist:.2f}m")
-                except:
-                    pass
+            for row in range(len(index)):
+                cell = index.cell(row)
+                fx, fy, fz = cell.position
+                dist = math.sqrt((fx - cx) ** 2 + (fy - cy) ** 2 + (fz - cz) ** 2)
+                print(f"  Ore: material={cell.material}, pos=({fx:.2f}, {fy:.2f}, {fz:.2f}), dist={dist:.2f}m")
 
         return results
 
@@ -12,7 +12,19 @@ load_dotenv(find_dotenv(usecwd=True), override=False)
 
 
 class FleetRedisReader:
-    def __init__(self):
+    def __init__(
+        self,
+        *,
+        map_cache_points: Optional[int] = None,
+        map_cache_ttl: Optional[float] = None,
+    ):
+        # Decoded shared-map chunks kept by _shared_map_controller().
+        self.map_cache_points = int(
+            map_cache_points if map_cache_points is not None else os.getenv("FLEET_MAP_CACHE_POINTS", "500000")
+        )
+        self.map_cache_ttl = float(
+            map_cache_ttl if map_cache_ttl is not None else os.getenv("FLEET_MAP_CACHE_TTL", "60")
+        )
         url = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
         username = os.getenv("REDIS_USERNAME", "")
         password = os.getenv("REDIS_PASSWORD", "")
@@ -783,6 +795,29 @@ class FleetRedisReader:
 
     _ore_scan_states: Dict[str, Dict[str, Any]] = {}
     _ore_scan_lock = threading.Lock()
+    _shared_map = None
+    _shared_map_lock = threading.Lock()
+
+    def _shared_map_controller(self):
+        """One cached SharedMapController per reader: repeated requests hit its chunk cache."""
+        with self._shared_map_lock:
+            if self._shared_map is None:
+                from secontrol.controllers import SharedMapController
+                self._shared_map = SharedMapController(
+                    owner_id=self.owner_id,
+                    storage_backend="redis",
+                    chunk_cache_points=self.map_cache_points,
+                    chunk_cache_ttl=self.map_cache_ttl,
+                )
+            return self._shared_map
+
+    def close(self) -> None:
+        """Stop the shared map's cache subscription and drop the Redis connection."""
+        with self._shared_map_lock:
+            if self._shared_map is not None:
+                self._shared_map.close()
+                self._shared_map = None
+        self.client.close()
 
     def get_nearby_ores(
         self,
@@ -796,61 +831,59 @@ class FleetRedisReader:
             return []
         from_position = (position["x"], position["y"], position["z"])
 
-        from secontrol.controllers import SharedMapController
-        import math
-        from collections import defaultdict
-        ctrl = SharedMapController(owner_id=self.owner_id, storage_backend="redis", chunk_size=100.0)
-        ctrl.load()
-        ores = ctrl.get_known_ores(material=material)
-
-        # cluster nearby deposits of same material (50m radius)
-        by_type = defaultdict(list)
-        for ore in ores:
-            by_type[ore.material].append(ore.position)
-
-        clusters = []
-        for mat, positions in sorted(by_type.items()):
-            remaining = list(set(positions))
-            while remaining:
-                seed = remaining.pop(0)
-                group = [seed]
-                rest = []
-                for pt in remaining:
-                    d = math.sqrt(sum((a - b) ** 2 for a, b in zip(seed, pt)))
-                    if d <= 50.0:
-                        group.append(pt)
-                    else:
-                        rest.append(pt)
-                remaining = rest
-                cx = sum(p[0] for p in group) / len(group)
-                cy = sum(p[1] for p in group) / len(group)
-                cz = sum(p[2] for p in group) / len(group)
-                clusters.append({
-                    "material": mat,
-                    "position": (cx, cy, cz),
-                    "count": len(group),
-                })
+        from secontrol.tools.ore_index import OreIndex
+        ores = self._shared_map_controller().get_known_ores(material=material)
 
+        # cluster nearby deposits of same material (cells chained within 50m)
+        index = OreIndex(ores, link_radius=50.0)
         results = []
-        for cl in clusters:
-            d = math.sqrt(
-                (cl["position"][0] - from_position[0]) ** 2
-                + (cl["position"][1] - from_position[1]) ** 2
-                + (cl["position"][2] - from_position[2]) ** 2
-            )
+        for distance, deposit in index.deposits_within(from_position, limit=limit or None):
             results.append({
-                "material": cl["material"],
-                "position": cl["position"],
-                "distance_m": round(d, 1),
-                "count": cl["count"],
+                "material": deposit.material,
+                "position": deposit.position,
+                "distance_m": round(distance, 1),
+                "count": deposit.count,
                 "cluster": True,
                 "source": "shared_map",
             })
-        results.sort(key=lambda r: r["distance_m"])
-        if limit and len(results) > limit:
-            results = results[:limit]
         return results
 
+    def get_map_voxels(
+        self,
+        grid_id: str,
+        radius: float = 5000.0,
+        lod: int | None = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Known terrain around the grid from the SharedMap, in the voxel-view payload shape.
+
+        ``lod`` defaults by radius (2 above 2 km, 1 above 500 m) so wide
+        overviews read the coarse LOD chunks instead of every stored point.
+        """
+        info = self.get_grid_info(grid_id)
+        position = self._extract_position(info)
+        if not position:
+            return None
+        center = (position["x"], position["y"], position["z"])
+        if lod is None:
+            lod = 2 if radius > 2000.0 else 1 if radius > 500.0 else 0
+
+        ctrl = self._shared_map_controller()
+        arrays = ctrl.load_region_arrays(center, radius, kinds=("voxels", "ores"), dtype="float64", lod=lod)
+        cell_size = ctrl.lod_cell_size(lod)
+        return {
+            "solid": arrays.voxels.tolist(),
+            "ore_cells": [
+                {"material": hit.material, "position": list(hit.position), "content": hit.content}
+                for hit in arrays.ore_hits()
+            ],
+            "contacts": [],
+            "metadata": {
+                "cellSize": cell_size,
+                "origin": [c - radius for c in center],
+                "lod": lod,
+            },
+        }
+
     def start_ore_scan(self, grid_id: str, radius: float = 300, cell_size: float = 10.0) -> Dict[str, Any]:
         detector = self._find_ore_detector(grid_id)
         if not detector:
@@ -954,9 +987,7 @@ class FleetRedisReader:
                         ore_cells = []
             if ore_cells:
                 try:
-                    from secontrol.controllers import SharedMapController
-                    ctrl = SharedMapController(owner_id=self.owner_id, storage_backend="redis")
-                    ctrl.add_ore_cells(ore_cells, save=True)
+                    self._shared_map_controller().add_ore_cells(ore_cells, save=True)
                 except Exception as e:
                     state["shared_map_error"] = str(e)
             state["scanning"] = False
@@ -18,6 +18,11 @@ static_dir = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
 
+@app.on_event("shutdown")
+def close_reader():
+    reader.close()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index():
     return (static_dir / "index.html").read_text(encoding="utf-8")
@@ -141,6 +146,17 @@ async def api_voxels(grid_id: str):
         return {"error": str(e)}
 
 
+@app.get("/api/grid/{grid_id}/map_voxels")
+async def api_map_voxels(grid_id: str, radius: float = 5000, lod: int | None = None):
+    try:
+        result = reader.get_map_voxels(grid_id, radius=radius, lod=lod)
+        if result is None:
+            return {"error": "Grid position unknown"}
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @app.post("/api/grid/{grid_id}/voxel_cancel")
 async def api_voxel_cancel(grid_id: str):
     try:
@@ -1063,6 +1063,7 @@ const voxelCellSize = document.getElementById('voxel-cellsize');
 const voxelOreOnly = document.getElementById('voxel-oreonly');
 const voxelScanStart = document.getElementById('voxel-scan-start');
 const voxelScanCancel = document.getElementById('voxel-scan-cancel');
+const voxelMapLoad = document.getElementById('voxel-map-load');
 const voxelScanProgressSection = document.getElementById('voxel-scan-progress-section');
 const voxelScanStatus = document.getElementById('voxel-scan-status');
 const voxelScanFill = document.getElementById('voxel-scan-fill');
@@ -1174,6 +1175,26 @@ voxelScanCancel.addEventListener('click', async () => {
     } catch (e) {}
 });
 
+voxelMapLoad.addEventListener('click', async () => {
+    if (!currentVoxelGridId) return;
+    const radius = parseFloat(voxelRadius.value) || 5000;
+    voxelScanProgressSection.style.display = '';
+    voxelScanStatus.textContent = 'Загрузка карты...';
+    try {
+        const res = await fetch(`/api/grid/${currentVoxelGridId}/map_voxels?radius=${radius}`);
+        const data = await res.json();
+        if (data.error) {
+            voxelScanStatus.textContent = `Ошибка: ${data.error}`;
+            return;
+        }
+        const lod = (data.metadata || {}).lod || 0;
+        voxelScanStatus.textContent = `Карта (LOD ${lod}): ${data.solid.length} вокселей, ${data.ore_cells.length} руды`;
+        mergeAndRenderVoxels(currentVoxelGridId, data);
+    } catch (e) {
+        voxelScanStatus.textContent = `Ошибка: ${e.message}`;
+    }
+});
+
 async function loadVoxels(gridId) {
     try {
         const res = await fetch(`/api/grid/${gridId}/voxels`);
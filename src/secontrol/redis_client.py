@@ -79,7 +79,7 @@ class RedisEventClient:
             if isinstance(value, bytes):
                 value = value.decode("utf-8")
             return json.loads(value)
-        except json.JSONDecodeError:
+        except (UnicodeDecodeError, json.JSONDecodeError):
             return value
 
     def list_grids(self, owner_id: str | int, *, key: str | None = None) -> list[Dict[str, Any]]:
@@ -117,6 +117,17 @@ class RedisEventClient:
         except redis.RedisError as exc:  # pragma: no cover - defensive logging
             raise RuntimeError(f"Failed to publish to {channel!r}: {exc}") from exc
 
+    def set_value(self, key: str, value: bytes | str, expire: Optional[int] = None) -> None:
+        """Store ``value`` as is (no JSON encoding), e.g. binary map chunks."""
+
+        try:
+            if expire is None:
+                self._client.set(key, value)
+            else:
+                self._client.setex(key, expire, value)
+        except redis.RedisError as exc:  # pragma: no cover - defensive logging
+            raise RuntimeError(f"Failed to write key {key!r}: {exc}") from exc
+
     def set_json(self, key: str, value: Any, expire: Optional[int] = None) -> None:
         payload = json.dumps(value, ensure_ascii=False)
         try:
@@ -147,6 +158,30 @@ class RedisEventClient:
         return subscription
 
 
+    def subscribe_to_key_pattern(self, pattern: str, callback: CallbackType, *,
+                                 events: Iterable[str] | None = None) -> "_PubSubSubscription":
+        """Subscribe to keyspace events of every key matching the glob ``pattern``.
+
+        The callback receives the concrete key and the event name; the value is
+        not fetched (``payload`` is always ``None``) because a pattern usually
+        covers many keys, some of them binary. ``events=None`` passes every
+        event through.
+        """
+        channel = f"__keyspace@{self._db_index}__:{pattern}"
+        subscription = _PubSubSubscription(
+            self._client,
+            channel,
+            pattern,
+            callback,
+            tuple(events) if events else None,
+            is_pattern=True,
+            is_keyspace=True,
+            fetch_value=False,
+        )
+        subscription.start()
+        self._subscriptions.append(subscription)
+        return subscription
+
     def subscribe_to_channel(self, channel: str, callback: CallbackType) -> "_PubSubSubscription":
         subscription = _PubSubSubscription(self._client, channel, channel, callback, None, is_pattern=False,
                                            is_keyspace=False)
@@ -187,6 +222,7 @@ class _PubSubSubscription:
             *,
             is_pattern: bool = True,
             is_keyspace: bool = True,
+            fetch_value: bool = True,
     ) -> None:
         self._client = client
         self._channel = channel
@@ -195,6 +231,7 @@ class _PubSubSubscription:
         self._events = events
         self._is_pattern = is_pattern
         self._is_keyspace = is_keyspace
+        self._fetch_value = fetch_value
         self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
         if self._is_pattern:
             self._pubsub.psubscribe(channel)
@@ -277,6 +314,18 @@ class _PubSubSubscription:
             if self._events and raw_event not in self._events:
                 continue
 
+            if not self._fetch_value:
+                # Pattern subscription: the key is the channel suffix.
+                channel = msg.get("channel")
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8", "replace")
+                key = str(channel).split(":", 1)[1] if channel and ":" in str(channel) else self._key
+                try:
+                    self._callback(key, None, str(raw_event))
+                except Exception:
+                    pass
+                continue
+
             payload: Optional[Any]
             if raw_event != "del":
                 try:
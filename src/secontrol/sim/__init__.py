@@ -0,0 +1,25 @@
+"""Offline kinematic flight simulator for benchmarking and regression tests.
+
+Runs navigation controllers without a game server: :class:`FlightSimulator`
+serves synthetic gridinfo and telemetry through :class:`SimRedisClient`,
+flies a :class:`PointMassShip` through a :class:`VoxelWorld` loaded from a
+saved radar map and answers ore detector scans with progressive tiles.
+:class:`VirtualClock` keeps runs deterministic; :class:`SimMetrics` reports
+planning (compute) time, flight time and command counts.
+"""
+
+from .client import SimRedisClient
+from .clock import VirtualClock
+from .ship import PointMassShip
+from .simulator import FlightSimulator, SimMetrics
+from .world import ScanVolume, VoxelWorld
+
+__all__ = [
+    "FlightSimulator",
+    "PointMassShip",
+    "ScanVolume",
+    "SimMetrics",
+    "SimRedisClient",
+    "VirtualClock",
+    "VoxelWorld",
+]
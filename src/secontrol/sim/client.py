@@ -0,0 +1,154 @@
+"""In-memory stand-in for :class:`~secontrol.redis_client.RedisEventClient`.
+
+Keys hold decoded JSON values, keyspace subscribers (per key or per glob
+pattern) are called synchronously from :meth:`SimRedisClient.set_json`, and every publish is handed to a
+``on_publish(channel, payload)`` hook — the simulator's command handler.
+Because it subclasses ``RedisEventClient`` it is accepted anywhere a real
+client is, including :func:`secontrol.common.prepare_grid`.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from secontrol.redis_client import CallbackType, RedisEventClient
+
+
+class _Subscription:
+    def __init__(self, registry: List[CallbackType], callback: CallbackType) -> None:
+        self._registry = registry
+        self._callback = callback
+
+    def close(self) -> None:
+        try:
+            self._registry.remove(self._callback)
+        except ValueError:
+            pass
+
+
+class SimRedisClient(RedisEventClient):
+    """Redis-compatible client backed by a dict; no server required."""
+
+    def __init__(self, *, on_publish: Optional[Callable[[str, Any], int]] = None) -> None:  # noqa: D401
+        # Deliberately does not call ``RedisEventClient.__init__``: no connection.
+        self._store: Dict[str, Any] = {}
+        self._key_callbacks: Dict[str, List[CallbackType]] = defaultdict(list)
+        self._channel_callbacks: Dict[str, List[CallbackType]] = defaultdict(list)
+        self._pattern_callbacks: Dict[str, List[CallbackType]] = defaultdict(list)
+        self._lock = threading.RLock()
+        self._db_index = 0
+        self._subscriptions = []
+        self.on_publish = on_publish
+
+    # Basic helpers ---------------------------------------------------
+
+    def get_value(self, key: str) -> Optional[bytes]:
+        value = self._store.get(key)
+        if value is None or isinstance(value, bytes):
+            return value
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        return text.encode("utf-8")
+
+    def get_json(self, key: str) -> Optional[Any]:
+        value = self._store.get(key)
+        if isinstance(value, bytes):
+            try:
+                return json.loads(value.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                return value
+        return value
+
+    def set_value(self, key: str, value: bytes | str, expire: Optional[int] = None) -> None:
+        self.set_json(key, value.encode("utf-8") if isinstance(value, str) else bytes(value), expire)
+
+    def set_json(self, key: str, value: Any, expire: Optional[int] = None) -> None:
+        with self._lock:
+            self._store[key] = value
+            callbacks = self._callbacks_for(key)
+        self._notify(callbacks, key, value, "set")
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._store.pop(key, None)
+            callbacks = self._callbacks_for(key)
+        self._notify(callbacks, key, None, "del")
+
+    def _callbacks_for(self, key: str) -> List[tuple[CallbackType, bool]]:
+        callbacks = [(callback, True) for callback in self._key_callbacks.get(key, ())]
+        for pattern, registry in self._pattern_callbacks.items():
+            if fnmatch.fnmatchcase(key, pattern):
+                callbacks.extend((callback, False) for callback in registry)
+        return callbacks
+
+    @staticmethod
+    def _notify(callbacks: List[tuple[CallbackType, bool]], key: str, value: Any, event: str) -> None:
+        for callback, with_value in callbacks:
+            try:
+                callback(key, value if with_value else None, event)
+            except Exception:
+                pass
+
+    def publish(self, channel: str, payload: Any) -> int:
+        if isinstance(payload, (str, bytes)):
+            try:
+                payload = json.loads(payload)
+            except json.JSONDecodeError:
+                pass
+        delivered = 0
+        if self.on_publish is not None:
+            delivered += int(self.on_publish(channel, payload) or 0)
+        for callback in list(self._channel_callbacks.get(channel, ())):
+            try:
+                callback(channel, payload, "message")
+            except Exception:
+                pass
+            delivered += 1
+        return delivered
+
+    # Subscriptions ---------------------------------------------------
+
+    def subscribe_to_key(
+        self,
+        key: str,
+        callback: CallbackType,
+        *,
+        events: Iterable[str] | None = None,
+    ) -> _Subscription:  # type: ignore[override]
+        registry = self._key_callbacks[key]
+        registry.append(callback)
+        return _Subscription(registry, callback)
+
+    def subscribe_to_key_pattern(
+        self,
+        pattern: str,
+        callback: CallbackType,
+        *,
+        events: Iterable[str] | None = None,
+    ) -> _Subscription:  # type: ignore[override]
+        registry = self._pattern_callbacks[pattern]
+        registry.append(callback)
+        return _Subscription(registry, callback)
+
+    def subscribe_to_channel(self, channel: str, callback: CallbackType) -> _Subscription:  # type: ignore[override]
+        registry = self._channel_callbacks[channel]
+        registry.append(callback)
+        return _Subscription(registry, callback)
+
+    def close(self) -> None:
+        pass
+
+    # Raw-client surface used by a few helpers (``scan_iter``).
+
+    @property
+    def client(self) -> "SimRedisClient":  # type: ignore[override]
+        return self
+
+    def scan_iter(self, match: str = "*", count: int = 100) -> Iterator[str]:
+        return iter([key for key in list(self._store) if fnmatch.fnmatchcase(key, match)])
+
+
+__all__ = ["SimRedisClient"]
@@ -0,0 +1,98 @@
+"""Virtual time source for lockstep simulation.
+
+Controllers pace themselves with ``time.sleep`` and measure with
+``time.time``/``time.monotonic``. While a :class:`VirtualClock` is installed
+those three functions are replaced: a sleep advances simulated time (and the
+simulator with it) instead of blocking, so a ten-minute flight finishes in
+seconds and every run sees the same sequence of telemetry.
+``time.perf_counter`` is left alone so real compute time stays measurable.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class VirtualClock:
+    """Simulated clock; ``on_advance(dt)`` is called for every advance."""
+
+    def __init__(
+        self,
+        start: float = 1_700_000_000.0,
+        *,
+        on_advance: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        self._epoch = float(start)
+        self._now = float(start)
+        self.on_advance = on_advance
+        self._lock = threading.RLock()
+        self._saved: Optional[tuple] = None
+        self._compute_mark = 0.0
+        # Keeps virtual monotonic time ahead of anything stamped before install.
+        self._mono_offset = 0.0
+        # Real seconds spent outside virtual sleeps while installed.
+        self.compute_seconds = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return self._now - self._epoch
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now - self._epoch + self._mono_offset
+
+    def sleep(self, seconds: float) -> None:
+        self._charge_compute()
+        self.advance(max(0.0, float(seconds)))
+        self._compute_mark = time.perf_counter()
+
+    def advance(self, seconds: float) -> None:
+        with self._lock:
+            target = self._now + seconds
+            if self.on_advance is not None and seconds > 0.0:
+                # The callback may :meth:`tick` through the interval so that
+                # events it raises are stamped with intermediate times.
+                self.on_advance(seconds)
+            self._now = max(self._now, target)
+
+    def tick(self, seconds: float) -> None:
+        """Move the clock forward without calling ``on_advance``."""
+
+        self._now += max(0.0, float(seconds))
+
+    # Installation ----------------------------------------------------
+
+    def install(self) -> None:
+        if self._saved is not None:
+            return
+        self._saved = (time.time, time.monotonic, time.sleep)
+        self._mono_offset = max(self._mono_offset, time.monotonic() - self.elapsed)
+        time.time = self.time  # type: ignore[assignment]
+        time.monotonic = self.monotonic  # type: ignore[assignment]
+        time.sleep = self.sleep  # type: ignore[assignment]
+        self._compute_mark = time.perf_counter()
+
+    def uninstall(self) -> None:
+        if self._saved is None:
+            return
+        self._charge_compute()
+        time.time, time.monotonic, time.sleep = self._saved  # type: ignore[assignment]
+        self._saved = None
+
+    def __enter__(self) -> "VirtualClock":
+        self.install()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.uninstall()
+
+    def _charge_compute(self) -> None:
+        if self._saved is not None:
+            self.compute_seconds += time.perf_counter() - self._compute_mark
+
+
+__all__ = ["VirtualClock"]
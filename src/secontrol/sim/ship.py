@@ -0,0 +1,143 @@
+"""Point-mass ship kinematics for the flight simulator.
+
+The model is deliberately simple: thrust is a bounded acceleration in any
+direction, the autopilot flies straight at its waypoint with a
+brake-in-time speed profile, dampeners null velocity when nothing else
+commands thrust, and gyros rotate the orientation basis without affecting
+translation.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+Vector3 = Tuple[float, float, float]
+
+
+class PointMassShip:
+    """Ship state plus the Remote Control and gyro switches that drive it."""
+
+    def __init__(
+        self,
+        position: Vector3,
+        *,
+        radius: float = 10.0,
+        max_accel: float = 10.0,
+        max_speed: float = 100.0,
+        max_turn_rate: float = 1.0,
+        arrival_tolerance: float = 1.0,
+    ) -> None:
+        self.position = np.asarray(position, dtype=np.float64).copy()
+        self.velocity = np.zeros(3)
+        self.forward = np.array([0.0, 0.0, 1.0])
+        self.up = np.array([0.0, 1.0, 0.0])
+        self.radius = float(radius)
+        self.max_accel = float(max_accel)
+        self.max_speed = float(max_speed)
+        self.max_turn_rate = float(max_turn_rate)
+        self.arrival_tolerance = float(arrival_tolerance)
+
+        self.autopilot = False
+        self.waypoint: Optional[np.ndarray] = None
+        self.speed_limit = self.max_speed
+        self.dampeners = True
+        self.thrusters = True
+        self.handbrake = False
+        # Gyro override as (pitch, yaw, roll) in [-1, 1], or a world direction to face.
+        self.gyro_override: Optional[Vector3] = None
+        self.align_target: Optional[np.ndarray] = None
+
+    @property
+    def speed(self) -> float:
+        return float(np.linalg.norm(self.velocity))
+
+    @property
+    def right(self) -> np.ndarray:
+        return np.cross(self.up, self.forward)
+
+    def set_waypoint(self, point: Vector3, speed: Optional[float] = None) -> None:
+        self.waypoint = np.asarray(point, dtype=np.float64)
+        self.speed_limit = self.max_speed if speed is None else min(self.max_speed, max(0.0, float(speed)))
+
+    def step(self, dt: float) -> None:
+        self._rotate(dt)
+        desired = self._desired_velocity()
+        if desired is not None and self.thrusters:
+            delta = desired - self.velocity
+            limit = self.max_accel * dt
+            norm = float(np.linalg.norm(delta))
+            if norm > limit:
+                delta *= limit / norm
+            self.velocity = self.velocity + delta
+        self.position = self.position + self.velocity * dt
+
+        if self.autopilot and self.waypoint is not None:
+            if (
+                float(np.linalg.norm(self.waypoint - self.position)) <= self.arrival_tolerance
+                and self.speed <= 0.5
+            ):
+                # One-way mode: the autopilot switches itself off on arrival.
+                self.autopilot = False
+
+    def _desired_velocity(self) -> Optional[np.ndarray]:
+        if self.autopilot and self.waypoint is not None and not self.handbrake:
+            offset = self.waypoint - self.position
+            distance = float(np.linalg.norm(offset))
+            if distance < 1e-9:
+                return np.zeros(3)
+            brake = math.sqrt(2.0 * self.max_accel * 0.8 * distance)
+            return offset / distance * min(self.speed_limit, brake)
+        if self.dampeners:
+            return np.zeros(3)
+        return None
+
+    def _rotate(self, dt: float) -> None:
+        if self.gyro_override is not None:
+            pitch, yaw, roll = (max(-1.0, min(1.0, v)) * self.max_turn_rate * dt for v in self.gyro_override)
+            right = self.right
+            self.forward, self.up = _rotate(self.forward, self.up, right, pitch)
+            self.forward, self.up = _rotate(self.forward, self.up, self.up, yaw)
+            self.forward, self.up = _rotate(self.forward, self.up, self.forward, roll)
+            return
+
+        target = self.align_target
+        if target is None and self.autopilot and self.waypoint is not None:
+            target = self.waypoint - self.position
+        norm = 0.0 if target is None else float(np.linalg.norm(target))
+        if norm < 1e-9:
+            return
+        direction = target / norm
+        angle = math.acos(max(-1.0, min(1.0, float(self.forward @ direction))))
+        if angle < 1e-9:
+            return
+        axis = np.cross(self.forward, direction)
+        if float(np.linalg.norm(axis)) < 1e-9:
+            axis = self.up
+        self.forward, self.up = _rotate(self.forward, self.up, axis, min(angle, self.max_turn_rate * dt))
+
+
+def _rotate(forward: np.ndarray, up: np.ndarray, axis: np.ndarray, angle: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Rotate ``forward`` and ``up`` about ``axis`` by ``angle`` radians (Rodrigues)."""
+
+    norm = float(np.linalg.norm(axis))
+    if norm < 1e-12 or angle == 0.0:
+        return forward, up
+    k = axis / norm
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+
+    def turn(v: np.ndarray) -> np.ndarray:
+        return v * cos_a + np.cross(k, v) * sin_a + k * float(k @ v) * (1.0 - cos_a)
+
+    forward = turn(forward)
+    up = turn(up)
+    # Re-orthonormalise to keep numerical drift out of long runs.
+    forward /= np.linalg.norm(forward)
+    up = up - forward * float(up @ forward)
+    up /= np.linalg.norm(up)
+    return forward, up
+
+
+__all__ = ["PointMassShip"]
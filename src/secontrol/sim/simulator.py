@@ -0,0 +1,370 @@
+"""Offline flight simulator standing in for a ship on the game server.
+
+:class:`FlightSimulator` publishes a grid with a Remote Control, an ore
+detector and a gyro into a :class:`SimRedisClient`, answers their commands
+and streams telemetry, so controllers run unmodified against it::
+
+    world = VoxelWorld.from_file("asteroid_raw.json")
+    sim = FlightSimulator(world, start=(0.0, 0.0, -800.0))
+    nav = SpaceNavigatorController(sim.grid(), ship_radius=15.0)
+    result = sim.run(lambda: nav.navigate_to((0.0, 0.0, 800.0)))
+    print(sim.metrics)
+
+:meth:`FlightSimulator.run` installs a :class:`VirtualClock`, so the
+controller's sleeps drive the simulation in lockstep and repeated runs are
+deterministic.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from secontrol.grids import Grid
+
+from .client import SimRedisClient
+from .clock import VirtualClock
+from .ship import PointMassShip
+from .world import ScanVolume, VoxelWorld
+
+T = TypeVar("T")
+
+_GPS_RE = re.compile(r"GPS:[^:]*:(-?[\d.eE+-]+):(-?[\d.eE+-]+):(-?[\d.eE+-]+):")
+_SPEED_RE = re.compile(r"speed=(-?[\d.eE+-]+)")
+
+
+@dataclass
+class SimMetrics:
+    """Counters collected while the simulator runs.
+
+    ``sim_seconds`` is simulated time, ``compute_seconds`` the real time the
+    controller spent between sleeps (path planning dominates it).
+    """
+
+    commands: Counter = field(default_factory=Counter)
+    sim_seconds: float = 0.0
+    compute_seconds: float = 0.0
+    distance_flown: float = 0.0
+    collisions: int = 0
+    min_clearance: float = float("inf")
+    scans: int = 0
+
+    @property
+    def command_count(self) -> int:
+        return int(sum(self.commands.values()))
+
+
+@dataclass
+class _ScanJob:
+    volume: ScanVolume
+    started: float
+    processed: int = 0
+    solid: list = field(default_factory=list)
+
+
+class FlightSimulator:
+    """Kinematic ship, voxel world and device bridge in one process."""
+
+    def __init__(
+        self,
+        world: VoxelWorld,
+        *,
+        start: Tuple[float, float, float],
+        ship: Optional[PointMassShip] = None,
+        owner_id: str = "sim",
+        player_id: Optional[str] = None,
+        grid_id: int = 1,
+        grid_name: str = "SimShip",
+        step: float = 0.05,
+        telemetry_interval: float = 0.1,
+        scan_tiles_per_second: float = 400.0,
+        scan_tile_cells: int = 8,
+    ) -> None:
+        self.world = world
+        self.ship = ship or PointMassShip(start)
+        self.ship.position = np.asarray(start, dtype=np.float64).copy()
+        self.owner_id = str(owner_id)
+        self.player_id = str(player_id or owner_id)
+        self.grid_id = int(grid_id)
+        self.grid_name = grid_name
+        self.step_seconds = float(step)
+        self.telemetry_interval = float(telemetry_interval)
+        self.scan_tiles_per_second = float(scan_tiles_per_second)
+        self.scan_tile_cells = int(scan_tile_cells)
+
+        self.rc_id, self.radar_id, self.gyro_id = 1001, 1002, 1003
+        self.metrics = SimMetrics()
+        self.client = SimRedisClient(on_publish=self._on_publish)
+        self.clock = VirtualClock(on_advance=self.advance)
+
+        self._sim_time = 0.0
+        self._carry = 0.0
+        self._next_telemetry = 0.0
+        self._colliding = False
+        self._scan: Optional[_ScanJob] = None
+        self._scan_state: Dict[str, Any] = {"inProgress": False, "progressPercent": 0.0}
+        self._radar: Optional[Dict[str, Any]] = None
+        self._radar_rev = 0
+
+        self._publish_grid()
+        self._publish_telemetry()
+
+    # Public API ------------------------------------------------------
+
+    def grid(self) -> Grid:
+        """Return a :class:`Grid` bound to the simulated client."""
+
+        return Grid(self.client, self.owner_id, str(self.grid_id), self.player_id, self.grid_name, auto_wake=False)
+
+    def run(self, fn: Callable[[], T]) -> T:
+        """Call ``fn`` with the virtual clock installed and record timing metrics."""
+
+        started = self._sim_time
+        compute = self.clock.compute_seconds
+        with self.clock:
+            try:
+                return fn()
+            finally:
+                self.metrics.sim_seconds += self._sim_time - started
+                self.metrics.compute_seconds += self.clock.compute_seconds - compute
+
+    def advance(self, seconds: float) -> None:
+        """Step physics, scans and telemetry forward by ``seconds`` of simulated time."""
+
+        self._carry += seconds
+        while self._carry >= self.step_seconds - 1e-12:
+            self._carry -= self.step_seconds
+            self._step(self.step_seconds)
+
+    # Simulation ------------------------------------------------------
+
+    def _step(self, dt: float) -> None:
+        ship = self.ship
+        before = ship.position.copy()
+        ship.step(dt)
+        if self.world.is_solid(tuple(ship.position)):
+            # Hitting rock stops the ship where it was.
+            ship.position = before
+            ship.velocity[:] = 0.0
+        self.metrics.distance_flown += float(np.linalg.norm(ship.position - before))
+
+        clearance = self.world.clearance(tuple(ship.position))
+        self.metrics.min_clearance = min(self.metrics.min_clearance, clearance)
+        colliding = clearance < ship.radius
+        if colliding and not self._colliding:
+            self.metrics.collisions += 1
+        self._colliding = colliding
+
+        self._sim_time += dt
+        self.clock.tick(dt)
+        if self._sim_time + 1e-9 >= self._next_telemetry:
+            self._next_telemetry = self._sim_time + self.telemetry_interval
+            self._advance_scan()
+            self._publish_telemetry()
+
+    def _advance_scan(self) -> None:
+        job = self._scan
+        if job is None:
+            return
+        elapsed = self._sim_time - job.started
+        total = job.volume.total_tiles
+        processed = min(total, int(elapsed * self.scan_tiles_per_second) + 1)
+        done = processed >= total
+        if processed != job.processed:
+            job.processed = processed
+            self._radar = self._radar_payload(job, done=done)
+        self._scan_state = {
+            "inProgress": not done,
+            "progressPercent": 100.0 * processed / max(1, total),
+            "processedTiles": processed,
+            "totalTiles": total,
+            "elapsedSeconds": elapsed,
+            "done": done,
+        }
+        if done:
+            self._scan = None
+
+    def _radar_payload(self, job: _ScanJob, *, done: bool) -> Dict[str, Any]:
+        volume = job.volume
+        # Extend the cumulative point list instead of re-encoding every tile.
+        job.solid.extend(volume.points_for_tiles(job.processed)[len(job.solid):].tolist())
+        self._radar_rev += 1
+        return {
+            "raw": {
+                "rev": self._radar_rev,
+                "tsMs": int(self.clock.time() * 1000),
+                "size": [volume.size] * 3,
+                "cellSize": volume.cell_size,
+                "origin": [float(v) for v in volume.origin],
+                "solidPoints": list(job.solid),
+            },
+            "radius": volume.radius,
+            "revision": self._radar_rev,
+            "contacts": [],
+            "oreCells": list(volume.ore_cells) if done else [],
+            "done": done,
+        }
+
+    # Telemetry -------------------------------------------------------
+
+    def _key(self, device_type: str, device_id: int) -> str:
+        return f"se:{self.owner_id}:grid:{self.grid_id}:{device_type}:{device_id}:telemetry"
+
+    def _publish_grid(self) -> None:
+        blocks = [
+            (self.rc_id, "MyObjectBuilder_RemoteControl", "Remote Control"),
+            (self.radar_id, "MyObjectBuilder_OreDetector", "Ore Detector"),
+            (self.gyro_id, "MyObjectBuilder_Gyro", "Gyroscope"),
+        ]
+        self.client.set_json(
+            f"se:{self.owner_id}:grids",
+            {"grids": [{"id": self.grid_id, "name": self.grid_name}]},
+        )
+        self.client.set_json(
+            f"se:{self.owner_id}:grid:{self.grid_id}:gridinfo",
+            {
+                "id": self.grid_id,
+                "name": self.grid_name,
+                "blocks": [
+                    {"id": block_id, "type": block_type, "customName": name, "isDevice": True}
+                    for block_id, block_type, name in blocks
+                ],
+            },
+        )
+
+    def _publish_telemetry(self) -> None:
+        ship = self.ship
+        position = _vec(ship.position)
+        self.client.set_json(
+            self._key("remote_control", self.rc_id),
+            {
+                "worldPosition": position,
+                "position": position,
+                "linearVelocity": _vec(ship.velocity),
+                "speed": ship.speed,
+                "autopilotEnabled": ship.autopilot,
+                "dampenersEnabled": ship.dampeners,
+                "handbrake": ship.handbrake,
+                "orientation": {
+                    "forward": _vec(ship.forward),
+                    "up": _vec(ship.up),
+                    "right": _vec(ship.right),
+                },
+            },
+        )
+        radar_telemetry: Dict[str, Any] = {
+            "enabled": True,
+            "isWorking": True,
+            "worldPosition": position,
+            "scan": dict(self._scan_state),
+        }
+        if self._radar is not None:
+            radar_telemetry["radar"] = self._radar
+        self.client.set_json(self._key("ore_detector", self.radar_id), radar_telemetry)
+        self.client.set_json(
+            self._key("gyro", self.gyro_id),
+            {"enabled": True, "override": ship.gyro_override is not None},
+        )
+
+    # Commands --------------------------------------------------------
+
+    def _on_publish(self, channel: str, payload: Any) -> int:
+        if not isinstance(payload, dict):
+            return 0
+        cmd = str(payload.get("cmd", ""))
+        self.metrics.commands[cmd] += 1
+        target = channel.rsplit(".", 1)[-1]
+        try:
+            device_id = int(target)
+        except ValueError:
+            return 1
+        if device_id == self.rc_id:
+            self._remote_control(cmd, payload)
+        elif device_id == self.radar_id:
+            self._ore_detector(cmd, payload)
+        elif device_id == self.gyro_id:
+            self._gyro(cmd, payload)
+        elif device_id != self.grid_id:
+            return 0
+        return 1
+
+    def _remote_control(self, cmd: str, payload: Dict[str, Any]) -> None:
+        ship = self.ship
+        state = payload.get("state")
+        if cmd == "remote_goto" and isinstance(state, str):
+            match = _GPS_RE.search(state)
+            if match:
+                speed = _SPEED_RE.search(state)
+                ship.set_waypoint(
+                    tuple(float(v) for v in match.groups()),  # type: ignore[arg-type]
+                    float(speed.group(1)) if speed else None,
+                )
+        elif cmd == "remote_control" and isinstance(state, str):
+            switches = {
+                "autopilot_enable": ("autopilot", True),
+                "autopilot_disable": ("autopilot", False),
+                "dampeners_on": ("dampeners", True),
+                "dampeners_off": ("dampeners", False),
+                "handbrake_on": ("handbrake", True),
+                "handbrake_off": ("handbrake", False),
+                "thrusters_on": ("thrusters", True),
+                "thrusters_off": ("thrusters", False),
+            }
+            if state in switches:
+                name, value = switches[state]
+                setattr(ship, name, value)
+                if name == "autopilot" and value and ship.waypoint is None:
+                    ship.autopilot = False
+
+    def _ore_detector(self, cmd: str, payload: Dict[str, Any]) -> None:
+        if cmd != "scan":
+            return
+        if payload.get("cancel"):
+            self._scan = None
+            self._scan_state = {"inProgress": False, "progressPercent": 0.0}
+            return
+        state = payload.get("state") if isinstance(payload.get("state"), dict) else {}
+        radius = float(state.get("radius", 50.0))
+        box = [state.get(f"boundingBox{axis}") for axis in "XYZ"]
+        if all(v is not None for v in box):
+            radius = min(radius, min(float(v) for v in box) / 2.0)
+        center = tuple(self.ship.position)
+        if all(state.get(f"center{axis}") is not None for axis in "XYZ"):
+            center = tuple(float(state[f"center{axis}"]) for axis in "XYZ")
+        volume = self.world.scan(
+            center,  # type: ignore[arg-type]
+            radius,
+            float(state.get("cellSize", 10.0)),
+            tile_cells=self.scan_tile_cells,
+        )
+        self.metrics.scans += 1
+        self._scan = _ScanJob(volume, self._sim_time)
+
+    def _gyro(self, cmd: str, payload: Dict[str, Any]) -> None:
+        ship = self.ship
+        if cmd == "override":
+            try:
+                pitch, yaw, roll = (float(v) for v in str(payload.get("state", "")).split(","))
+            except ValueError:
+                return
+            ship.gyro_override = (pitch, yaw, roll)
+            ship.align_target = None
+        elif cmd == "clear_override":
+            ship.gyro_override = None
+            ship.align_target = None
+        elif cmd in {"align_vector", "aim_vector"}:
+            vector = np.array([float(payload.get(axis, 0.0)) for axis in "xyz"])
+            if float(np.linalg.norm(vector)) > 1e-9:
+                ship.gyro_override = None
+                ship.align_target = vector
+
+
+def _vec(values: Any) -> Dict[str, float]:
+    return {"x": float(values[0]), "y": float(values[1]), "z": float(values[2])}
+
+
+__all__ = ["FlightSimulator", "SimMetrics"]
@@ -0,0 +1,148 @@
+"""Static voxel world built from a saved radar map.
+
+The world answers two questions: how close the ship is to solid voxels, and
+what an ore detector scan centred somewhere would report. Scans are
+resampled onto the requested scan cell size and split into tiles ordered
+near-to-far, so the simulator can stream them the way the server plugin
+does.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from secontrol.tools.radar_navigation import RawRadarMap, WorldPoint
+
+
+@dataclass
+class ScanVolume:
+    """Result of one scan, with solid cells sorted by the tile that reports them."""
+
+    origin: np.ndarray
+    size: int
+    cell_size: float
+    radius: float
+    points: np.ndarray  # (N, 3) scan cell centres, near tiles first
+    tile_ends: np.ndarray  # tile_ends[k] = number of points in the first k + 1 tiles
+    ore_cells: List[Dict[str, Any]]
+
+    @property
+    def total_tiles(self) -> int:
+        return int(self.tile_ends.size)
+
+    def points_for_tiles(self, processed: int) -> np.ndarray:
+        if processed <= 0:
+            return self.points[:0]
+        return self.points[: int(self.tile_ends[min(processed, self.total_tiles) - 1])]
+
+
+class VoxelWorld:
+    """Solid voxels the simulated ship flies through and scans."""
+
+    def __init__(self, radar_map: RawRadarMap, *, ore_cells: Sequence[Dict[str, Any]] = ()) -> None:
+        self.map = radar_map
+        self.ore_cells = [dict(cell) for cell in ore_cells]
+        idx = np.argwhere(radar_map.occ)
+        self._solid = radar_map.origin + (idx + 0.5) * radar_map.cell_size
+
+    @classmethod
+    def from_json(cls, payload: str | bytes | Dict[str, Any]) -> "VoxelWorld":
+        """Load a raw radar export, or a telemetry ``radar`` block holding one under ``raw``."""
+
+        data = json.loads(payload) if isinstance(payload, (str, bytes)) else dict(payload)
+        raw = data.get("raw") if isinstance(data.get("raw"), dict) else data
+        ore_cells = data.get("oreCells") or []
+        return cls(RawRadarMap.from_json(raw), ore_cells=[c for c in ore_cells if isinstance(c, dict)])
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "VoxelWorld":
+        return cls.from_json(Path(path).read_text(encoding="utf-8"))
+
+    def is_solid(self, point: WorldPoint) -> bool:
+        idx = self.map.world_to_index(point)
+        return idx is not None and bool(self.map.occ[idx])
+
+    def clearance(self, point: WorldPoint) -> float:
+        """Distance from ``point`` to the nearest solid voxel centre, ``inf`` off the map."""
+
+        return self.map.clearance_at(point)
+
+    def scan(
+        self,
+        center: WorldPoint,
+        radius: float,
+        cell_size: float,
+        *,
+        tile_cells: int = 8,
+    ) -> ScanVolume:
+        """Resample solid voxels within ``radius`` of ``center`` onto a scan grid."""
+
+        cs = float(cell_size)
+        size = max(1, int(math.ceil(2.0 * radius / cs)))
+        center_arr = np.asarray(center, dtype=np.float64)
+        origin = center_arr - size * cs / 2.0
+
+        cells = self._covered_cells(origin, cs, size)
+        if cells.size:
+            centres = origin + (cells + 0.5) * cs
+            inside = np.einsum("ij,ij->i", centres - center_arr, centres - center_arr) <= radius * radius
+            cells = cells[inside]
+
+        tiles_per_axis = -(-size // tile_cells)
+        tile_grid = np.indices((tiles_per_axis,) * 3).reshape(3, -1).T
+        tile_centres = origin + (tile_grid * tile_cells + tile_cells / 2.0) * cs
+        tile_order = np.argsort(np.linalg.norm(tile_centres - center_arr, axis=1), kind="stable")
+        rank = np.empty_like(tile_order)
+        rank[tile_order] = np.arange(tile_order.size)
+
+        tile_of = cells // tile_cells
+        cell_rank = rank[(tile_of[:, 0] * tiles_per_axis + tile_of[:, 1]) * tiles_per_axis + tile_of[:, 2]]
+        order = np.argsort(cell_rank, kind="stable")
+        points = origin + (cells[order] + 0.5) * cs
+        tile_ends = np.searchsorted(cell_rank[order], np.arange(1, tile_order.size + 1))
+
+        ores = [
+            cell
+            for cell in self.ore_cells
+            if _within(cell.get("position"), center_arr, radius)
+        ]
+        return ScanVolume(origin, size, cs, float(radius), points, tile_ends, ores)
+
+    def _covered_cells(self, origin: np.ndarray, cs: float, size: int) -> np.ndarray:
+        """Scan cells overlapped by any solid world voxel."""
+
+        if not len(self._solid):
+            return np.zeros((0, 3), dtype=np.int64)
+        half = self.map.cell_size / 2.0
+        lo = np.floor((self._solid - half - origin) / cs).astype(np.int64)
+        hi = np.floor((self._solid + half - origin) / cs - 1e-9).astype(np.int64)
+        keep = np.all((hi >= 0) & (lo < size), axis=1)
+        lo, hi = np.clip(lo[keep], 0, size - 1), np.clip(hi[keep], 0, size - 1)
+        span = int((hi - lo).max(initial=0)) + 1
+        found = []
+        for offset in itertools.product(range(span), repeat=3):
+            cell = lo + np.asarray(offset)
+            found.append(cell[np.all(cell <= hi, axis=1)])
+        cells = np.concatenate(found)
+        flat = np.unique((cells[:, 0] * size + cells[:, 1]) * size + cells[:, 2])
+        return np.stack([flat // (size * size), (flat // size) % size, flat % size], axis=1)
+
+
+def _within(position: Any, center: np.ndarray, radius: float) -> bool:
+    if isinstance(position, dict):
+        position = [position.get("x"), position.get("y"), position.get("z")]
+    try:
+        point = np.asarray(position, dtype=np.float64)
+    except (TypeError, ValueError):
+        return False
+    return point.shape == (3,) and float(np.linalg.norm(point - center)) <= radius
+
+
+__all__ = ["ScanVolume", "VoxelWorld"]
@@ -0,0 +1,342 @@
+"""Compact binary encoding for shared map chunks.
+
+A chunk of ``[x, y, z]`` points is stored as little-endian ``int16`` offsets
+from the chunk centre, quantised to ``resolution`` metres, behind a small
+fixed header. A 100 m chunk at the default 5 mm resolution uses 6 bytes per
+point instead of ~60 bytes of JSON and decodes with one ``np.frombuffer``.
+Offsets that do not fit ``int16`` (a resolution too fine for the chunk size)
+fall back to ``float32`` offsets, so encoding never loses points.
+
+Ore chunks carry the same position block plus a ``uint16`` material id column,
+a ``float64`` content column (``NaN`` for missing) and a short JSON trailer
+with the material names. Non-numeric contents are kept verbatim in the
+trailer.
+
+Layout (version 1)::
+
+    magic "SECK" | version u8 | kind u8 | encoding u8 | compression u8
+    | count u32 | resolution f64 | centre 3 x f64 | body
+
+The body is optionally compressed with ``zlib`` (default) or ``lz4``.
+:func:`is_binary_chunk` tells binary payloads from legacy JSON ones.
+Uncompressed ``int16`` point chunks are exactly :func:`point_header` followed
+by :func:`point_records`, fixed 6-byte records that a Redis script can merge
+without decoding anything.
+
+Only ``numpy`` is required; ``lz4`` is used when installed and requested.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:  # optional, faster than zlib at a slightly worse ratio
+    import lz4.frame as _lz4  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - depends on the environment
+    _lz4 = None
+
+MAGIC = b"SECK"
+VERSION = 1
+DEFAULT_RESOLUTION = 0.005
+
+KIND_POINTS = 0
+KIND_ORES = 1
+
+_ENC_INT16 = 0
+_ENC_FLOAT32 = 1
+
+_COMPRESSION_IDS = {"none": 0, "zlib": 1, "lz4": 2}
+_COMPRESSION_NAMES = {v: k for k, v in _COMPRESSION_IDS.items()}
+
+_HEADER = struct.Struct("<4sBBBBId3d")
+HEADER_SIZE = _HEADER.size
+_INT16_LIMIT = 32767
+
+
+@dataclass
+class OreChunk:
+    """Decoded ore chunk as columns."""
+
+    positions: np.ndarray  # (N, 3) float64
+    material_ids: np.ndarray  # (N,) uint16 indices into ``materials``
+    materials: List[str]
+    content: np.ndarray  # (N,) float64, NaN where missing or non-numeric
+    raw_content: Optional[List[Any]] = None  # original values when any is non-numeric
+
+    def __len__(self) -> int:
+        return int(self.positions.shape[0])
+
+    def contents(self) -> List[Any]:
+        """Per-ore content values as stored (``None`` for missing)."""
+
+        if self.raw_content is not None:
+            return list(self.raw_content)
+        return [None if math.isnan(v) else v for v in self.content.tolist()]
+
+
+def is_binary_chunk(payload: Any) -> bool:
+    return isinstance(payload, (bytes, bytearray, memoryview)) and bytes(payload[:4]) == MAGIC
+
+
+def point_count(prefix: Any) -> Optional[int]:
+    """Number of points from the first :data:`HEADER_SIZE` bytes of a point chunk.
+
+    Returns ``None`` for anything else (legacy JSON, ore chunks), so callers
+    can count points with a ranged read instead of fetching whole chunks.
+    """
+
+    data = bytes(prefix[:HEADER_SIZE]) if prefix is not None else b""
+    if len(data) < HEADER_SIZE or data[:4] != MAGIC:
+        return None
+    _, version, kind, _, _, count, *_ = _HEADER.unpack(data)
+    return int(count) if version == VERSION and kind == KIND_POINTS else None
+
+
+def chunk_centre(chunk_id: str, chunk_size: float) -> Tuple[float, float, float]:
+    """World-space centre of the ``"ix:iy:iz"`` chunk."""
+
+    ix, iy, iz = (int(v) for v in chunk_id.split(":"))
+    half = float(chunk_size) / 2.0
+    return (ix * chunk_size + half, iy * chunk_size + half, iz * chunk_size + half)
+
+
+def available_compressions() -> Tuple[str, ...]:
+    return ("none", "zlib", "lz4") if _lz4 is not None else ("none", "zlib")
+
+
+def encode_points(
+    points: Any,
+    *,
+    centre: Sequence[float],
+    resolution: float = DEFAULT_RESOLUTION,
+    compression: str = "zlib",
+) -> bytes:
+    """Encode an ``(N, 3)`` point array or sequence of triples.
+
+    Points that quantise to the same offset are stored once, keeping the
+    first occurrence, so re-ingesting already stored points adds nothing.
+    """
+
+    pts = _unique_rows(_as_points(points), centre, resolution)
+    encoding, block = _encode_positions(pts, centre, resolution)
+    return _pack(KIND_POINTS, encoding, len(pts), resolution, centre, block, compression)
+
+
+def point_records(
+    points: Any,
+    *,
+    centre: Sequence[float],
+    resolution: float = DEFAULT_RESOLUTION,
+) -> Optional[bytes]:
+    """Deduplicated 6-byte ``int16`` records, or ``None`` when they do not fit ``int16``."""
+
+    pts = _unique_rows(_as_points(points), centre, resolution)
+    encoding, block = _encode_positions(pts, centre, resolution)
+    return block if encoding == _ENC_INT16 else None
+
+
+def point_header(count: int, *, centre: Sequence[float], resolution: float = DEFAULT_RESOLUTION) -> bytes:
+    """Header of an uncompressed ``int16`` point chunk holding ``count`` records."""
+
+    cx, cy, cz = (float(v) for v in centre)
+    return _HEADER.pack(MAGIC, VERSION, KIND_POINTS, _ENC_INT16, 0, int(count), float(resolution), cx, cy, cz)
+
+
+def decode_points(payload: bytes) -> np.ndarray:
+    """Decode a point chunk into an ``(N, 3)`` ``float64`` array."""
+
+    kind, encoding, count, resolution, centre, body = _unpack(payload)
+    if kind != KIND_POINTS:
+        raise ValueError("payload is not a point chunk")
+    positions, _ = _decode_positions(body, encoding, count, resolution, centre)
+    return positions
+
+
+def encode_ores(
+    positions: Any,
+    materials: Sequence[str],
+    contents: Sequence[Any],
+    *,
+    centre: Sequence[float],
+    resolution: float = DEFAULT_RESOLUTION,
+    compression: str = "zlib",
+) -> bytes:
+    """Encode ore hits given as parallel position/material/content columns."""
+
+    pts = _as_points(positions)
+    if not (len(pts) == len(materials) == len(contents)):
+        raise ValueError("positions, materials and contents must have the same length")
+
+    names: List[str] = []
+    lookup: dict = {}
+    ids = np.empty(len(pts), dtype="<u2")
+    for i, name in enumerate(materials):
+        key = str(name)
+        if key not in lookup:
+            if len(names) > 0xFFFF:
+                raise ValueError("too many distinct materials in one chunk")
+            lookup[key] = len(names)
+            names.append(key)
+        ids[i] = lookup[key]
+
+    numeric = np.full(len(pts), np.nan, dtype="<f8")
+    raw: Optional[List[Any]] = None
+    for i, value in enumerate(contents):
+        if _is_number(value):
+            numeric[i] = float(value)
+        elif value is not None and raw is None:
+            raw = list(contents)
+
+    trailer: dict = {"materials": names}
+    if raw is not None:
+        trailer["content"] = raw
+    trailer_bytes = json.dumps(trailer, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    encoding, block = _encode_positions(pts, centre, resolution)
+    body = b"".join(
+        (struct.pack("<I", len(trailer_bytes)), trailer_bytes, block, ids.tobytes(), numeric.tobytes())
+    )
+    return _pack(KIND_ORES, encoding, len(pts), resolution, centre, body, compression)
+
+
+def decode_ores(payload: bytes) -> OreChunk:
+    kind, encoding, count, resolution, centre, body = _unpack(payload)
+    if kind != KIND_ORES:
+        raise ValueError("payload is not an ore chunk")
+    (trailer_len,) = struct.unpack_from("<I", body, 0)
+    trailer = json.loads(bytes(body[4 : 4 + trailer_len]).decode("utf-8"))
+    offset = 4 + trailer_len
+    positions, offset = _decode_positions(body, encoding, count, resolution, centre, offset)
+    ids = np.frombuffer(body, dtype="<u2", count=count, offset=offset).astype(np.uint16)
+    offset += 2 * count
+    content = np.frombuffer(body, dtype="<f8", count=count, offset=offset).astype(np.float64)
+    return OreChunk(
+        positions=positions,
+        material_ids=ids,
+        materials=[str(name) for name in trailer.get("materials", [])],
+        content=content,
+        raw_content=trailer.get("content"),
+    )
+
+
+# ----------------------------------------------------------------------
+
+
+def _as_points(points: Any) -> np.ndarray:
+    arr = np.asarray(points, dtype=np.float64)
+    if arr.size == 0:
+        return np.zeros((0, 3), dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] != 3:
+        raise ValueError(f"points must have shape (N, 3), got {arr.shape}")
+    return arr
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _encode_positions(pts: np.ndarray, centre: Sequence[float], resolution: float) -> Tuple[int, bytes]:
+    if resolution <= 0.0:
+        raise ValueError(f"resolution must be > 0, got {resolution}")
+    offsets = pts - np.asarray(centre, dtype=np.float64)
+    quantised = np.rint(offsets / resolution)
+    if quantised.size == 0 or float(np.abs(quantised).max()) <= _INT16_LIMIT:
+        return _ENC_INT16, quantised.astype("<i2").tobytes()
+    return _ENC_FLOAT32, offsets.astype("<f4").tobytes()
+
+
+def _unique_rows(pts: np.ndarray, centre: Sequence[float], resolution: float) -> np.ndarray:
+    if len(pts) < 2:
+        return pts
+    quantised = np.rint((pts - np.asarray(centre, dtype=np.float64)) / resolution)
+    _, first = np.unique(quantised, axis=0, return_index=True)
+    if len(first) == len(pts):
+        return pts
+    return pts[np.sort(first)]
+
+
+def _decode_positions(
+    body: bytes,
+    encoding: int,
+    count: int,
+    resolution: float,
+    centre: Tuple[float, float, float],
+    offset: int = 0,
+) -> Tuple[np.ndarray, int]:
+    centre_arr = np.asarray(centre, dtype=np.float64)
+    if encoding == _ENC_INT16:
+        raw = np.frombuffer(body, dtype="<i2", count=3 * count, offset=offset)
+        positions = raw.reshape(count, 3) * resolution + centre_arr
+        return positions, offset + 6 * count
+    if encoding == _ENC_FLOAT32:
+        raw = np.frombuffer(body, dtype="<f4", count=3 * count, offset=offset)
+        positions = raw.reshape(count, 3).astype(np.float64) + centre_arr
+        return positions, offset + 12 * count
+    raise ValueError(f"unknown position encoding {encoding}")
+
+
+def _pack(
+    kind: int,
+    encoding: int,
+    count: int,
+    resolution: float,
+    centre: Sequence[float],
+    body: bytes,
+    compression: str,
+) -> bytes:
+    name = compression or "none"
+    if name not in _COMPRESSION_IDS:
+        raise ValueError(f"unknown compression {compression!r}")
+    if name == "lz4" and _lz4 is None:
+        name = "zlib"
+    if name == "zlib":
+        body = zlib.compress(body, 6)
+    elif name == "lz4":
+        body = _lz4.compress(body)
+    cx, cy, cz = (float(v) for v in centre)
+    header = _HEADER.pack(MAGIC, VERSION, kind, encoding, _COMPRESSION_IDS[name], count, float(resolution), cx, cy, cz)
+    return header + body
+
+
+def _unpack(payload: bytes) -> Tuple[int, int, int, float, Tuple[float, float, float], bytes]:
+    data = bytes(payload)
+    if len(data) < _HEADER.size or data[:4] != MAGIC:
+        raise ValueError("not a binary map chunk")
+    _, version, kind, encoding, compression, count, resolution, cx, cy, cz = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unsupported chunk version {version}")
+    body = data[_HEADER.size :]
+    name = _COMPRESSION_NAMES.get(compression)
+    if name == "zlib":
+        body = zlib.decompress(body)
+    elif name == "lz4":
+        if _lz4 is None:
+            raise RuntimeError("chunk is lz4-compressed but the lz4 package is not installed")
+        body = _lz4.decompress(body)
+    elif name != "none":
+        raise ValueError(f"unknown compression id {compression}")
+    return kind, encoding, count, resolution, (cx, cy, cz), body
+
+
+__all__ = [
+    "DEFAULT_RESOLUTION",
+    "HEADER_SIZE",
+    "OreChunk",
+    "available_compressions",
+    "chunk_centre",
+    "decode_ores",
+    "decode_points",
+    "encode_ores",
+    "encode_points",
+    "is_binary_chunk",
+    "point_count",
+    "point_header",
+    "point_records",
+]
@@ -0,0 +1,588 @@
+"""Hierarchical (HPA*) path planning over fixed-size chunks of a radar map.
+
+Long routes on a fine voxel grid are expensive for a flat A*: the search cost
+grows with the route length. :class:`HierarchicalPathFinder` splits the
+inflated occupancy grid into cubic chunks, places portal cells on every chunk
+face where both sides are free, and caches the travel cost between the
+portals of each chunk. A route is first planned over this small abstract
+graph and only the next leg is refined at full resolution.
+
+Chunks are built lazily, so only chunks the abstract search touches are ever
+analysed. When occupancy changes, :meth:`HierarchicalPathFinder.update_map`
+drops only the chunks whose cells changed; their face neighbours keep their
+graphs and only swap the portal nodes on the shared faces.
+
+Portals are undirected, but a three-axis diagonal move that passes the corner
+rule one way may fail it the other way. Routes that depend on such a move have
+no abstract path, so :meth:`HierarchicalPathFinder.find_path_world` falls back
+to a flat search when the abstract search fails.
+
+Only ``numpy`` is required.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .radar_navigation import Index3, PassabilityProfile, PathCache, PathFinder, RawRadarMap, WorldPoint
+
+ChunkKey = Tuple[int, int, int]
+_AXES = ((1, 0, 0), (0, 1, 0), (0, 0, 1))
+
+
+@dataclass
+class _ChunkGraph:
+    lo: Index3
+    finder: PathFinder
+    edges: Dict[Index3, List[Tuple[Index3, float]]]
+    moves: Optional[List[Tuple[tuple, tuple, np.ndarray]]] = None
+    empty: bool = False
+
+
+class HierarchicalPathFinder:
+    """HPA* planner on top of :class:`PathFinder`.
+
+    Costs are expressed in cells. Intra-chunk costs use the straight-line
+    distance when the two portals see each other and the grid distance
+    otherwise, so the coarse route slightly favours open chunks.
+    """
+
+    def __init__(
+        self,
+        radar_map: RawRadarMap,
+        profile: Optional[PassabilityProfile] = None,
+        *,
+        chunk_cells: int = 16,
+        face_tiles: int = 2,
+    ) -> None:
+        if chunk_cells < 2:
+            raise ValueError("chunk_cells must be at least 2")
+        if face_tiles < 1:
+            raise ValueError("face_tiles must be positive")
+        self.chunk_cells = int(chunk_cells)
+        self.face_tiles = int(face_tiles)
+        self._finder = PathFinder(radar_map, profile)
+        self.profile = self._finder.profile
+        self._local_profile = replace(self.profile, robot_radius=0.0, clearance_voxels=0)
+        self._axis_allowed = [self._finder._direction_allowed(*axis) for axis in _AXES]
+        self._reset(radar_map)
+
+    # Public API ------------------------------------------------------
+
+    @property
+    def radar_map(self) -> RawRadarMap:
+        return self._finder.radar_map
+
+    @property
+    def built_chunks(self) -> int:
+        return len(self._chunks)
+
+    def chunk_of(self, idx: Index3) -> ChunkKey:
+        c = self.chunk_cells
+        return idx[0] // c, idx[1] // c, idx[2] // c
+
+    def find_path_world(
+        self,
+        start: WorldPoint,
+        goal: WorldPoint,
+        *,
+        max_legs: Optional[int] = None,
+        any_angle: bool = False,
+        cache: Optional[PathCache] = None,
+    ) -> List[WorldPoint]:
+        """Plan a coarse route and refine it at full resolution.
+
+        ``max_legs`` limits refinement to the first abstract legs, returning a
+        full-resolution path that ends at an intermediate portal; the caller
+        replans from there once the ship arrives. When the abstract graph
+        finds no route the whole path comes from a flat A* search instead.
+        With ``any_angle=True`` the refined path is shortcut to straight legs.
+        A :class:`PathCache` is consulted first; only paths that reach the
+        goal are stored in it.
+        """
+
+        start_idx = self._snap(start)
+        goal_idx = self._snap(goal)
+        if start_idx is None or goal_idx is None:
+            return []
+        if cache is not None:
+            cached = cache.get(self._finder, start_idx, goal_idx, any_angle=any_angle)
+            if cached is not None:
+                return [self.radar_map.index_to_world_center(p) for p in cached]
+        abstract = self.find_abstract_path(start_idx, goal_idx)
+        if abstract:
+            refined = self.refine(abstract, max_legs=max_legs)
+        else:
+            # Three-axis diagonal moves are not reversible under the corner
+            # rule, so a cell entered only that way across a face has no
+            # portal. The flat search still finds such routes.
+            refined = self._finder.find_path_indices(start_idx, goal_idx)
+        if refined and any_angle:
+            refined = self._finder.shortcut_path(refined)
+        if cache is not None and refined and tuple(refined[-1]) == goal_idx:
+            cache.put(self._finder, start_idx, goal_idx, refined, any_angle=any_angle)
+        return [self.radar_map.index_to_world_center(p) for p in refined]
+
+    def find_abstract_path_world(self, start: WorldPoint, goal: WorldPoint) -> List[WorldPoint]:
+        start_idx = self._snap(start)
+        goal_idx = self._snap(goal)
+        if start_idx is None or goal_idx is None:
+            return []
+        return [self.radar_map.index_to_world_center(p) for p in self.find_abstract_path(start_idx, goal_idx)]
+
+    def find_abstract_path(self, start: Index3, goal: Index3) -> List[Index3]:
+        """Return the portal cells of the coarse route, including ``start`` and ``goal``."""
+
+        start = tuple(start)
+        goal = tuple(goal)
+        if not self.radar_map.is_within_bounds(start) or not self.radar_map.is_within_bounds(goal):
+            return []
+        if self._occ[start] or self._occ[goal]:
+            return []
+        if start == goal:
+            return [start]
+
+        start_chunk = self.chunk_of(start)
+        goal_chunk = self.chunk_of(goal)
+        start_graph = self._chunk_graph(start_chunk)
+        goal_graph = self._chunk_graph(goal_chunk)
+
+        start_targets = list(start_graph.edges)
+        if start_chunk == goal_chunk:
+            start_targets.append(goal)
+        start_edges = {
+            target: cost for (_, target), cost in self._local_costs(start_graph, [start], start_targets).items()
+        }
+        # Axis and two-axis moves are symmetric, so portal -> goal costs equal
+        # goal -> portal; three-axis moves are the exception (module docstring).
+        goal_edges = {
+            target: cost
+            for (_, target), cost in self._local_costs(goal_graph, [goal], list(goal_graph.edges)).items()
+        }
+
+        open_set: List[Tuple[float, float, Index3]] = [(self._heuristic(start, goal), 0.0, start)]
+        g_score: Dict[Index3, float] = {start: 0.0}
+        parents: Dict[Index3, Index3] = {}
+        closed: Set[Index3] = set()
+
+        while open_set:
+            _, g, node = heapq.heappop(open_set)
+            if node in closed:
+                continue
+            if node == goal:
+                path = [node]
+                while node in parents:
+                    node = parents[node]
+                    path.append(node)
+                path.reverse()
+                return path
+            closed.add(node)
+
+            if node == start:
+                successors = list(start_edges.items())
+                successors.extend((partner, 1.0) for partner in self._partners(node))
+            else:
+                chunk = self.chunk_of(node)
+                graph = self._chunk_graph(chunk)
+                successors = list(graph.edges.get(node, ()))
+                successors.extend((partner, 1.0) for partner in self._partners(node))
+                if chunk == goal_chunk and node in goal_edges:
+                    successors.append((goal, goal_edges[node]))
+
+            for succ, cost in successors:
+                if succ in closed:
+                    continue
+                tentative = g + cost
+                if tentative >= g_score.get(succ, math.inf):
+                    continue
+                g_score[succ] = tentative
+                parents[succ] = node
+                heapq.heappush(open_set, (tentative + self._heuristic(succ, goal), tentative, succ))
+
+        return []
+
+    def refine(self, abstract_path: Sequence[Index3], *, max_legs: Optional[int] = None) -> List[Index3]:
+        """Expand consecutive abstract nodes into a full-resolution cell path."""
+
+        if not abstract_path:
+            return []
+        result: List[Index3] = [tuple(abstract_path[0])]
+        legs = len(abstract_path) - 1
+        if max_legs is not None:
+            legs = min(legs, max(0, int(max_legs)))
+        for a, b in zip(abstract_path[:legs], abstract_path[1 : legs + 1]):
+            chunk = self.chunk_of(a)
+            if chunk != self.chunk_of(b):
+                result.append(tuple(b))
+                continue
+            graph = self._chunk_graph(chunk)
+            lo = graph.lo
+            local = graph.finder.find_path_indices(_sub(a, lo), _sub(b, lo))
+            if not local:
+                return result
+            result.extend(_add(p, lo) for p in local[1:])
+        return result
+
+    def update_map(self, radar_map: RawRadarMap) -> Set[ChunkKey]:
+        """Swap in a new map and invalidate only chunks whose occupancy changed.
+
+        Returns the invalidated chunk keys. A map with a different grid
+        layout resets the whole hierarchy.
+        """
+
+        old_occ = self._occ
+        same_layout = (
+            tuple(radar_map.size) == tuple(self.radar_map.size)
+            and float(radar_map.cell_size) == float(self.radar_map.cell_size)
+            and np.allclose(radar_map.origin, self.radar_map.origin)
+        )
+        previous = set(self._chunks)
+        radar_map.reuse_inflation(self.radar_map)
+        self._finder = PathFinder(radar_map, replace(self.profile))
+        if not same_layout:
+            self._reset(radar_map)
+            return previous
+        self._occ = self._finder._occ
+
+        changed = self._changed_chunks(old_occ, self._occ)
+        self.invalidate_chunks(changed)
+        return changed
+
+    def invalidate_region(self, lo: Index3, hi: Index3) -> Set[ChunkKey]:
+        """Invalidate every chunk overlapping the inclusive cell box ``lo``..``hi``."""
+
+        klo = self.chunk_of(tuple(max(0, v) for v in lo))
+        khi = self.chunk_of(tuple(min(s - 1, v) for v, s in zip(hi, self._occ.shape)))
+        keys = {
+            (x, y, z)
+            for x in range(klo[0], khi[0] + 1)
+            for y in range(klo[1], khi[1] + 1)
+            for z in range(klo[2], khi[2] + 1)
+        }
+        self.invalidate_chunks(keys)
+        return keys
+
+    def invalidate_chunks(self, keys: Iterable[ChunkKey]) -> None:
+        """Drop the graphs of ``keys`` and the portals on their faces.
+
+        Intra-chunk costs of a face neighbour depend only on its own cells, so
+        its graph is kept and merely marked to re-sync the portal nodes of the
+        shared face the next time it is used.
+        """
+
+        for key in keys:
+            key = tuple(key)
+            self._chunks.pop(key, None)
+            self._stale.discard(key)
+            for axis, step in enumerate(_AXES):
+                below = _sub(key, step)
+                above = _add(key, step)
+                self._faces.pop((key, axis), None)
+                self._faces.pop((below, axis), None)
+                for neighbor in (below, above):
+                    if neighbor in self._chunks:
+                        self._stale.add(neighbor)
+            self._partner_cache.clear()
+
+    # Internal helpers ------------------------------------------------
+
+    def _reset(self, radar_map: RawRadarMap) -> None:
+        if self._finder.radar_map is not radar_map:
+            self._finder = PathFinder(radar_map, replace(self.profile))
+        self._occ = self._finder._occ
+        c = self.chunk_cells
+        self._grid_chunks = tuple(int(math.ceil(s / c)) for s in self._occ.shape)
+        self._faces: Dict[Tuple[ChunkKey, int], List[Tuple[Index3, Index3]]] = {}
+        self._chunks: Dict[ChunkKey, _ChunkGraph] = {}
+        # Built chunks whose portal nodes on a neighbour's face may be outdated.
+        self._stale: Set[ChunkKey] = set()
+        self._partner_cache: Dict[Index3, List[Index3]] = {}
+
+    def _snap(self, point: WorldPoint) -> Optional[Index3]:
+        idx = self.radar_map.world_to_index(point)
+        if idx is None:
+            return None
+        return self._finder._find_nearest_free_index(idx)
+
+    def _chunk_exists(self, key: ChunkKey) -> bool:
+        return all(0 <= k < n for k, n in zip(key, self._grid_chunks))
+
+    def _chunk_bounds(self, key: ChunkKey) -> Tuple[Index3, Index3]:
+        c = self.chunk_cells
+        lo = (key[0] * c, key[1] * c, key[2] * c)
+        hi = tuple(min(v + c, s) for v, s in zip(lo, self._occ.shape))
+        return lo, hi  # type: ignore[return-value]
+
+    def _face_portals(self, key: ChunkKey, axis: int) -> List[Tuple[Index3, Index3]]:
+        """Portals on the face between ``key`` and its ``+axis`` neighbour."""
+
+        cache_key = (key, axis)
+        cached = self._faces.get(cache_key)
+        if cached is not None:
+            return cached
+
+        portals: List[Tuple[Index3, Index3]] = []
+        neighbor = _add(key, _AXES[axis])
+        if self._axis_allowed[axis] and self._chunk_exists(key) and self._chunk_exists(neighbor):
+            lo, hi = self._chunk_bounds(key)
+            plane = hi[axis] - 1
+            sl_a: List[object] = [slice(lo[0], hi[0]), slice(lo[1], hi[1]), slice(lo[2], hi[2])]
+            sl_b = list(sl_a)
+            sl_a[axis] = plane
+            sl_b[axis] = plane + 1
+            free = ~self._occ[tuple(sl_a)] & ~self._occ[tuple(sl_b)]
+            other = [a for a in range(3) if a != axis]
+            for u, v in _face_components(free, self.face_tiles):
+                cell_a = [0, 0, 0]
+                cell_a[axis] = plane
+                cell_a[other[0]] = lo[other[0]] + u
+                cell_a[other[1]] = lo[other[1]] + v
+                cell_b = list(cell_a)
+                cell_b[axis] = plane + 1
+                portals.append((tuple(cell_a), tuple(cell_b)))  # type: ignore[arg-type]
+        self._faces[cache_key] = portals
+        return portals
+
+    def _chunk_portal_cells(self, key: ChunkKey) -> List[Index3]:
+        cells: List[Index3] = []
+        for axis, step in enumerate(_AXES):
+            cells.extend(a for a, _ in self._face_portals(key, axis))
+            cells.extend(b for _, b in self._face_portals(_sub(key, step), axis))
+        return list(dict.fromkeys(cells))
+
+    def _partners(self, node: Index3) -> List[Index3]:
+        cached = self._partner_cache.get(node)
+        if cached is not None:
+            return cached
+        key = self.chunk_of(node)
+        partners: List[Index3] = []
+        for axis, step in enumerate(_AXES):
+            partners.extend(b for a, b in self._face_portals(key, axis) if a == node)
+            partners.extend(a for a, b in self._face_portals(_sub(key, step), axis) if b == node)
+        self._partner_cache[node] = partners
+        return partners
+
+    def _chunk_graph(self, key: ChunkKey) -> _ChunkGraph:
+        graph = self._chunks.get(key)
+        if graph is not None:
+            if key in self._stale:
+                self._sync_portals(key, graph)
+            return graph
+
+        lo, hi = self._chunk_bounds(key)
+        sub_occ = self._occ[lo[0] : hi[0], lo[1] : hi[1], lo[2] : hi[2]].copy()
+        base = self.radar_map
+        sub_map = RawRadarMap(
+            occ=sub_occ,
+            origin=np.asarray(base.origin, dtype=np.float64) + np.asarray(lo, dtype=np.float64) * base.cell_size,
+            cell_size=base.cell_size,
+            size=sub_occ.shape,  # type: ignore[arg-type]
+            revision=base.revision,
+            timestamp_ms=base.timestamp_ms,
+            contacts=(),
+            _inflation_cache={},
+        )
+        graph = _ChunkGraph(
+            lo=lo,
+            finder=PathFinder(sub_map, replace(self._local_profile)),
+            edges={},
+            empty=not sub_occ.any(),
+        )
+
+        nodes = self._chunk_portal_cells(key)
+        for node in nodes:
+            graph.edges[node] = []
+        costs = self._local_costs(graph, nodes, nodes, symmetric=True)
+        for (a, b), cost in costs.items():
+            graph.edges[a].append((b, cost))
+            graph.edges[b].append((a, cost))
+        self._chunks[key] = graph
+        return graph
+
+    def _sync_portals(self, key: ChunkKey, graph: _ChunkGraph) -> None:
+        """Replace portal nodes that left or joined ``key``'s faces, keeping the rest."""
+
+        self._stale.discard(key)
+        nodes = self._chunk_portal_cells(key)
+        current = set(nodes)
+        removed = set(graph.edges) - current
+        added = [node for node in nodes if node not in graph.edges]
+        for node in removed:
+            del graph.edges[node]
+        if removed:
+            for node, links in graph.edges.items():
+                graph.edges[node] = [(b, cost) for b, cost in links if b not in removed]
+        if not added:
+            return
+        new_nodes = set(added)
+        for node in added:
+            graph.edges[node] = []
+        for (a, b), cost in self._local_costs(graph, added, nodes).items():
+            graph.edges[a].append((b, cost))
+            if b not in new_nodes:
+                graph.edges[b].append((a, cost))
+
+    def _local_costs(
+        self,
+        graph: _ChunkGraph,
+        sources: Sequence[Index3],
+        targets: Sequence[Index3],
+        *,
+        symmetric: bool = False,
+    ) -> Dict[Tuple[Index3, Index3], float]:
+        """Travel costs between cells of one chunk, keyed by ``(source, target)``.
+
+        Visible pairs get the straight-line distance. The remaining pairs are
+        solved together by one multi-source relaxation over the chunk. With
+        ``symmetric=True`` each unordered pair is computed once.
+        """
+
+        finder = graph.finder
+        lo = graph.lo
+        costs: Dict[Tuple[Index3, Index3], float] = {}
+        pending: Dict[Index3, List[Index3]] = {}
+        for i, source in enumerate(sources):
+            src = _sub(source, lo)
+            for target in targets[i + 1 :] if symmetric else targets:
+                if target == source:
+                    continue
+                if graph.empty or finder.line_of_sight(src, _sub(target, lo)):
+                    costs[(source, target)] = self._heuristic(source, target)
+                else:
+                    pending.setdefault(source, []).append(target)
+
+        if pending:
+            if graph.moves is None:
+                graph.moves = self._relaxation_moves(finder)
+            field_sources = list(pending)
+            fields = _relax_costs(
+                finder._occ,
+                graph.moves,
+                [_sub(src, lo) for src in field_sources],
+            )
+            for row, source in enumerate(field_sources):
+                for target in pending[source]:
+                    value = float(fields[(row,) + _sub(target, lo)])
+                    if math.isfinite(value):
+                        costs[(source, target)] = value
+        return costs
+
+    def _relaxation_moves(self, finder: PathFinder) -> List[Tuple[tuple, tuple, np.ndarray]]:
+        """Per-direction ``(src, dst, cost)`` slices for :func:`_relax_costs`.
+
+        ``cost`` is ``inf`` where the move is blocked or would cut a corner.
+        """
+
+        free = ~finder._occ
+        shape = free.shape
+        moves: List[Tuple[tuple, tuple, np.ndarray]] = []
+        for d in finder._directions():
+            if not finder._direction_allowed(*d):
+                continue
+            src = tuple(slice(max(0, -k), n - max(0, k)) for k, n in zip(d, shape))
+            dst = tuple(slice(max(0, k), n - max(0, -k)) for k, n in zip(d, shape))
+            allowed = free[src] & free[dst]
+            if sum(1 for k in d if k) > 1:
+                for axis, k in enumerate(d):
+                    if k:
+                        corner = list(src)
+                        corner[axis] = slice(src[axis].start + k, src[axis].stop + k)
+                        allowed &= free[tuple(corner)]
+            step = np.float32(math.sqrt(sum(k * k for k in d)))
+            moves.append((src, dst, np.where(allowed, step, np.float32(np.inf)).astype(np.float32)))
+        return moves
+
+    def _changed_chunks(self, old: np.ndarray, new: np.ndarray) -> Set[ChunkKey]:
+        diff = old != new
+        if not diff.any():
+            return set()
+        c = self.chunk_cells
+        padded_shape = tuple(n * c for n in self._grid_chunks)
+        padded = np.zeros(padded_shape, dtype=bool)
+        padded[: diff.shape[0], : diff.shape[1], : diff.shape[2]] = diff
+        nx, ny, nz = self._grid_chunks
+        blocks = padded.reshape(nx, c, ny, c, nz, c).any(axis=(1, 3, 5))
+        return {tuple(int(v) for v in k) for k in np.argwhere(blocks)}  # type: ignore[misc]
+
+    @staticmethod
+    def _heuristic(a: Index3, b: Index3) -> float:
+        return math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2)
+
+
+def _relax_costs(
+    occ: np.ndarray,
+    moves: Sequence[Tuple[tuple, tuple, np.ndarray]],
+    sources: Sequence[Index3],
+) -> np.ndarray:
+    """Shortest grid costs from each source to every cell of a small grid.
+
+    All sources are relaxed together as one ``(len(sources), *occ.shape)``
+    array; every sweep applies each move as an in-place sliced ``minimum`` and
+    the loop stops once a sweep changes nothing.
+    """
+
+    dist = np.full((len(sources),) + occ.shape, np.inf, dtype=np.float32)
+    for row, src in enumerate(sources):
+        if not occ[src]:
+            dist[(row,) + tuple(src)] = 0.0
+    everything = slice(None)
+    previous = np.empty_like(dist)
+    while True:
+        np.copyto(previous, dist)
+        for src, dst, cost in moves:
+            target = dist[(everything,) + dst]
+            np.minimum(target, dist[(everything,) + src] + cost, out=target)
+        if np.array_equal(previous, dist):
+            return dist
+
+
+def _face_components(free: np.ndarray, tiles: int = 1) -> List[Tuple[int, int]]:
+    """Return representative cells of the 4-connected free regions of a face.
+
+    The face is split into ``tiles`` x ``tiles`` tiles and every region gets
+    one portal per tile it covers, placed on the member nearest the centre of
+    that part, so wide openings offer several crossing points.
+    """
+
+    seen = np.zeros(free.shape, dtype=bool)
+    reps: List[Tuple[int, int]] = []
+    rows, cols = free.shape
+    tile_u = max(1, int(math.ceil(rows / tiles)))
+    tile_v = max(1, int(math.ceil(cols / tiles)))
+    for u, v in zip(*np.nonzero(free)):
+        if seen[u, v]:
+            continue
+        stack = [(int(u), int(v))]
+        seen[u, v] = True
+        members: List[Tuple[int, int]] = []
+        while stack:
+            cu, cv = stack.pop()
+            members.append((cu, cv))
+            for nu, nv in ((cu + 1, cv), (cu - 1, cv), (cu, cv + 1), (cu, cv - 1)):
+                if 0 <= nu < rows and 0 <= nv < cols and free[nu, nv] and not seen[nu, nv]:
+                    seen[nu, nv] = True
+                    stack.append((nu, nv))
+        arr = np.asarray(members, dtype=np.int64)
+        tile = (arr[:, 0] // tile_u) * tiles + arr[:, 1] // tile_v
+        for t in np.unique(tile):
+            part = arr[tile == t]
+            center = part.mean(axis=0)
+            best = int(np.argmin(np.sum((part - center) ** 2, axis=1)))
+            reps.append((int(part[best, 0]), int(part[best, 1])))
+    return reps
+
+
+def _add(a: Sequence[int], b: Sequence[int]) -> Index3:
+    return a[0] + b[0], a[1] + b[1], a[2] + b[2]
+
+
+def _sub(a: Sequence[int], b: Sequence[int]) -> Index3:
+    return a[0] - b[0], a[1] - b[1], a[2] - b[2]
+
+
+__all__ = ["HierarchicalPathFinder"]
@@ -0,0 +1,379 @@
+"""Incremental (D* Lite) replanning on radar occupancy grids.
+
+A new scan usually changes only a handful of cells near the ship, yet a flat
+A* replans the whole route from scratch. :class:`DStarLitePlanner` searches
+backwards from the goal and keeps its ``g``/``rhs`` tables between queries.
+When :meth:`DStarLitePlanner.update_map` receives a new map it diffs the
+inflated occupancy over the region both maps cover and re-opens only the
+cells around the flipped voxels; moving the start is absorbed by the usual
+key modifier. A replan in a stable field then touches a few cells instead of
+the whole search volume.
+
+The planner works on the padded flat indices and move tables of
+:class:`~secontrol.tools.radar_navigation.PathFinder`, so costs, slope limits
+and the corner-cutting rule are identical to the A* search.
+
+Only ``numpy`` is required.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from dataclasses import replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .radar_navigation import Index3, PassabilityProfile, PathFinder, RawRadarMap, WorldPoint
+
+_Key = Tuple[float, float]
+
+# Rebuild the search instead of repairing it once this share of the grid is
+# affected by a single update: a fresh search is cheaper at that point.
+_RESET_FRACTION = 0.25
+
+# Keys are rounded so that ties between mathematically equal keys (common on
+# a grid) are not broken by floating-point noise in the heuristic sums.
+_KEY_DIGITS = 9
+
+
+class DStarLitePlanner:
+    """D* Lite planner that repairs its search when occupancy changes.
+
+    The planner owns a *frame*: the grid layout of the map it was built from.
+    Later maps with the same cell size are moved onto the frame's lattice
+    (conservatively, when their origin is off by a fraction of a cell) and
+    diffed over their overlap with the frame; frame cells outside the new map
+    keep their last known state. Maps with another cell size, and queries
+    whose endpoints fall outside the frame, rebuild the planner on the latest
+    map.
+    Changing the goal restarts the search; moving the start does not.
+    """
+
+    def __init__(self, radar_map: RawRadarMap, profile: Optional[PassabilityProfile] = None) -> None:
+        self._finder = PathFinder(radar_map, profile)
+        self.profile = self._finder.profile
+        self.expansions = 0
+        self._reset(radar_map)
+
+    # Public API ------------------------------------------------------
+
+    @property
+    def radar_map(self) -> RawRadarMap:
+        """The map that defines the planner's grid frame."""
+
+        return self._finder.radar_map
+
+    @property
+    def goal(self) -> Optional[Index3]:
+        return None if self._goal < 0 else self._finder._from_padded_flat(self._goal)
+
+    def find_path_world(self, start: WorldPoint, goal: WorldPoint) -> List[WorldPoint]:
+        """Plan between two world points, snapping blocked endpoints to free cells."""
+
+        start_idx = self.radar_map.world_to_index(start)
+        goal_idx = self.radar_map.world_to_index(goal)
+        if (start_idx is None or goal_idx is None) and self._latest is not self.radar_map:
+            self._rebuild(self._latest)
+            start_idx = self.radar_map.world_to_index(start)
+            goal_idx = self.radar_map.world_to_index(goal)
+        if start_idx is None or goal_idx is None:
+            return []
+        start_idx = self._snap(start_idx)
+        goal_idx = self._snap(goal_idx)
+        if start_idx is None or goal_idx is None:
+            return []
+        path_idx = self.find_path_indices(start_idx, goal_idx)
+        return [self.radar_map.index_to_world_center(p) for p in path_idx]
+
+    def find_path_indices(self, start: Index3, goal: Index3) -> List[Index3]:
+        """Return the shortest grid path from ``start`` to ``goal`` in frame indices.
+
+        Consecutive calls with the same goal reuse the previous search; only
+        cells whose cost-to-goal may have changed are expanded again.
+        """
+
+        frame = self.radar_map
+        if not frame.is_within_bounds(start) or not frame.is_within_bounds(goal):
+            return []
+        blocked = self._blocked
+        start_flat = self._finder._to_padded_flat(start)
+        goal_flat = self._finder._to_padded_flat(goal)
+        if blocked[start_flat] or blocked[goal_flat]:
+            return []
+
+        if goal_flat != self._goal:
+            self._start = start_flat
+            self._restart(goal_flat)
+        elif start_flat != self._last_start:
+            self._km += self._h(self._last_start, start_flat)
+        self._last_start = self._start = start_flat
+
+        self._compute_shortest_path()
+        if math.isinf(self._g[start_flat]):
+            return []
+        return self._extract_path(start_flat)
+
+    def update_map(self, radar_map: RawRadarMap) -> int:
+        """Feed a new map into the planner and return the number of cells that flipped.
+
+        Only cells inside the overlap of ``radar_map`` and the frame are
+        compared. A map whose origin is off the frame's lattice (a scan
+        centred on the moved ship) is first resampled onto it with
+        :meth:`RawRadarMap.aligned_to`. A map with another cell size rebuilds
+        the planner and returns ``-1``.
+        """
+
+        if radar_map is not self.radar_map and self._same_cell_size(radar_map):
+            radar_map = radar_map.aligned_to(self.radar_map.origin)
+        previous, self._latest = self._latest, radar_map
+        if radar_map is self.radar_map:
+            return 0
+        radar_map.reuse_inflation(previous)
+        offset = self._frame_offset(radar_map)
+        if offset is None:
+            self._rebuild(radar_map)
+            return -1
+
+        frame_size = self.radar_map.size
+        lo = [max(0, o) for o in offset]
+        hi = [min(f, o + n) for f, o, n in zip(frame_size, offset, radar_map.size)]
+        if any(h <= l for l, h in zip(lo, hi)):
+            self._rebuild(radar_map)
+            return -1
+
+        new_occ = PathFinder(radar_map, replace(self.profile))._occ
+        src = tuple(slice(l - o, h - o) for l, h, o in zip(lo, hi, offset))
+        dst = tuple(slice(l, h) for l, h in zip(lo, hi))
+        incoming = new_occ[src]
+        changed = self._finder._occ[dst] != incoming
+        if not changed.any():
+            return 0
+        cells = np.argwhere(changed) + np.asarray(lo, dtype=np.int64).reshape(1, 3)
+        self.update_cells(cells, incoming[changed])
+        return int(cells.shape[0])
+
+    def update_cells(self, cells: Sequence[Index3], blocked: Sequence[bool]) -> None:
+        """Set the inflated occupancy of ``cells`` and repair the search around them."""
+
+        cells_arr = np.asarray(cells, dtype=np.int64).reshape(-1, 3)
+        if cells_arr.shape[0] == 0:
+            return
+        values = np.asarray(blocked, dtype=bool).reshape(-1)
+        self._finder._occ[cells_arr[:, 0], cells_arr[:, 1], cells_arr[:, 2]] = values
+        _, sy, sz = self._finder._padded_shape
+        flat = ((cells_arr[:, 0] + 1) * sy + cells_arr[:, 1] + 1) * sz + cells_arr[:, 2] + 1
+        self._view[flat] = values.astype(np.uint8)
+        self._snap_map = None
+        if self._goal < 0:
+            return
+
+        affected = np.unique((flat.reshape(-1, 1) + self._ring.reshape(1, -1)).reshape(-1))
+        if affected.shape[0] > _RESET_FRACTION * len(self._blocked):
+            self._restart(self._goal)
+            return
+        for u in affected.tolist():
+            if u != self._goal:
+                self._rhs[u] = self._best_successor_cost(u)
+            self._update_queue(u)
+
+    def line_of_sight(self, start: Index3, goal: Index3) -> bool:
+        return self._finder.line_of_sight(start, goal)
+
+    def shortcut_path_world(self, path: Sequence[WorldPoint]) -> List[WorldPoint]:
+        return self._finder.shortcut_path_world(path)
+
+    # Search ----------------------------------------------------------
+
+    def _compute_shortest_path(self) -> None:
+        g = self._g
+        rhs = self._rhs
+        blocked = self._blocked
+        queue = self._queue
+        queued = self._queued
+        moves = self._moves
+        heappop = heapq.heappop
+        heappush = heapq.heappush
+        key = self._key
+        start = self._start
+        goal = self._goal
+
+        while queue:
+            k1, k2, u = queue[0]
+            if queued.get(u) != (k1, k2):
+                heappop(queue)
+                continue
+            if g[start] == rhs[start] and (k1, k2) >= key(start):
+                break
+            heappop(queue)
+            k_new = key(u)
+            if (k1, k2) < k_new:
+                queued[u] = k_new
+                heappush(queue, (k_new[0], k_new[1], u))
+                continue
+            self.expansions += 1
+            g_u = g[u]
+            if g_u > rhs[u]:
+                g_u = rhs[u]
+                g[u] = g_u
+                del queued[u]
+                for offset, cost, c0, c1, c2 in moves:
+                    p = u - offset
+                    if p == goal or blocked[p]:
+                        continue
+                    if blocked[p + c0] or blocked[p + c1] or blocked[p + c2]:
+                        continue
+                    candidate = g_u + cost
+                    if candidate < rhs[p]:
+                        rhs[p] = candidate
+                        self._update_queue(p)
+            else:
+                g[u] = math.inf
+                if u != goal:
+                    rhs[u] = self._best_successor_cost(u)
+                self._update_queue(u)
+                for offset, cost, c0, c1, c2 in moves:
+                    p = u - offset
+                    if p == goal or blocked[p]:
+                        continue
+                    if blocked[p + c0] or blocked[p + c1] or blocked[p + c2]:
+                        continue
+                    if rhs[p] == g_u + cost:
+                        rhs[p] = self._best_successor_cost(p)
+                        self._update_queue(p)
+
+    def _best_successor_cost(self, u: int) -> float:
+        blocked = self._blocked
+        if blocked[u]:
+            return math.inf
+        g = self._g
+        best = math.inf
+        for offset, cost, c0, c1, c2 in self._moves:
+            s = u + offset
+            if blocked[s] or blocked[u + c0] or blocked[u + c1] or blocked[u + c2]:
+                continue
+            candidate = g[s] + cost
+            if candidate < best:
+                best = candidate
+        return best
+
+    def _update_queue(self, u: int) -> None:
+        if self._g[u] != self._rhs[u]:
+            k = self._key(u)
+            self._queued[u] = k
+            heapq.heappush(self._queue, (k[0], k[1], u))
+        else:
+            self._queued.pop(u, None)
+
+    def _key(self, u: int) -> _Key:
+        m = min(self._g[u], self._rhs[u])
+        if m == math.inf:
+            return m, m
+        return round(m + self._h(self._start, u) + self._km, _KEY_DIGITS), round(m, _KEY_DIGITS)
+
+    def _h(self, a: int, b: int) -> float:
+        sx, sz = self._stride_x, self._stride_z
+        ax, rem = divmod(a, sx)
+        ay, az = divmod(rem, sz)
+        bx, rem = divmod(b, sx)
+        by, bz = divmod(rem, sz)
+        return math.sqrt((ax - bx) ** 2 + (ay - by) ** 2 + (az - bz) ** 2)
+
+    def _extract_path(self, start: int) -> List[Index3]:
+        g = self._g
+        blocked = self._blocked
+        current = start
+        path = [self._finder._from_padded_flat(current)]
+        for _ in range(len(blocked)):
+            if current == self._goal:
+                return path
+            best = math.inf
+            best_next = -1
+            for offset, cost, c0, c1, c2 in self._moves:
+                s = current + offset
+                if blocked[s] or blocked[current + c0] or blocked[current + c1] or blocked[current + c2]:
+                    continue
+                candidate = g[s] + cost
+                if candidate < best:
+                    best = candidate
+                    best_next = s
+            if best_next < 0 or math.isinf(best):
+                return []
+            current = best_next
+            path.append(self._finder._from_padded_flat(current))
+        return []
+
+    # Frame management ------------------------------------------------
+
+    def _reset(self, radar_map: RawRadarMap) -> None:
+        self._latest = radar_map
+        blocked, axis_moves, diag_moves = self._finder._search_tables()
+        self._blocked = blocked
+        self._view = self._finder._blocked_view
+        self._moves = [(offset, cost, 0, 0, 0) for offset, cost in axis_moves] + list(diag_moves)
+        _, sy, sz = self._finder._padded_shape
+        self._stride_x = sy * sz
+        self._stride_z = sz
+        self._ring = np.array(
+            [dx * sy * sz + dy * sz + dz for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)],
+            dtype=np.int64,
+        )
+        self._snap_map: Optional[RawRadarMap] = None
+        self._goal = -1
+        self._start = -1
+        self._last_start = -1
+        self._km = 0.0
+        self._g = memoryview(np.zeros(0, dtype=np.float64))
+        self._rhs = self._g
+        self._queue: List[Tuple[float, float, int]] = []
+        self._queued: Dict[int, _Key] = {}
+
+    def _rebuild(self, radar_map: RawRadarMap) -> None:
+        self._finder = PathFinder(radar_map, replace(self.profile))
+        self._reset(radar_map)
+
+    def _restart(self, goal_flat: int) -> None:
+        size = len(self._blocked)
+        self._g = memoryview(np.full(size, np.inf, dtype=np.float64))
+        self._rhs = memoryview(np.full(size, np.inf, dtype=np.float64))
+        self._queue = []
+        self._queued = {}
+        self._km = 0.0
+        self._last_start = self._start
+        self._goal = goal_flat
+        self._rhs[goal_flat] = 0.0
+        self._update_queue(goal_flat)
+
+    def _same_cell_size(self, radar_map: RawRadarMap) -> bool:
+        return math.isclose(float(radar_map.cell_size), float(self.radar_map.cell_size), rel_tol=1e-9)
+
+    def _frame_offset(self, radar_map: RawRadarMap) -> Optional[Index3]:
+        frame = self.radar_map
+        if not self._same_cell_size(radar_map):
+            return None
+        rel = (np.asarray(radar_map.origin, dtype=np.float64) - frame.origin) / frame.cell_size
+        cells = np.round(rel)
+        if not np.allclose(rel, cells, atol=1e-6):
+            return None
+        return int(cells[0]), int(cells[1]), int(cells[2])
+
+    def _snap(self, idx: Index3) -> Optional[Index3]:
+        if not self._finder._occ[idx]:
+            return idx
+        if self._snap_map is None:
+            frame = self.radar_map
+            self._snap_map = RawRadarMap(
+                occ=self._finder._occ.copy(),
+                origin=frame.origin,
+                cell_size=frame.cell_size,
+                size=frame.size,
+                revision=frame.revision,
+                timestamp_ms=frame.timestamp_ms,
+                contacts=(),
+                _inflation_cache={},
+            )
+        return self._snap_map.nearest_free_index(idx)
+
+
+__all__ = ["DStarLitePlanner"]
@@ -0,0 +1,440 @@
+"""Columnar index over ore detector cells with deposit clustering.
+
+Ore cells arrive from several sources (radar ``oreCells``, the shared map's
+:class:`OreHit` records, cached dicts with ``x``/``worldX`` style keys).
+:class:`OreIndex` normalises them once into NumPy columns – material id,
+position and content – so per-material nearest queries and radius searches
+are single vectorised passes.
+
+Deposits are connected components of same-material cells closer than
+``link_radius``. They are found with a grid hash whose cell diagonal equals the
+link radius: every point inside one hash cell is linked by construction, so
+only neighbouring cells need point-level distance checks.
+
+Only ``numpy`` is required.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+WorldPoint = Tuple[float, float, float]
+
+_POSITION_KEYS = (("x", "X", "worldX", "wx"), ("y", "Y", "worldY", "wy"), ("z", "Z", "worldZ", "wz"))
+_MATERIAL_KEYS = ("material", "ore", "type")
+_DEDUP_STEP = 1e-3
+_PAIR_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True)
+class OreCell:
+    """Single ore detector cell."""
+
+    material: str
+    position: WorldPoint
+    content: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class OreDeposit:
+    """Connected group of same-material ore cells."""
+
+    material: str
+    position: WorldPoint
+    count: int
+    content: float
+    min_corner: WorldPoint
+    max_corner: WorldPoint
+
+
+def parse_ore_cell(cell: Any) -> Optional[Tuple[str, WorldPoint, Optional[float]]]:
+    """Normalise one ore record into ``(material, position, content)``.
+
+    Accepts radar/shared-map dicts (``position`` list or ``x``/``X``/``worldX``/
+    ``wx`` keys), objects with ``material``/``position`` attributes such as
+    :class:`OreHit`, and bare ``(x, y, z)`` sequences (material ``""``).
+    """
+
+    material: Any = None
+    content: Any = None
+    if isinstance(cell, dict):
+        position = cell.get("position")
+        if not (isinstance(position, (list, tuple)) and len(position) >= 3):
+            position = []
+            for keys in _POSITION_KEYS:
+                value = None
+                for key in keys:
+                    value = cell.get(key)
+                    if value is not None:
+                        break
+                position.append(value)
+        for key in _MATERIAL_KEYS:
+            material = cell.get(key)
+            if material:
+                break
+        content = cell.get("content")
+    elif isinstance(cell, (list, tuple)):
+        if len(cell) < 3:
+            return None
+        position = cell
+    elif hasattr(cell, "position"):
+        position = getattr(cell, "position")
+        material = getattr(cell, "material", None)
+        content = getattr(cell, "content", None)
+    else:
+        return None
+
+    try:
+        point = (float(position[0]), float(position[1]), float(position[2]))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if not all(math.isfinite(v) for v in point):
+        return None
+    try:
+        content_val = float(content) if content is not None else None
+    except (TypeError, ValueError):
+        content_val = None
+    return (str(material) if material else ""), point, content_val
+
+
+class OreIndex:
+    """Incrementally growing columnar store of ore cells.
+
+    Re-inserting a cell with the same material and position replaces its
+    content instead of adding a duplicate. Deposits are recomputed lazily
+    after insertions.
+    """
+
+    def __init__(self, cells: Optional[Iterable[Any]] = None, *, link_radius: float = 50.0) -> None:
+        if link_radius <= 0:
+            raise ValueError("link_radius must be positive")
+        self.link_radius = float(link_radius)
+        self.materials: List[str] = []
+        self._material_ids: Dict[str, int] = {}
+        self._lower_ids: Dict[str, List[int]] = {}
+        self.material_ids = np.zeros(0, dtype=np.int32)
+        self.positions = np.zeros((0, 3), dtype=np.float64)
+        self.contents = np.zeros(0, dtype=np.float64)
+        self._rows: Dict[Tuple[int, int, int, int], int] = {}
+        self._deposits: Optional[List[OreDeposit]] = None
+        self._deposit_centers = np.zeros((0, 3), dtype=np.float64)
+        if cells is not None:
+            self.add_cells(cells)
+
+    def __len__(self) -> int:
+        return int(self.material_ids.shape[0])
+
+    # ------------------------------------------------------------------
+    # Insertion
+
+    def add_cells(self, cells: Iterable[Any]) -> int:
+        """Insert ore records in any format understood by :func:`parse_ore_cell`.
+
+        Returns the number of new cells (updates of known cells are not counted).
+        """
+
+        new_ids: List[int] = []
+        new_pos: List[WorldPoint] = []
+        new_content: List[float] = []
+        updates: Dict[int, float] = {}
+        base = len(self)
+
+        for cell in cells:
+            parsed = parse_ore_cell(cell)
+            if parsed is None:
+                continue
+            material, point, content = parsed
+            mid = self._material_id(material)
+            key = (
+                mid,
+                int(round(point[0] / _DEDUP_STEP)),
+                int(round(point[1] / _DEDUP_STEP)),
+                int(round(point[2] / _DEDUP_STEP)),
+            )
+            value = content if content is not None else math.nan
+            row = self._rows.get(key)
+            if row is not None:
+                if row >= base:
+                    new_content[row - base] = value
+                else:
+                    updates[row] = value
+                continue
+            self._rows[key] = base + len(new_ids)
+            new_ids.append(mid)
+            new_pos.append(point)
+            new_content.append(value)
+
+        if updates:
+            rows = np.fromiter(updates.keys(), dtype=np.int64, count=len(updates))
+            self.contents[rows] = np.fromiter(updates.values(), dtype=np.float64, count=len(updates))
+            self._deposits = None
+        if new_ids:
+            self.material_ids = np.concatenate([self.material_ids, np.asarray(new_ids, dtype=np.int32)])
+            self.positions = np.concatenate([self.positions, np.asarray(new_pos, dtype=np.float64)])
+            self.contents = np.concatenate([self.contents, np.asarray(new_content, dtype=np.float64)])
+            self._deposits = None
+        return len(new_ids)
+
+    def _material_id(self, material: str) -> int:
+        mid = self._material_ids.get(material)
+        if mid is None:
+            mid = len(self.materials)
+            self.materials.append(material)
+            self._material_ids[material] = mid
+            self._lower_ids.setdefault(material.lower(), []).append(mid)
+        return mid
+
+    # ------------------------------------------------------------------
+    # Cell queries
+
+    def material_mask(
+        self,
+        material: Optional[str] = None,
+        *,
+        exclude: Sequence[str] = (),
+    ) -> np.ndarray:
+        """Boolean row mask for ``material`` (case-insensitive) minus ``exclude``."""
+
+        if material is None:
+            mask = np.ones(len(self), dtype=bool)
+        else:
+            ids = self._lower_ids.get(material.lower(), [])
+            mask = np.isin(self.material_ids, np.asarray(ids, dtype=np.int32))
+        drop = [mid for name in exclude for mid in self._lower_ids.get(name.lower(), [])]
+        if drop:
+            mask &= ~np.isin(self.material_ids, np.asarray(drop, dtype=np.int32))
+        return mask
+
+    def cell(self, row: int) -> OreCell:
+        content = float(self.contents[row])
+        pos = self.positions[row]
+        return OreCell(
+            material=self.materials[int(self.material_ids[row])],
+            position=(float(pos[0]), float(pos[1]), float(pos[2])),
+            content=None if math.isnan(content) else content,
+        )
+
+    def nearest(
+        self,
+        point: Sequence[float],
+        k: int = 1,
+        *,
+        material: Optional[str] = None,
+        exclude: Sequence[str] = (),
+    ) -> List[Tuple[float, OreCell]]:
+        """Return up to ``k`` ``(distance, cell)`` pairs closest to ``point``."""
+
+        rows = np.flatnonzero(self.material_mask(material, exclude=exclude))
+        if rows.size == 0 or k <= 0:
+            return []
+        dist = self._distances(self.positions[rows], point)
+        if k < rows.size:
+            part = np.argpartition(dist, k - 1)[:k]
+        else:
+            part = np.arange(rows.size)
+        order = part[np.argsort(dist[part], kind="stable")]
+        return [(float(dist[i]), self.cell(int(rows[i]))) for i in order]
+
+    def cells_within(
+        self,
+        center: Sequence[float],
+        radius: float,
+        *,
+        material: Optional[str] = None,
+        exclude: Sequence[str] = (),
+        limit: Optional[int] = None,
+    ) -> List[Tuple[float, OreCell]]:
+        """Return ``(distance, cell)`` pairs within ``radius`` sorted by distance."""
+
+        rows = np.flatnonzero(self.material_mask(material, exclude=exclude))
+        if rows.size == 0:
+            return []
+        dist = self._distances(self.positions[rows], center)
+        inside = np.flatnonzero(dist <= radius)
+        order = inside[np.argsort(dist[inside], kind="stable")]
+        if limit is not None and limit > 0:
+            order = order[:limit]
+        return [(float(dist[i]), self.cell(int(rows[i]))) for i in order]
+
+    # ------------------------------------------------------------------
+    # Deposits
+
+    def deposits(self, material: Optional[str] = None) -> List[OreDeposit]:
+        """Return all deposits, optionally only for ``material``."""
+
+        if self._deposits is None:
+            self._deposits = self._build_deposits()
+            self._deposit_centers = np.asarray(
+                [d.position for d in self._deposits], dtype=np.float64
+            ).reshape(-1, 3)
+        if material is None:
+            return list(self._deposits)
+        wanted = material.lower()
+        return [d for d in self._deposits if d.material.lower() == wanted]
+
+    def deposits_within(
+        self,
+        center: Sequence[float],
+        radius: float = math.inf,
+        *,
+        material: Optional[str] = None,
+        sort_by: str = "distance",
+        limit: Optional[int] = None,
+    ) -> List[Tuple[float, OreDeposit]]:
+        """Return ``(distance, deposit)`` pairs whose centroid lies within ``radius``.
+
+        ``sort_by`` is ``"distance"`` (nearest first), ``"content"`` or
+        ``"count"`` (largest first).
+        """
+
+        if sort_by not in ("distance", "content", "count"):
+            raise ValueError(f"Unsupported sort_by: {sort_by!r}")
+        deposits = self.deposits()
+        if not deposits:
+            return []
+        dist = self._distances(self._deposit_centers, center)
+        keep = dist <= radius
+        if material is not None:
+            wanted = material.lower()
+            keep &= np.fromiter((d.material.lower() == wanted for d in deposits), dtype=bool, count=len(deposits))
+        rows = np.flatnonzero(keep)
+        if sort_by == "distance":
+            order = rows[np.argsort(dist[rows], kind="stable")]
+        else:
+            key = np.asarray([getattr(deposits[i], sort_by) for i in rows], dtype=np.float64)
+            order = rows[np.lexsort((dist[rows], -key))]
+        if limit is not None and limit > 0:
+            order = order[:limit]
+        return [(float(dist[i]), deposits[int(i)]) for i in order]
+
+    def _build_deposits(self) -> List[OreDeposit]:
+        n = len(self)
+        if n == 0:
+            return []
+        labels = self._component_labels()
+        _, comp = np.unique(labels, return_inverse=True)
+        comp = comp.reshape(-1)
+        count = np.bincount(comp)
+        centers = np.stack([np.bincount(comp, weights=self.positions[:, a]) for a in range(3)], axis=1)
+        centers /= count.reshape(-1, 1)
+        content = np.bincount(comp, weights=np.nan_to_num(self.contents, nan=0.0))
+        lo = np.full((count.size, 3), np.inf)
+        hi = np.full((count.size, 3), -np.inf)
+        np.minimum.at(lo, comp, self.positions)
+        np.maximum.at(hi, comp, self.positions)
+        first = np.full(count.size, n, dtype=np.int64)
+        np.minimum.at(first, comp, np.arange(n))
+        mids = self.material_ids[first]
+
+        return [
+            OreDeposit(
+                material=self.materials[int(mids[i])],
+                position=(float(centers[i, 0]), float(centers[i, 1]), float(centers[i, 2])),
+                count=int(count[i]),
+                content=float(content[i]),
+                min_corner=(float(lo[i, 0]), float(lo[i, 1]), float(lo[i, 2])),
+                max_corner=(float(hi[i, 0]), float(hi[i, 1]), float(hi[i, 2])),
+            )
+            for i in range(count.size)
+        ]
+
+    def _component_labels(self) -> np.ndarray:
+        """Connected-component label per row (same material, chained within ``link_radius``)."""
+
+        hash_size = self.link_radius / math.sqrt(3.0)
+        coords = np.floor(self.positions / hash_size).astype(np.int64)
+        coords -= coords.min(axis=0)
+        span = coords.max(axis=0) + 5
+        keys = ((self.material_ids.astype(np.int64) * span[0] + coords[:, 0]) * span[1] + coords[:, 1]) * span[2] + coords[:, 2]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        boundary = np.ones(sorted_keys.size, dtype=bool)
+        boundary[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        starts = np.flatnonzero(boundary)
+        cell_keys = sorted_keys[starts]
+        counts = np.diff(np.append(starts, sorted_keys.size))
+        cell_of_row = np.empty(keys.size, dtype=np.int64)
+        cell_of_row[order] = np.cumsum(boundary) - 1
+        cell_coords = coords[order[starts]]
+
+        # Points sharing a hash cell are always linked, so components are
+        # computed over cells. Neighbour cells within two steps on each axis
+        # may hold linked points; only those pairs need point checks.
+        link_sq = self.link_radius * self.link_radius
+        edges_a: List[np.ndarray] = []
+        edges_b: List[np.ndarray] = []
+        for dx in range(-2, 3):
+            for dy in range(-2, 3):
+                for dz in range(-2, 3):
+                    if (dx, dy, dz) <= (0, 0, 0):
+                        continue
+                    gap = np.maximum(np.abs(np.array([dx, dy, dz])) - 1, 0) * hash_size
+                    if float(gap @ gap) > link_sq:
+                        continue
+                    shifted = cell_coords + np.array([dx, dy, dz])
+                    valid = np.all(shifted >= 0, axis=1) & np.all(shifted < span, axis=1)
+                    target = cell_keys + (dx * span[1] + dy) * span[2] + dz
+                    pos = np.searchsorted(cell_keys, target)
+                    pos = np.minimum(pos, cell_keys.size - 1)
+                    hit = valid & (cell_keys[pos] == target)
+                    a = np.flatnonzero(hit)
+                    if a.size == 0:
+                        continue
+                    b = pos[hit]
+                    linked = self._cells_linked(order, starts, counts, a, b, link_sq)
+                    edges_a.append(a[linked])
+                    edges_b.append(b[linked])
+
+        labels = np.arange(cell_keys.size, dtype=np.int64)
+        if edges_a:
+            ea = np.concatenate(edges_a)
+            eb = np.concatenate(edges_b)
+            while True:
+                low = np.minimum(labels[ea], labels[eb])
+                before = labels.copy()
+                np.minimum.at(labels, ea, low)
+                np.minimum.at(labels, eb, low)
+                labels = labels[labels]
+                if np.array_equal(labels, before):
+                    break
+        return labels[cell_of_row]
+
+    def _cells_linked(
+        self,
+        order: np.ndarray,
+        starts: np.ndarray,
+        counts: np.ndarray,
+        a: np.ndarray,
+        b: np.ndarray,
+        link_sq: float,
+    ) -> np.ndarray:
+        pairs = counts[a] * counts[b]
+        linked = np.zeros(a.size, dtype=bool)
+        begin = 0
+        while begin < a.size:
+            total = np.cumsum(pairs[begin:])
+            end = begin + max(1, int(np.searchsorted(total, _PAIR_CHUNK, side="right")))
+            sl = slice(begin, end)
+            n_pairs = pairs[sl]
+            pair_id = np.repeat(np.arange(n_pairs.size), n_pairs)
+            local = np.arange(int(n_pairs.sum())) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+            cb = counts[b[sl]][pair_id]
+            i = order[starts[a[sl]][pair_id] + local // cb]
+            j = order[starts[b[sl]][pair_id] + local % cb]
+            diff = self.positions[i] - self.positions[j]
+            close = np.einsum("ij,ij->i", diff, diff) <= link_sq
+            linked[begin:end] = np.bincount(pair_id[close], minlength=n_pairs.size) > 0
+            begin = end
+        return linked
+
+    @staticmethod
+    def _distances(points: np.ndarray, center: Sequence[float]) -> np.ndarray:
+        diff = points - np.asarray(center[:3], dtype=np.float64).reshape(1, 3)
+        return np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+
+__all__ = ["OreCell", "OreDeposit", "OreIndex", "parse_ore_cell"]
@@ -0,0 +1,238 @@
+"""Background path planning with deadlines and cooperative cancellation.
+
+A* on a fine scan map can take hundreds of milliseconds, and while it runs
+inside the navigation loop telemetry is not polled. :class:`PlannerService`
+moves the search onto a thread or process pool: :meth:`PlannerService.submit`
+returns a :class:`PlanFuture` immediately, the caller keeps flying the current
+leg, and the search stops on its own when the deadline passes, returning the
+best partial path found so far.
+
+With ``use_processes=True`` the searches run in other processes. The raw
+occupancy grid is handed over through :mod:`multiprocessing.shared_memory`
+together with a one-byte cancel flag, so neither the grid nor the cancel
+signal needs to be pickled per poll; obstacle inflation also runs in the
+worker.
+
+Only ``numpy`` is required.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .radar_navigation import PassabilityProfile, PathCache, PathFinder, RawRadarMap, WorldPoint
+
+
+@dataclass
+class PlanResult:
+    """Outcome of a background search.
+
+    ``status`` is ``"complete"`` when the goal was reached, ``"partial"`` when
+    the deadline expired (``path`` then ends at the explored cell closest to
+    the goal), ``"cancelled"`` after :meth:`PlanFuture.cancel` and
+    ``"no_path"`` when the goal is unreachable.
+    """
+
+    path: List[WorldPoint] = field(default_factory=list)
+    status: str = "no_path"
+    elapsed: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return self.status == "complete"
+
+
+class PlanFuture:
+    """Handle for a submitted search.
+
+    :meth:`cancel` is cooperative: a running search notices it within a few
+    hundred expansions and resolves with ``status="cancelled"``.
+    """
+
+    def __init__(self, future: Future, cancel: Callable[[], None]) -> None:
+        self._future = future
+        self._cancel = cancel
+
+    def cancel(self) -> bool:
+        self._cancel()
+        self._future.cancel()
+        return True
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self, timeout: Optional[float] = None) -> PlanResult:
+        try:
+            return self._future.result(timeout)
+        except CancelledError:
+            return PlanResult(status="cancelled")
+
+    def add_done_callback(self, fn: Callable[["PlanFuture"], None]) -> None:
+        self._future.add_done_callback(lambda _f: fn(self))
+
+
+class PlannerService:
+    """Executor-backed planner running :class:`PathFinder` searches off the caller's thread."""
+
+    def __init__(self, *, max_workers: int = 1, use_processes: bool = False) -> None:
+        self.use_processes = bool(use_processes)
+        self._executor: Executor
+        if self.use_processes:
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="planner")
+
+    def __enter__(self) -> "PlannerService":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.shutdown()
+
+    def submit(
+        self,
+        radar_map: RawRadarMap,
+        start: WorldPoint,
+        goal: WorldPoint,
+        profile: Optional[PassabilityProfile] = None,
+        deadline: Optional[float] = None,
+        *,
+        any_angle: bool = False,
+        cache: Optional[PathCache] = None,
+    ) -> PlanFuture:
+        """Queue a search from ``start`` to ``goal``.
+
+        ``deadline`` is a time budget in seconds counted from submission; the
+        time spent waiting for a free worker counts against it. Thread workers
+        consult ``cache`` before searching and store complete paths in it;
+        process workers cannot share it and ignore it.
+        """
+
+        expires = None if deadline is None else time.time() + float(deadline)
+        profile = replace(profile) if profile is not None else PassabilityProfile()
+        if self.use_processes:
+            return self._submit_process(radar_map, start, goal, profile, expires, any_angle)
+
+        cancelled = threading.Event()
+        future = self._executor.submit(
+            _run_search,
+            radar_map,
+            start,
+            goal,
+            profile,
+            expires,
+            any_angle,
+            cancelled.is_set,
+            cache,
+        )
+        return PlanFuture(future, cancelled.set)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _submit_process(
+        self,
+        radar_map: RawRadarMap,
+        start: WorldPoint,
+        goal: WorldPoint,
+        profile: PassabilityProfile,
+        expires: Optional[float],
+        any_angle: bool,
+    ) -> PlanFuture:
+        occ = np.ascontiguousarray(radar_map.occ, dtype=bool)
+        block = shared_memory.SharedMemory(create=True, size=occ.nbytes + 1)
+        block.buf[0] = 0
+        np.ndarray(occ.shape, dtype=bool, buffer=block.buf, offset=1)[:] = occ
+        layout = (
+            tuple(int(v) for v in occ.shape),
+            tuple(float(v) for v in radar_map.origin),
+            float(radar_map.cell_size),
+            radar_map.revision,
+            radar_map.timestamp_ms,
+        )
+        future = self._executor.submit(
+            _run_shared_search,
+            block.name,
+            layout,
+            start,
+            goal,
+            profile,
+            expires,
+            any_angle,
+        )
+
+        def _cancel() -> None:
+            try:
+                block.buf[0] = 1
+            except (TypeError, ValueError):
+                pass  # already released by _release
+
+        def _release(_f: Future) -> None:
+            block.close()
+            block.unlink()
+
+        future.add_done_callback(_release)
+        return PlanFuture(future, _cancel)
+
+
+def _run_search(
+    radar_map: RawRadarMap,
+    start: WorldPoint,
+    goal: WorldPoint,
+    profile: PassabilityProfile,
+    expires: Optional[float],
+    any_angle: bool,
+    cancelled: Callable[[], bool],
+    cache: Optional[PathCache] = None,
+) -> PlanResult:
+    started = time.time()
+    if cancelled():
+        return PlanResult(status="cancelled")
+
+    def _stop() -> bool:
+        return cancelled() or (expires is not None and time.time() >= expires)
+
+    finder = PathFinder(radar_map, profile)
+    path = finder.find_path_world(start, goal, any_angle=any_angle, cache=cache, stop=_stop)
+    if finder.interrupted:
+        status = "cancelled" if cancelled() else "partial"
+    else:
+        status = "complete" if path else "no_path"
+    return PlanResult(path=path, status=status, elapsed=time.time() - started)
+
+
+def _run_shared_search(
+    name: str,
+    layout: Tuple[Tuple[int, int, int], Sequence[float], float, Optional[int], Optional[int]],
+    start: WorldPoint,
+    goal: WorldPoint,
+    profile: PassabilityProfile,
+    expires: Optional[float],
+    any_angle: bool,
+) -> PlanResult:
+    shape, origin, cell_size, revision, timestamp_ms = layout
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        occ = np.ndarray(shape, dtype=bool, buffer=block.buf, offset=1).copy()
+        radar_map = RawRadarMap(
+            occ=occ,
+            origin=np.asarray(origin, dtype=np.float64),
+            cell_size=cell_size,
+            size=shape,
+            revision=revision,
+            timestamp_ms=timestamp_ms,
+            contacts=(),
+            _inflation_cache={},
+        )
+        return _run_search(radar_map, start, goal, profile, expires, any_angle, lambda: bool(block.buf[0]))
+    finally:
+        block.close()
+
+
+__all__ = ["PlanFuture", "PlanResult", "PlannerService"]
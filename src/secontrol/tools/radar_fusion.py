@@ -0,0 +1,463 @@
+"""Persistent fused world model built from successive radar scans.
+
+Every :meth:`RadarController.scan_voxels` call describes one sphere (or box)
+around the ship. :class:`FusedRadarMap` accumulates those scans into a single
+sparse map in world-aligned coordinates so planning can use areas scanned
+earlier and the next scan can target only the regions that went stale.
+
+The map is split into cubic bricks of ``brick_size`` cells. Each brick keeps a
+quantised log-odds value per cell plus the timestamp and map revision of the
+last scan that observed it. Bricks observed as completely empty are stored as
+a single scalar until something solid shows up inside them, which keeps open
+space cheap.
+
+Only ``numpy`` is required.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .radar_navigation import RadarContact, RawRadarMap
+
+BrickKey = Tuple[int, int, int]
+WorldPoint = Tuple[float, float, float]
+
+
+@dataclass
+class _Brick:
+    log_odds: Optional[np.ndarray]
+    uniform: int
+    last_seen_ms: int
+    revision: int
+
+    def values(self, brick_size: int) -> np.ndarray:
+        if self.log_odds is None:
+            return np.full((brick_size,) * 3, self.uniform, dtype=np.int16)
+        return self.log_odds
+
+
+@dataclass(frozen=True)
+class StaleRegion:
+    """World-space brick that has not been observed recently (or ever)."""
+
+    key: BrickKey
+    min_corner: WorldPoint
+    max_corner: WorldPoint
+    last_seen_ms: Optional[int]
+    revision: Optional[int]
+
+    @property
+    def center(self) -> WorldPoint:
+        return (
+            0.5 * (self.min_corner[0] + self.max_corner[0]),
+            0.5 * (self.min_corner[1] + self.max_corner[1]),
+            0.5 * (self.min_corner[2] + self.max_corner[2]),
+        )
+
+
+class FusedRadarMap:
+    """Sparse log-odds occupancy map fused from many radar scans.
+
+    Log-odds are stored as integers in units of 0.1 nat. A solid voxel adds
+    ``hit`` and an observed empty cell adds ``miss``; values are clamped to
+    ``[clamp_min, clamp_max]`` so a mined-out cell flips back to free after a
+    few rescans. A cell is occupied when its value exceeds ``threshold``.
+    """
+
+    def __init__(
+        self,
+        cell_size: float = 10.0,
+        *,
+        brick_size: int = 16,
+        hit: int = 9,
+        miss: int = -7,
+        clamp_min: int = -20,
+        clamp_max: int = 20,
+        threshold: int = 0,
+    ) -> None:
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        if brick_size <= 0:
+            raise ValueError("brick_size must be positive")
+        self.cell_size = float(cell_size)
+        self.brick_size = int(brick_size)
+        self.hit = int(hit)
+        self.miss = int(miss)
+        self.clamp_min = int(clamp_min)
+        self.clamp_max = int(clamp_max)
+        self.threshold = int(threshold)
+        self.revision = 0
+        self.timestamp_ms: Optional[int] = None
+        self._bricks: Dict[BrickKey, _Brick] = {}
+
+    def __len__(self) -> int:
+        return len(self._bricks)
+
+    @property
+    def brick_extent(self) -> float:
+        return self.cell_size * self.brick_size
+
+    def bricks(self) -> Iterator[Tuple[BrickKey, int, int]]:
+        """Yield ``(key, last_seen_ms, revision)`` for every observed brick."""
+
+        for key, brick in self._bricks.items():
+            yield key, brick.last_seen_ms, brick.revision
+
+    # ------------------------------------------------------------------
+    # Integration
+
+    def integrate_scan(
+        self,
+        solid: Optional[Sequence[Sequence[float]]],
+        metadata: Mapping[str, Any],
+        *,
+        center: Optional[Sequence[float]] = None,
+        radius: Optional[float] = None,
+        timestamp_ms: Optional[int] = None,
+    ) -> int:
+        """Fuse one scan result and return the new map revision.
+
+        ``metadata`` is the dict produced by ``RadarController.extract_solid``.
+        Every cell inside the scan box – and inside the sphere of ``radius``
+        around ``center`` when given (defaults come from ``metadata["radius"]``
+        and the box centre) – counts as observed: solid points register hits,
+        every other observed cell registers a miss.
+
+        A scan coarser than the fused lattice marks every fused cell whose
+        centre lies inside a solid scan cell as hit, so a coarse pass never
+        erases fine detail it could not resolve; the coarse cell is treated as
+        a conservative solid block.
+        """
+
+        try:
+            origin = np.asarray(metadata["origin"], dtype=np.float64).reshape(3)
+            scan_cell = float(metadata["cellSize"])
+            size = np.asarray([int(v) for v in metadata["size"]], dtype=np.float64).reshape(3)
+        except (KeyError, TypeError, ValueError):
+            return self.revision
+        if scan_cell <= 0 or np.any(size <= 0):
+            return self.revision
+
+        box_min = origin
+        box_max = origin + size * scan_cell
+        if center is None:
+            center_arr = 0.5 * (box_min + box_max)
+        else:
+            center_arr = np.asarray(center[:3], dtype=np.float64)
+        if radius is None:
+            radius = metadata.get("radius")
+        try:
+            radius_val = float(radius) if radius is not None else math.inf
+        except (TypeError, ValueError):
+            radius_val = math.inf
+        if radius_val <= 0:
+            return self.revision
+
+        if timestamp_ms is None:
+            ts = metadata.get("tsMs")
+            timestamp_ms = int(ts) if isinstance(ts, (int, float)) and ts else None
+        self.revision += 1
+        self.timestamp_ms = timestamp_ms if timestamp_ms is not None else self.timestamp_ms
+        stamp = int(timestamp_ms) if timestamp_ms is not None else 0
+
+        hits = self._group_hits(solid, origin, scan_cell)
+
+        cs = self.cell_size
+        extent = self.brick_extent
+        b = self.brick_size
+        lo = np.floor(box_min / extent).astype(np.int64)
+        hi = np.floor((box_max - 1e-9) / extent).astype(np.int64)
+        r_sq = radius_val * radius_val
+        local = (np.arange(b, dtype=np.float64) + 0.5) * cs
+
+        for bx in range(lo[0], hi[0] + 1):
+            for by in range(lo[1], hi[1] + 1):
+                for bz in range(lo[2], hi[2] + 1):
+                    key = (bx, by, bz)
+                    bmin = np.array(key, dtype=np.float64) * extent
+                    bmax = bmin + extent
+                    near = np.clip(center_arr, bmin, bmax) - center_arr
+                    if float(near @ near) > r_sq:
+                        continue
+                    far = np.maximum(np.abs(bmin - center_arr), np.abs(bmax - center_arr))
+                    inside_sphere = float(far @ far) <= r_sq
+                    inside_box = bool(np.all(bmin >= box_min) and np.all(bmax <= box_max))
+
+                    observed: Optional[np.ndarray] = None
+                    if not (inside_sphere and inside_box):
+                        xs = bmin[0] + local
+                        ys = bmin[1] + local
+                        zs = bmin[2] + local
+                        mx = (xs >= box_min[0]) & (xs < box_max[0])
+                        my = (ys >= box_min[1]) & (ys < box_max[1])
+                        mz = (zs >= box_min[2]) & (zs < box_max[2])
+                        observed = mx[:, None, None] & my[None, :, None] & mz[None, None, :]
+                        if not inside_sphere:
+                            dx = (xs - center_arr[0]) ** 2
+                            dy = (ys - center_arr[1]) ** 2
+                            dz = (zs - center_arr[2]) ** 2
+                            observed &= (dx[:, None, None] + dy[None, :, None] + dz[None, None, :]) <= r_sq
+                        if not observed.any():
+                            continue
+
+                    self._update_brick(key, observed, hits.get(key), stamp)
+
+        return self.revision
+
+    def _group_hits(
+        self,
+        solid: Optional[Sequence[Sequence[float]]],
+        origin: np.ndarray,
+        scan_cell: float,
+    ) -> Dict[BrickKey, np.ndarray]:
+        if solid is None or len(solid) == 0:
+            return {}
+        try:
+            arr = np.asarray(solid, dtype=np.float64)
+        except (TypeError, ValueError):
+            return {}
+        if arr.ndim != 2 or arr.shape[1] < 3:
+            return {}
+        cs = self.cell_size
+        if scan_cell <= cs * (1.0 + 1e-9):
+            cells = np.floor(arr[:, :3] / cs).astype(np.int64)
+        else:
+            cells = self._footprint_cells(arr[:, :3], origin, scan_cell)
+        b = self.brick_size
+        bricks = np.floor_divide(cells, b)
+        local = cells - bricks * b
+        flat_local = (local[:, 0] * b + local[:, 1]) * b + local[:, 2]
+        keys, inverse = np.unique(bricks, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(keys.shape[0] + 1))
+        grouped: Dict[BrickKey, np.ndarray] = {}
+        for i, key in enumerate(keys):
+            grouped[(int(key[0]), int(key[1]), int(key[2]))] = flat_local[order[bounds[i] : bounds[i + 1]]]
+        return grouped
+
+    def _footprint_cells(self, points: np.ndarray, origin: np.ndarray, scan_cell: float) -> np.ndarray:
+        """Return the fused cells whose centres fall inside the scan cells of ``points``."""
+
+        cs = self.cell_size
+        scan_idx = np.floor((points - origin) / scan_cell)
+        low = origin + scan_idx * scan_cell
+        first = np.ceil(low / cs - 0.5).astype(np.int64)
+        last = np.ceil((low + scan_cell) / cs - 0.5).astype(np.int64) - 1
+        span = int(math.ceil(scan_cell / cs)) + 1
+        offsets = np.stack(
+            np.meshgrid(*(np.arange(span, dtype=np.int64),) * 3, indexing="ij"), axis=-1
+        ).reshape(-1, 3)
+        batch = max(1, (1 << 20) // offsets.shape[0])
+        parts: List[np.ndarray] = []
+        for start in range(0, first.shape[0], batch):
+            lo = first[start : start + batch]
+            hi = last[start : start + batch]
+            cand = lo[:, None, :] + offsets[None, :, :]
+            keep = np.all(cand <= hi[:, None, :], axis=2)
+            parts.append(cand[keep])
+        return np.unique(np.concatenate(parts), axis=0)
+
+    def _update_brick(
+        self,
+        key: BrickKey,
+        observed: Optional[np.ndarray],
+        hit_cells: Optional[np.ndarray],
+        stamp: int,
+    ) -> None:
+        brick = self._bricks.get(key)
+        if brick is None:
+            brick = _Brick(log_odds=None, uniform=0, last_seen_ms=stamp, revision=self.revision)
+            self._bricks[key] = brick
+        brick.last_seen_ms = stamp
+        brick.revision = self.revision
+
+        if hit_cells is None and observed is None and brick.log_odds is None:
+            brick.uniform = max(self.clamp_min, brick.uniform + self.miss)
+            return
+
+        b = self.brick_size
+        values = brick.values(b).copy() if brick.log_odds is None else brick.log_odds
+        delta = np.full(b * b * b, self.miss, dtype=np.int16)
+        if hit_cells is not None:
+            delta[hit_cells] = self.hit
+        if observed is not None:
+            delta[~observed.reshape(-1)] = 0
+        flat = values.reshape(-1)
+        np.clip(flat + delta, self.clamp_min, self.clamp_max, out=flat)
+        brick.log_odds = values
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def _cell_of(self, point: Sequence[float]) -> Tuple[BrickKey, Tuple[int, int, int]]:
+        cell = [int(math.floor(float(point[i]) / self.cell_size)) for i in range(3)]
+        b = self.brick_size
+        key = (cell[0] // b, cell[1] // b, cell[2] // b)
+        return key, (cell[0] - key[0] * b, cell[1] - key[1] * b, cell[2] - key[2] * b)
+
+    def log_odds_at(self, point: Sequence[float]) -> Optional[float]:
+        """Return the log-odds (in nats) at ``point`` or ``None`` if never observed."""
+
+        key, local = self._cell_of(point)
+        brick = self._bricks.get(key)
+        if brick is None:
+            return None
+        value = brick.uniform if brick.log_odds is None else int(brick.log_odds[local])
+        return value / 10.0
+
+    def probability_at(self, point: Sequence[float]) -> Optional[float]:
+        value = self.log_odds_at(point)
+        if value is None:
+            return None
+        return 1.0 / (1.0 + math.exp(-value))
+
+    def is_occupied(self, point: Sequence[float]) -> bool:
+        value = self.log_odds_at(point)
+        return value is not None and value * 10.0 > self.threshold
+
+    def last_seen_ms(self, point: Sequence[float]) -> Optional[int]:
+        brick = self._bricks.get(self._cell_of(point)[0])
+        return brick.last_seen_ms if brick is not None else None
+
+    def solid_points(self) -> np.ndarray:
+        """Return ``(N, 3)`` world centres of every occupied cell."""
+
+        chunks: List[np.ndarray] = []
+        b = self.brick_size
+        for key, brick in self._bricks.items():
+            if brick.log_odds is None:
+                continue
+            local = np.argwhere(brick.log_odds > self.threshold)
+            if local.size == 0:
+                continue
+            cells = local + np.asarray(key, dtype=np.int64) * b
+            chunks.append((cells + 0.5) * self.cell_size)
+        if not chunks:
+            return np.zeros((0, 3), dtype=np.float64)
+        return np.concatenate(chunks)
+
+    def stale_regions(
+        self,
+        max_age_ms: int,
+        *,
+        now_ms: Optional[int] = None,
+        center: Optional[Sequence[float]] = None,
+        radius: Optional[float] = None,
+        include_unknown: bool = True,
+    ) -> List[StaleRegion]:
+        """Return bricks not observed within ``max_age_ms`` (oldest first).
+
+        ``now_ms`` defaults to the timestamp of the latest fused scan. When
+        ``center``/``radius`` are given only bricks touching that sphere are
+        considered, and ``include_unknown`` adds bricks that were never seen.
+        """
+
+        if now_ms is None:
+            now_ms = self.timestamp_ms or 0
+        extent = self.brick_extent
+        regions: List[StaleRegion] = []
+
+        def _region(key: BrickKey, brick: Optional[_Brick]) -> StaleRegion:
+            lo = (key[0] * extent, key[1] * extent, key[2] * extent)
+            return StaleRegion(
+                key=key,
+                min_corner=lo,
+                max_corner=(lo[0] + extent, lo[1] + extent, lo[2] + extent),
+                last_seen_ms=brick.last_seen_ms if brick is not None else None,
+                revision=brick.revision if brick is not None else None,
+            )
+
+        if center is not None and radius is not None:
+            c = np.asarray(center[:3], dtype=np.float64)
+            lo = np.floor((c - radius) / extent).astype(np.int64)
+            hi = np.floor((c + radius) / extent).astype(np.int64)
+            r_sq = float(radius) * float(radius)
+            for bx in range(lo[0], hi[0] + 1):
+                for by in range(lo[1], hi[1] + 1):
+                    for bz in range(lo[2], hi[2] + 1):
+                        key = (bx, by, bz)
+                        bmin = np.array(key, dtype=np.float64) * extent
+                        near = np.clip(c, bmin, bmin + extent) - c
+                        if float(near @ near) > r_sq:
+                            continue
+                        brick = self._bricks.get(key)
+                        if brick is None:
+                            if include_unknown:
+                                regions.append(_region(key, None))
+                        elif now_ms - brick.last_seen_ms > max_age_ms:
+                            regions.append(_region(key, brick))
+        else:
+            for key, brick in self._bricks.items():
+                if now_ms - brick.last_seen_ms > max_age_ms:
+                    regions.append(_region(key, brick))
+
+        regions.sort(key=lambda r: -1 if r.last_seen_ms is None else r.last_seen_ms)
+        return regions
+
+    def to_raw_map(
+        self,
+        min_corner: Sequence[float],
+        max_corner: Sequence[float],
+        *,
+        contacts: Sequence[RadarContact] = (),
+    ) -> RawRadarMap:
+        """Rasterise the fused map inside an axis-aligned box into a :class:`RawRadarMap`.
+
+        The returned grid is aligned to the fused cell lattice; never observed
+        cells are reported as free, matching a single radar scan.
+        """
+
+        cs = self.cell_size
+        lo_cell = np.floor(np.asarray(min_corner[:3], dtype=np.float64) / cs).astype(np.int64)
+        hi_cell = np.ceil(np.asarray(max_corner[:3], dtype=np.float64) / cs).astype(np.int64)
+        shape = tuple(int(v) for v in np.maximum(hi_cell - lo_cell, 1))
+        occ = np.zeros(shape, dtype=np.bool_)
+
+        b = self.brick_size
+        hi_cell = lo_cell + np.asarray(shape, dtype=np.int64)
+        blo = np.floor_divide(lo_cell, b)
+        bhi = np.floor_divide(hi_cell - 1, b)
+        for key, brick in self._bricks.items():
+            if brick.log_odds is None:
+                continue
+            if any(key[i] < blo[i] or key[i] > bhi[i] for i in range(3)):
+                continue
+            base = np.asarray(key, dtype=np.int64) * b
+            src_lo = np.maximum(lo_cell - base, 0)
+            src_hi = np.minimum(hi_cell - base, b)
+            dst_lo = base + src_lo - lo_cell
+            dst_hi = base + src_hi - lo_cell
+            occ[dst_lo[0] : dst_hi[0], dst_lo[1] : dst_hi[1], dst_lo[2] : dst_hi[2]] |= (
+                brick.log_odds[src_lo[0] : src_hi[0], src_lo[1] : src_hi[1], src_lo[2] : src_hi[2]]
+                > self.threshold
+            )
+
+        return RawRadarMap(
+            occ=occ,
+            origin=lo_cell.astype(np.float64) * cs,
+            cell_size=cs,
+            size=shape,  # type: ignore[arg-type]
+            revision=self.revision,
+            timestamp_ms=self.timestamp_ms,
+            contacts=tuple(contacts),
+            _inflation_cache={},
+        )
+
+    def to_raw_map_around(
+        self,
+        center: Sequence[float],
+        radius: float,
+        *,
+        contacts: Sequence[RadarContact] = (),
+    ) -> RawRadarMap:
+        c = np.asarray(center[:3], dtype=np.float64)
+        return self.to_raw_map(c - radius, c + radius, contacts=contacts)
+
+
+__all__ = ["FusedRadarMap", "StaleRegion"]
@@ -12,15 +12,26 @@ from __future__ import annotations
 
 import heapq
 import json
+import logging
 import math
-from dataclasses import dataclass
-from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import threading
+from collections import OrderedDict
+from dataclasses import astuple, dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .reservations import ReservationTable
+
 Index3 = Tuple[int, int, int]
 WorldPoint = Tuple[float, float, float]
 
+_log = logging.getLogger(__name__)
+
+# Searches poll their ``stop`` callback once every 256 expansions.
+_STOP_CHECK_MASK = 0xFF
+
 
 @dataclass(frozen=True)
 class RadarContact:
@@ -43,7 +54,10 @@ class RawRadarMap:
     timestamp_ms: Optional[int]
     contacts: Sequence[RadarContact]
 
-    _inflation_cache: Dict[int, np.ndarray]
+    _inflation_cache: Dict[Any, np.ndarray]
+    _distance_cache: Dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+    # Parent map and cell offset for maps produced by :meth:`crop`.
+    _source: Optional[Tuple["RawRadarMap", Index3]] = field(default=None, repr=False)
 
     def __post_init__(self) -> None:  # pragma: no cover - simple defensive check
         if self.occ.shape != self.size:
@@ -163,29 +177,327 @@ class RawRadarMap:
     # ------------------------------------------------------------------
     # Occupancy helpers
 
-    def occupancy(self, robot_radius: float = 0.0) -> np.ndarray:
-        """Return an occupancy grid inflated to accommodate a robot radius."""
+    def occupancy(self, robot_radius: float = 0.0, *, shape: str = "box") -> np.ndarray:
+        """Return an occupancy grid inflated to accommodate a robot radius.
 
-        if robot_radius <= 1e-6:
-            return self.occ.copy()
+        ``shape="box"`` dilates with a cube of half-width ``ceil(radius /
+        cell_size)`` cells; ``shape="sphere"`` blocks only cells whose
+        Euclidean distance to a solid cell is within that many cells, so
+        diagonal gaps are not over-inflated by up to √3. Maps produced by
+        :meth:`crop` slice their parent's cached inflation instead of
+        inflating again.
+        """
 
-        radius_cells = int(math.ceil(robot_radius / self.cell_size))
+        inflated = self._inflated(robot_radius, shape)
+        return self.occ.copy() if inflated is None else inflated.copy()
+
+    def _inflated(self, robot_radius: float, shape: str) -> Optional[np.ndarray]:
+        radius_cells = _radius_cells(robot_radius, self.cell_size)
         if radius_cells <= 0:
-            return self.occ.copy()
+            return None
+        key = _inflation_key(radius_cells, shape)
+        cached = self._inflation_cache.get(key)
+        if cached is None:
+            cached = self._inflated_from_source(radius_cells, shape)
+            if cached is None:
+                cached = _inflate_grid(self.occ, radius_cells, shape)
+            self._inflation_cache[key] = cached
+        return cached
+
+    def _inflated_from_source(self, radius_cells: int, shape: str) -> Optional[np.ndarray]:
+        if self._source is None:
+            return None
+        parent, lo = self._source
+        inner = tuple(slice(o, o + n) for o, n in zip(lo, self.size))
+        # The parent's inflation is only valid while the crop's cells still
+        # match it; update_region() on either side makes them diverge.
+        diverged = not np.array_equal(parent.occ[inner], self.occ)
+        cached = parent._inflation_cache.get(_inflation_key(radius_cells, shape))
+        if cached is not None and not diverged:
+            return cached[inner].copy()
+        # Inflate a window grown by the radius so solids just outside the
+        # crop still block the cells next to its faces.
+        window_lo = [max(0, o - radius_cells) for o in lo]
+        window_hi = [min(n, o + k + radius_cells) for o, k, n in zip(lo, self.size, parent.size)]
+        window = parent.occ[tuple(slice(a, b) for a, b in zip(window_lo, window_hi))].copy()
+        local = tuple(slice(o - a, o - a + k) for o, a, k in zip(lo, window_lo, self.size))
+        window[local] = self.occ
+        inflated = _inflate_grid(window, radius_cells, shape)
+        return inflated[local].copy()
+
+    def crop(self, lo: Index3, hi: Index3) -> "RawRadarMap":
+        """Return the sub-map of cells ``lo`` (inclusive) to ``hi`` (exclusive).
+
+        The crop keeps a link to this map: cached inflations are sliced, and
+        inflations computed later account for solids just outside the crop
+        and for any :meth:`update_region` edits made to the crop itself.
+        """
+
+        lo = tuple(max(0, int(v)) for v in lo)  # type: ignore[assignment]
+        hi = tuple(min(n, int(v)) for v, n in zip(hi, self.size))  # type: ignore[assignment]
+        slices = tuple(slice(a, b) for a, b in zip(lo, hi))
+        size = tuple(b - a for a, b in zip(lo, hi))
+        return RawRadarMap(
+            occ=self.occ[slices].copy(),
+            origin=self.origin + np.asarray(lo, dtype=np.float64) * self.cell_size,
+            cell_size=self.cell_size,
+            size=size,  # type: ignore[arg-type]
+            revision=self.revision,
+            timestamp_ms=self.timestamp_ms,
+            contacts=self.contacts,
+            _inflation_cache={key: grid[slices].copy() for key, grid in self._inflation_cache.items()},
+            _source=(self, lo),  # type: ignore[arg-type]
+        )
+
+    def aligned_to(self, origin: Sequence[float]) -> "RawRadarMap":
+        """Return this map resampled onto the cell lattice through ``origin``.
+
+        A target cell is solid when it overlaps any solid cell of this map, so
+        the result never frees space; axes offset by a fraction of a cell grow
+        by one cell. Returns ``self`` when the lattices already coincide.
+        """
+
+        rel = (np.asarray(self.origin, dtype=np.float64) - np.asarray(origin, dtype=np.float64)) / self.cell_size
+        nearest = np.round(rel)
+        aligned = np.isclose(rel, nearest, rtol=0.0, atol=1e-6)
+        if aligned.all():
+            return self
+        base = np.where(aligned, nearest, np.floor(rel))
+        grow = [0 if a else 1 for a in aligned]
+        nx, ny, nz = self.size
+        occ = np.zeros((nx + grow[0], ny + grow[1], nz + grow[2]), dtype=bool)
+        # Each source cell straddles the target cell it starts in and the next one.
+        for dx in range(grow[0] + 1):
+            for dy in range(grow[1] + 1):
+                for dz in range(grow[2] + 1):
+                    occ[dx : dx + nx, dy : dy + ny, dz : dz + nz] |= self.occ
+        return RawRadarMap(
+            occ=occ,
+            origin=np.asarray(origin, dtype=np.float64) + base * self.cell_size,
+            cell_size=self.cell_size,
+            size=occ.shape,  # type: ignore[arg-type]
+            revision=self.revision,
+            timestamp_ms=self.timestamp_ms,
+            contacts=self.contacts,
+            _inflation_cache={},
+        )
+
+    def update_region(self, lo: Index3, block: np.ndarray) -> None:
+        """Overwrite the occupancy of a sub-box and refresh cached inflations locally.
+
+        Each cached inflation is recomputed only over the changed box grown
+        by its radius; cached distance fields are dropped.
+        """
+
+        block = np.asarray(block, dtype=bool)
+        lo = tuple(int(v) for v in lo)  # type: ignore[assignment]
+        hi = tuple(a + n for a, n in zip(lo, block.shape))
+        if any(a < 0 for a in lo) or any(b > n for b, n in zip(hi, self.size)):
+            raise ValueError("region lies outside the map")
+        self.occ[tuple(slice(a, b) for a, b in zip(lo, hi))] = block
+        self._refresh_inflation(lo, hi)  # type: ignore[arg-type]
+
+    def reuse_inflation(self, previous: "RawRadarMap") -> bool:
+        """Adopt the cached inflations of ``previous`` (same grid), re-inflating only what changed.
+
+        Returns ``False`` when the grids differ and nothing was reused.
+        """
+
+        if (
+            tuple(previous.size) != tuple(self.size)
+            or float(previous.cell_size) != float(self.cell_size)
+            or not np.allclose(previous.origin, self.origin)
+        ):
+            return False
+        changed = np.argwhere(previous.occ != self.occ)
+        for key, grid in previous._inflation_cache.items():
+            self._inflation_cache.setdefault(key, grid.copy())
+        if changed.size:
+            lo = tuple(int(v) for v in changed.min(axis=0))
+            hi = tuple(int(v) + 1 for v in changed.max(axis=0))
+            self._refresh_inflation(lo, hi)  # type: ignore[arg-type]
+        return True
+
+    def _refresh_inflation(self, lo: Index3, hi: Index3) -> None:
+        self._distance_cache.clear()
+        for key, grid in self._inflation_cache.items():
+            shape, radius_cells = _split_inflation_key(key)
+            # Cells within the radius of the box may change; their value
+            # depends on solids up to another radius further out.
+            out_lo = [max(0, a - radius_cells) for a in lo]
+            out_hi = [min(n, b + radius_cells) for b, n in zip(hi, self.size)]
+            in_lo = [max(0, a - radius_cells) for a in out_lo]
+            in_hi = [min(n, b + radius_cells) for b, n in zip(out_hi, self.size)]
+            window = self.occ[tuple(slice(a, b) for a, b in zip(in_lo, in_hi))]
+            inflated = _inflate_grid(window, radius_cells, shape)
+            inner = tuple(slice(a - w, b - w) for a, b, w in zip(out_lo, out_hi, in_lo))
+            grid[tuple(slice(a, b) for a, b in zip(out_lo, out_hi))] = inflated[inner]
+
+    # ------------------------------------------------------------------
+    # Distance field helpers
 
-        cached = self._inflation_cache.get(radius_cells)
+    def distance_field(self, *, signed: bool = False) -> np.ndarray:
+        """Return the Euclidean distance (metres) from every cell to the nearest solid cell.
+
+        Solid cells hold ``0`` in the unsigned field. With ``signed=True`` they
+        hold the negated distance to the nearest free cell instead, so the
+        value is a clearance that is negative inside obstacles. The transform
+        is computed once per map and cached; treat the result as read-only.
+        """
+
+        key = "signed" if signed else "unsigned"
+        cached = self._distance_cache.get(key)
         if cached is not None:
-            return cached.copy()
+            return cached
 
-        inflated = self._inflate(radius_cells)
-        self._inflation_cache[radius_cells] = inflated
-        return inflated.copy()
+        unsigned = self._distance_cache.get("unsigned")
+        if unsigned is None:
+            unsigned = (np.sqrt(_edt_squared(self.occ)) * self.cell_size).astype(np.float32)
+            self._distance_cache["unsigned"] = unsigned
+        if not signed:
+            return unsigned
 
-    def _inflate(self, radius_cells: int) -> np.ndarray:
-        inflated = self.occ.copy()
-        for axis in range(3):
-            inflated = _dilate_axis(inflated, radius_cells, axis)
-        return inflated
+        inside = (np.sqrt(_edt_squared(~self.occ)) * self.cell_size).astype(np.float32)
+        field_ = np.where(self.occ, -inside, unsigned).astype(np.float32)
+        self._distance_cache[key] = field_
+        return field_
+
+    def clearance_at(self, point: WorldPoint) -> float:
+        """Distance from ``point`` to the nearest solid cell, ``inf`` outside the map."""
+
+        idx = self.world_to_index(point)
+        if idx is None:
+            return float("inf")
+        value = float(self.distance_field()[idx])
+        return value if math.isfinite(value) else float("inf")
+
+    def is_clear(self, idx: Index3, radius: float) -> bool:
+        """Return ``True`` when cell ``idx`` lies at least ``radius`` metres from solid voxels."""
+
+        if not self.is_within_bounds(idx):
+            return False
+        return bool(self.distance_field()[idx] >= radius)
+
+    def segment_clearance(self, start: WorldPoint, goal: WorldPoint) -> float:
+        """Minimum clearance over the cells crossed by the straight segment ``start`` → ``goal``.
+
+        Samples outside the map are ignored; a segment that never enters the
+        map returns ``inf``.
+        """
+
+        a = np.asarray(start, dtype=np.float64)
+        b = np.asarray(goal, dtype=np.float64)
+        steps = max(1, int(math.ceil(float(np.linalg.norm(b - a)) / (self.cell_size * 0.5))))
+        t = np.linspace(0.0, 1.0, steps + 1).reshape(-1, 1)
+        samples = a.reshape(1, 3) + (b - a).reshape(1, 3) * t
+        idx = np.floor((samples - self.origin.reshape(1, 3)) / self.cell_size).astype(np.int64)
+        size = np.asarray(self.size, dtype=np.int64).reshape(1, 3)
+        valid = np.all((idx >= 0) & (idx < size), axis=1)
+        if not np.any(valid):
+            return float("inf")
+        idx = idx[valid]
+        values = self.distance_field()[idx[:, 0], idx[:, 1], idx[:, 2]]
+        return float(np.min(values))
+
+    def nearest_free_index(
+        self,
+        idx: Index3,
+        robot_radius: float = 0.0,
+        *,
+        shape: str = "box",
+    ) -> Optional[Index3]:
+        """Return the cell closest (Euclidean) to ``idx`` that is free for ``robot_radius``.
+
+        Free means unoccupied in :meth:`occupancy` for the same radius. The
+        feature transform behind the lookup is cached per radius, so repeated
+        queries are O(1).
+        """
+
+        if not self.is_within_bounds(idx):
+            return None
+        radius_cells = _radius_cells(robot_radius, self.cell_size)
+        key = f"free-features:{shape}:{radius_cells}"
+        features = self._distance_cache.get(key)
+        if features is None:
+            occ = self._inflated(robot_radius, shape)
+            if occ is None:
+                occ = self.occ
+            if not bool(occ[idx]):
+                return idx
+            if not np.any(~occ):
+                return None
+            _dist_sq, features = _edt_squared(~occ, return_indices=True)
+            self._distance_cache[key] = features
+        nearest = features[:, idx[0], idx[1], idx[2]]
+        return int(nearest[0]), int(nearest[1]), int(nearest[2])
+
+
+def _radius_cells(robot_radius: float, cell_size: float) -> int:
+    if robot_radius <= 1e-6:
+        return 0
+    return max(0, int(math.ceil(robot_radius / cell_size)))
+
+
+def _inflation_key(radius_cells: int, shape: str) -> Any:
+    if shape == "box":
+        return radius_cells
+    if shape == "sphere":
+        return ("sphere", radius_cells)
+    raise ValueError(f"unknown inflation shape {shape!r}")
+
+
+def _split_inflation_key(key: Any) -> Tuple[str, int]:
+    if isinstance(key, tuple):
+        return key[0], int(key[1])
+    return "box", int(key)
+
+
+def _inflate_grid(occ: np.ndarray, radius_cells: int, shape: str) -> np.ndarray:
+    """Dilate ``occ`` by ``radius_cells`` with a box or a Euclidean ball."""
+
+    if shape == "sphere":
+        if not occ.any():
+            return np.zeros_like(occ, dtype=bool)
+        if math.pi * radius_cells * radius_cells <= _BALL_SHIFT_LIMIT:
+            return _dilate_ball(occ, radius_cells)
+        return _edt_squared(occ) <= float(radius_cells * radius_cells)
+    inflated = occ.copy()
+    for axis in range(3):
+        inflated = _dilate_axis(inflated, radius_cells, axis)
+    return inflated
+
+
+# Above roughly this many (dy, dz) offsets a full distance transform is
+# cheaper than OR-ing shifted line dilations.
+_BALL_SHIFT_LIMIT = 400
+
+
+def _dilate_ball(occ: np.ndarray, radius_cells: int) -> np.ndarray:
+    """Exact Euclidean ball dilation as a union of shifted x-line dilations.
+
+    For every ``(dy, dz)`` inside the disk of radius ``radius_cells`` the
+    grid dilated along x by ``floor(sqrt(r² - dy² - dz²))`` is OR-ed in at
+    that offset; each distinct x half-width is computed once.
+    """
+
+    r2 = radius_cells * radius_cells
+    _, ny, nz = occ.shape
+    lines: Dict[int, np.ndarray] = {}
+    out = np.zeros_like(occ, dtype=bool)
+    for dy in range(-radius_cells, radius_cells + 1):
+        for dz in range(-radius_cells, radius_cells + 1):
+            rem = r2 - dy * dy - dz * dz
+            if rem < 0 or abs(dy) >= ny or abs(dz) >= nz:
+                continue
+            width = math.isqrt(rem)
+            line = lines.get(width)
+            if line is None:
+                line = _dilate_axis(occ, width, 0)
+                lines[width] = line
+            dst = (slice(None), slice(max(0, dy), ny + min(0, dy)), slice(max(0, dz), nz + min(0, dz)))
+            src = (slice(None), slice(max(0, -dy), ny + min(0, -dy)), slice(max(0, -dz), nz + min(0, -dz)))
+            out[dst] |= line[src]
+    return out
 
 
 def _dilate_axis(occ: np.ndarray, radius_cells: int, axis: int) -> np.ndarray:
@@ -215,6 +527,118 @@ def _dilate_axis(occ: np.ndarray, radius_cells: int, axis: int) -> np.ndarray:
     return (cumsum[tuple(hi)] - cumsum[tuple(lo)]) > 0
 
 
+_EDT_FAR = 1.0e12
+
+
+def _edt_squared(
+    features: np.ndarray,
+    *,
+    return_indices: bool = False,
+) -> np.ndarray | Tuple[np.ndarray, np.ndarray]:
+    """Exact squared Euclidean distance transform (in cells) of a boolean grid.
+
+    Every cell receives the squared distance to the nearest ``True`` cell of
+    ``features``. The transform is separable (Felzenszwalb & Huttenlocher):
+    one lower-envelope-of-parabolas pass per axis, vectorised over all lines
+    of that axis. Cells are ``inf`` when ``features`` has no ``True`` cell.
+    With ``return_indices`` the nearest feature coordinates are returned as an
+    ``(ndim, *shape)`` int array.
+    """
+
+    coords: Optional[List[np.ndarray]] = None
+    if return_indices:
+        coords = [np.broadcast_to(grid, features.shape) for grid in np.ogrid[tuple(slice(0, n) for n in features.shape)]]
+
+    # The first axis only needs the distance to the nearest feature on the same
+    # line, which two running max/min sweeps give without the envelope pass.
+    n0 = features.shape[0]
+    positions = np.arange(n0).reshape((-1,) + (1,) * (features.ndim - 1))
+    before = np.maximum.accumulate(np.where(features, positions, -n0 * 4), axis=0)
+    after = np.flip(np.minimum.accumulate(np.flip(np.where(features, positions, n0 * 5), axis=0), axis=0), axis=0)
+    use_after = (after - positions) < (positions - before)
+    nearest0 = np.where(use_after, after, before)
+    offset = np.abs(nearest0 - positions).astype(np.float64)
+    dist = np.where(offset > n0, _EDT_FAR, offset * offset)
+    if coords is not None:
+        coords[0] = np.clip(nearest0, 0, n0 - 1)
+
+    for axis in range(1, features.ndim):
+        # Lay lines out as (n, lines) so every step of the sweep reads one
+        # contiguous row.
+        moved = np.moveaxis(dist, axis, 0)
+        line_shape = moved.shape
+        lines = np.ascontiguousarray(moved).reshape(line_shape[0], -1)
+        lines, nearest = _lower_envelope(lines)
+        dist = np.moveaxis(lines.reshape(line_shape), 0, axis)
+        if coords is not None:
+            flat = nearest * lines.shape[1] + np.arange(lines.shape[1])
+            coords = [
+                np.moveaxis(
+                    np.ascontiguousarray(np.moveaxis(c, axis, 0)).reshape(-1)[flat].reshape(line_shape),
+                    0,
+                    axis,
+                )
+                for c in coords
+            ]
+
+    dist = np.where(dist >= _EDT_FAR * 0.5, np.inf, dist)
+    if coords is not None:
+        return dist, np.stack(coords).astype(np.int32)
+    return dist
+
+
+def _lower_envelope(f: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """One-dimensional squared distance transform applied to every column of ``f``.
+
+    Returns the transformed values and, per cell, the row of the parabola
+    (feature) that produced the minimum.
+    """
+
+    n, lines = f.shape
+    cols = np.arange(lines)
+    if n == 1 or lines == 0:
+        return f.copy(), np.zeros(f.shape, dtype=np.int64)
+    base = f + (np.arange(n, dtype=np.float64) ** 2).reshape(-1, 1)
+    base_flat = base.reshape(-1)
+
+    v = np.zeros((n, lines), dtype=np.int64)
+    z = np.full((n + 1, lines), np.inf)
+    z[0] = -np.inf
+    v_flat = v.reshape(-1)
+    z_flat = z.reshape(-1)
+    k = np.zeros(lines, dtype=np.int64)
+
+    for q in range(1, n):
+        slot = k * lines + cols
+        vk = v_flat[slot]
+        s = (base[q] - base_flat[vk * lines + cols]) / (2.0 * (q - vk))
+        pending = np.flatnonzero(s <= z_flat[slot])
+        while pending.size:
+            k[pending] -= 1
+            slot_p = k[pending] * lines + pending
+            vk = v_flat[slot_p]
+            s[pending] = (base[q, pending] - base_flat[vk * lines + pending]) / (2.0 * (q - vk))
+            pending = pending[s[pending] <= z_flat[slot_p]]
+        k += 1
+        slot = k * lines + cols
+        v_flat[slot] = q
+        z_flat[slot] = s
+        z_flat[slot + lines] = np.inf
+
+    out = np.empty_like(f)
+    nearest = np.empty((n, lines), dtype=np.int64)
+    k[:] = 0
+    for q in range(n):
+        advance = np.flatnonzero(z_flat[(k + 1) * lines + cols] < q)
+        while advance.size:
+            k[advance] += 1
+            advance = advance[z_flat[(k[advance] + 1) * lines + advance] < q]
+        vk = v_flat[k * lines + cols]
+        nearest[q] = vk
+        out[q] = (q - vk) ** 2 + f.reshape(-1)[vk * lines + cols]
+    return out, nearest
+
+
 @dataclass
 class PassabilityProfile:
     """Parameters describing how a robot is allowed to move through the grid."""
@@ -226,6 +650,7 @@ class PassabilityProfile:
     allow_vertical_movement: bool = False
     allow_diagonal: bool = True
     is_ground_vehicle: bool = False
+    inflation: str = "box"  # "box" или "sphere", см. RawRadarMap.occupancy
 
 
 class PathFinder:
@@ -239,7 +664,14 @@ class PathFinder:
         if self.profile.robot_radius <= 1e-6:
             self.profile.robot_radius = self.profile.clearance_voxels * radar_map.cell_size
         
-        self._occ = radar_map.occupancy(self.profile.robot_radius)
+        self._occ = radar_map.occupancy(self.profile.robot_radius, shape=self.profile.inflation)
+        self._tables: Optional[Tuple[bytearray, List[Tuple[int, float]], List[Tuple[int, float, int, int, int]]]] = None
+        self._padded_shape: Index3 = (0, 0, 0)
+        self._blocked_view: Optional[np.ndarray] = None
+        self._field: Optional[np.ndarray] = None
+        self._field_goal: Optional[Index3] = None
+        # Set when the last search was stopped early and returned a partial path.
+        self.interrupted = False
 
         if self.profile.max_step_cells < 0:
             raise ValueError("max_step_cells must be non-negative")
@@ -250,9 +682,20 @@ class PathFinder:
         self,
         start: WorldPoint,
         goal: WorldPoint,
+        *,
+        any_angle: bool = False,
+        cache: Optional["PathCache"] = None,
+        stop: Optional[Callable[[], bool]] = None,
     ) -> List[WorldPoint]:
-        """Find a path between two world coordinates."""
+        """Find a path between two world coordinates.
+
+        With ``any_angle=True`` the search runs Lazy Theta* and the result is a
+        short list of straight legs instead of a voxel staircase. A
+        :class:`PathCache` is consulted before searching and filled after.
+        ``stop`` is passed to :meth:`find_path_indices`.
+        """
 
+        self.interrupted = False
         start_idx = self.radar_map.world_to_index(start)
         if start_idx is None:
             return []
@@ -267,82 +710,591 @@ class PathFinder:
         if goal_idx is None:
             return []
 
-        path_idx = self.find_path_indices(start_idx, goal_idx)
-        return [self.radar_map.index_to_world_center(p) for p in path_idx]
+        if cache is not None:
+            cached = cache.get(self, start_idx, goal_idx, any_angle=any_angle)
+            if cached is not None:
+                return [self.radar_map.index_to_world_center(p) for p in cached]
 
-    def find_path_indices(self, start: Index3, goal: Index3) -> List[Index3]:
-        """Return a list of indices describing a path between ``start`` and ``goal``."""
+        path_idx = self.find_path_indices(start_idx, goal_idx, any_angle=any_angle, stop=stop)
+        if cache is not None and path_idx and not self.interrupted:
+            cache.put(self, start_idx, goal_idx, path_idx, any_angle=any_angle)
+        return [self.radar_map.index_to_world_center(p) for p in path_idx]
 
+    def find_path_indices(
+        self,
+        start: Index3,
+        goal: Index3,
+        *,
+        any_angle: bool = False,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> List[Index3]:
+        """Return a list of indices describing a path between ``start`` and ``goal``.
+
+        ``stop`` is polled every few hundred expansions; once it returns
+        ``True`` the search ends with the best partial path so far (ending at
+        the expanded cell closest to the goal) and :attr:`interrupted` is set.
+        """
+
+        self.interrupted = False
         if not self.radar_map.is_within_bounds(start) or not self.radar_map.is_within_bounds(goal):
             return []
         if self._is_blocked(start) or self._is_blocked(goal):
             return []
+        if any_angle:
+            return self._find_path_lazy_theta(start, goal, stop)
+
+        blocked, axis_moves, diag_moves = self._search_tables()
+        _, sy, sz = self._padded_shape
+        stride_x = sy * sz
+        start_flat = self._to_padded_flat(start)
+        goal_flat = self._to_padded_flat(goal)
+        gx, gy, gz = goal[0] + 1, goal[1] + 1, goal[2] + 1
+
+        # Preallocated per-search state; memoryviews give fast scalar access.
+        size = len(blocked)
+        g_arr = np.full(size, np.inf, dtype=np.float32)
+        parent_arr = np.full(size, -1, dtype=np.int32)
+        g_score = memoryview(g_arr)
+        parents = memoryview(parent_arr)
+        closed = bytearray(size)
+
+        sqrt = math.sqrt
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        g_score[start_flat] = 0.0
+        h_start = self._heuristic(start, goal)
+        open_set: List[Tuple[float, float, int]] = [(h_start, h_start, start_flat)]
+        expansions = 0
+        best_h = math.inf
+        best_flat = start_flat
+
+        while open_set:
+            _, h_current, current = heappop(open_set)
+            if closed[current]:
+                continue
+            if current == goal_flat:
+                return self._reconstruct_flat_path(parent_arr, current)
+            if stop is not None:
+                if h_current < best_h:
+                    best_h = h_current
+                    best_flat = current
+                expansions += 1
+                if not expansions & _STOP_CHECK_MASK and stop():
+                    self.interrupted = True
+                    return self._reconstruct_flat_path(parent_arr, best_flat)
+            closed[current] = 1
+            g_current = g_score[current]
+
+            for offset, step_cost, c0, c1, c2 in diag_moves:
+                neighbor = current + offset
+                if blocked[neighbor] or closed[neighbor]:
+                    continue
+                if blocked[current + c0] or blocked[current + c1] or blocked[current + c2]:
+                    continue
+                tentative = g_current + step_cost
+                if tentative >= g_score[neighbor]:
+                    continue
+                g_score[neighbor] = tentative
+                parents[neighbor] = current
+                x, rem = divmod(neighbor, stride_x)
+                y, z = divmod(rem, sz)
+                h = sqrt((gx - x) ** 2 + (gy - y) ** 2 + (gz - z) ** 2)
+                heappush(open_set, (tentative + h, h, neighbor))
+
+            for offset, step_cost in axis_moves:
+                neighbor = current + offset
+                if blocked[neighbor] or closed[neighbor]:
+                    continue
+                tentative = g_current + step_cost
+                if tentative >= g_score[neighbor]:
+                    continue
+                g_score[neighbor] = tentative
+                parents[neighbor] = current
+                x, rem = divmod(neighbor, stride_x)
+                y, z = divmod(rem, sz)
+                h = sqrt((gx - x) ** 2 + (gy - y) ** 2 + (gz - z) ** 2)
+                heappush(open_set, (tentative + h, h, neighbor))
+
+        return []
+
+    def line_of_sight(self, start: Index3, goal: Index3) -> bool:
+        """Return ``True`` when the segment between two cell centres avoids inflated obstacles."""
+
+        if not self.radar_map.is_within_bounds(start) or not self.radar_map.is_within_bounds(goal):
+            return False
+        blocked, _, _ = self._search_tables()
+        return self._line_of_sight_flat(blocked, self._to_padded_flat(start), self._to_padded_flat(goal))
+
+    def path_is_clear(self, path: Sequence[Index3]) -> bool:
+        """Return ``True`` when ``path`` is still traversable on the current grid.
+
+        Every cell must be in bounds and free, diagonal steps must not cut a
+        blocked corner, and longer legs (any-angle paths) need line of sight.
+        """
+
+        if not path:
+            return False
+        cells = np.asarray(path, dtype=np.int64).reshape(-1, 3)
+        size = np.asarray(self._occ.shape, dtype=np.int64).reshape(1, 3)
+        if np.any(cells < 0) or np.any(cells >= size):
+            return False
+        if self._occ[cells[:, 0], cells[:, 1], cells[:, 2]].any():
+            return False
+
+        steps = np.diff(cells, axis=0)
+        adjacent = np.abs(steps).max(axis=1) <= 1 if len(steps) else np.zeros(0, dtype=bool)
+        multi_axis = adjacent & (np.count_nonzero(steps, axis=1) > 1)
+        for axis in range(3):
+            mask = multi_axis & (steps[:, axis] != 0)
+            if not mask.any():
+                continue
+            corners = cells[:-1][mask].copy()
+            corners[:, axis] += steps[mask, axis]
+            if self._occ[corners[:, 0], corners[:, 1], corners[:, 2]].any():
+                return False
+        for i in np.flatnonzero(~adjacent):
+            if not self.line_of_sight(tuple(cells[i]), tuple(cells[i + 1])):
+                return False
+        return True
+
+    def shortcut_path(self, path: Sequence[Index3]) -> List[Index3]:
+        """Drop intermediate cells that are visible from an earlier kept cell."""
+
+        if len(path) <= 2:
+            return list(path)
+        result: List[Index3] = [tuple(path[0])]
+        anchor = path[0]
+        for i in range(2, len(path)):
+            if not self.line_of_sight(anchor, path[i]):
+                anchor = path[i - 1]
+                result.append(tuple(anchor))
+        result.append(tuple(path[-1]))
+        return result
+
+    def shortcut_path_world(self, path: Sequence[WorldPoint]) -> List[WorldPoint]:
+        """World-space variant of :meth:`shortcut_path` keeping the original points."""
+
+        indices = [self.radar_map.world_to_index(p) for p in path]
+        if len(path) <= 2 or any(idx is None for idx in indices):
+            return list(path)
+        kept = [0]
+        anchor = 0
+        for i in range(2, len(path)):
+            if not self.line_of_sight(indices[anchor], indices[i]):  # type: ignore[arg-type]
+                anchor = i - 1
+                kept.append(anchor)
+        kept.append(len(path) - 1)
+        return [path[i] for i in kept]
+
+    def distance_field(self, goal: Index3, *, delta: float = 1.5) -> np.ndarray:
+        """Return the cost-to-goal (in cells) of every cell, ``inf`` where unreachable.
+
+        The field is built once per goal with a vectorised delta-stepping
+        wavefront over the same moves, costs and corner rule as the A*
+        search. Any number of starts can then be routed to ``goal`` with
+        :meth:`descend`, so a fleet heading to one dock pays for one search.
+        ``delta`` is the bucket width: larger buckets mean fewer, wider
+        wavefront steps at the price of more re-relaxed cells.
+        """
+
+        blocked, axis_moves, diag_moves = self._search_tables()
+        field_ = np.full(len(blocked), np.inf, dtype=np.float64)
+        if self.radar_map.is_within_bounds(goal) and not self._is_blocked(goal):
+            free = self._blocked_view == 0
+            moves = [(offset, cost, 0, 0, 0) for offset, cost in axis_moves] + diag_moves
+            goal_flat = self._to_padded_flat(goal)
+            field_[goal_flat] = 0.0
+            active = np.array([goal_flat], dtype=np.int64)
+            while active.size:
+                values = field_[active]
+                bucket = values <= values.min() + delta
+                settled = active[bucket]
+                reached = [active[~bucket]]
+                for offset, cost, c0, c1, c2 in moves:
+                    # Predecessors ``p`` reach a settled cell via ``p + offset``.
+                    prev = settled - offset
+                    ok = free[prev] & free[prev + c0] & free[prev + c1] & free[prev + c2]
+                    prev = prev[ok]
+                    candidate = field_[settled[ok]] + cost
+                    better = candidate < field_[prev]
+                    if not better.any():
+                        continue
+                    prev = prev[better]
+                    np.minimum.at(field_, prev, candidate[better])
+                    reached.append(prev)
+                active = np.unique(np.concatenate(reached))
+        sx, sy, sz = self._padded_shape
+        return field_.reshape(sx, sy, sz)[1:-1, 1:-1, 1:-1].astype(np.float32)
+
+    def descend(self, field: np.ndarray, start: Index3) -> List[Index3]:
+        """Follow ``field`` downhill from ``start`` to its goal; ``[]`` if unreachable.
+
+        Each step picks the neighbour minimising ``step cost + field`` under
+        the usual move rules, so the walk costs O(path length).
+        """
+
+        if not self.radar_map.is_within_bounds(start) or not math.isfinite(float(field[start])):
+            return []
+        blocked, axis_moves, diag_moves = self._search_tables()
+        moves = [(offset, cost, 0, 0, 0) for offset, cost in axis_moves] + diag_moves
+        _, sy, sz = self._padded_shape
+        stride_x = sy * sz
+        values = field.ravel()
+        inner_y, inner_z = sy - 2, sz - 2
+
+        def value(flat: int) -> float:
+            x, rem = divmod(flat, stride_x)
+            y, z = divmod(rem, sz)
+            return float(values[((x - 1) * inner_y + y - 1) * inner_z + z - 1])
+
+        current = self._to_padded_flat(start)
+        remaining = value(current)
+        path = [tuple(start)]
+        while remaining > 0.0:
+            best = math.inf
+            best_next = -1
+            for offset, cost, c0, c1, c2 in moves:
+                nxt = current + offset
+                if blocked[nxt] or blocked[current + c0] or blocked[current + c1] or blocked[current + c2]:
+                    continue
+                candidate = value(nxt) + cost
+                if candidate < best:
+                    best = candidate
+                    best_next = nxt
+            if best_next < 0 or value(best_next) >= remaining:
+                return []
+            current = best_next
+            remaining = value(current)
+            path.append(self._from_padded_flat(current))
+        return path
 
-        open_set: List[Tuple[float, float, Index3]] = []
-        heapq.heappush(open_set, (0.0, 0.0, start))
+    def descend_world(self, field: np.ndarray, start: WorldPoint) -> List[WorldPoint]:
+        """World-space :meth:`descend`, snapping a blocked start to the nearest free cell."""
 
-        g_score: Dict[Index3, float] = {start: 0.0}
-        parents: Dict[Index3, Index3] = {}
+        start_idx = self.radar_map.world_to_index(start)
+        if start_idx is None:
+            return []
+        start_idx = self._find_nearest_free_index(start_idx)
+        if start_idx is None:
+            return []
+        return [self.radar_map.index_to_world_center(p) for p in self.descend(field, start_idx)]
 
-        goal = tuple(goal)
+    def find_path_timed(
+        self,
+        start: Index3,
+        goal: Index3,
+        reservations: "ReservationTable",
+        *,
+        agent: str,
+        priority: int = 0,
+        start_time: float = 0.0,
+        seconds_per_cell: float = 1.0,
+        window: int = 32,
+    ) -> List[Tuple[Index3, float]]:
+        """Plan around space-time reservations of better-ranked agents (WHCA*).
+
+        The first ``window`` moves are searched in (cell, step) space with an
+        extra wait move, skipping any cell whose reservation block is held by
+        a better-ranked agent while the drone would be there; the true
+        cost-to-goal from :meth:`distance_field` is the heuristic. The rest
+        of the route is completed along the field without looking at
+        reservations, so callers replan before the window runs out. Returns
+        ``(cell, arrival time)`` pairs, ``[]`` when no path exists.
+        """
+
+        self.interrupted = False
+        if not self.radar_map.is_within_bounds(start) or not self.radar_map.is_within_bounds(goal):
+            return []
+        if self._is_blocked(start) or self._is_blocked(goal):
+            return []
+        field = self._goal_field(goal)
+        if not math.isfinite(float(field[start])):
+            return []
 
+        blocked, axis_moves, diag_moves = self._search_tables()
+        moves = [(offset, cost, 0, 0, 0) for offset, cost in axis_moves] + diag_moves
+        _, sy, sz = self._padded_shape
+        stride_x = sy * sz
+        values = field.ravel()
+        inner_y, inner_z = sy - 2, sz - 2
+        goal_flat = self._to_padded_flat(goal)
+        blocks: Dict[int, Any] = {}
+
+        def value(flat: int) -> float:
+            x, rem = divmod(flat, stride_x)
+            y, z = divmod(rem, sz)
+            return float(values[((x - 1) * inner_y + y - 1) * inner_z + z - 1])
+
+        def free(flat: int, t0: float, t1: float) -> bool:
+            block = blocks.get(flat)
+            if block is None:
+                block = blocks[flat] = reservations.block_of(
+                    self.radar_map.index_to_world_center(self._from_padded_flat(flat))
+                )
+            return reservations.is_free(block, t0, t1, agent=agent, priority=priority)
+
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        start_flat = self._to_padded_flat(start)
+        start_state = (start_flat, 0)
+        best_g: Dict[Tuple[int, int], float] = {start_state: 0.0}
+        parents: Dict[Tuple[int, int], Tuple[Tuple[int, int], float]] = {start_state: (start_state, start_time)}
+        closed: set = set()
+        # Entries: (f, -step, flat, g, time); deeper states win ties.
+        open_set: List[Tuple[float, int, int, float, float]] = [
+            (value(start_flat), 0, start_flat, 0.0, float(start_time))
+        ]
+
+        def push(state: Tuple[int, int], nxt: int, g: float, t0: float, t1: float) -> None:
+            # The drone holds both its current and its next block for the whole move.
+            key = (nxt, state[1] + 1)
+            if key in closed or g >= best_g.get(key, math.inf):
+                return
+            h = value(nxt)
+            if not math.isfinite(h) or not free(nxt, t0, t1):
+                return
+            if nxt != state[0] and not free(state[0], t0, t1):
+                return
+            best_g[key] = g
+            parents[key] = (state, t1)
+            heappush(open_set, (g + h, -key[1], nxt, g, t1))
+
+        terminal: Optional[Tuple[int, int]] = None
         while open_set:
-            f, g, current = heapq.heappop(open_set)
-            if current == goal:
-                return self._reconstruct_path(parents, current)
+            _, neg_step, current, g_current, t_current = heappop(open_set)
+            step = -neg_step
+            state = (current, step)
+            if state in closed:
+                continue
+            closed.add(state)
+            if current == goal_flat or step >= window:
+                terminal = state
+                break
+            for offset, cost, c0, c1, c2 in moves:
+                nxt = current + offset
+                if blocked[nxt] or blocked[current + c0] or blocked[current + c1] or blocked[current + c2]:
+                    continue
+                push(state, nxt, g_current + cost, t_current, t_current + cost * seconds_per_cell)
+            # Waiting in place costs one cell of travel time.
+            push(state, current, g_current + 1.0, t_current, t_current + seconds_per_cell)
+        if terminal is None:
+            return []
 
-            for neighbor, step_cost in self._neighbors(current):
-                tentative = g + step_cost
-                if tentative >= g_score.get(neighbor, float("inf")):
+        timed: List[Tuple[Index3, float]] = []
+        state = terminal
+        while True:
+            previous, arrival = parents[state]
+            timed.append((self._from_padded_flat(state[0]), arrival))
+            if previous == state:
+                break
+            state = previous
+        timed.reverse()
+
+        cell, t = timed[-1]
+        tail = self.descend(field, cell)
+        for a, b in zip(tail, tail[1:]):
+            t += math.sqrt(sum((p - q) ** 2 for p, q in zip(a, b))) * seconds_per_cell
+            timed.append((b, t))
+        return timed
+
+    def find_path_timed_world(
+        self,
+        start: WorldPoint,
+        goal: WorldPoint,
+        reservations: "ReservationTable",
+        **kwargs: Any,
+    ) -> List[Tuple[WorldPoint, float]]:
+        """World-space :meth:`find_path_timed`; ready for ``ReservationTable.reserve_path``."""
+
+        self.interrupted = False
+        start_idx = self.radar_map.world_to_index(start)
+        goal_idx = self.radar_map.world_to_index(goal)
+        if start_idx is None or goal_idx is None:
+            return []
+        start_idx = self._find_nearest_free_index(start_idx)
+        goal_idx = self._find_nearest_free_index(goal_idx)
+        if start_idx is None or goal_idx is None:
+            return []
+        timed = self.find_path_timed(start_idx, goal_idx, reservations, **kwargs)
+        return [(self.radar_map.index_to_world_center(idx), t) for idx, t in timed]
+
+    # Internal helpers ------------------------------------------------
+
+    def _goal_field(self, goal: Index3) -> np.ndarray:
+        """:meth:`distance_field` for ``goal``, kept while the goal stays the same."""
+
+        if self._field_goal != goal or self._field is None:
+            self._field = self.distance_field(goal)
+            self._field_goal = goal
+        return self._field
+
+    def _find_path_lazy_theta(
+        self,
+        start: Index3,
+        goal: Index3,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> List[Index3]:
+        """Lazy Theta* over the same move tables as :meth:`find_path_indices`.
+
+        Successors inherit the parent of the expanded cell optimistically; line
+        of sight is verified only when a cell is expanded, falling back to the
+        best closed grid neighbour when the shortcut is blocked. Slope limits
+        are not applied to the straight legs, so this mode is meant for
+        free-flying profiles.
+        """
+
+        blocked, axis_moves, diag_moves = self._search_tables()
+        moves = [(offset, cost, 0, 0, 0) for offset, cost in axis_moves] + diag_moves
+        _, sy, sz = self._padded_shape
+        stride_x = sy * sz
+        start_flat = self._to_padded_flat(start)
+        goal_flat = self._to_padded_flat(goal)
+        gx, gy, gz = goal[0] + 1, goal[1] + 1, goal[2] + 1
+
+        size = len(blocked)
+        g_arr = np.full(size, np.inf, dtype=np.float64)
+        parent_arr = np.full(size, -1, dtype=np.int32)
+        g_score = memoryview(g_arr)
+        parents = memoryview(parent_arr)
+        closed = bytearray(size)
+
+        sqrt = math.sqrt
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        g_score[start_flat] = 0.0
+        parents[start_flat] = start_flat
+        h_start = self._heuristic(start, goal)
+        open_set: List[Tuple[float, float, int]] = [(h_start, h_start, start_flat)]
+        expansions = 0
+        best_h = math.inf
+        best_flat = start_flat
+
+        while open_set:
+            _, h_current, current = heappop(open_set)
+            if closed[current]:
+                continue
+            cx, rem = divmod(current, stride_x)
+            cy, cz = divmod(rem, sz)
+
+            parent = parents[current]
+            if parent != current and not self._line_of_sight_flat(blocked, parent, current):
+                best_g = math.inf
+                best_parent = parent
+                for offset, step_cost, c0, c1, c2 in moves:
+                    prev = current - offset
+                    if not closed[prev]:
+                        continue
+                    if blocked[prev + c0] or blocked[prev + c1] or blocked[prev + c2]:
+                        continue
+                    candidate = g_score[prev] + step_cost
+                    if candidate < best_g:
+                        best_g = candidate
+                        best_parent = prev
+                g_score[current] = best_g
+                parents[current] = best_parent
+                parent = best_parent
+
+            if current == goal_flat:
+                return self._reconstruct_any_angle_path(parent_arr, current)
+            if stop is not None:
+                if h_current < best_h:
+                    best_h = h_current
+                    best_flat = current
+                expansions += 1
+                if not expansions & _STOP_CHECK_MASK and stop():
+                    self.interrupted = True
+                    return self._reconstruct_any_angle_path(parent_arr, best_flat)
+            closed[current] = 1
+
+            px, rem = divmod(parent, stride_x)
+            py, pz = divmod(rem, sz)
+            g_parent = g_score[parent]
+            for offset, _step_cost, c0, c1, c2 in moves:
+                neighbor = current + offset
+                if blocked[neighbor] or closed[neighbor]:
+                    continue
+                if blocked[current + c0] or blocked[current + c1] or blocked[current + c2]:
+                    continue
+                x, rem = divmod(neighbor, stride_x)
+                y, z = divmod(rem, sz)
+                tentative = g_parent + sqrt((x - px) ** 2 + (y - py) ** 2 + (z - pz) ** 2)
+                if tentative >= g_score[neighbor]:
                     continue
                 g_score[neighbor] = tentative
-                parents[neighbor] = current
-                priority = tentative + self._heuristic(neighbor, goal)
-                heapq.heappush(open_set, (priority, tentative, neighbor))
+                parents[neighbor] = parent
+                h = sqrt((gx - x) ** 2 + (gy - y) ** 2 + (gz - z) ** 2)
+                heappush(open_set, (tentative + h, h, neighbor))
 
         return []
 
-    # Internal helpers ------------------------------------------------
-
-    def _neighbors(self, idx: Index3) -> Iterator[Tuple[Index3, float]]:
-        x, y, z = idx
+    def _line_of_sight_flat(self, blocked: bytearray, start: int, goal: int) -> bool:
+        _, sy, sz = self._padded_shape
+        x0, rem = divmod(start, sy * sz)
+        y0, z0 = divmod(rem, sz)
+        x1, rem = divmod(goal, sy * sz)
+        y1, z1 = divmod(rem, sz)
+        cells = _segment_cells((x0, y0, z0), (x1, y1, z1), (sy * sz, sz, 1))
+        return not bool(self._blocked_view[cells + start].any())
+
+    def _reconstruct_any_angle_path(self, parents: np.ndarray, current: int) -> List[Index3]:
+        path: List[Index3] = [self._from_padded_flat(current)]
+        while int(parents[current]) != current:
+            current = int(parents[current])
+            path.append(self._from_padded_flat(current))
+        path.reverse()
+        return path
 
+    def _search_tables(self) -> Tuple[bytearray, List[Tuple[int, float]], List[Tuple[int, float, int, int, int]]]:
+        """Return the padded blocked grid and per-direction move tables.
+
+        The occupancy grid is padded by one blocked cell on every side so the
+        search never needs bounds checks. Moves are split into axis moves and
+        multi-axis moves; the latter carry the flat offsets of the cells that
+        must be free to avoid cutting corners (padded with ``0``, the current
+        cell, which is always free).
+        """
+
+        if self._tables is None:
+            padded = np.pad(self._occ, 1, mode="constant", constant_values=True)
+            self._padded_shape = padded.shape
+            blocked = bytearray(padded.astype(np.uint8).tobytes())
+            self._blocked_view = np.frombuffer(blocked, dtype=np.uint8)
+            _, sy, sz = padded.shape
+            strides = (sy * sz, sz, 1)
+
+            axis_moves: List[Tuple[int, float]] = []
+            diag_moves: List[Tuple[int, float, int, int, int]] = []
+            for dx, dy, dz in self._directions():
+                if not self._direction_allowed(dx, dy, dz):
+                    continue
+                offset = dx * strides[0] + dy * strides[1] + dz * strides[2]
+                cost = math.sqrt(dx * dx + dy * dy + dz * dz)
+                corners = [d * stride for d, stride in zip((dx, dy, dz), strides) if d]
+                if len(corners) < 2:
+                    axis_moves.append((offset, cost))
+                else:
+                    corners += [0] * (3 - len(corners))
+                    diag_moves.append((offset, cost, corners[0], corners[1], corners[2]))
+            self._tables = (blocked, axis_moves, diag_moves)
+        return self._tables
+
+    def _directions(self) -> List[Index3]:
         if self.profile.allow_diagonal:
-            directions = (
+            return [
                 (dx, dy, dz)
                 for dx in (-1, 0, 1)
                 for dy in (-1, 0, 1)
                 for dz in (-1, 0, 1)
                 if not (dx == dy == dz == 0)
-            )
-        else:
-            directions = (
-                (1, 0, 0),
-                (-1, 0, 0),
-                (0, 1, 0),
-                (0, -1, 0),
-                (0, 0, 1),
-                (0, 0, -1),
-            )
-
-        for dx, dy, dz in directions:
-            nx, ny, nz = x + dx, y + dy, z + dz
-            neighbor = (nx, ny, nz)
-            if not self.radar_map.is_within_bounds(neighbor):
-                continue
-            if self._is_blocked(neighbor):
-                continue
-            if not self._transition_allowed(idx, neighbor):
-                continue
-
-            step_cost = math.sqrt(dx * dx + dy * dy + dz * dz)
-            yield neighbor, step_cost
+            ]
+        return [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]
 
-    def _transition_allowed(self, current: Index3, neighbor: Index3) -> bool:
-        dx = abs(neighbor[0] - current[0])
-        dy = abs(neighbor[1] - current[1])
-        dz = abs(neighbor[2] - current[2])
+    def _direction_allowed(self, dx: int, dy: int, dz: int) -> bool:
+        """Slope and step limits for a unit move; independent of the grid contents."""
 
+        dx, dy, dz = abs(dx), abs(dy), abs(dz)
         if dy > self.profile.max_step_cells:
             return False
 
@@ -353,24 +1305,17 @@ class PathFinder:
             return self.profile.allow_vertical_movement and vertical <= self.profile.max_step_cells * self.radar_map.cell_size
 
         slope_deg = math.degrees(math.atan2(vertical, horizontal))
-        if slope_deg > self.profile.max_slope_degrees:
-            return False
-
-        axis_deltas = []
-        if dx:
-            axis_deltas.append((int(math.copysign(1, neighbor[0] - current[0])), 0, 0))
-        if dy:
-            axis_deltas.append((0, int(math.copysign(1, neighbor[1] - current[1])), 0))
-        if dz:
-            axis_deltas.append((0, 0, int(math.copysign(1, neighbor[2] - current[2]))))
+        return slope_deg <= self.profile.max_slope_degrees
 
-        if len(axis_deltas) >= 2:
-            for ddx, ddy, ddz in axis_deltas:
-                intermediate = (current[0] + ddx, current[1] + ddy, current[2] + ddz)
-                if self.radar_map.is_within_bounds(intermediate) and self._is_blocked(intermediate):
-                    return False
+    def _to_padded_flat(self, idx: Index3) -> int:
+        _, sy, sz = self._padded_shape
+        return ((idx[0] + 1) * sy + idx[1] + 1) * sz + idx[2] + 1
 
-        return True
+    def _from_padded_flat(self, flat: int) -> Index3:
+        _, sy, sz = self._padded_shape
+        x, rem = divmod(flat, sy * sz)
+        y, z = divmod(rem, sz)
+        return x - 1, y - 1, z - 1
 
     def _heuristic(self, node: Index3, goal: Index3) -> float:
         dx = abs(goal[0] - node[0])
@@ -382,43 +1327,211 @@ class PathFinder:
         return bool(self._occ[idx])
 
     def _find_nearest_free_index(self, start_idx: Index3) -> Optional[Index3]:
-        """Find the nearest free cell to start_idx using BFS."""
-        from collections import deque
-        visited = set()
-        queue = deque([start_idx])
-        visited.add(start_idx)
-        while queue:
-            current = queue.popleft()
-            if not self._is_blocked(current):
-                return current
-            x, y, z = current
-            for dx in (-1, 0, 1):
-                for dy in (-1, 0, 1):
-                    for dz in (-1, 0, 1):
-                        if dx == 0 and dy == 0 and dz == 0:
-                            continue
-                        nx, ny, nz = x + dx, y + dy, z + dz
-                        neighbor = (nx, ny, nz)
-                        if not self.radar_map.is_within_bounds(neighbor):
-                            continue
-                        if neighbor not in visited:
-                            visited.add(neighbor)
-                            queue.append(neighbor)
-        return None
-
-    @staticmethod
-    def _reconstruct_path(parents: Dict[Index3, Index3], current: Index3) -> List[Index3]:
-        path: List[Index3] = [current]
-        while current in parents:
-            current = parents[current]
-            path.append(current)
+        """Find the nearest free cell to start_idx using the cached feature transform."""
+        if not self.radar_map.is_within_bounds(start_idx):
+            return None
+        if not self._is_blocked(start_idx):
+            return start_idx
+        return self.radar_map.nearest_free_index(
+            start_idx, self.profile.robot_radius, shape=self.profile.inflation
+        )
+
+    def _reconstruct_flat_path(self, parents: np.ndarray, current: int) -> List[Index3]:
+        path: List[Index3] = [self._from_padded_flat(current)]
+        current = int(parents[current])
+        while current >= 0:
+            path.append(self._from_padded_flat(current))
+            current = int(parents[current])
         path.reverse()
         return path
 
 
+class PathCache:
+    """LRU cache of planned paths shared between :class:`PathFinder` instances.
+
+    Entries are keyed by the map scope, the lattice cells of both endpoints,
+    the passability profile and the search mode. The scope is the map
+    revision when ``match_revision`` is set and the grid lattice (cell size
+    and origin phase) otherwise, so maps cropped or rescanned on the same
+    lattice share entries. Paths are stored as cell centres in world space
+    and re-checked with :meth:`PathFinder.path_is_clear` before every reuse;
+    stale entries are dropped.
+
+    ``storage`` is any object with ``load_cached_path(key)`` and
+    ``save_cached_path(key, points, ttl)``, such as the shared map storages,
+    so a fleet can reuse known-good corridors. Every entry is stored on its
+    own (a Redis key or a SQLite row) and expires after ``ttl`` seconds; the
+    named paths of the shared map are not touched. Storage failures are
+    logged as warnings and otherwise ignored, the in-memory cache keeps
+    working. The cache may be shared by the threads of a
+    :class:`PlannerService`.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 256,
+        *,
+        match_revision: bool = False,
+        storage: Any = None,
+        ttl: float = 3600.0,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.capacity = int(capacity)
+        self.match_revision = bool(match_revision)
+        self.storage = storage
+        self.ttl = float(ttl)
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, List[WorldPoint]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, finder: PathFinder, start: Index3, goal: Index3, *, any_angle: bool = False) -> str:
+        radar_map = finder.radar_map
+        cell = float(radar_map.cell_size)
+        if self.match_revision and radar_map.revision is not None:
+            scope = f"rev{radar_map.revision}"
+        else:
+            phase = [round((float(o) / cell) % 1.0, 3) % 1.0 for o in radar_map.origin]
+            scope = f"{cell:g}@{phase[0]:g},{phase[1]:g},{phase[2]:g}"
+        ends = [
+            tuple(int(math.floor(c / cell)) for c in radar_map.index_to_world_center(idx))
+            for idx in (start, goal)
+        ]
+        profile = ",".join(
+            f"{v:g}" if isinstance(v, float) else str(int(v)) if isinstance(v, (bool, int)) else str(v)
+            for v in astuple(finder.profile)
+        )
+        mode = "any" if any_angle else "grid"
+        return f"{scope}|{ends[0][0]},{ends[0][1]},{ends[0][2]}|{ends[1][0]},{ends[1][1]},{ends[1][2]}|{profile}|{mode}"
+
+    def get(self, finder: PathFinder, start: Index3, goal: Index3, *, any_angle: bool = False) -> Optional[List[Index3]]:
+        """Return a cached path in ``finder`` indices, or ``None`` on a miss or a stale entry."""
+
+        key = self.key(finder, start, goal, any_angle=any_angle)
+        with self._lock:
+            points = self._entries.get(key)
+        if points is None:
+            points = self._load(key)
+            if points is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+        path = [finder.radar_map.world_to_index(p) for p in points]
+        with self._lock:
+            if any(idx is None for idx in path) or not finder.path_is_clear(path):  # type: ignore[arg-type]
+                self._entries.pop(key, None)
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries[key] = points
+            self._entries.move_to_end(key)
+            self._trim()
+            self.hits += 1
+        return path  # type: ignore[return-value]
+
+    def put(
+        self,
+        finder: PathFinder,
+        start: Index3,
+        goal: Index3,
+        path: Sequence[Index3],
+        *,
+        any_angle: bool = False,
+    ) -> None:
+        key = self.key(finder, start, goal, any_angle=any_angle)
+        points = [finder.radar_map.index_to_world_center(idx) for idx in path]
+        with self._lock:
+            self._entries[key] = points
+            self._entries.move_to_end(key)
+            self._trim()
+        self._store(key, points)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[List[WorldPoint]]:
+        if self.storage is None:
+            return None
+        try:
+            points = self.storage.load_cached_path(key)
+        except Exception as exc:
+            _log.warning("path cache: failed to load %r: %s", key, exc)
+            return None
+        if not points:
+            return None
+        try:
+            return [(float(p[0]), float(p[1]), float(p[2])) for p in points]
+        except (TypeError, ValueError, IndexError):
+            _log.warning("path cache: ignoring malformed entry %r", key)
+            return None
+
+    def _store(self, key: str, points: List[WorldPoint]) -> None:
+        if self.storage is None:
+            return
+        try:
+            self.storage.save_cached_path(key, points, self.ttl)
+        except Exception as exc:
+            _log.warning("path cache: failed to store %r: %s", key, exc)
+
+
+def _segment_cells(start: Index3, goal: Index3, strides: Index3) -> np.ndarray:
+    """Return flat offsets (relative to ``start``) of the cells crossed by a segment.
+
+    Vectorised 3D DDA between two cell centres: along an axis with ``n`` cell
+    steps the boundary crossings sit at ``t = (k + 0.5) / n``, so all crossings
+    are generated with ``arange``, merged by a stable sort and turned into
+    cells with a cumulative sum of per-axis stride offsets. Where several axes
+    cross at the same ``t`` (an edge or corner), the cells reached by stepping
+    each of those axes alone are checked instead of the intermediate ones,
+    matching the corner-cutting rule of the grid search.
+    """
+
+    counts = []
+    steps = []
+    for axis in range(3):
+        delta = goal[axis] - start[axis]
+        if delta:
+            counts.append(abs(delta))
+            steps.append(strides[axis] if delta > 0 else -strides[axis])
+    if not counts:
+        return np.zeros(1, dtype=np.int64)
+    t = np.concatenate([(np.arange(n, dtype=np.float64) + 0.5) / n for n in counts])
+    off = np.repeat(np.asarray(steps, dtype=np.int64), counts)
+    order = np.argsort(t, kind="stable")
+    t = t[order]
+    off = off[order]
+    cells = np.cumsum(off)
+
+    gap = t[1:] - t[:-1] >= 1e-9
+    if gap.all():
+        return cells
+    group_end = np.empty(t.size, dtype=bool)
+    group_end[:-1] = gap
+    group_end[-1] = True
+    group_start = np.empty(t.size, dtype=bool)
+    group_start[0] = True
+    group_start[1:] = gap
+    before = (cells - off)[np.flatnonzero(group_start)][np.cumsum(group_start) - 1]
+    tied = ~(group_start & group_end)
+    return np.concatenate([cells[group_end], before[tied] + off[tied]])
+
+
 __all__ = [
     "RawRadarMap",
     "PassabilityProfile",
+    "PathCache",
     "PathFinder",
     "RadarContact",
 ]
@@ -0,0 +1,385 @@
+"""Space-time reservations for routing several drones through shared space.
+
+Each drone plans alone, so two miners heading for the same connector happily
+pick the same corridor at the same moment and then deadlock. A reservation
+table records which world *block* (a cube of ``block_size`` metres) each
+agent intends to occupy during which time window. :meth:`PathFinder.find_path_timed
+<secontrol.tools.radar_navigation.PathFinder.find_path_timed>` plans around
+those windows (Cooperative A* / WHCA*), and :meth:`ReservationTable.reserve_path`
+books the result.
+
+Contention is resolved by a fixed total order instead of arrival time: an
+agent's rank is ``(-priority, agent_id)``, planning only respects
+reservations of better-ranked agents, and a successful reservation evicts
+every overlapping reservation of worse-ranked agents, which then see
+:meth:`ReservationTable.preempted` and replan. The best-ranked agent never
+replans because of anybody else, so churn cannot cycle.
+
+:class:`ReservationTable` keeps everything in process.
+:class:`RedisReservationTable` shares the table through Redis: every agent's
+reservations are one JSON document, and writes are serialised with a
+short-lived lock key.
+
+:class:`~secontrol.controllers.space_navigator_controller.SpaceNavigatorController`
+uses a table when one is passed as ``reservations=``: it plans every leg with
+``find_path_timed``, books it, and stops a leg once it is preempted.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+BlockKey = Tuple[int, int, int]
+WorldPoint = Tuple[float, float, float]
+
+
+@dataclass(frozen=True)
+class Reservation:
+    """One agent occupying one block during ``[start, end]`` (seconds)."""
+
+    block: BlockKey
+    start: float
+    end: float
+    agent: str
+    priority: int = 0
+
+    @property
+    def rank(self) -> Tuple[int, str]:
+        return _rank(self.agent, self.priority)
+
+
+class ReservationTable:
+    """In-process space-time reservation table.
+
+    ``margin`` seconds are added on both sides of every reserved window to
+    absorb timing jitter of real flight.
+    """
+
+    def __init__(self, block_size: float = 10.0, *, margin: float = 0.0) -> None:
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        self.block_size = float(block_size)
+        self.margin = float(margin)
+        self._lock = threading.RLock()
+        self._by_block: Dict[BlockKey, List[Reservation]] = defaultdict(list)
+        self._by_agent: Dict[str, List[Reservation]] = {}
+        self._preempted: Set[str] = set()
+
+    # Queries ---------------------------------------------------------
+
+    def block_of(self, point: Sequence[float]) -> BlockKey:
+        size = self.block_size
+        return (
+            int(math.floor(float(point[0]) / size)),
+            int(math.floor(float(point[1]) / size)),
+            int(math.floor(float(point[2]) / size)),
+        )
+
+    def is_free(
+        self,
+        block: BlockKey,
+        start: float,
+        end: float,
+        *,
+        agent: Optional[str] = None,
+        priority: int = 0,
+    ) -> bool:
+        """Return ``True`` unless a better-ranked agent holds ``block`` during ``[start, end]``.
+
+        Without ``agent`` every reservation counts.
+        """
+
+        rank = None if agent is None else _rank(agent, priority)
+        with self._lock:
+            for item in self._by_block.get(block, ()):
+                if item.agent == agent:
+                    continue
+                if rank is not None and item.rank > rank:
+                    continue
+                if item.start <= end and start <= item.end:
+                    return False
+        return True
+
+    def reservations(self, agent: Optional[str] = None) -> List[Reservation]:
+        with self._lock:
+            if agent is not None:
+                return list(self._by_agent.get(agent, ()))
+            return [item for items in self._by_agent.values() for item in items]
+
+    def preempted(self, agent: str) -> bool:
+        """Return ``True`` once another agent has evicted ``agent``'s reservations."""
+
+        return agent in self._preempted
+
+    # Updates ---------------------------------------------------------
+
+    def reserve(
+        self,
+        agent: str,
+        entries: Iterable[Tuple[BlockKey, float, float]],
+        *,
+        priority: int = 0,
+    ) -> bool:
+        """Replace ``agent``'s reservations with ``entries``.
+
+        Fails without changes when a better-ranked agent holds an
+        overlapping window; otherwise evicts overlapping worse-ranked agents.
+        """
+
+        requested = [
+            Reservation(tuple(block), float(t0) - self.margin, float(t1) + self.margin, agent, priority)  # type: ignore[arg-type]
+            for block, t0, t1 in entries
+        ]
+        with self._lock:
+            return self._apply(agent, requested)
+
+    def reserve_path(
+        self,
+        agent: str,
+        path: Sequence[Tuple[WorldPoint, float]],
+        *,
+        priority: int = 0,
+        hold: float = 0.0,
+    ) -> bool:
+        """Reserve a timed world path as returned by ``PathFinder.find_path_timed_world``.
+
+        Each point's block is held from its timestamp until the next one;
+        the final block is held for another ``hold`` seconds (``inf`` parks
+        the agent there until :meth:`release`).
+        """
+
+        return self.reserve(agent, self.path_entries(path, hold=hold), priority=priority)
+
+    def path_entries(
+        self,
+        path: Sequence[Tuple[WorldPoint, float]],
+        *,
+        hold: float = 0.0,
+    ) -> List[Tuple[BlockKey, float, float]]:
+        entries: List[Tuple[BlockKey, float, float]] = []
+        for i, (point, t) in enumerate(path):
+            block = self.block_of(point)
+            end = path[i + 1][1] if i + 1 < len(path) else t + hold
+            if entries and entries[-1][0] == block:
+                entries[-1] = (block, entries[-1][1], max(entries[-1][2], end))
+            else:
+                entries.append((block, float(t), float(end)))
+        return entries
+
+    def release(self, agent: str) -> None:
+        with self._lock:
+            self._drop(agent)
+            self._preempted.discard(agent)
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """Forget windows that ended before ``now``."""
+
+        now = time.time() if now is None else float(now)
+        with self._lock:
+            for agent, items in list(self._by_agent.items()):
+                kept = [item for item in items if item.end >= now]
+                if len(kept) != len(items):
+                    self._drop(agent)
+                    if kept:
+                        self._store(agent, kept)
+
+    # Internal helpers ------------------------------------------------
+
+    def _apply(self, agent: str, requested: List[Reservation]) -> bool:
+        losers: Set[str] = set()
+        for item in requested:
+            for other in self._by_block.get(item.block, ()):
+                if other.agent == agent or other.end < item.start or item.end < other.start:
+                    continue
+                if other.rank < item.rank:
+                    return False
+                losers.add(other.agent)
+        for loser in losers:
+            self._drop(loser)
+            self._preempted.add(loser)
+        self._drop(agent)
+        self._preempted.discard(agent)
+        self._store(agent, requested)
+        return True
+
+    def _store(self, agent: str, items: List[Reservation]) -> None:
+        self._by_agent[agent] = list(items)
+        for item in items:
+            self._by_block[item.block].append(item)
+
+    def _drop(self, agent: str) -> None:
+        for item in self._by_agent.pop(agent, ()):
+            entries = self._by_block.get(item.block)
+            if entries is None:
+                continue
+            entries[:] = [other for other in entries if other.agent != agent]
+            if not entries:
+                del self._by_block[item.block]
+
+
+class RedisReservationTable(ReservationTable):
+    """Reservation table shared by the fleet through Redis.
+
+    Queries run against a local copy refreshed by :meth:`refresh`; call it
+    before planning. :meth:`reserve` takes the ``<prefix>:lock`` key, reloads
+    the table, applies the same rank rules as the in-process table and
+    writes back only the documents that changed.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        prefix: str = "se:fleet:reservations",
+        block_size: float = 10.0,
+        margin: float = 0.0,
+        lock_timeout: float = 2.0,
+    ) -> None:
+        super().__init__(block_size, margin=margin)
+        # RedisEventClient wraps the raw client; redis.Redis itself has a
+        # ``client()`` method, so unwrap only clients that cannot run scripts.
+        self._redis = client if hasattr(client, "register_script") else client.client
+        self.prefix = prefix
+        self.lock_timeout = float(lock_timeout)
+        self._unlock_script = self._redis.register_script(_UNLOCK_LUA)
+
+    @property
+    def agents_key(self) -> str:
+        return f"{self.prefix}:agents"
+
+    @property
+    def preempted_key(self) -> str:
+        return f"{self.prefix}:preempted"
+
+    def _agent_key(self, agent: str) -> str:
+        return f"{self.prefix}:agent:{agent}"
+
+    def refresh(self) -> None:
+        """Reload every agent's reservations from Redis into the local index."""
+
+        agents = sorted(_decode(a) for a in (self._redis.smembers(self.agents_key) or ()))
+        payloads = self._redis.mget([self._agent_key(a) for a in agents]) if agents else []
+        preempted = {_decode(a) for a in (self._redis.smembers(self.preempted_key) or ())}
+        with self._lock:
+            for agent in list(self._by_agent):
+                self._drop(agent)
+            for agent, payload in zip(agents, payloads):
+                if payload is None:
+                    continue
+                doc = json.loads(payload)
+                self._store(
+                    agent,
+                    [
+                        Reservation((int(b[0]), int(b[1]), int(b[2])), float(t0), float(t1), agent, int(doc["priority"]))
+                        for b, t0, t1 in doc["entries"]
+                    ],
+                )
+            self._preempted = preempted
+
+    def preempted(self, agent: str) -> bool:
+        return bool(self._redis.sismember(self.preempted_key, agent))
+
+    def reserve(
+        self,
+        agent: str,
+        entries: Iterable[Tuple[BlockKey, float, float]],
+        *,
+        priority: int = 0,
+    ) -> bool:
+        requested = [
+            Reservation(tuple(block), float(t0) - self.margin, float(t1) + self.margin, agent, priority)  # type: ignore[arg-type]
+            for block, t0, t1 in entries
+        ]
+        with self._locked():
+            self.refresh()
+            before = set(self._by_agent)
+            with self._lock:
+                if not self._apply(agent, requested):
+                    return False
+            for loser in before - set(self._by_agent):
+                self._redis.delete(self._agent_key(loser))
+                self._redis.srem(self.agents_key, loser)
+                self._redis.sadd(self.preempted_key, loser)
+            self._write(agent)
+            return True
+
+    def release(self, agent: str) -> None:
+        with self._locked():
+            self._redis.delete(self._agent_key(agent))
+            self._redis.srem(self.agents_key, agent)
+            self._redis.srem(self.preempted_key, agent)
+        super().release(agent)
+
+    def expire(self, now: Optional[float] = None) -> None:
+        with self._locked():
+            self.refresh()
+            before = {agent: len(items) for agent, items in self._by_agent.items()}
+            super().expire(now)
+            for agent, count in before.items():
+                if agent not in self._by_agent:
+                    self._redis.delete(self._agent_key(agent))
+                    self._redis.srem(self.agents_key, agent)
+                elif len(self._by_agent[agent]) != count:
+                    self._write(agent)
+
+    def _write(self, agent: str) -> None:
+        items = self._by_agent.get(agent, [])
+        doc = {
+            "priority": items[0].priority if items else 0,
+            "entries": [[list(item.block), item.start, item.end] for item in items],
+        }
+        self._redis.set(self._agent_key(agent), json.dumps(doc, separators=(",", ":")))
+        self._redis.sadd(self.agents_key, agent)
+        self._redis.srem(self.preempted_key, agent)
+
+    def _locked(self) -> "_RedisLock":
+        return _RedisLock(self._redis, f"{self.prefix}:lock", self.lock_timeout, self._unlock_script)
+
+
+# Deletes the lock only while it still holds our token, in one server-side
+# step: a lock that expired and was taken by another agent stays untouched.
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _RedisLock:
+    def __init__(self, redis: Any, key: str, timeout: float, unlock: Any) -> None:
+        self._redis = redis
+        self._key = key
+        self._timeout = timeout
+        self._unlock = unlock
+        self._token = uuid.uuid4().hex
+
+    def __enter__(self) -> "_RedisLock":
+        deadline = time.time() + self._timeout
+        ttl_ms = max(1, int(self._timeout * 1000))
+        while not self._redis.set(self._key, self._token, nx=True, px=ttl_ms):
+            if time.time() >= deadline:
+                raise TimeoutError(f"could not acquire {self._key}")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._unlock(keys=[self._key], args=[self._token])
+
+
+def _rank(agent: str, priority: int) -> Tuple[int, str]:
+    return -int(priority), str(agent)
+
+
+def _decode(value: Any) -> Any:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+__all__ = ["RedisReservationTable", "Reservation", "ReservationTable"]
@@ -0,0 +1,225 @@
+"""Uniform hash-grid spatial index for radar point clouds.
+
+Radar scans return tens or hundreds of thousands of solid points, and the
+navigation helpers ask the same few questions on every control tick: how far
+is the nearest voxel, which voxels are inside a sphere, and where does a
+forward corridor first hit something. :class:`PointGridIndex` buckets the
+points into world-aligned cubic cells once per scan and answers those
+queries by visiting only the cells that can contain a hit.
+
+Only ``numpy`` is required.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+WorldPoint = Tuple[float, float, float]
+
+
+class PointGridIndex:
+    """Static spatial index over a fixed set of 3D points.
+
+    Points are sorted by their cell key so each occupied cell is a contiguous
+    slice of :attr:`points`. Queries first prune occupied cells with an exact
+    point-to-box lower bound (vectorised over cells), then test only the
+    points inside the surviving cells.
+    """
+
+    def __init__(
+        self,
+        points: Any,
+        cell_size: Optional[float] = None,
+        *,
+        revision: Optional[int] = None,
+    ) -> None:
+        arr = _as_points(points)
+        self.revision = revision
+
+        if cell_size is None:
+            cell_size = _auto_cell_size(arr)
+        self.cell_size = float(cell_size)
+        if self.cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+
+        if arr.shape[0] == 0:
+            self.points = arr
+            self.cell_coords = np.zeros((0, 3), dtype=np.int64)
+            self.cell_start = np.zeros(1, dtype=np.int64)
+            self._cell_lo = np.zeros((0, 3), dtype=np.float64)
+            return
+
+        coords = np.floor(arr / self.cell_size).astype(np.int64)
+        order = np.lexsort((coords[:, 2], coords[:, 1], coords[:, 0]))
+        coords = coords[order]
+        self.points = arr[order]
+
+        boundary = np.ones(coords.shape[0], dtype=bool)
+        boundary[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+        starts = np.flatnonzero(boundary)
+        self.cell_coords = coords[starts]
+        self.cell_start = np.append(starts, coords.shape[0]).astype(np.int64)
+        self._cell_lo = self.cell_coords.astype(np.float64) * self.cell_size
+
+    def __len__(self) -> int:
+        return int(self.points.shape[0])
+
+    @property
+    def cell_count(self) -> int:
+        return int(self.cell_coords.shape[0])
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def nearest(self, point: Sequence[float]) -> Tuple[float, Optional[WorldPoint]]:
+        """Return ``(distance, point)`` for the indexed point closest to ``point``."""
+
+        if len(self) == 0:
+            return float("inf"), None
+        center = np.asarray(point[:3], dtype=np.float64)
+        bounds = self._cell_box_distance_sq(center)
+
+        # Seed the search with the cell that has the smallest lower bound, then
+        # only revisit cells that could still hold a closer point.
+        seed = self.points[self._point_indices(np.array([int(np.argmin(bounds))]))]
+        seed_diff = seed - center.reshape(1, 3)
+        best_sq = float(np.min(np.einsum("ij,ij->i", seed_diff, seed_diff)))
+        cells = np.flatnonzero(bounds <= best_sq)
+        candidates = self.points[self._point_indices(cells)]
+        diff = candidates - center.reshape(1, 3)
+        dist_sq = np.einsum("ij,ij->i", diff, diff)
+        i = int(np.argmin(dist_sq))
+        best = candidates[i]
+        return math.sqrt(float(dist_sq[i])), (float(best[0]), float(best[1]), float(best[2]))
+
+    def nearest_distance(self, point: Sequence[float]) -> float:
+        return self.nearest(point)[0]
+
+    def query_radius(self, center: Sequence[float], radius: float) -> np.ndarray:
+        """Return an ``(M, 3)`` array of the indexed points within ``radius`` of ``center``."""
+
+        if len(self) == 0 or radius < 0:
+            return self.points[:0]
+        c = np.asarray(center[:3], dtype=np.float64)
+        r_sq = float(radius) * float(radius)
+        cells = np.flatnonzero(self._cell_box_distance_sq(c) <= r_sq)
+        candidates = self.points[self._point_indices(cells)]
+        diff = candidates - c.reshape(1, 3)
+        return candidates[np.einsum("ij,ij->i", diff, diff) <= r_sq]
+
+    def query_capsule(self, start: Sequence[float], end: Sequence[float], radius: float) -> np.ndarray:
+        """Return the indexed points within ``radius`` of the segment ``start`` → ``end``."""
+
+        if len(self) == 0 or radius < 0:
+            return self.points[:0]
+        a = np.asarray(start[:3], dtype=np.float64)
+        b = np.asarray(end[:3], dtype=np.float64)
+        half_diag = 0.5 * math.sqrt(3.0) * self.cell_size
+        centers = self._cell_lo + 0.5 * self.cell_size
+        cell_dist = np.sqrt(_segment_distance_sq(centers, a, b))
+        cells = np.flatnonzero(cell_dist <= float(radius) + half_diag)
+        candidates = self.points[self._point_indices(cells)]
+        if candidates.shape[0] == 0:
+            return candidates
+        inside = _segment_distance_sq(candidates, a, b) <= float(radius) * float(radius)
+        return candidates[inside]
+
+    def corridor_free_distance(
+        self,
+        origin: Sequence[float],
+        direction_point: Sequence[float],
+        *,
+        lookahead: float,
+        corridor_radius: float,
+    ) -> float:
+        """Distance to the first point inside a forward cylinder of ``corridor_radius``.
+
+        Mirrors the brute-force ``corridor_free_distance`` helper of the space
+        navigator: only points whose projection lies in ``[0, lookahead]``
+        count, and ``lookahead`` is returned when the corridor is clear.
+        """
+
+        o = np.asarray(origin[:3], dtype=np.float64)
+        d = np.asarray(direction_point[:3], dtype=np.float64) - o
+        length = float(np.linalg.norm(d))
+        if length <= 1e-6:
+            return 0.0
+        direction = d / length
+        candidates = self.query_capsule(o, o + direction * lookahead, corridor_radius)
+        if candidates.shape[0] == 0:
+            return lookahead
+        rel = candidates - o.reshape(1, 3)
+        projections = rel @ direction
+        forward = (projections >= 0.0) & (projections <= lookahead)
+        if not np.any(forward):
+            return lookahead
+        closest = rel[forward] - projections[forward].reshape(-1, 1) * direction.reshape(1, 3)
+        lateral_sq = np.einsum("ij,ij->i", closest, closest)
+        inside = lateral_sq <= corridor_radius * corridor_radius
+        if not np.any(inside):
+            return lookahead
+        return max(0.0, float(np.min(projections[forward][inside])))
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+
+    def _cell_box_distance_sq(self, center: np.ndarray) -> np.ndarray:
+        lo = self._cell_lo
+        hi = lo + self.cell_size
+        gap = np.maximum(np.maximum(lo - center.reshape(1, 3), center.reshape(1, 3) - hi), 0.0)
+        return np.einsum("ij,ij->i", gap, gap)
+
+    def _point_indices(self, cells: np.ndarray) -> np.ndarray:
+        starts = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return offsets + np.arange(total, dtype=np.int64)
+
+
+def _segment_distance_sq(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ab = b - a
+    denom = float(ab @ ab)
+    rel = points - a.reshape(1, 3)
+    if denom <= 1e-12:
+        return np.einsum("ij,ij->i", rel, rel)
+    t = np.clip((rel @ ab) / denom, 0.0, 1.0)
+    closest = rel - t.reshape(-1, 1) * ab.reshape(1, 3)
+    return np.einsum("ij,ij->i", closest, closest)
+
+
+def _as_points(points: Any) -> np.ndarray:
+    try:
+        if len(points) == 0:
+            return np.zeros((0, 3), dtype=np.float64)
+    except TypeError:
+        pass
+    try:
+        arr = np.asarray(points, dtype=np.float64)
+    except (TypeError, ValueError):
+        arr = np.asarray(
+            [p[:3] for p in points if isinstance(p, (list, tuple)) and len(p) >= 3],
+            dtype=np.float64,
+        )
+    if arr.ndim != 2 or arr.shape[1] < 3:
+        return np.zeros((0, 3), dtype=np.float64)
+    arr = arr[:, :3]
+    return np.ascontiguousarray(arr[np.all(np.isfinite(arr), axis=1)])
+
+
+def _auto_cell_size(points: np.ndarray, points_per_cell: float = 8.0) -> float:
+    if points.shape[0] < 2:
+        return 1.0
+    extent = float(np.max(np.ptp(points, axis=0)))
+    if extent <= 0.0:
+        return 1.0
+    cells_per_axis = max(1.0, (points.shape[0] / points_per_cell) ** (1.0 / 3.0))
+    return max(extent / cells_per_axis, 1e-3)
+
+
+__all__ = ["PointGridIndex"]
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from secontrol.controllers.radar_controller import RadarController
+from secontrol.devices.ore_detector_device import OreDetectorDevice
+from secontrol.devices.remote_control_device import RemoteControlDevice
+from secontrol.sim import FlightSimulator, VirtualClock, VoxelWorld
+from secontrol.tools.radar_navigation import RawRadarMap
+
+
+def _sphere_world(n: int = 30, cell_size: float = 20.0, radius: float = 100.0) -> VoxelWorld:
+    origin = np.full(3, -n * cell_size / 2.0)
+    centres = origin + (np.indices((n,) * 3).reshape(3, -1).T + 0.5) * cell_size
+    occ = (np.linalg.norm(centres, axis=1) < radius).reshape((n,) * 3)
+    return VoxelWorld(
+        RawRadarMap(
+            occ=occ,
+            origin=origin,
+            cell_size=cell_size,
+            size=occ.shape,
+            revision=1,
+            timestamp_ms=1,
+            contacts=(),
+            _inflation_cache={},
+        )
+    )
+
+
+def test_virtual_clock_drives_callback_and_restores_time():
+    seen = []
+    clock = VirtualClock(start=100.0, on_advance=seen.append)
+    real_sleep = time.sleep
+    with clock:
+        t0 = time.time()
+        time.sleep(2.5)
+        assert time.time() >= t0 + 2.5
+    assert time.sleep is real_sleep
+    assert sum(seen) >= 2.5
+
+
+def test_world_scan_streams_near_tiles_first():
+    world = _sphere_world()
+    volume = world.scan((0.0, 0.0, -250.0), 200.0, 20.0, tile_cells=4)
+
+    assert volume.total_tiles > 1
+    assert len(volume.points_for_tiles(volume.total_tiles)) == len(volume.points) > 0
+    distances = np.linalg.norm(volume.points - np.array([0.0, 0.0, -250.0]), axis=1)
+    half = len(distances) // 2
+    assert distances[:half].mean() < distances[half:].mean()
+    assert np.all(np.diff(volume.tile_ends) >= 0)
+
+
+def test_remote_control_goto_flies_ship_to_waypoint():
+    sim = FlightSimulator(_sphere_world(), start=(0.0, 0.0, -250.0))
+    rc = sim.grid().get_first_device(RemoteControlDevice)
+
+    def fly():
+        rc.goto("GPS:Target:50:0:-250:", speed=20.0)
+        rc.autopilot_enable()
+        deadline = time.time() + 60.0
+        time.sleep(0.5)
+        while rc.autopilot_enabled() and time.time() < deadline:
+            time.sleep(0.5)
+
+    sim.run(fly)
+
+    assert np.linalg.norm(sim.ship.position - np.array([50.0, 0.0, -250.0])) <= 1.5
+    assert sim.metrics.commands["remote_goto"] == 1
+    assert sim.metrics.collisions == 0
+    assert 0.0 < sim.metrics.sim_seconds < 60.0
+
+
+def test_scan_is_progressive_and_deterministic():
+    def run_scan():
+        sim = FlightSimulator(_sphere_world(), start=(0.0, 0.0, -250.0), scan_tiles_per_second=20.0)
+        radar = sim.grid().get_first_device(OreDetectorDevice)
+        controller = RadarController(radar, radius=200.0, cell_size=20.0)
+
+        def scan():
+            with contextlib.redirect_stdout(io.StringIO()):
+                return list(controller.iter_scan_voxels(max_wait_sec=60.0))
+
+        updates = sim.run(scan)
+        return sim, controller, updates
+
+    sim, controller, updates = run_scan()
+    assert sim.metrics.scans == 1
+    assert updates and updates[-1].done
+    assert len(updates) > 2
+    assert controller.occupancy_grid is not None and controller.occupancy_grid.any()
+
+    again, _, _ = run_scan()
+    assert again.metrics.sim_seconds == sim.metrics.sim_seconds
+    assert again.metrics.commands == sim.metrics.commands
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import numpy as np
+
+from secontrol.tools.hierarchical_pathfinding import HierarchicalPathFinder
+from secontrol.tools.radar_navigation import PassabilityProfile, PathCache, PathFinder, RawRadarMap
+
+
+def _map(occ, revision=1):
+    return RawRadarMap(
+        occ=occ,
+        origin=np.zeros(3),
+        cell_size=10.0,
+        size=occ.shape,
+        revision=revision,
+        timestamp_ms=revision,
+        contacts=(),
+        _inflation_cache={},
+    )
+
+
+def _profile():
+    return PassabilityProfile(
+        robot_radius=0.0,
+        clearance_voxels=0,
+        max_slope_degrees=90.0,
+        max_step_cells=1,
+        allow_vertical_movement=True,
+    )
+
+
+def _length(path):
+    return sum(float(np.linalg.norm(np.subtract(b, a))) for a, b in zip(path, path[1:]))
+
+
+def _assert_valid(occ, path, start, goal):
+    assert path[0] == start and path[-1] == goal
+    for a, b in zip(path, path[1:]):
+        assert max(abs(a[i] - b[i]) for i in range(3)) == 1
+        assert not occ[b]
+
+
+def _wall_with_hole():
+    occ = np.zeros((24, 24, 24), dtype=bool)
+    occ[12, :, :] = True
+    occ[12, 18:20, 18:20] = False
+    return occ
+
+
+def test_hierarchical_path_goes_through_the_only_opening():
+    occ = _wall_with_hole()
+    planner = HierarchicalPathFinder(_map(occ), _profile(), chunk_cells=8)
+
+    abstract = planner.find_abstract_path((2, 2, 2), (21, 2, 2))
+    path = planner.refine(abstract)
+
+    _assert_valid(occ, path, (2, 2, 2), (21, 2, 2))
+    assert any(p[0] == 12 and 18 <= p[1] < 20 and 18 <= p[2] < 20 for p in path)
+    flat = PathFinder(_map(occ), _profile()).find_path_indices((2, 2, 2), (21, 2, 2))
+    assert _length(path) <= 1.3 * _length(flat)
+
+
+def test_partial_refinement_stops_at_abstract_node():
+    occ = np.zeros((32, 32, 32), dtype=bool)
+    planner = HierarchicalPathFinder(_map(occ), _profile(), chunk_cells=8)
+
+    abstract = planner.find_abstract_path((1, 1, 1), (30, 30, 30))
+    leg = planner.refine(abstract, max_legs=2)
+
+    assert len(abstract) > 3
+    _assert_valid(occ, leg, (1, 1, 1), abstract[2])
+    assert planner.built_chunks < 64
+
+
+def test_update_map_invalidates_only_changed_chunks():
+    occ = _wall_with_hole()
+    planner = HierarchicalPathFinder(_map(occ), _profile(), chunk_cells=8)
+    planner.find_abstract_path((2, 2, 2), (21, 2, 2))
+
+    changed = occ.copy()
+    changed[12, 18:20, 18:20] = True
+    changed[12, 2:4, 2:4] = False
+    invalidated = planner.update_map(_map(changed, revision=2))
+
+    assert invalidated == {(1, 2, 2), (1, 0, 0)}
+    path = planner.refine(planner.find_abstract_path((2, 2, 2), (21, 2, 2)))
+    _assert_valid(changed, path, (2, 2, 2), (21, 2, 2))
+    assert any(p[0] == 12 and p[1] < 4 and p[2] < 4 for p in path)
+
+
+def test_update_map_keeps_neighbour_graphs_and_resyncs_shared_portals():
+    occ = _wall_with_hole()
+    planner = HierarchicalPathFinder(_map(occ), _profile(), chunk_cells=8)
+    planner.find_abstract_path((2, 2, 2), (21, 2, 2))
+    neighbour = planner._chunks[(0, 0, 0)]
+
+    before = set(neighbour.edges)
+
+    changed = occ.copy()
+    changed[12, 2:4, 2:4] = False
+    changed[8, 0:5, 0:8] = True
+    planner.update_map(_map(changed, revision=2))
+
+    assert planner._chunks[(0, 0, 0)] is neighbour
+    assert set(planner._chunk_graph((0, 0, 0)).edges) != before
+    fresh = HierarchicalPathFinder(_map(changed), _profile(), chunk_cells=8)
+    for key in ((0, 0, 0), (1, 0, 0)):
+        patched = planner._chunk_graph(key).edges
+        expected = fresh._chunk_graph(key).edges
+        assert set(patched) == set(expected)
+        for node, links in expected.items():
+            assert sorted(patched[node]) == sorted(links)
+
+
+def test_goal_entered_only_by_a_diagonal_face_crossing_is_still_reached():
+    occ = np.zeros((8, 4, 4), dtype=bool)
+    goal = (4, 1, 1)
+    # Block every axis neighbour of the goal: the only way in is the
+    # three-axis diagonal from (3, 0, 0) across the x face, which has no
+    # reverse move and therefore no portal.
+    for cell in ((3, 1, 1), (5, 1, 1), (4, 0, 1), (4, 2, 1), (4, 1, 0), (4, 1, 2)):
+        occ[cell] = True
+    planner = HierarchicalPathFinder(_map(occ), _profile(), chunk_cells=4)
+
+    assert planner.find_abstract_path((0, 0, 0), goal) == []
+    path = planner.find_path_world((5.0, 5.0, 5.0), (45.0, 15.0, 15.0))
+
+    flat = PathFinder(_map(occ), _profile()).find_path_world((5.0, 5.0, 5.0), (45.0, 15.0, 15.0))
+    assert flat and path == flat
+    assert path[-2:] == [(35.0, 5.0, 5.0), (45.0, 15.0, 15.0)]
+
+
+def test_find_path_world_returns_world_points():
+    occ = np.zeros((16, 16, 16), dtype=bool)
+    planner = HierarchicalPathFinder(_map(occ), _profile(), chunk_cells=8)
+
+    path = planner.find_path_world((5.0, 5.0, 5.0), (155.0, 155.0, 5.0))
+
+    assert path[0] == (5.0, 5.0, 5.0)
+    assert path[-1] == (155.0, 155.0, 5.0)
+
+
+def test_find_path_world_shortcuts_and_caches_only_complete_routes():
+    occ = _wall_with_hole()
+    cache = PathCache()
+    planner = HierarchicalPathFinder(_map(occ), _profile(), chunk_cells=8)
+    start, goal = (25.0, 25.0, 25.0), (215.0, 25.0, 25.0)
+
+    partial = planner.find_path_world(start, goal, max_legs=1, any_angle=True, cache=cache)
+    assert partial[-1] != goal and len(cache) == 0
+
+    path = planner.find_path_world(start, goal, any_angle=True, cache=cache)
+    grid = planner.find_path_world(start, goal)
+
+    assert path[0] == start and path[-1] == goal
+    assert len(path) < len(grid)
+    assert len(cache) == 1
+    assert planner.find_path_world(start, goal, any_angle=True, cache=cache) == path
+    assert cache.hits == 1
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from secontrol.tools.incremental_pathfinding import DStarLitePlanner
+from secontrol.tools.radar_navigation import PassabilityProfile, PathFinder, RawRadarMap
+
+
+def _map(occ, origin=(0.0, 0.0, 0.0), cell=1.0):
+    return RawRadarMap(
+        occ=occ.copy(),
+        origin=np.array(origin, dtype=float),
+        cell_size=cell,
+        size=occ.shape,
+        revision=1,
+        timestamp_ms=1,
+        contacts=(),
+        _inflation_cache={},
+    )
+
+
+def _profile():
+    return PassabilityProfile(
+        robot_radius=0.0,
+        clearance_voxels=0,
+        max_slope_degrees=90.0,
+        allow_vertical_movement=True,
+    )
+
+
+def _length(path):
+    return sum(float(np.linalg.norm(np.subtract(b, a))) for a, b in zip(path, path[1:]))
+
+
+def _astar_length(occ, start, goal):
+    return _length(PathFinder(_map(occ), _profile()).find_path_indices(start, goal))
+
+
+def test_replanning_after_map_changes_matches_fresh_astar():
+    rng = np.random.default_rng(3)
+    occ = rng.random((12, 12, 12)) < 0.2
+    occ[0, 0, 0] = occ[11, 11, 11] = False
+    planner = DStarLitePlanner(_map(occ), _profile())
+
+    path = planner.find_path_indices((0, 0, 0), (11, 11, 11))
+    assert path[0] == (0, 0, 0) and path[-1] == (11, 11, 11)
+    assert _length(path) == pytest.approx(_astar_length(occ, (0, 0, 0), (11, 11, 11)))
+
+    for _ in range(4):
+        # Block part of the current route and clear a few random cells.
+        for idx in path[2:-2:3]:
+            occ[idx] = True
+        for idx in rng.integers(0, 12, size=(20, 3)):
+            occ[tuple(idx)] = False
+        occ[0, 0, 0] = occ[11, 11, 11] = False
+        flipped = planner.update_map(_map(occ))
+        assert flipped > 0
+
+        path = planner.find_path_indices((0, 0, 0), (11, 11, 11))
+        expected = _astar_length(occ, (0, 0, 0), (11, 11, 11))
+        assert _length(path) == pytest.approx(expected)
+        assert not any(occ[idx] for idx in path)
+
+
+def test_moving_start_reuses_search_and_stays_optimal():
+    occ = np.zeros((16, 16, 4), dtype=bool)
+    occ[8, 0:14, :] = True
+    planner = DStarLitePlanner(_map(occ), _profile())
+
+    first = planner.find_path_indices((0, 0, 1), (15, 0, 1))
+    initial_expansions = planner.expansions
+    second = planner.find_path_indices(first[3], (15, 0, 1))
+
+    assert second[0] == first[3]
+    assert _length(second) == pytest.approx(_astar_length(occ, first[3], (15, 0, 1)))
+    assert planner.expansions - initial_expansions < initial_expansions / 4
+
+
+def test_unchanged_map_does_not_expand_again():
+    occ = np.zeros((10, 10, 10), dtype=bool)
+    occ[5, :8, :] = True
+    planner = DStarLitePlanner(_map(occ), _profile())
+    planner.find_path_indices((0, 0, 0), (9, 0, 9))
+    expansions = planner.expansions
+
+    assert planner.update_map(_map(occ)) == 0
+    planner.find_path_indices((0, 0, 0), (9, 0, 9))
+
+    assert planner.expansions == expansions
+
+
+def test_shifted_map_is_diffed_over_the_overlap():
+    occ = np.zeros((10, 10, 10), dtype=bool)
+    planner = DStarLitePlanner(_map(occ), _profile())
+    planner.find_path_world((0.5, 0.5, 0.5), (9.5, 0.5, 0.5))
+
+    shifted = np.zeros((10, 10, 10), dtype=bool)
+    shifted[0, 0:5, 0:5] = True  # frame cell x=5 once shifted by five cells
+    flipped = planner.update_map(_map(shifted, origin=(5.0, 0.0, 0.0)))
+
+    assert flipped == 25
+    assert planner.radar_map.origin[0] == 0.0
+    path = planner.find_path_world((0.5, 0.5, 0.5), (9.5, 0.5, 0.5))
+    assert path[0] == (0.5, 0.5, 0.5) and path[-1] == (9.5, 0.5, 0.5)
+    assert all(not (5.0 <= p[0] < 6.0 and p[1] < 5.0 and p[2] < 5.0) for p in path)
+
+    # Off-lattice scans are resampled conservatively: the solid slab now
+    # straddles frame cells x=5 and x=6.
+    assert planner.update_map(_map(shifted, origin=(5.25, 0.0, 0.0))) == 25
+    assert planner.radar_map.origin[0] == 0.0
+    assert planner._finder._occ[6, 0:5, 0:5].all()
+
+    assert planner.update_map(_map(shifted, origin=(0.25, 0.0, 0.0), cell=2.0)) == -1
+    assert planner.radar_map.cell_size == 2.0
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from secontrol.tools.ore_index import OreIndex, parse_ore_cell
+
+
+def _brute_force_components(materials, positions, link):
+    n = len(materials)
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(n):
+        for j in range(i + 1, n):
+            if materials[i] == materials[j] and math.dist(positions[i], positions[j]) <= link:
+                parent[find(i)] = find(j)
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(sorted(g) for g in groups.values())
+
+
+def test_parse_ore_cell_accepts_known_formats():
+    assert parse_ore_cell({"material": "Iron", "position": [1, 2, 3], "content": 5}) == ("Iron", (1.0, 2.0, 3.0), 5.0)
+    assert parse_ore_cell({"ore": "Gold", "worldX": 1, "worldY": 0, "worldZ": 2}) == ("Gold", (1.0, 0.0, 2.0), None)
+    assert parse_ore_cell((4, 5, 6)) == ("", (4.0, 5.0, 6.0), None)
+    assert parse_ore_cell(SimpleNamespace(material="Ice", position=(1, 1, 1), content=None))[0] == "Ice"
+    assert parse_ore_cell({"material": "Iron"}) is None
+
+
+def test_deposits_match_brute_force_components():
+    rng = np.random.default_rng(3)
+    positions = [tuple(p) for p in rng.uniform(0, 400, (300, 3))]
+    materials = [("Iron", "Nickel")[i % 2] for i in range(300)]
+    index = OreIndex(
+        [{"material": m, "position": p, "content": 1} for m, p in zip(materials, positions)],
+        link_radius=40.0,
+    )
+
+    deposits = index.deposits()
+
+    expected = _brute_force_components(materials, positions, 40.0)
+    assert sorted(d.count for d in deposits) == sorted(len(g) for g in expected)
+    assert sum(d.content for d in deposits) == pytest.approx(300.0)
+    assert {d.material for d in index.deposits("iron")} == {"Iron"}
+
+
+def test_incremental_insert_deduplicates_and_updates_content():
+    index = OreIndex(link_radius=20.0)
+    assert index.add_cells([{"material": "Iron", "position": [0, 0, 0], "content": 1}]) == 1
+    assert index.add_cells([
+        {"material": "Iron", "position": [0, 0, 0], "content": 7},
+        {"material": "Iron", "position": [15, 0, 0]},
+        {"material": "Stone", "position": [5, 0, 0]},
+    ]) == 2
+
+    assert len(index) == 3
+    assert [d.count for d in index.deposits("Iron")] == [2]
+    assert index.deposits("Iron")[0].content == pytest.approx(7.0)
+
+
+def test_nearest_and_radius_queries_filter_by_material():
+    index = OreIndex([
+        {"material": "Iron", "position": [10, 0, 0]},
+        {"material": "Iron", "position": [30, 0, 0]},
+        {"material": "Gold", "position": [5, 0, 0]},
+        {"material": "Stone", "position": [1, 0, 0]},
+    ])
+
+    nearest = index.nearest((0, 0, 0), k=2, material="iron")
+    assert [(d, c.position) for d, c in nearest] == [(10.0, (10.0, 0.0, 0.0)), (30.0, (30.0, 0.0, 0.0))]
+    within = index.cells_within((0, 0, 0), 12.0, exclude=("Stone",))
+    assert [c.material for _, c in within] == ["Gold", "Iron"]
+
+
+def test_deposits_within_sorts_by_distance_or_content():
+    index = OreIndex([
+        {"material": "Iron", "position": [100, 0, 0], "content": 1},
+        {"material": "Iron", "position": [500, 0, 0], "content": 3},
+        {"material": "Iron", "position": [510, 0, 0], "content": 3},
+    ], link_radius=50.0)
+
+    by_distance = index.deposits_within((0, 0, 0))
+    assert [d.count for _, d in by_distance] == [1, 2]
+    by_content = index.deposits_within((0, 0, 0), sort_by="content")
+    assert by_content[0][1].content == pytest.approx(6.0)
+    assert index.deposits_within((0, 0, 0), radius=200.0, limit=5)[0][0] == pytest.approx(100.0)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from secontrol.tools.planner_service import PlannerService
+from secontrol.tools.radar_navigation import PassabilityProfile, PathCache, PathFinder, RawRadarMap
+
+
+def _map(occ):
+    return RawRadarMap(
+        occ=occ,
+        origin=np.zeros(3, dtype=float),
+        cell_size=1.0,
+        size=occ.shape,
+        revision=1,
+        timestamp_ms=1,
+        contacts=(),
+        _inflation_cache={},
+    )
+
+
+def _profile():
+    return PassabilityProfile(
+        robot_radius=0.0,
+        clearance_voxels=0,
+        max_slope_degrees=90.0,
+        allow_vertical_movement=True,
+    )
+
+
+def _maze(n=40):
+    occ = np.zeros((n, n, n), dtype=bool)
+    for x in range(4, n - 4, 4):
+        occ[x, :, :] = True
+        hole = (n - 2) if (x // 4) % 2 else 1
+        occ[x, hole, hole] = False
+    return occ
+
+
+def test_thread_service_matches_synchronous_search():
+    occ = _maze(16)
+    radar_map = _map(occ)
+    expected = PathFinder(_map(occ.copy()), _profile()).find_path_world((0.5, 0.5, 0.5), (15.5, 15.5, 15.5))
+
+    with PlannerService() as service:
+        result = service.submit(radar_map, (0.5, 0.5, 0.5), (15.5, 15.5, 15.5), _profile()).result(10)
+
+    assert result.status == "complete"
+    assert result.path == expected
+
+
+def test_thread_service_consults_and_fills_path_cache():
+    occ = _maze(16)
+    cache = PathCache()
+
+    with PlannerService() as service:
+        first = service.submit(_map(occ), (0.5, 0.5, 0.5), (15.5, 15.5, 15.5), _profile(), cache=cache).result(10)
+        second = service.submit(_map(occ), (0.5, 0.5, 0.5), (15.5, 15.5, 15.5), _profile(), cache=cache).result(10)
+
+    assert len(cache) == 1
+    assert cache.hits == 1
+    assert second.path == first.path
+
+
+def test_deadline_returns_best_partial_path():
+    with PlannerService() as service:
+        result = service.submit(
+            _map(_maze()), (0.5, 0.5, 0.5), (39.5, 39.5, 39.5), _profile(), deadline=0.0
+        ).result(10)
+
+    assert result.status == "partial"
+    assert result.path and result.path[0] == (0.5, 0.5, 0.5)
+    assert result.path[-1] != (39.5, 39.5, 39.5)
+
+
+def test_cancel_stops_running_search():
+    with PlannerService() as service:
+        future = service.submit(_map(_maze(60)), (0.5, 0.5, 0.5), (59.5, 59.5, 59.5), _profile())
+        time.sleep(0.05)
+        started = time.time()
+        future.cancel()
+        result = future.result(10)
+
+    assert result.status == "cancelled"
+    assert time.time() - started < 1.0
+
+
+def test_process_service_uses_shared_occupancy():
+    occ = _maze(16)
+    expected = PathFinder(_map(occ.copy()), _profile()).find_path_world((0.5, 0.5, 0.5), (15.5, 15.5, 15.5))
+
+    with PlannerService(use_processes=True) as service:
+        result = service.submit(_map(occ), (0.5, 0.5, 0.5), (15.5, 15.5, 15.5), _profile()).result(60)
+
+    assert result.status == "complete"
+    assert result.path == expected
@@ -29,3 +29,82 @@ def test_get_surface_height_neighbour_search():
     height = controller.get_surface_height(5.0, 15.0)
 
     assert height == 25.0
+
+
+class _StreamingRadar:
+    """Radar stub replaying a fixed sequence of telemetry packets."""
+
+    def __init__(self, packets):
+        self._packets = list(packets)
+        self.telemetry = {}
+
+    def scan(self, **kwargs):
+        return 1
+
+    def wait_for_telemetry(self, timeout=None, need_update=True):
+        if not self._packets:
+            return False
+        self.telemetry = self._packets.pop(0)
+        return True
+
+    def radar_snapshot(self):
+        return None
+
+    def update(self):
+        pass
+
+
+def _radar_payload(rev, solid, done):
+    return {
+        "raw": {"rev": rev, "tsMs": rev, "size": [4, 4, 4], "cellSize": 10.0, "origin": [0.0, 0.0, 0.0], "solid": solid},
+        "done": done,
+    }
+
+
+def test_iter_scan_voxels_streams_partial_tiles():
+    packets = [
+        {"scan": {"inProgress": True, "progressPercent": 25.0, "processedTiles": 1, "totalTiles": 4},
+         "radar": _radar_payload(1, [0, 1], False)},
+        {"scan": {"inProgress": True, "progressPercent": 50.0, "processedTiles": 2, "totalTiles": 4},
+         "radar": _radar_payload(2, [0, 1, 63], False)},
+        {"scan": {"inProgress": False, "progressPercent": 100.0, "processedTiles": 4, "totalTiles": 4, "done": True},
+         "radar": _radar_payload(3, [0, 1, 63, 21], True)},
+    ]
+    controller = RadarController(_StreamingRadar(packets))
+    updates = []
+
+    solid, metadata, _contacts, _ores = controller.scan_voxels(on_progress=updates.append)
+
+    partial = [u for u in updates if not u.done]
+    assert [u.processed_tiles for u in partial] == [1, 2]
+    assert partial[0].new_solid == [[5.0, 5.0, 5.0], [5.0, 5.0, 15.0]]
+    assert partial[1].new_solid == [[35.0, 35.0, 35.0]]
+    assert partial[1].solid_count == 3
+
+    final = updates[-1]
+    assert final.done and final.result[0] == solid
+    assert len(solid) == 4
+    assert metadata["rev"] == 3
+    assert int(controller.occupancy_grid.sum()) == 4
+
+
+def test_iter_scan_voxels_survives_malformed_partials_and_missing_scan_state():
+    broken = _radar_payload(1, [0], False)
+    broken["raw"]["size"] = 4  # not a list
+    packets = [
+        {"scan": {"inProgress": True, "progressPercent": 25.0, "processedTiles": 1, "totalTiles": 4}, "radar": broken},
+        {"scan": None, "radar": _radar_payload(2, [0, 1], False)},
+        {"scan": {"inProgress": False, "progressPercent": 100.0, "processedTiles": 4, "totalTiles": 4, "done": True},
+         "radar": _radar_payload(3, [0, 1, 63], True)},
+    ]
+    controller = RadarController(_StreamingRadar(packets))
+    updates = []
+
+    solid, _metadata, _contacts, _ores = controller.scan_voxels(on_progress=updates.append)
+
+    partial = [u for u in updates if not u.done]
+    assert [u.progress for u in partial] == [25.0, 0.0]
+    assert partial[0].new_solid == [] and partial[0].metadata is None
+    assert partial[1].new_solid == [[5.0, 5.0, 5.0], [5.0, 5.0, 15.0]]
+    assert partial[1].solid_count == 2
+    assert len(solid) == 3
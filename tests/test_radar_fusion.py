@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from secontrol.tools.radar_fusion import FusedRadarMap
+
+
+def _metadata(origin=(0.0, 0.0, 0.0), size=(8, 8, 8), cell=10.0, ts=1000, radius=None):
+    return {"origin": list(origin), "size": list(size), "cellSize": cell, "tsMs": ts, "radius": radius}
+
+
+def test_integrate_scan_marks_hits_and_misses():
+    fused = FusedRadarMap(cell_size=10.0, brick_size=4)
+
+    rev = fused.integrate_scan([[15.0, 15.0, 15.0]], _metadata())
+
+    assert rev == 1
+    assert fused.is_occupied((15.0, 15.0, 15.0))
+    assert not fused.is_occupied((55.0, 55.0, 55.0))
+    assert fused.log_odds_at((55.0, 55.0, 55.0)) < 0
+    assert fused.log_odds_at((500.0, 500.0, 500.0)) is None
+    np.testing.assert_allclose(fused.solid_points(), [[15.0, 15.0, 15.0]])
+
+
+def test_repeated_misses_clear_mined_cell():
+    fused = FusedRadarMap(cell_size=10.0, brick_size=4)
+    fused.integrate_scan([[15.0, 15.0, 15.0]], _metadata(ts=1))
+    fused.integrate_scan([[15.0, 15.0, 15.0]], _metadata(ts=2))
+
+    fused.integrate_scan([], _metadata(ts=3))
+    assert fused.is_occupied((15.0, 15.0, 15.0))
+    fused.integrate_scan([], _metadata(ts=4))
+    fused.integrate_scan([], _metadata(ts=5))
+
+    assert not fused.is_occupied((15.0, 15.0, 15.0))
+    assert fused.revision == 5
+
+
+def test_scans_accumulate_across_regions():
+    fused = FusedRadarMap(cell_size=10.0, brick_size=4)
+    fused.integrate_scan([[5.0, 5.0, 5.0]], _metadata(ts=1))
+    fused.integrate_scan([[205.0, 5.0, 5.0]], _metadata(origin=(160.0, 0.0, 0.0), ts=2))
+
+    raw = fused.to_raw_map((0.0, 0.0, 0.0), (240.0, 80.0, 80.0))
+
+    assert raw.size == (24, 8, 8)
+    assert raw.occ[0, 0, 0] and raw.occ[20, 0, 0]
+    assert int(raw.occ.sum()) == 2
+    assert raw.revision == 2
+
+
+def test_sphere_limits_observed_cells():
+    fused = FusedRadarMap(cell_size=10.0, brick_size=4)
+
+    fused.integrate_scan([], _metadata(radius=20.0))
+
+    assert fused.log_odds_at((45.0, 45.0, 45.0)) < 0
+    assert fused.log_odds_at((5.0, 5.0, 5.0)) == 0
+
+
+def test_stale_regions_reports_old_and_unknown_bricks():
+    fused = FusedRadarMap(cell_size=10.0, brick_size=4)
+    fused.integrate_scan([], _metadata(size=(4, 4, 4), ts=1000))
+    fused.integrate_scan([], _metadata(origin=(40.0, 0.0, 0.0), size=(4, 4, 4), ts=9000))
+
+    stale = fused.stale_regions(5000)
+    assert [r.key for r in stale] == [(0, 0, 0)]
+    assert stale[0].center == pytest.approx((20.0, 20.0, 20.0))
+
+    around = fused.stale_regions(5000, center=(40.0, 20.0, 20.0), radius=30.0)
+    keys = {r.key for r in around}
+    assert (0, 0, 0) in keys and (1, 0, 0) not in keys
+    assert (0, -1, 0) in keys and (-1, 0, 0) not in keys
+    assert around[0].last_seen_ms is None
+
+
+def test_coarse_scan_keeps_fine_detail_inside_solid_cell():
+    fused = FusedRadarMap(cell_size=10.0, brick_size=4)
+    fine = [[x + 5.0, y + 5.0, z + 5.0] for x in range(0, 50, 10) for y in range(0, 50, 10) for z in range(0, 50, 10)]
+    fused.integrate_scan(fine, _metadata(size=(10, 10, 10), ts=1))
+    assert len(fused.solid_points()) == 125
+
+    coarse = _metadata(size=(2, 2, 2), cell=50.0, ts=2)
+    fused.integrate_scan([[25.0, 25.0, 25.0]], coarse)
+    fused.integrate_scan([[25.0, 25.0, 25.0]], dict(coarse, tsMs=3))
+
+    assert len(fused.solid_points()) == 125
+    assert fused.log_odds_at((75.0, 75.0, 75.0)) < 0
@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from secontrol.tools.radar_navigation import PassabilityProfile, PathCache, PathFinder, RawRadarMap
+
+
+def _map(size=(8, 8, 8), cell=10.0, solid=()):
+    occ = np.zeros(size, dtype=bool)
+    for idx in solid:
+        occ[idx] = True
+    return RawRadarMap(
+        occ=occ,
+        origin=np.array([0.0, 0.0, 0.0], dtype=float),
+        cell_size=cell,
+        size=size,
+        revision=1,
+        timestamp_ms=1,
+        contacts=(),
+        _inflation_cache={},
+    )
+
+
+def _brute_force_distance(occ: np.ndarray) -> np.ndarray:
+    solid = np.argwhere(occ)
+    cells = np.argwhere(np.ones_like(occ))
+    diff = cells[:, None, :] - solid[None, :, :]
+    dist = np.sqrt(np.min(np.sum(diff * diff, axis=2), axis=1))
+    return dist.reshape(occ.shape)
+
+
+def test_distance_field_matches_brute_force():
+    rng = np.random.default_rng(7)
+    occ = rng.random((9, 7, 6)) < 0.05
+    occ[0, 0, 0] = True
+    radar_map = _map(size=occ.shape, cell=2.0)
+    radar_map.occ[:] = occ
+
+    field = radar_map.distance_field()
+
+    assert field.dtype == np.float32
+    np.testing.assert_allclose(field, _brute_force_distance(occ) * 2.0, rtol=1e-5)
+    assert radar_map.distance_field() is field
+
+
+def test_signed_distance_field_is_negative_inside_obstacles():
+    solid = [(x, y, z) for x in range(2, 5) for y in range(2, 5) for z in range(2, 5)]
+    radar_map = _map(solid=solid)
+
+    field = radar_map.distance_field(signed=True)
+
+    assert field[3, 3, 3] == pytest.approx(-20.0)
+    assert field[2, 3, 3] == pytest.approx(-10.0)
+    assert field[1, 3, 3] == pytest.approx(10.0)
+
+
+def test_distance_field_is_infinite_without_obstacles():
+    radar_map = _map(size=(3, 3, 3))
+
+    assert np.isinf(radar_map.distance_field()).all()
+    assert radar_map.clearance_at((15.0, 15.0, 15.0)) == float("inf")
+
+
+def test_clearance_queries_use_distance_field():
+    radar_map = _map(solid=[(4, 4, 4)])
+
+    assert radar_map.clearance_at((15.0, 45.0, 45.0)) == pytest.approx(30.0)
+    assert radar_map.is_clear((1, 4, 4), 30.0)
+    assert not radar_map.is_clear((2, 4, 4), 30.0)
+    assert radar_map.segment_clearance((5.0, 45.0, 45.0), (75.0, 45.0, 45.0)) == 0.0
+    assert radar_map.segment_clearance((5.0, 5.0, 5.0), (75.0, 5.0, 5.0)) == pytest.approx(
+        float(np.sqrt(0 + 16 + 16)) * 10.0
+    )
+
+
+def test_nearest_free_index_uses_euclidean_feature_transform():
+    solid = [(x, y, z) for x in range(8) for y in range(8) for z in range(0, 5)]
+    radar_map = _map(solid=solid)
+
+    assert radar_map.nearest_free_index((3, 3, 1)) == (3, 3, 5)
+    assert radar_map.nearest_free_index((3, 3, 6)) == (3, 3, 6)
+
+
+def test_path_finder_snaps_blocked_endpoints_to_nearest_free_cell():
+    radar_map = _map(solid=[(4, 4, 4)])
+    finder = PathFinder(radar_map, PassabilityProfile(robot_radius=0.0, clearance_voxels=0))
+
+    path = finder.find_path_world((45.0, 45.0, 45.0), (5.0, 5.0, 5.0))
+
+    assert path
+    assert radar_map.world_to_index(path[0]) != (4, 4, 4)
+    assert path[-1] == (5.0, 5.0, 5.0)
+
+
+def _reference_cost(occ, start, goal):
+    """Plain Dijkstra over 26-connected moves without corner cutting."""
+
+    import heapq
+    import itertools
+    import math
+
+    dist = {start: 0.0}
+    heap = [(0.0, start)]
+    while heap:
+        d, cur = heapq.heappop(heap)
+        if cur == goal:
+            return d
+        if d > dist[cur]:
+            continue
+        for delta in itertools.product((-1, 0, 1), repeat=3):
+            if delta == (0, 0, 0):
+                continue
+            nb = tuple(c + o for c, o in zip(cur, delta))
+            if not all(0 <= v < s for v, s in zip(nb, occ.shape)) or occ[nb]:
+                continue
+            axes = [i for i in range(3) if delta[i]]
+            if len(axes) > 1 and any(occ[tuple(cur[j] + (delta[j] if j == i else 0) for j in range(3))] for i in axes):
+                continue
+            nd = d + math.sqrt(len(axes))
+            if nd < dist.get(nb, float("inf")):
+                dist[nb] = nd
+                heapq.heappush(heap, (nd, nb))
+    return None
+
+
+def test_find_path_indices_is_optimal_and_avoids_corner_cutting():
+    rng = np.random.default_rng(11)
+    occ = rng.random((10, 10, 10)) < 0.25
+    occ[0, 0, 0] = occ[9, 9, 9] = False
+    radar_map = _map(size=occ.shape, cell=1.0)
+    radar_map.occ[:] = occ
+    profile = PassabilityProfile(
+        robot_radius=0.0, clearance_voxels=0, max_slope_degrees=90.0, allow_vertical_movement=True
+    )
+
+    path = PathFinder(radar_map, profile).find_path_indices((0, 0, 0), (9, 9, 9))
+
+    expected = _reference_cost(occ, (0, 0, 0), (9, 9, 9))
+    assert expected is not None
+    assert path[0] == (0, 0, 0) and path[-1] == (9, 9, 9)
+    cost = sum(float(np.linalg.norm(np.subtract(b, a))) for a, b in zip(path, path[1:]))
+    assert cost == pytest.approx(expected, rel=1e-5)
+    for a, b in zip(path, path[1:]):
+        assert not occ[b]
+        for axis in range(3):
+            if a[axis] != b[axis]:
+                corner = list(a)
+                corner[axis] = b[axis]
+                assert not occ[tuple(corner)]
+
+
+def test_find_path_indices_respects_slope_limits():
+    radar_map = _map(size=(6, 6, 6))
+    profile = PassabilityProfile(robot_radius=0.0, clearance_voxels=0, max_slope_degrees=30.0)
+
+    finder = PathFinder(radar_map, profile)
+
+    assert finder.find_path_indices((0, 0, 0), (0, 3, 0)) == []
+    flat = finder.find_path_indices((0, 2, 0), (5, 2, 5))
+    assert all(idx[1] == 2 for idx in flat)
+
+
+def _flight_profile():
+    return PassabilityProfile(
+        robot_radius=0.0,
+        clearance_voxels=0,
+        max_slope_degrees=90.0,
+        max_step_cells=1,
+        allow_vertical_movement=True,
+    )
+
+
+def test_line_of_sight_blocks_grazed_corners():
+    radar_map = _map(solid=[(2, 2, 4)])
+    finder = PathFinder(radar_map, _flight_profile())
+
+    assert finder.line_of_sight((0, 0, 4), (7, 7, 4)) is False
+    assert finder.line_of_sight((0, 0, 4), (7, 0, 4)) is True
+    assert finder.line_of_sight((1, 2, 4), (3, 3, 4)) is False
+    assert finder.line_of_sight((0, 4, 4), (4, 7, 4)) is True
+
+
+def test_any_angle_path_has_few_visible_legs():
+    solid = [(4, y, z) for y in range(0, 7) for z in range(8)]
+    radar_map = _map(solid=solid)
+    finder = PathFinder(radar_map, _flight_profile())
+
+    grid_path = finder.find_path_indices((0, 0, 0), (7, 0, 7))
+    any_angle = finder.find_path_indices((0, 0, 0), (7, 0, 7), any_angle=True)
+
+    assert any_angle[0] == (0, 0, 0) and any_angle[-1] == (7, 0, 7)
+    assert len(any_angle) < len(grid_path)
+    assert all(finder.line_of_sight(a, b) for a, b in zip(any_angle, any_angle[1:]))
+
+    def length(path):
+        return sum(float(np.linalg.norm(np.subtract(b, a))) for a, b in zip(path, path[1:]))
+
+    assert length(any_angle) <= length(grid_path) + 1e-9
+
+
+def test_shortcut_path_keeps_only_turning_points():
+    radar_map = _map(solid=[(3, y, z) for y in range(0, 6) for z in range(8)])
+    finder = PathFinder(radar_map, _flight_profile())
+    path = finder.find_path_indices((0, 0, 0), (6, 0, 0))
+
+    shortcut = finder.shortcut_path(path)
+
+    assert shortcut[0] == path[0] and shortcut[-1] == path[-1]
+    assert 2 < len(shortcut) < len(path)
+    assert all(finder.line_of_sight(a, b) for a, b in zip(shortcut, shortcut[1:]))
+
+
+class _PathStorage:
+    def __init__(self):
+        self.cached = {}
+
+    def load_cached_path(self, key):
+        return self.cached.get(key, (None,))[0]
+
+    def save_cached_path(self, key, points, ttl):
+        self.cached[key] = (list(points), ttl)
+
+
+def test_path_cache_reuses_valid_paths_and_drops_stale_ones():
+    cache = PathCache(capacity=4)
+    radar_map = _map(solid=[(3, y, z) for y in range(0, 6) for z in range(8)])
+    finder = PathFinder(radar_map, _flight_profile())
+
+    first = finder.find_path_world((5.0, 5.0, 5.0), (65.0, 5.0, 5.0), cache=cache)
+    # A rescan on the same lattice (shifted origin, fresh revision) reuses the entry.
+    shifted = _map(size=(9, 8, 8), solid=[(4, y, z) for y in range(0, 6) for z in range(8)])
+    shifted.origin = np.array([-10.0, 0.0, 0.0])
+    again = PathFinder(shifted, _flight_profile()).find_path_world((5.0, 5.0, 5.0), (65.0, 5.0, 5.0), cache=cache)
+
+    assert again == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    blocked = _map(solid=[(3, y, z) for y in range(0, 8) for z in range(8) if (y, z) != (7, 7)])
+    blocked_finder = PathFinder(blocked, _flight_profile())
+    replanned = blocked_finder.find_path_world((5.0, 5.0, 5.0), (65.0, 5.0, 5.0), cache=cache)
+
+    assert cache.stale == 1
+    assert replanned != first
+    assert blocked_finder.path_is_clear([blocked.world_to_index(p) for p in replanned])
+
+
+def test_path_cache_is_lru_and_persists_to_storage():
+    storage = _PathStorage()
+    cache = PathCache(capacity=2, storage=storage)
+    finder = PathFinder(_map(), _flight_profile())
+    for goal in ((1, 0, 0), (2, 0, 0), (3, 0, 0)):
+        cache.put(finder, (0, 0, 0), goal, finder.find_path_indices((0, 0, 0), goal))
+
+    assert len(cache) == 2
+    assert len(storage.cached) == 3
+    assert {ttl for _, ttl in storage.cached.values()} == {cache.ttl}
+
+    fleet_cache = PathCache(storage=storage)
+    assert fleet_cache.get(finder, (0, 0, 0), (3, 0, 0)) == [(0, 0, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0)]
+    assert fleet_cache.get(finder, (0, 0, 0), (1, 0, 0)) == [(0, 0, 0), (1, 0, 0)]
+    assert cache.get(PathFinder(_map(), PassabilityProfile()), (0, 0, 0), (3, 0, 0)) is None
+
+
+
+def test_path_cache_logs_storage_failures_instead_of_printing(caplog, capsys):
+    class _BrokenStorage:
+        def load_cached_path(self, key):
+            raise OSError("offline")
+
+        def save_cached_path(self, key, points, ttl):
+            raise OSError("offline")
+
+    cache = PathCache(storage=_BrokenStorage())
+    finder = PathFinder(_map(), _flight_profile())
+
+    with caplog.at_level("WARNING", logger="secontrol.tools.radar_navigation"):
+        cache.put(finder, (0, 0, 0), (1, 0, 0), [(0, 0, 0), (1, 0, 0)])
+        assert cache.get(finder, (0, 0, 0), (2, 0, 0)) is None
+
+    assert capsys.readouterr().out == ""
+    assert [record.levelname for record in caplog.records] == ["WARNING", "WARNING"]
+    assert all("offline" in record.getMessage() for record in caplog.records)
+    assert cache.get(finder, (0, 0, 0), (1, 0, 0)) == [(0, 0, 0), (1, 0, 0)]
+
+def test_distance_field_to_goal_matches_astar_costs_and_descends():
+    rng = np.random.default_rng(5)
+    occ = rng.random((10, 9, 8)) < 0.25
+    goal = (9, 8, 7)
+    occ[goal] = False
+    occ[0, 0, 0] = occ[0, 8, 0] = False
+    radar_map = _map(size=occ.shape, cell=1.0)
+    radar_map.occ[:] = occ
+    finder = PathFinder(radar_map, _flight_profile())
+
+    field = finder.distance_field(goal)
+
+    assert field.shape == occ.shape and field[goal] == 0.0
+    assert np.isinf(field[occ]).all()
+    for start in ((0, 0, 0), (0, 8, 0), (5, 4, 3)):
+        if occ[start]:
+            continue
+        path = finder.find_path_indices(start, goal)
+        cost = sum(float(np.linalg.norm(np.subtract(b, a))) for a, b in zip(path, path[1:]))
+        assert field[start] == pytest.approx(cost, rel=1e-5)
+        walked = finder.descend(field, start)
+        assert walked[0] == start and walked[-1] == goal
+        walked_cost = sum(float(np.linalg.norm(np.subtract(b, a))) for a, b in zip(walked, walked[1:]))
+        assert walked_cost == pytest.approx(cost, rel=1e-5)
+
+
+def test_descend_returns_empty_path_when_goal_is_unreachable():
+    radar_map = _map(solid=[(4, y, z) for y in range(8) for z in range(8)])
+    finder = PathFinder(radar_map, _flight_profile())
+
+    field = finder.distance_field((7, 7, 7))
+
+    assert np.isinf(field[0, 0, 0])
+    assert finder.descend(field, (0, 0, 0)) == []
+    assert finder.descend_world(field, (75.0, 75.0, 75.0)) == [(75.0, 75.0, 75.0)]
+
+
+def test_sphere_inflation_keeps_diagonal_gaps_open():
+    radar_map = _map(size=(7, 7, 7), solid=[(3, 3, 3)])
+
+    box = radar_map.occupancy(20.0)
+    sphere = radar_map.occupancy(20.0, shape="sphere")
+
+    expected = _brute_force_distance(radar_map.occ) <= 2.0
+    np.testing.assert_array_equal(sphere, expected)
+    assert box.sum() == 125
+    assert sphere[1, 3, 3] and not sphere[1, 1, 1]
+    assert PathFinder(radar_map, PassabilityProfile(robot_radius=20.0, inflation="sphere"))._occ.sum() == sphere.sum()
+
+
+@pytest.mark.parametrize("shape", ["box", "sphere"])
+def test_crop_slices_parent_inflation_and_sees_outside_solids(shape):
+    rng = np.random.default_rng(2)
+    radar_map = _map(size=(20, 18, 16))
+    radar_map.occ[:] = rng.random(radar_map.size) < 0.03
+    full = radar_map.occupancy(20.0, shape=shape)
+
+    lazy = radar_map.crop((4, 3, 2), (15, 12, 10))
+    cached_parent = _map(size=radar_map.size)
+    cached_parent.occ[:] = radar_map.occ
+    cached_parent.occupancy(20.0, shape=shape)
+    sliced = cached_parent.crop((4, 3, 2), (15, 12, 10))
+
+    window = full[4:15, 3:12, 2:10]
+    assert lazy.size == (11, 9, 8)
+    np.testing.assert_allclose(lazy.origin, [40.0, 30.0, 20.0])
+    np.testing.assert_array_equal(lazy.occupancy(20.0, shape=shape), window)
+    np.testing.assert_array_equal(sliced.occupancy(20.0, shape=shape), window)
+
+
+def test_aligned_to_resamples_conservatively_onto_another_lattice():
+    radar_map = _map(size=(4, 4, 4), solid=[(1, 2, 3)])
+    radar_map.origin = np.array([3.0, 0.0, -4.0])
+
+    aligned = radar_map.aligned_to((0.0, 0.0, 0.0))
+
+    assert radar_map.aligned_to((13.0, -20.0, 6.0)) is radar_map
+    np.testing.assert_allclose(aligned.origin, [0.0, 0.0, -10.0])
+    assert aligned.size == (5, 4, 5)
+    assert sorted(map(tuple, np.argwhere(aligned.occ).tolist())) == [(1, 2, 3), (1, 2, 4), (2, 2, 3), (2, 2, 4)]
+
+
+@pytest.mark.parametrize("shape", ["box", "sphere"])
+def test_edited_crop_inflates_its_own_cells(shape):
+    radar_map = _map(size=(12, 12, 12))
+    crop = radar_map.crop((0, 0, 0), (10, 10, 10))
+
+    crop.update_region((5, 5, 5), [[[True]]])
+
+    inflated = crop.occupancy(2.0, shape=shape)
+    assert inflated[5, 5, 5] and inflated[4, 5, 5]
+    assert not radar_map.occ[5, 5, 5]
+
+    radar_map.occupancy(12.0, shape=shape)
+    assert radar_map.crop((0, 0, 0), (10, 10, 10)).occupancy(12.0, shape=shape).sum() == 0
+    assert crop.occupancy(12.0, shape=shape)[3, 5, 5]
+
+
+@pytest.mark.parametrize("shape", ["box", "sphere"])
+def test_region_updates_reinflate_locally(shape):
+    rng = np.random.default_rng(4)
+    occ = rng.random((24, 20, 18)) < 0.03
+    radar_map = _map(size=occ.shape)
+    radar_map.occ[:] = occ
+    radar_map.occupancy(20.0, shape=shape)
+
+    block = rng.random((5, 4, 6)) < 0.5
+    radar_map.update_region((10, 2, 11), block)
+    occ[10:15, 2:6, 11:17] = block
+
+    fresh = _map(size=occ.shape)
+    fresh.occ[:] = occ
+    np.testing.assert_array_equal(radar_map.occupancy(20.0, shape=shape), fresh.occupancy(20.0, shape=shape))
+
+    rescanned = _map(size=occ.shape)
+    rescanned.occ[:] = occ
+    rescanned.occ[0:2, 0:2, 0:2] = True
+    assert rescanned.reuse_inflation(radar_map)
+    expected = _map(size=occ.shape)
+    expected.occ[:] = rescanned.occ
+    np.testing.assert_array_equal(rescanned.occupancy(20.0, shape=shape), expected.occupancy(20.0, shape=shape))
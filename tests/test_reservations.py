@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from secontrol.tools.radar_navigation import PassabilityProfile, PathFinder, RawRadarMap
+from secontrol.tools.reservations import RedisReservationTable, ReservationTable
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def sadd(self, key, member):
+        self.sets.setdefault(key, set()).add(member)
+
+    def srem(self, key, member):
+        self.sets.get(key, set()).discard(member)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def sismember(self, key, member):
+        return member in self.sets.get(key, set())
+
+    def register_script(self, source):
+        assert "redis.call('DEL'" in source
+
+        def unlock(keys, args):
+            # Python mirror of the compare-and-delete script.
+            if self.values.get(keys[0]) == args[0]:
+                self.values.pop(keys[0])
+                return 1
+            return 0
+
+        return unlock
+
+
+def _finder(occ):
+    radar_map = RawRadarMap(
+        occ=occ,
+        origin=np.zeros(3),
+        cell_size=1.0,
+        size=occ.shape,
+        revision=1,
+        timestamp_ms=1,
+        contacts=(),
+        _inflation_cache={},
+    )
+    profile = PassabilityProfile(
+        robot_radius=0.0,
+        clearance_voxels=0,
+        max_slope_degrees=90.0,
+        allow_vertical_movement=True,
+    )
+    return PathFinder(radar_map, profile)
+
+
+def _corridor():
+    # A one-cell-wide tunnel along x; drones cannot pass each other inside it.
+    occ = np.ones((12, 3, 3), dtype=bool)
+    occ[:, 1, 1] = False
+    return _finder(occ)
+
+
+@pytest.mark.parametrize("make_table", [ReservationTable, lambda **kw: RedisReservationTable(FakeRedis(), **kw)])
+def test_better_ranked_reservation_wins_and_evicts(make_table):
+    table = make_table(block_size=1.0)
+
+    assert table.reserve("b", [((0, 0, 0), 0.0, 5.0)])
+    assert table.reserve("a", [((0, 0, 0), 4.0, 6.0)])  # "a" < "b" at equal priority
+    assert table.preempted("b")
+    assert table.reservations("b") == []
+    assert not table.reserve("b", [((0, 0, 0), 5.5, 7.0)])
+    assert table.reserve("b", [((0, 0, 0), 6.5, 7.0)])
+    assert not table.preempted("b")
+
+    assert table.reserve("z", [((0, 0, 0), 6.0, 8.0)], priority=5)
+    assert table.preempted("a") and table.preempted("b")
+    assert table.is_free((0, 0, 0), 0.0, 10.0, agent="y", priority=9)
+    assert not table.is_free((0, 0, 0), 0.0, 10.0, agent="zz", priority=5)
+
+
+def test_redis_table_is_shared_between_clients():
+    redis = FakeRedis()
+    first = RedisReservationTable(redis, block_size=1.0)
+    second = RedisReservationTable(redis, block_size=1.0)
+
+    assert first.reserve("a", [((1, 0, 0), 0.0, 2.0)])
+    second.refresh()
+    assert not second.is_free((1, 0, 0), 1.0, 1.5, agent="b")
+    assert not second.reserve("b", [((1, 0, 0), 1.0, 3.0)])
+
+    first.release("a")
+    second.refresh()
+    assert second.is_free((1, 0, 0), 1.0, 1.5, agent="b")
+    assert "se:fleet:reservations:lock" not in redis.values
+
+
+def test_redis_lock_release_keeps_a_lock_taken_over_after_expiry():
+    redis = FakeRedis()
+    table = RedisReservationTable(redis, block_size=1.0)
+
+    with table._locked():
+        redis.values["se:fleet:reservations:lock"] = "other-agent"
+
+    assert redis.values["se:fleet:reservations:lock"] == "other-agent"
+
+
+def _world(finder, timed):
+    return [(finder.radar_map.index_to_world_center(cell), t) for cell, t in timed]
+
+
+def _assert_disjoint(table, finder, timed, agent):
+    for block, t0, t1 in table.path_entries(_world(finder, timed)):
+        assert table.is_free(block, t0 + 1e-6, t1 - 1e-6, agent=agent)
+
+
+def test_timed_path_queues_behind_slower_better_ranked_drone():
+    finder = _corridor()
+    table = ReservationTable(block_size=1.0)
+
+    lead = finder.find_path_timed((3, 1, 1), (11, 1, 1), table, agent="a", seconds_per_cell=2.0)
+    assert [t for _, t in lead] == [2.0 * i for i in range(9)]
+    assert table.reserve_path("a", _world(finder, lead))
+
+    follower = finder.find_path_timed((0, 1, 1), (11, 1, 1), table, agent="b")
+    assert follower[-1][0] == (11, 1, 1)
+    assert follower[-1][1] > lead[-1][1]
+    _assert_disjoint(table, finder, follower, "b")
+    assert table.reserve_path("b", _world(finder, follower))
+    assert not table.preempted("a")
+
+
+def test_timed_path_yields_when_a_better_drone_comes_head_on():
+    finder = _corridor()
+    table = ReservationTable(block_size=1.0)
+    table.reserve_path(
+        "a",
+        [(finder.radar_map.index_to_world_center((x, 1, 1)), float(11 - x)) for x in range(11, -1, -1)],
+    )
+
+    path = finder.find_path_timed((0, 1, 1), (11, 1, 1), table, agent="b", window=40)
+    assert path == []  # the corridor has no place to step aside
+
+    # A side pocket at x=4 lets "b" duck out, wait and continue.
+    finder.radar_map.occ[4, 2, 1] = False
+    finder = _finder(finder.radar_map.occ)
+    path = finder.find_path_timed((0, 1, 1), (11, 1, 1), table, agent="b", window=40)
+    assert path and path[-1][0] == (11, 1, 1)
+    assert any(cell == (4, 2, 1) for cell, _ in path)
+    _assert_disjoint(table, finder, path, "b")
@@ -0,0 +1,684 @@
+from __future__ import annotations
+
+import json
+import math
+import sqlite3
+import struct
+import time
+
+import numpy as np
+import pytest
+from redis.exceptions import WatchError
+
+from secontrol.controllers.shared_map_controller import (
+    OreHit,
+    SharedMapChunkCache,
+    SharedMapController,
+    SharedMapData,
+)
+from secontrol.redis_client import RedisEventClient
+from secontrol.sim import SimRedisClient
+from secontrol.tools import chunk_codec
+
+
+def _controller(tmp_path=None, **kwargs):
+    if tmp_path is not None:
+        return SharedMapController(
+            owner_id="test", storage_backend="sqlite", sqlite_path=tmp_path / "map.sqlite", **kwargs
+        )
+    return SharedMapController(owner_id="test", redis_client=SimRedisClient(), **kwargs)
+
+
+def test_point_codec_round_trip_is_compact():
+    # Radar voxels are cell centres on a regular lattice, as in a real chunk.
+    cells = np.argwhere(np.random.default_rng(0).random((40, 40, 40)) < 0.3)
+    points = 100.0 + (cells + 0.5) * 2.5
+    blob = chunk_codec.encode_points(points, centre=(150.0, 150.0, 150.0))
+
+    decoded = chunk_codec.decode_points(blob)
+
+    assert chunk_codec.is_binary_chunk(blob)
+    assert decoded.shape == points.shape
+    assert np.abs(decoded - points).max() <= chunk_codec.DEFAULT_RESOLUTION / 2 + 1e-9
+    assert len(blob) * 10 < len(json.dumps(points.tolist()))
+
+
+def test_point_codec_falls_back_to_float32_and_dedupes():
+    far = np.array([[0.0, 0.0, 0.0], [1000.0, 0.0, 0.0], [1000.001, 0.0, 0.0]])
+    decoded = chunk_codec.decode_points(chunk_codec.encode_points(far, centre=(0.0, 0.0, 0.0)))
+
+    assert decoded.shape == (2, 3)
+    assert np.allclose(decoded, far[:2], atol=1e-3)
+
+
+def test_ore_codec_keeps_materials_and_contents():
+    blob = chunk_codec.encode_ores(
+        [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0), (7.0, 8.0, 9.0)],
+        ["Iron", "Gold", "Iron"],
+        [12.5, None, {"raw": 3}],
+        centre=(0.0, 0.0, 0.0),
+    )
+    chunk = chunk_codec.decode_ores(blob)
+
+    assert [chunk.materials[i] for i in chunk.material_ids] == ["Iron", "Gold", "Iron"]
+    assert chunk.contents() == [12.5, None, {"raw": 3}]
+    assert np.isnan(chunk.content[2]) and chunk.content[0] == 12.5
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_controller_stores_binary_chunks_and_reads_them_back(backend, tmp_path):
+    ctrl = _controller(tmp_path if backend == "sqlite" else None)
+    ctrl.add_voxel_points([(10.0, 20.0, 30.0), (15.5, 20.0, 30.0), (150.0, 0.0, 0.0)])
+    ctrl.add_ore_cells([{"material": "Iron", "position": (12.0, 22.0, 32.0), "content": 40}])
+
+    data = ctrl.load_region((0.0, 0.0, 0.0), 200.0)
+
+    assert sorted(data.voxels) == [(10.0, 20.0, 30.0), (15.5, 20.0, 30.0), (150.0, 0.0, 0.0)]
+    assert data.ores == [OreHit("Iron", (12.0, 22.0, 32.0), 40.0)]
+    assert ctrl.storage.load_chunk_array("voxels", "0:0:0").shape == (2, 3)
+
+
+def test_legacy_json_chunks_remain_readable():
+    client = SimRedisClient()
+    legacy = _controller(chunk_format="json")
+    legacy.storage.client = client
+    legacy.add_voxel_points([(1.0, 2.0, 3.0)])
+    legacy.add_ore_cells([{"material": "Gold", "position": (4.0, 5.0, 6.0), "content": "rich"}])
+    assert isinstance(client.get_json("se:test:memory:voxels:0:0:0"), list)
+
+    ctrl = SharedMapController(owner_id="test", redis_client=client)
+    ctrl.add_voxel_points([(2.0, 2.0, 3.0)])
+    data = ctrl.load()
+
+    assert sorted(data.voxels) == [(1.0, 2.0, 3.0), (2.0, 2.0, 3.0)]
+    assert data.ores[0].content == "rich"
+    assert chunk_codec.is_binary_chunk(client.get_value("se:test:memory:voxels:0:0:0"))
+
+
+class _CountingClient(SimRedisClient):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def set_value(self, key, value, expire=None):
+        self.writes += 1
+        super().set_value(key, value, expire)
+
+    def set_json(self, key, value, expire=None):
+        self.writes += 1
+        super().set_json(key, value, expire)
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_path_cache_entries_live_outside_named_paths(backend, tmp_path):
+    ctrl = _controller(tmp_path if backend == "sqlite" else None)
+    ctrl.storage.save_paths({"dock": [(0.0, 0.0, 0.0)]})
+
+    ctrl.storage.save_cached_path("10@0,0,0|0,0,0|3,0,0", [(5.0, 5.0, 5.0), (35.0, 5.0, 5.0)], 60.0)
+
+    assert ctrl.storage.load_cached_path("10@0,0,0|0,0,0|3,0,0") == [(5.0, 5.0, 5.0), (35.0, 5.0, 5.0)]
+    assert ctrl.storage.load_cached_path("missing") is None
+    assert ctrl.storage.load_paths() == {"dock": [(0.0, 0.0, 0.0)]}
+
+
+def test_sqlite_path_cache_entries_expire(tmp_path):
+    storage = _controller(tmp_path).storage
+    storage.save_cached_path("old", [(1.0, 2.0, 3.0)], 0.01)
+    time.sleep(0.05)
+    storage.save_cached_path("new", [(1.0, 2.0, 3.0)], 60.0)
+
+    assert storage.load_cached_path("old") is None
+    assert storage.conn.execute("SELECT key FROM path_cache").fetchall() == [("new",)]
+
+
+def test_write_behind_defers_until_flush():
+    client = _CountingClient()
+    ctrl = SharedMapController(owner_id="test", redis_client=client, write_behind=True)
+
+    for i in range(50):
+        ctrl.add_flight_points([(float(i), 0.0, 0.0)])
+    assert client.writes == 0
+    assert ctrl.write_buffer.dirty_chunks()["visited"] == {"0:0:0"}
+
+    assert ctrl.flush() == 1
+    assert ctrl.write_buffer.pending == 0
+    assert len(ctrl.load(kinds=("visited",)).visited) == 50
+
+
+def test_write_behind_flushes_on_size_and_reads_see_pending_points():
+    client = _CountingClient()
+    ctrl = SharedMapController(owner_id="test", redis_client=client, write_behind=True, flush_max_points=10)
+
+    ctrl.add_voxel_points([(float(i), 0.0, 0.0) for i in range(9)])
+    assert client.writes == 0
+    ctrl.add_voxel_points([(9.0, 0.0, 0.0)])
+    assert client.writes > 0 and ctrl.write_buffer.pending == 0
+
+    ctrl.add_ore_cells([{"material": "Iron", "position": (1.0, 1.0, 1.0)}])
+    assert [ore.material for ore in ctrl.get_known_ores()] == ["Iron"]
+
+
+def test_background_flusher_writes_aged_buffer(tmp_path):
+    ctrl = _controller(tmp_path, background_flush=True, flush_max_age=0.05)
+    try:
+        ctrl.add_flight_points([(1.0, 2.0, 3.0)])
+        # The buffer empties before the batch lands, so wait for the write itself.
+        deadline = time.monotonic() + 5.0
+        while not ctrl.storage.load_chunk_points("visited", "0:0:0") and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert ctrl.write_buffer.pending == 0
+        assert ctrl.storage.load_chunk_points("visited", "0:0:0") == [(1.0, 2.0, 3.0)]
+    finally:
+        ctrl.close()
+
+
+class FakeRedis:
+    """Dict-backed subset of ``redis.Redis`` counting round trips."""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.versions = {}
+        self.round_trips = 0
+        self.before_exec = None  # simulates another writer right before EXEC
+
+    def _call(self, name, *args, **kwargs):
+        return getattr(self, "_" + name)(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if hasattr(type(self), "_" + name):
+            def command(*args, **kwargs):
+                self.round_trips += 1
+                return self._call(name, *args, **kwargs)
+            return command
+        raise AttributeError(name)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, source):
+        assert "redis.call('SADD'" in source
+        return FakeScript()
+
+    def _get(self, key):
+        return self.values.get(key)
+
+    def _set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode("utf-8") if isinstance(value, str) else value
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return True
+
+    def _merge_points(self, keys, args):
+        # Python mirror of the server-side merge script.
+        header, incoming, chunk_id, flag = args
+        size = len(header)
+        current = self.values.get(keys[0])
+        body = b""
+        if current is not None:
+            if current[:8] != header[:8] or current[12:size] != header[12:] or (len(current) - size) % 6:
+                return -1
+            body = current[size:]
+        records = [body[i : i + 6] for i in range(0, len(body), 6)]
+        seen, added = set(records), 0
+        for i in range(0, len(incoming), 6):
+            if incoming[i : i + 6] not in seen:
+                seen.add(incoming[i : i + 6])
+                records.append(incoming[i : i + 6])
+                added += 1
+        if added or current is None:
+            self._set(keys[0], header[:8] + struct.pack("<I", len(records)) + header[12:] + b"".join(records))
+        if flag == "1":
+            self._sadd(keys[1], chunk_id)
+        return added
+
+    def _getrange(self, key, start, end):
+        return (self.values.get(key) or b"")[start : end + 1]
+
+    def _mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def _delete(self, *keys):
+        for key in keys:
+            self.versions[key] = self.versions.get(key, 0) + 1
+        return sum(self.values.pop(key, None) is not None or self.sets.pop(key, None) is not None for key in keys)
+
+    def _exists(self, *keys):
+        return sum(key in self.values or bool(self.sets.get(key)) for key in keys)
+
+    def _sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(m.encode() for m in members)
+
+    def _srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(m.encode() for m in members)
+
+    def _smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def _sismember(self, key, member):
+        return member.encode() in self.sets.get(key, set())
+
+    def _smismember(self, key, members):
+        return [int(m.encode() in self.sets.get(key, set())) for m in members]
+
+
+class FakeScript:
+    def __call__(self, keys, args, client):
+        client.merge_points(keys, args)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._queue = []
+        self._watched = None
+        self._immediate = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._queue, self._watched, self._immediate = [], None, False
+
+    def watch(self, *keys):
+        self._redis.round_trips += 1
+        self._watched = {key: self._redis.versions.get(key, 0) for key in keys}
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def __getattr__(self, name):
+        if self._immediate:
+            return getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._queue.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        self._redis.round_trips += 1
+        queue, self._queue = self._queue, []
+        watched, self._watched = self._watched, None
+        if watched is not None:
+            hook, self._redis.before_exec = self._redis.before_exec, None
+            if hook is not None:
+                hook()
+            if any(self._redis.versions.get(key, 0) != version for key, version in watched.items()):
+                raise WatchError("watched key changed")
+        return [self._redis._call(name, *args, **kwargs) for name, args, kwargs in queue]
+
+
+def _redis_event_client(raw):
+    client = RedisEventClient.__new__(RedisEventClient)
+    client._client = raw
+    client._db_index = 0
+    client._subscriptions = []
+    return client
+
+
+def test_redis_index_uses_sets_and_region_loads_in_few_round_trips():
+    raw = FakeRedis()
+    ctrl = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw), chunk_size=10.0)
+    ctrl.add_voxel_points([(x * 10.0 + 1.0, y * 10.0 + 1.0, 1.0) for x in range(10) for y in range(10)])
+
+    assert len(raw.sets["se:test:memory:index:voxels"]) == 100
+    assert json.loads(raw.values["se:test:memory:index"]) == {"chunk_size": 10.0}
+
+    fresh = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw), chunk_size=10.0)
+    raw.round_trips = 0
+    data = fresh.load_region((50.0, 50.0, 0.0), 60.0, include_paths=False, include_metadata=False)
+
+    assert len(data.voxels) == 100
+    assert raw.round_trips <= 4
+
+
+def test_legacy_json_index_is_migrated_to_sets():
+    raw = FakeRedis()
+    client = _redis_event_client(raw)
+    client.set_json("se:test:memory:index", {"chunk_size": 100.0, "voxels": ["0:0:0"], "visited": [], "ores": []})
+    client.set_json("se:test:memory:voxels:0:0:0", [[1.0, 2.0, 3.0]])
+
+    ctrl = SharedMapController(owner_id="test", redis_client=client)
+    assert ctrl.load().voxels == [(1.0, 2.0, 3.0)]
+    assert raw.sets["se:test:memory:index:voxels"] == {b"0:0:0"}
+
+    ctrl.clear_region((1.0, 2.0, 3.0), 1.0)
+    assert not raw.sets["se:test:memory:index:voxels"]
+
+
+def test_uncompressed_chunks_merge_server_side_without_reads():
+    raw = FakeRedis()
+    first = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw), chunk_compression="none")
+    second = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw), chunk_compression="none")
+    first.add_voxel_points([(1.0, 2.0, 3.0), (150.0, 2.0, 3.0)])
+
+    raw.round_trips = 0
+    second.write_buffer.add_points("voxels", "0:0:0", [(4.0, 5.0, 6.0), (1.0, 2.0, 3.0)])
+    second.write_buffer.add_points("voxels", "1:0:0", [(151.0, 2.0, 3.0)])
+    second.flush(save=False)
+
+    assert raw.round_trips == 1  # one pipeline of EVALSHA calls, no GET/MGET
+    assert raw.values["se:test:memory:voxels:0:0:0"] == chunk_codec.encode_points(
+        [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)], centre=(50.0, 50.0, 50.0), compression="none"
+    )
+    assert sorted(first.load().voxels) == [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0), (150.0, 2.0, 3.0), (151.0, 2.0, 3.0)]
+
+
+def test_redis_chunks_default_to_uncompressed_server_side_merge():
+    raw = FakeRedis()
+    ctrl = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw))
+    ctrl.add_voxel_points([(1.0, 2.0, 3.0)])
+
+    raw.round_trips = 0
+    ctrl.write_buffer.add_points("voxels", "0:0:0", [(4.0, 5.0, 6.0)])
+    ctrl.flush(save=False)
+
+    assert ctrl.storage.compression == "none"
+    assert raw.round_trips == 1
+    assert sorted(ctrl.load().voxels) == [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)]
+
+
+def test_compressed_chunk_merge_retries_after_concurrent_write():
+    raw = FakeRedis()
+    first = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw), chunk_compression="zlib")
+    second = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw), chunk_compression="zlib")
+    first.add_voxel_points([(1.0, 2.0, 3.0)])
+
+    raw.before_exec = lambda: second.add_voxel_points([(4.0, 5.0, 6.0)])
+    first.add_voxel_points([(7.0, 8.0, 9.0)])
+
+    assert raw.before_exec is None
+    assert sorted(first.load().voxels) == [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0), (7.0, 8.0, 9.0)]
+    assert raw.sets["se:test:memory:index:voxels"] == {b"0:0:0"}
+
+
+def test_merge_script_runs_on_a_lua_capable_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis needs it to run EVAL/EVALSHA
+    raw = fakeredis.FakeRedis()
+    zlib = SharedMapController(
+        owner_id="test", redis_client=_redis_event_client(raw), chunk_size=10.0, chunk_compression="zlib"
+    )
+    zlib.add_voxel_points([(1.0, 1.0, 1.0)])
+    ctrl = SharedMapController(
+        owner_id="test", redis_client=_redis_event_client(raw), chunk_size=10.0, chunk_compression="none"
+    )
+
+    # Compressed chunk: the script refuses it (-1) and the client merges it.
+    ctrl.add_voxel_points([(1.0, 1.0, 1.0), (2.0, 1.0, 1.0)])
+    # Plain chunks on both sides of the script, including a duplicate point.
+    ctrl.add_voxel_points([(21.0, 1.0, 1.0)])
+    ctrl.add_voxel_points([(21.0, 1.0, 1.0), (23.0, 1.0, 1.0)])
+
+    assert ctrl.storage._merge_script is not None
+    blob = raw.get("se:test:memory:voxels:2:0:0")
+    assert chunk_codec.point_count(blob) == 2
+    np.testing.assert_allclose(chunk_codec.decode_points(blob), [(21.0, 1.0, 1.0), (23.0, 1.0, 1.0)], atol=0.05)
+    assert raw.sismember("se:test:memory:index:voxels", "2:0:0")
+    assert sorted(ctrl.load(kinds=("voxels",)).voxels) == pytest.approx(
+        [(1.0, 1.0, 1.0), (2.0, 1.0, 1.0), (21.0, 1.0, 1.0), (23.0, 1.0, 1.0)], abs=0.05
+    )
+
+
+def test_chunk_cache_serves_repeated_reads_and_sees_other_writers():
+    client = SimRedisClient()
+    reader = SharedMapController(owner_id="test", redis_client=client, chunk_size=10.0, chunk_cache_points=10_000)
+    writer = SharedMapController(owner_id="test", redis_client=client, chunk_size=10.0)
+    writer.add_voxel_points([(1.0, 1.0, 1.0), (15.0, 1.0, 1.0)])
+    writer.add_ore_cells([{"material": "Iron", "position": (2.0, 2.0, 2.0), "content": 0.5}])
+
+    for _ in range(3):
+        assert len(reader.load_region((5.0, 5.0, 5.0), 12.0).voxels) == 2
+        assert len(reader.get_known_ores()) == 1
+    stats = reader.chunk_cache.stats()
+    assert stats["misses"] == 3 and stats["hits"] == 9
+
+    writer.add_voxel_points([(2.0, 2.0, 2.0)])  # keyspace event invalidates only chunk 0:0:0
+    assert len(reader.load_region((5.0, 5.0, 5.0), 12.0).voxels) == 3
+    stats = reader.chunk_cache.stats()
+    assert stats["invalidations"] == 1 and stats["misses"] == 4
+
+
+def test_chunk_cache_is_bounded_and_drops_stale_fills():
+    cache = SharedMapChunkCache(max_points=5)
+    cache.put_many("voxels", {"a": np.zeros((3, 3)), "b": np.zeros((2, 3))}, cache.epoch)
+    cache.get_many("voxels", ["a"])
+    cache.put_many("voxels", {"c": np.zeros((2, 3))}, cache.epoch)
+
+    found, missing = cache.get_many("voxels", ["a", "b", "c"])
+    assert sorted(found) == ["a", "c"] and missing == ["b"]
+    assert cache.stats()["evictions"] == 1
+
+    epoch = cache.epoch  # a read starts, then another agent rewrites the chunk
+    cache.invalidate("voxels", ["d"])
+    cache.put_many("voxels", {"d": np.zeros((1, 3))}, epoch)
+    assert cache.get_many("voxels", ["d"]) == ({}, ["d"])
+
+
+def test_merge_voxels_collapses_jitter_on_quantised_keys():
+    data = SharedMapData(resolution=0.01)
+    data.merge_voxels([(1.0, 2.0, 3.0), (10.0, 0.0, 0.0)])
+    data.merge_voxels(np.array([[1.001, 1.999, 3.002], [10.0, 0.0, 0.0], [5.0, 5.0, 5.0]]))
+    assert data.voxels == [(1.0, 2.0, 3.0), (10.0, 0.0, 0.0), (5.0, 5.0, 5.0)]
+
+    data.voxels = [(7.0, 7.0, 7.0)]  # replaced from outside: keys are rebuilt
+    data.merge_voxels([(7.0, 7.0, 7.0), (1.0, 2.0, 3.0)])
+    assert data.voxels == [(7.0, 7.0, 7.0), (1.0, 2.0, 3.0)]
+
+
+@pytest.mark.parametrize("chunk_format", ["json", "binary"])
+def test_repeated_jittered_scans_do_not_grow_chunks(tmp_path, chunk_format):
+    ctrl = _controller(tmp_path, chunk_format=chunk_format)
+    base = np.random.default_rng(1).uniform(0.0, 90.0, size=(500, 3)).round(1)
+    ctrl.add_voxel_points(base.tolist())
+    for seed in range(3):
+        jitter = np.random.default_rng(seed).uniform(-0.002, 0.002, size=base.shape)
+        ctrl.add_voxel_points((base + jitter).tolist())
+
+    assert len(ctrl.storage.load_chunk_array("voxels", "0:0:0")) == len(base)
+
+
+@pytest.mark.parametrize("per_cell", [1, 3])
+def test_thin_voxel_density_matches_reference_and_dry_run_writes_nothing(tmp_path, per_cell):
+    ctrl = _controller(tmp_path, chunk_format="json")
+    points = np.random.default_rng(3).uniform(0.0, 99.0, size=(3000, 3))
+    ores = [{"material": "Iron", "position": tuple(points[i]), "content": 1.0} for i in range(0, 3000, 300)]
+    ctrl.add_voxel_points(points.tolist())
+    ctrl.add_ore_cells(ores)
+
+    ore_cells = {tuple(math.floor(v / 5.0) for v in ore["position"]) for ore in ores}
+    buckets = {}
+    for p in ctrl.storage.load_chunk_array("voxels", "0:0:0").tolist():
+        cell = tuple(math.floor(v / 5.0) for v in p)
+        bucket = buckets.setdefault(cell, [])
+        if cell in ore_cells or len(bucket) < per_cell:
+            bucket.append(tuple(p))
+    expected = sorted(p for bucket in buckets.values() for p in bucket)
+
+    dry = ctrl.thin_voxel_density(max_points_per_cell=per_cell, verbose=False, dry_run=True)
+    assert len(ctrl.storage.load_chunk_array("voxels", "0:0:0")) == dry["total_before"] == 3000
+    result = ctrl.thin_voxel_density(max_points_per_cell=per_cell, verbose=False, workers=2)
+
+    assert sorted(map(tuple, ctrl.storage.load_chunk_array("voxels", "0:0:0").tolist())) == expected
+    assert dry["total_after"] == result["total_after"] == len(expected)
+
+
+
+def test_thin_voxel_density_rebuilds_lod_only_over_rewritten_chunks(tmp_path):
+    ctrl = _controller(tmp_path)
+    dense = np.random.default_rng(4).uniform(0.0, 99.0, size=(3000, 3))
+    sparse = [(505.0 + x, 5.0, 5.0) for x in range(10)]
+    ctrl.add_voxel_points(dense.tolist() + sparse)
+    rebuilt = []
+    rebuild_lod = ctrl.storage.rebuild_lod
+
+    def _record(kind, chunk_ids, **kwargs):
+        rebuilt.append((kind, list(chunk_ids)))
+        return rebuild_lod(kind, chunk_ids, **kwargs)
+
+    ctrl.storage.rebuild_lod = _record
+    stats = ctrl.thin_voxel_density(verbose=False)
+
+    assert stats["changed_chunk_ids"] == ["0:0:0"]
+    assert rebuilt == [("voxels", ["0:0:0"])]
+    kept = np.concatenate([ctrl.storage.load_chunk_array("voxels", "0:0:0"), sparse])
+    coarse = ctrl.load_region((0.0, 0.0, 0.0), 2000.0, lod=1, include_paths=False, include_metadata=False)
+    assert sorted(coarse.voxels) == _lod_reference(kept, 8.0)
+
+def test_reduce_points_counts_from_chunk_headers():
+    raw = FakeRedis()
+    ctrl = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw), chunk_size=10.0)
+    ctrl.add_voxel_points([(x + 0.5, y * 10.0 + 0.5, z * 0.25) for x in range(4) for y in range(5) for z in range(8)])
+
+    estimate = ctrl.reduce_points(max_points=40, dry_run=True)
+    assert estimate == {"removed": 120, "total": 160, "kept": 40}
+    assert ctrl.reduce_points(max_points=40, workers=2) == estimate
+    assert ctrl.storage.count_chunk_points("voxels", ["0:0:0", "0:9:0"]) == {"0:0:0": 8}
+
+
+
+def test_sqlite_counts_from_chunk_headers_and_reduce_points_stays_within_the_limit(tmp_path, monkeypatch):
+    ctrl = _controller(tmp_path, chunk_size=10.0)
+    ctrl.add_voxel_points([(x + 0.5, 0.5, 0.5) for x in range(10)] + [(0.5, y * 10.0 + 0.5, 0.5) for y in (1, 2, 3)])
+    ids = sorted(ctrl.storage.load_index()["voxels"])
+
+    def _no_decode(*args, **kwargs):
+        raise AssertionError("chunk payload decoded")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ctrl.storage, "load_chunk_arrays", _no_decode)
+        assert ctrl.storage.count_chunk_points("voxels", ids + ["5:5:5"]) == {
+            "0:0:0": 10,
+            "0:1:0": 1,
+            "0:2:0": 1,
+            "0:3:0": 1,
+        }
+
+    # Every k = ceil(13 / 6) = 3 would keep 4 + 1 + 1 + 1 = 7 points.
+    assert ctrl.reduce_points(max_points=6) == {"removed": 7, "total": 13, "kept": 6}
+    assert len(ctrl.storage.load_chunk_array("voxels", "0:0:0")) == 3
+
+def test_sqlite_region_queries_use_integer_chunk_coordinates(tmp_path):
+    path = tmp_path / "map.sqlite"
+    with sqlite3.connect(path) as conn:  # schema from before the ix/iy/iz columns
+        conn.execute("CREATE TABLE chunk_index (kind TEXT NOT NULL, chunk_id TEXT NOT NULL, PRIMARY KEY (kind, chunk_id))")
+        conn.execute("CREATE TABLE chunks (kind TEXT NOT NULL, chunk_id TEXT NOT NULL, payload TEXT NOT NULL, PRIMARY KEY (kind, chunk_id))")
+        conn.execute("INSERT INTO chunk_index VALUES ('voxels', '-1:0:0')")
+        conn.execute("INSERT INTO chunks VALUES ('voxels', '-1:0:0', '[[-50.0, 1.0, 1.0]]')")
+
+    ctrl = SharedMapController(owner_id="test", storage_backend="sqlite", sqlite_path=path, chunk_size=100.0)
+    ctrl.add_voxel_points([(x * 100.0 + 1.0, 1.0, 1.0) for x in range(100)])
+
+    near = ctrl.load_region((0.0, 0.0, 0.0), 150.0, include_paths=False, include_metadata=False)
+    assert sorted(near.voxels) == [(-50.0, 1.0, 1.0), (1.0, 1.0, 1.0), (101.0, 1.0, 1.0)]
+    wide = ctrl.storage.index_in_box(["voxels"], (-1, -1000, -1000), (200, 1000, 1000))
+    assert len(wide["voxels"]) == 101
+
+    plan = ctrl.storage.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT chunk_id FROM chunk_index WHERE kind = 'voxels' AND ix BETWEEN 0 AND 1"
+    ).fetchall()
+    assert "chunk_index_box" in " ".join(str(row) for row in plan)
+    assert isinstance(ctrl.storage.conn.execute("SELECT payload FROM chunks WHERE chunk_id = '0:0:0'").fetchone()[0], bytes)
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_region_arrays_clip_to_sphere_and_remap_ore_materials(backend, tmp_path):
+    ctrl = _controller(tmp_path if backend == "sqlite" else None, chunk_size=50.0)
+    rng = np.random.default_rng(3)
+    ctrl.add_voxel_points(np.round(rng.uniform(-200.0, 200.0, (2000, 3)), 1).tolist())
+    ctrl.add_flight_points([(0.0, 0.0, 0.0), (90.0, 90.0, 0.0)])
+    ctrl.add_ore_cells(
+        [
+            {"material": "Gold", "position": (130.0, 0.0, 0.0), "content": 5},
+            {"material": "Iron", "position": (-80.0, 0.0, 0.0)},
+            {"material": "Gold", "position": (0.0, 60.0, 0.0), "content": 7},
+            {"material": "Ice", "position": (0.0, 0.0, 140.0), "content": 1},
+        ]
+    )
+    center, radius = (10.0, 0.0, 0.0), 115.0
+
+    arrays = ctrl.load_region_arrays(center, radius, dtype=np.float64)
+    objects = ctrl.load_region(center, radius, include_paths=False, include_metadata=False)
+
+    inside = lambda p: math.dist(p, center) <= radius
+    assert arrays.voxels.dtype == np.float64 and arrays.voxels.shape[1] == 3
+    assert sorted(map(tuple, arrays.voxels.tolist())) == sorted(p for p in objects.voxels if inside(p))
+    assert arrays.visited.tolist() == [[0.0, 0.0, 0.0]]
+    assert [arrays.ore_materials[i] for i in arrays.ore_material_ids] in (["Iron", "Gold"], ["Gold", "Iron"])
+    assert sorted(hit.material for hit in arrays.ore_hits()) == ["Gold", "Iron"]
+    assert sorted(np.nan_to_num(arrays.ore_content, nan=-1.0).tolist()) == [-1.0, 7.0]
+
+    voxels_only = ctrl.load_region_arrays(center, radius, kinds=("voxels",))
+    assert voxels_only.voxels.dtype == np.float32 and len(voxels_only.voxels) == len(arrays.voxels)
+    assert len(voxels_only.visited) == len(voxels_only.ore_positions) == 0
+
+
+def test_region_arrays_migrate_legacy_blob_and_cache_ore_chunks():
+    client = SimRedisClient()
+    client.set_json(
+        "se:test:memory",
+        {"voxels": [[1.0, 2.0, 3.0]], "ores": [{"material": "Gold", "position": [4.0, 5.0, 6.0], "content": 3}]},
+    )
+    ctrl = SharedMapController(owner_id="test", redis_client=client, chunk_cache_points=1000)
+
+    arrays = ctrl.load_region_arrays((0.0, 0.0, 0.0), 50.0, dtype=np.float64)
+    assert arrays.voxels.tolist() == [[1.0, 2.0, 3.0]]
+    assert arrays.ore_materials == ["Gold"]
+
+    misses = ctrl.chunk_cache.stats()["misses"]
+    ctrl.load_region_arrays((0.0, 0.0, 0.0), 50.0)
+    assert ctrl.chunk_cache.stats()["misses"] == misses
+
+    ctrl.add_ore_cells([{"material": "Iron", "position": (7.0, 5.0, 6.0)}])
+    refreshed = ctrl.load_region_arrays((0.0, 0.0, 0.0), 50.0)
+    assert sorted(refreshed.ore_materials) == ["Gold", "Iron"]
+
+
+def _lod_reference(points, cell):
+    cells = np.unique(np.floor(np.asarray(points, dtype=np.float64) / cell), axis=0)
+    return sorted(map(tuple, ((cells + 0.5) * cell).tolist()))
+
+
+@pytest.mark.parametrize("backend", ["redis", "lua", "sqlite"])
+def test_lod_levels_follow_incremental_writes_and_clears(backend, tmp_path):
+    if backend == "lua":
+        raw = FakeRedis()
+        ctrl = SharedMapController(owner_id="test", redis_client=_redis_event_client(raw), chunk_compression="none")
+    else:
+        ctrl = _controller(tmp_path if backend == "sqlite" else None)
+    points = np.round(np.random.default_rng(5).uniform(-700.0, 700.0, (3000, 3)), 2)
+    for part in np.array_split(points, 3):
+        ctrl.add_voxel_points(part.tolist())
+
+    for lod, cell in ((1, 8.0), (2, 32.0)):
+        coarse = ctrl.load_region((0.0, 0.0, 0.0), 2000.0, lod=lod, include_paths=False, include_metadata=False)
+        assert sorted(coarse.voxels) == _lod_reference(points, cell)
+    assert ctrl.lod_cell_size(2) == 32.0
+    if backend == "lua":
+        raw.round_trips = 0
+        ctrl.add_voxel_points([(1.0, 2.0, 3.0)], save=False)
+        assert raw.round_trips == 1  # LOD chunks ride in the same EVALSHA pipeline
+
+    ctrl.clear_region((100.0, 0.0, 0.0), 250.0)
+    kept = points[np.linalg.norm(points - (100.0, 0.0, 0.0), axis=1) > 250.0]
+    arrays = ctrl.load_region_arrays((0.0, 0.0, 0.0), 2000.0, kinds=("voxels",), dtype=np.float64, lod=1)
+    assert sorted(map(tuple, arrays.voxels.tolist())) == _lod_reference(kept, 8.0)
+    with pytest.raises(ValueError):
+        ctrl.load_region((0.0, 0.0, 0.0), 100.0, lod=3)
+
+
+def test_rebuild_lod_backfills_maps_written_without_it(tmp_path):
+    ctrl = _controller(tmp_path, maintain_lod=False)
+    ctrl.add_voxel_points([(x * 3.0, 1.0, 5.0) for x in range(-200, 200)])
+    ctrl.add_flight_points([(0.0, 50.0, 0.0), (700.0, 50.0, 0.0)])
+    assert ctrl.load_region((0.0, 0.0, 0.0), 1000.0, lod=2).voxels == []
+
+    counts = ctrl.rebuild_lod()
+
+    assert counts == {"voxels_lod1": 4, "voxels_lod2": 2, "visited_lod1": 2, "visited_lod2": 1}
+    data = ctrl.load_region((0.0, 0.0, 0.0), 1000.0, lod=2)
+    assert sorted(data.voxels) == [(x + 16.0, 16.0, 16.0) for x in range(-608, 600, 32)]
+    assert sorted(data.visited) == [(16.0, 48.0, 16.0), (688.0, 48.0, 16.0)]
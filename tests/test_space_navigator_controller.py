@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import math
+import time
 import types
 
 import pytest
 
 from secontrol.devices.ore_detector_device import OreDetectorDevice
 from secontrol.devices.remote_control_device import RemoteControlDevice
+from secontrol.tools.radar_fusion import FusedRadarMap
 from secontrol.tools.radar_navigation import RawRadarMap
+from secontrol.tools.reservations import ReservationTable
 
 import secontrol.controllers.space_navigator_controller as nav
 
@@ -192,6 +196,20 @@ def test_occupancy_inflation_matches_box_clearance():
     assert not inflated[0, 2, 2]
 
 
+def test_world_model_overlay_marks_remembered_cells_over_their_footprint():
+    fused = FusedRadarMap(cell_size=10.0, brick_size=4)
+    fused.integrate_scan(
+        [[15.0, 15.0, 15.0], [500.0, 500.0, 500.0]],
+        {"origin": [0.0, 0.0, 0.0], "size": [8, 8, 8], "cellSize": 10.0},
+    )
+    radar_map = _map(size=(8, 8, 8), cell=5.0)
+
+    added = nav.overlay_world_model(radar_map, fused)
+
+    assert added == 8
+    assert radar_map.occ[2:4, 2:4, 2:4].all()
+
+
 def test_waypoint_selection_respects_rescan_distance_and_boundary():
     path = [
         (0.0, 0.0, 0.0),
@@ -313,6 +331,246 @@ def test_dry_run_plans_one_bounded_segment_without_flying(monkeypatch):
     assert rc.goto_calls == 0
 
 
+class _PendingPlan:
+    def __init__(self):
+        self.cancelled = False
+
+    def done(self):
+        return self.cancelled
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
+
+class _PendingPlanner:
+    def __init__(self):
+        self.future = _PendingPlan()
+        self.kwargs = {}
+
+    def submit(self, *args, **kwargs):
+        self.kwargs = kwargs
+        return self.future
+
+
+def test_off_thread_planning_aborts_when_ship_leaves_scanned_volume(monkeypatch):
+    meta = {"origin": [0.0, 0.0, 0.0], "cellSize": 10.0, "size": [20, 20, 20], "rev": 1}
+    rc = _install_fake_controller(monkeypatch, [([], meta, [], [])])
+    coarse = nav.ScanProfile("COARSE", 100.0, 10.0, rescan_distance=50.0, clearance_voxels=0)
+    planner = _PendingPlanner()
+    cache = nav.PathCache()
+    controller = nav.SpaceNavigatorController(
+        "fake", ship_radius=0.0, coarse_scan=coarse, planner_service=planner, path_cache=cache
+    )
+    radar_map = _map(size=(20, 20, 20), cell=10.0)
+    rc.telemetry["worldPosition"] = [195.0, 45.0, 45.0]
+
+    path = controller._find_path_off_thread(
+        radar_map, (5.0, 45.0, 45.0), (85.0, 45.0, 45.0), coarse, None, scan_center=(5.0, 45.0, 45.0)
+    )
+
+    assert path == []
+    assert planner.future.cancelled
+    assert planner.kwargs["cache"] is cache
+    assert controller.state.position == (195.0, 45.0, 45.0)
+
+
+
+class _DonePlan(_PendingPlan):
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def done(self):
+        return True
+
+    def result(self):
+        return types.SimpleNamespace(path=self.path, status="complete", elapsed=0.0)
+
+
+class _RecordingPlanner:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, radar_map, start, goal, *args, **kwargs):
+        future = _DonePlan([start, goal])
+        self.submitted.append((start, goal, future))
+        return future
+
+
+def test_off_thread_planning_collects_the_search_submitted_when_the_leg_started(monkeypatch):
+    meta = {"origin": [0.0, 0.0, 0.0], "cellSize": 10.0, "size": [20, 20, 20], "rev": 1}
+    rc = _install_fake_controller(monkeypatch, [([], meta, [], [])])
+    coarse = nav.ScanProfile("COARSE", 100.0, 10.0, rescan_distance=50.0, clearance_voxels=0)
+    planner = _RecordingPlanner()
+    controller = nav.SpaceNavigatorController("fake", ship_radius=0.0, coarse_scan=coarse, planner_service=planner)
+    radar_map = _map(size=(20, 20, 20), cell=10.0)
+    goal = (85.0, 45.0, 45.0)
+    rc.telemetry["worldPosition"] = [45.0, 45.0, 45.0]
+
+    controller._submit_next_plan(radar_map, (45.0, 45.0, 45.0), goal, coarse)
+    path = controller._find_path_off_thread(radar_map, (47.0, 45.0, 45.0), goal, coarse, None)
+
+    assert path == [(45.0, 45.0, 45.0), goal]
+    assert len(planner.submitted) == 1
+
+    # A fresh scan invalidates the prefetched search.
+    controller._submit_next_plan(radar_map, (45.0, 45.0, 45.0), goal, coarse)
+    stale = planner.submitted[-1][2]
+    path = controller._find_path_off_thread(_map(size=(20, 20, 20), cell=10.0), (47.0, 45.0, 45.0), goal, coarse, None)
+
+    assert stale.cancelled
+    assert path == [(47.0, 45.0, 45.0), goal]
+    assert len(planner.submitted) == 3
+
+def test_incremental_replanning_repairs_scans_taken_from_a_moved_ship(monkeypatch, capsys):
+    _install_fake_controller(monkeypatch, [([], {}, [], [])])
+    fine = nav.ScanProfile("FINE", 300.0, 10.0, rescan_distance=50.0, clearance_voxels=1)
+    controller = nav.SpaceNavigatorController(
+        "fake", ship_radius=0.0, fine_scan=fine, incremental_replanning=True
+    )
+    meta = {"cellSize": 10.0, "size": [1, 1, 1], "rev": 1}
+    wall = [
+        (65.0, float(y), float(z))
+        for y in range(-295, 300, 10)
+        for z in range(-295, 300, 10)
+        if abs(y) > 40 or abs(z) > 40
+    ]
+    goal = (125.0, 4.0, 5.0)
+
+    first = nav.build_map_with_ships(wall, meta, [], ship_radius=0.0, scan_center=(3.0, 4.0, 5.0), scan_profile=fine)
+    second = nav.build_map_with_ships(
+        wall + [(65.0, 5.0, 5.0)], meta, [], ship_radius=0.0, scan_center=(15.3, 4.0, 5.0), scan_profile=fine
+    )
+
+    assert controller._find_path_incremental(first, (3.0, 4.0, 5.0), goal, fine)
+    planner = controller._incremental_planner
+    frame = planner.radar_map
+    assert frame.size[0] < first.size[0]
+
+    path = controller._find_path_incremental(second, (15.3, 4.0, 5.0), goal, fine)
+
+    assert "incremental D* Lite" in capsys.readouterr().out.splitlines()[-1]
+    assert controller._incremental_planner is planner and planner.radar_map is frame
+    assert path and math.dist(path[-1], goal) < 10.0
+    assert min(math.dist(p, (65.0, 5.0, 5.0)) for p in path) > 10.0
+
+
+def test_hierarchical_paths_refine_only_the_next_legs_to_a_distant_target(monkeypatch, capsys):
+    meta = {"origin": [0.0, 0.0, 0.0], "cellSize": 10.0, "size": [60, 20, 20], "rev": 1}
+    _install_fake_controller(monkeypatch, [([], meta, [], [])])
+    coarse = nav.ScanProfile("COARSE", 300.0, 10.0, rescan_distance=60.0, clearance_voxels=0)
+    controller = nav.SpaceNavigatorController(
+        "fake",
+        ship_radius=0.0,
+        coarse_scan=coarse,
+        arrival_distance=5.0,
+        dry_run=True,
+        max_steps=1,
+        hierarchical_paths=True,
+        hierarchical_chunk_cells=4,
+    )
+
+    result = controller.navigate_to((1850.0, 45.0, 45.0))
+
+    assert result.status == "dry_run"
+    line = next(line for line in capsys.readouterr().out.splitlines() if line.startswith("[PATH] hier"))
+    assert line.startswith("[PATH] hierarchical:")
+    waypoints = int(line.split()[2])
+    assert 1 < waypoints < 20
+
+
+def test_reserved_planning_books_around_better_ranked_drones_and_stops_when_preempted(monkeypatch):
+    meta = {"origin": [0.0, 0.0, 0.0], "cellSize": 10.0, "size": [20, 20, 20], "rev": 1}
+    _install_fake_controller(monkeypatch, [([], meta, [], [])])
+    coarse = nav.ScanProfile("COARSE", 100.0, 10.0, rescan_distance=50.0, clearance_voxels=0)
+    table = ReservationTable(block_size=10.0)
+    # A better-ranked drone parks across the straight line to the target.
+    table.reserve("hauler", [((x, 4, 4), 0.0, math.inf) for x in range(2, 7)], priority=5)
+    controller = nav.SpaceNavigatorController(
+        "fake",
+        ship_radius=0.0,
+        coarse_scan=coarse,
+        arrival_distance=5.0,
+        dry_run=True,
+        max_steps=1,
+        reservations=table,
+        reservation_agent="miner",
+    )
+
+    booked = []
+    reserve_path = table.reserve_path
+
+    def _record(agent, path, **kwargs):
+        ok = reserve_path(agent, path, **kwargs)
+        booked.extend(table.reservations(agent))
+        return ok
+
+    monkeypatch.setattr(table, "reserve_path", _record)
+
+    result = controller.navigate_to((85.0, 45.0, 45.0))
+
+    assert result.status == "dry_run"
+    assert booked and math.isfinite(booked[-1].end)
+    assert all(item.block not in {(x, 4, 4) for x in range(2, 7)} for item in booked)
+    # A dry run never flies the route, so the booking is handed back.
+    assert table.reservations("miner") == []
+
+    table.reserve("miner", [(item.block, item.start, item.end) for item in booked])
+    assert controller._leg_abort_reason(coarse, (5.0, 45.0, 45.0), None) is None
+
+    table.reserve("hauler", [(booked[1].block, booked[1].start, booked[1].end)], priority=5)
+
+    assert "preempted" in controller._leg_abort_reason(coarse, (5.0, 45.0, 45.0), None)
+
+
+def test_arrived_navigation_parks_with_a_finite_hold_and_stop_releases_it(monkeypatch):
+    meta = {"origin": [0.0, 0.0, 0.0], "cellSize": 10.0, "size": [20, 20, 20], "rev": 1}
+    _install_fake_controller(monkeypatch, [([], meta, [], [])])
+    table = ReservationTable(block_size=10.0)
+    controller = nav.SpaceNavigatorController(
+        "fake",
+        ship_radius=0.0,
+        dry_run=True,
+        reservations=table,
+        reservation_agent="miner",
+        reservation_hold=20.0,
+    )
+    table.reserve("miner", [((x, 4, 4), 0.0, math.inf) for x in range(2, 7)])
+    arrived = nav.NavigationResult(
+        "arrived", (45.0, 45.0, 45.0), (45.0, 45.0, 45.0), (45.0, 45.0, 45.0), "FINE", 1, 0
+    )
+
+    before = time.time()
+    controller._settle_reservations(arrived)
+
+    (parked,) = table.reservations("miner")
+    assert parked.block == (4, 4, 4)
+    assert before + 20.0 <= parked.end <= time.time() + 20.0
+
+    controller.stop()
+
+    assert table.reservations("miner") == []
+
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"incremental_replanning": True, "hierarchical_paths": True},
+        {"reservations": ReservationTable(), "planner_service": _PendingPlanner()},
+        {"hierarchical_paths": True, "planner_service": _PendingPlanner()},
+        {"reservations": ReservationTable(), "any_angle_paths": True},
+        {"reservations": ReservationTable(), "path_cache": nav.PathCache()},
+        {"incremental_replanning": True, "path_cache": nav.PathCache()},
+    ],
+)
+def test_planner_options_that_would_be_ignored_are_rejected(monkeypatch, options):
+    _install_fake_controller(monkeypatch, [([], {}, [], [])])
+
+    with pytest.raises(ValueError):
+        nav.SpaceNavigatorController("fake", ship_radius=0.0, **options)
+
 def test_initial_scan_uses_fine_profile_when_target_is_already_close(monkeypatch):
     meta = {"origin": [0.0, 0.0, 0.0], "cellSize": 10.0, "size": [20, 20, 20], "rev": 1}
     rc = _install_fake_controller(monkeypatch, [([], meta, [], [])])
@@ -654,3 +912,18 @@ def test_obstacle_target_does_not_switch_to_fine_from_resolved_goal(monkeypatch)
     assert result.status == "max_steps"
     assert result.profile == "COARSE"
     assert result.scan_count == 2
+
+
+def test_waypoint_selection_interpolates_long_legs():
+    path = [(0.0, 0.0, 0.0), (2000.0, 0.0, 0.0)]
+
+    assert nav.pick_waypoint_along_path(path, (0.0, 0.0, 0.0), rescan_distance=500.0) is None
+    waypoint = nav.pick_waypoint_along_path(
+        path,
+        (0.0, 0.0, 0.0),
+        rescan_distance=500.0,
+        interpolate=True,
+    )
+
+    assert waypoint[0] == pytest.approx(500.0)
+    assert waypoint[1:] == (0.0, 0.0)
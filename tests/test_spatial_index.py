@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from secontrol.tools.spatial_index import PointGridIndex
+
+import secontrol.controllers.space_navigator_controller as nav
+
+
+def _cloud(n=2000, seed=3):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-500.0, 500.0, size=(n, 3))
+
+
+def test_nearest_matches_brute_force():
+    points = _cloud()
+    index = PointGridIndex(points, 40.0)
+
+    for query in [(0.0, 0.0, 0.0), (480.0, -470.0, 10.0), (2000.0, 0.0, 0.0)]:
+        expected = float(np.min(np.linalg.norm(points - np.asarray(query), axis=1)))
+        distance, nearest = index.nearest(query)
+        assert distance == pytest.approx(expected)
+        assert nearest is not None
+
+
+def test_radius_and_capsule_queries_match_brute_force():
+    points = _cloud()
+    index = PointGridIndex(points)
+
+    center = np.array([100.0, 50.0, -20.0])
+    inside = index.query_radius(center, 150.0)
+    expected = points[np.linalg.norm(points - center, axis=1) <= 150.0]
+    assert sorted(map(tuple, inside)) == sorted(map(tuple, expected))
+
+    a = np.array([-400.0, 0.0, 0.0])
+    b = np.array([400.0, 0.0, 0.0])
+    t = np.clip((points - a) @ (b - a) / float((b - a) @ (b - a)), 0.0, 1.0)
+    lateral = np.linalg.norm(points - (a + t[:, None] * (b - a)), axis=1)
+    capsule = index.query_capsule(a, b, 60.0)
+    assert len(capsule) == int(np.sum(lateral <= 60.0))
+
+
+def test_corridor_distance_matches_navigator_brute_force():
+    points = _cloud(n=500, seed=11)
+    index = PointGridIndex(points, 50.0)
+    kwargs = {"lookahead": 800.0, "corridor_radius": 90.0}
+
+    for target in [(500.0, 0.0, 0.0), (0.0, -500.0, 300.0)]:
+        brute = nav.corridor_free_distance((-450.0, 0.0, 0.0), target, points.tolist(), **kwargs)
+        indexed = nav.corridor_free_distance((-450.0, 0.0, 0.0), target, index, **kwargs)
+        assert indexed == pytest.approx(brute)
+
+
+def test_empty_index_reports_clear_space():
+    index = PointGridIndex([])
+
+    assert len(index) == 0
+    assert nav.nearest_point_distance(index, (0.0, 0.0, 0.0)) == float("inf")
+    assert index.query_radius((0.0, 0.0, 0.0), 10.0).shape == (0, 3)
+    assert index.corridor_free_distance((0.0, 0.0, 0.0), (1.0, 0.0, 0.0), lookahead=50.0, corridor_radius=5.0) == 50.0